@@ -11,6 +11,29 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./teacher_evaluation.db"
     
+    # SQLite 生产配置（仅 DATABASE_URL 为 sqlite 时生效）
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256MB
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 64MB
+    SQLITE_POOL_SIZE: int = 10
+    
+    # 管理端同步发件箱
+    ADMIN_API_URL: str = "http://localhost:8001"
+    SYNC_OUTBOX_BATCH_SIZE: int = 100
+    SYNC_OUTBOX_POLL_INTERVAL: float = 2.0
+    SYNC_OUTBOX_MAX_ATTEMPTS: int = 10
+    SYNC_OUTBOX_BACKOFF_BASE: float = 2.0
+    SYNC_OUTBOX_BACKOFF_MAX: float = 600.0
+    SYNC_OUTBOX_CONCURRENCY: int = 10
+    # 领取后的租期（秒）：租期内其他 worker 进程跳过该消息，发送中进程退出时租期过后重新发送
+    SYNC_OUTBOX_CLAIM_LEASE: float = 300.0
+    
+    # 评分结果缓存：超过 TTL（秒）后向管理端条件请求重新验证，管理端不可用时返回缓存
+    SCORING_CACHE_TTL: int = 300
+    SCORING_CACHE_REVALIDATE_TIMEOUT: float = 3.0
+    # 调用管理端服务间接口的共享令牌（与管理端 SYNC_SERVICE_TOKEN 一致，未设置时不发送）
+    SYNC_SERVICE_TOKEN: Optional[str] = None
+    
     # Redis 配置
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_HOST: str = "localhost"
@@ -18,6 +41,15 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
     
+    # WebSocket 推送的跨进程广播：memory（单进程）| redis（多 worker 部署，使用 REDIS_URL）
+    WEBSOCKET_BACKPLANE: str = "memory"
+    WEBSOCKET_REDIS_CHANNEL: str = "teacher:websocket"
+    WEBSOCKET_PUBLISH_QUEUE_SIZE: int = 10000
+    WEBSOCKET_REDIS_RETRY_INTERVAL: float = 1.0
+    # 每个连接最多排队的消息数（满时丢弃最旧的），单条消息发送超时（秒，超时断开该连接）
+    WEBSOCKET_QUEUE_SIZE: int = 100
+    WEBSOCKET_SEND_TIMEOUT: float = 10.0
+    
     # JWT 配置
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
@@ -9,8 +9,27 @@ from app.config import settings
 if settings.DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         settings.DATABASE_URL,
-        connect_args={"check_same_thread": False}
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        },
+        pool_size=settings.SQLITE_POOL_SIZE,
+        max_overflow=20
     )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL 模式下读写互不阻塞，写锁被占用时等待 busy_timeout 而不是立即报错"""
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
 else:
     engine = create_engine(
         settings.DATABASE_URL,
@@ -44,6 +63,8 @@ def init_db():
         from app.models.evaluation_task import EvaluationTask
         from app.models.evaluation_data import EvaluationData
         from app.models.material import DistributedMaterial, TeacherSubmission, EvaluationTaskModel
+        from app.models.sync_outbox import SyncOutbox
+        from app.models.scoring_cache import ScoringRecordCache
         
         # 创建所有表
         Base.metadata.create_all(bind=engine)
@@ -3,6 +3,8 @@ from app.models.system_config import SystemConfig
 from app.models.evaluation_task import EvaluationTask
 from app.models.evaluation_data import EvaluationData
 from app.models.material import DistributedMaterial, TeacherSubmission, EvaluationTaskModel
+from app.models.sync_outbox import SyncOutbox
+from app.models.scoring_cache import ScoringRecordCache
 
 __all__ = [
     "Base",
@@ -11,5 +13,7 @@ __all__ = [
     "EvaluationData",
     "DistributedMaterial",
     "TeacherSubmission",
-    "EvaluationTaskModel"
+    "EvaluationTaskModel",
+    "SyncOutbox",
+    "ScoringRecordCache"
 ]
@@ -0,0 +1,19 @@
+"""
+评分结果缓存模型
+"""
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime
+from app.models.base import Base
+
+
+class ScoringRecordCache(Base):
+    """提交材料评分记录的本地缓存 - 由管理端推送填充，过期后向管理端条件请求重新验证"""
+    __tablename__ = "scoring_record_cache"
+    
+    submission_id = Column(String, primary_key=True)
+    records = Column(JSON, nullable=False)  # 管理端返回的逐条评分记录（原始格式）
+    scoring_result = Column(JSON)
+    review_status = Column(String(20))
+    etag = Column(String(64), nullable=False)  # 管理端快照的 ETag
+    source_updated_at = Column(DateTime, nullable=True)  # 管理端数据的最后修改时间
+    refreshed_at = Column(DateTime, default=datetime.utcnow)  # 最近一次确认与管理端一致的时间
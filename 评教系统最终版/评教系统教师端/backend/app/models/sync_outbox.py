@@ -0,0 +1,29 @@
+"""
+向管理端同步的发件箱模型
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, JSON, Index
+from datetime import datetime
+from app.models.base import Base
+
+
+class SyncOutbox(Base):
+    """同步发件箱 - 与业务数据在同一事务中写入，由后台分发器发送到管理端"""
+    __tablename__ = "sync_outbox"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(200), nullable=False, unique=True)  # 同一消息只入队一次
+    path = Column(String(200), nullable=False)  # 管理端同步接口
+    payload = Column(JSON, nullable=False)
+    submission_id = Column(String(50), nullable=True)  # 材料提交消息发送成功后标记 synced_to_admin
+    
+    status = Column(String(20), default="pending")  # pending/sent/failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # 下次发送时间（退避重试）
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_sync_outbox_status_next_attempt", "status", "next_attempt_at", "id"),
+    )
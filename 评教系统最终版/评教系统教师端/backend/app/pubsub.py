@@ -0,0 +1,156 @@
+"""
+WebSocket 推送的跨进程广播（backplane）
+
+多个 uvicorn worker 部署时，用户的连接可能在任一进程中。通知先发布到 backplane，
+每个进程订阅 backplane 并推送给本进程的连接，因此不会因为连接在其他 worker 上而丢失通知。
+
+- InMemoryBackplane：进程内广播，单 worker 部署的默认实现；多个连接管理器共用一个实例即可模拟多 worker
+- RedisBackplane：Redis pub/sub（WEBSOCKET_BACKPLANE=redis，连接 REDIS_URL）
+"""
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from app.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str], None]
+
+
+class InMemoryBackplane:
+    """进程内广播：publish 直接调用本实例上的所有订阅回调"""
+
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+
+    def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: MessageHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, message: str):
+        for handler in list(self._handlers):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.error(f"处理广播消息失败: {str(e)}")
+
+
+class RedisBackplane:
+    """
+    Redis pub/sub 广播
+
+    所有进程订阅同一个频道，发布的消息（包括本进程发布的）由订阅协程分发；
+    publish 不等待，消息放入有界队列后由发布协程按顺序发送到 Redis。
+    """
+
+    def __init__(self, url: Optional[str] = None, channel: Optional[str] = None,
+                 queue_size: Optional[int] = None, retry_interval: Optional[float] = None):
+        if aioredis is None:
+            raise RuntimeError("未安装 redis，无法使用 Redis 广播")
+        self.url = url or settings.REDIS_URL
+        self.channel = channel or settings.WEBSOCKET_REDIS_CHANNEL
+        self.queue_size = queue_size or settings.WEBSOCKET_PUBLISH_QUEUE_SIZE
+        self.retry_interval = retry_interval or settings.WEBSOCKET_REDIS_RETRY_INTERVAL
+        self.dropped = 0
+
+        self._handlers: List[MessageHandler] = []
+        self._redis = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: MessageHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._subscribe_loop())
+        ]
+        logger.info(f"已连接 Redis 广播频道 {self.channel}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def publish(self, message: str):
+        if self._queue is None:
+            logger.warning("Redis 广播未启动，消息被丢弃")
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"待发布消息超过 {self.queue_size} 条，消息被丢弃")
+
+    async def _publish_loop(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._redis.publish(self.channel, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f"发布到 Redis 失败: {str(e)}")
+
+    async def _subscribe_loop(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    for handler in list(self._handlers):
+                        try:
+                            handler(item["data"])
+                        except Exception as e:
+                            logger.error(f"处理广播消息失败: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis 订阅断开，{self.retry_interval} 秒后重连: {str(e)}")
+                await asyncio.sleep(self.retry_interval)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+def create_backplane():
+    """按 WEBSOCKET_BACKPLANE 创建广播实现，Redis 不可用时回退到进程内广播"""
+    if settings.WEBSOCKET_BACKPLANE == "redis":
+        if aioredis is not None:
+            return RedisBackplane()
+        logger.warning("WEBSOCKET_BACKPLANE=redis 但未安装 redis，使用进程内广播（多 worker 时通知只推送给本进程的连接）")
+    return InMemoryBackplane()
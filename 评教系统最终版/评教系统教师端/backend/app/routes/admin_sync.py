@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from app.database import get_db
 from app.models.material import DistributedMaterial, TeacherSubmission
@@ -24,6 +24,32 @@ class DistributionSyncRequest(BaseModel):
     distributed_at: str
 
 
+class DistributionBulkSyncRequest(BaseModel):
+    """批量分发同步请求"""
+    distributions: List[DistributionSyncRequest]
+
+
+def _parse_sync_datetime(value: str) -> datetime:
+    """解析管理端传来的时间：ISO 格式，或去掉微秒后的格式，都失败时使用当前时间"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except Exception:
+        try:
+            return datetime.fromisoformat(value.split('.')[0])
+        except Exception:
+            return datetime.now()
+
+
+def _is_outdated(incoming: datetime, current: Optional[datetime]) -> bool:
+    """
+    管理端的审核/评分消息经发件箱并发发送、失败后重试，可能乱序到达：
+    比已保存的审核/评分时间更早的消息是过期消息，不能覆盖更新的状态
+    """
+    if current is None:
+        return False
+    return incoming.replace(tzinfo=None) < current.replace(tzinfo=None)
+
+
 class ReviewSyncRequest(BaseModel):
     """审核同步请求"""
     submission_id: str
@@ -100,6 +126,57 @@ async def sync_distribution(
         )
 
 
+@router.post("/sync-distributions", response_model=dict)
+async def sync_distributions(
+    data: DistributionBulkSyncRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    批量接收管理端的材料分发信息
+
+    一次查询已存在的记录，新记录一次提交；已存在的（同一材料、同一教师）跳过。
+    """
+    try:
+        keys = {(d.material_id, d.teacher_id) for d in data.distributions}
+        existing = set(
+            db.query(DistributedMaterial.material_id, DistributedMaterial.teacher_id).filter(
+                DistributedMaterial.material_id.in_({material_id for material_id, _ in keys}),
+                DistributedMaterial.teacher_id.in_({teacher_id for _, teacher_id in keys})
+            ).all()
+        )
+
+        created = 0
+        for d in data.distributions:
+            key = (d.material_id, d.teacher_id)
+            if key in existing:
+                continue
+            existing.add(key)
+            db.add(DistributedMaterial(
+                material_id=d.material_id,
+                teacher_id=d.teacher_id,
+                material_name=d.material_name,
+                material_type=d.material_type,
+                file_url=d.file_url,
+                file_size=0,
+                distributed_at=_parse_sync_datetime(d.distributed_at),
+                is_viewed=False
+            ))
+            created += 1
+
+        db.commit()
+        print(f"✅ 批量材料同步成功: 新建 {created}，跳过 {len(data.distributions) - created}")
+
+        return {"message": "同步成功", "created": created, "existing": len(data.distributions) - created}
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ 批量同步失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"同步失败: {str(e)}"
+        )
+
+
 @router.put("/sync-review", response_model=dict)
 async def sync_review_status(
     data: ReviewSyncRequest,
@@ -120,10 +197,14 @@ async def sync_review_status(
                 detail="提交记录不存在"
             )
         
+        reviewed_at = datetime.fromisoformat(data.reviewed_at.replace('Z', '+00:00'))
+        if _is_outdated(reviewed_at, submission.reviewed_at):
+            return {"message": "已有更新的审核状态，忽略过期消息"}
+
         # 更新审核状态
         submission.review_status = data.status
         submission.review_feedback = data.feedback
-        submission.reviewed_at = datetime.fromisoformat(data.reviewed_at.replace('Z', '+00:00'))
+        submission.reviewed_at = reviewed_at
         
         db.commit()
         
@@ -182,6 +263,11 @@ class EvaluationTaskSyncRequest(BaseModel):
     deadline: str
 
 
+class EvaluationTaskBulkSyncRequest(BaseModel):
+    """批量考评任务同步请求"""
+    tasks: List[EvaluationTaskSyncRequest]
+
+
 @router.post("/sync-evaluation-task", response_model=dict)
 async def sync_evaluation_task(
     data: EvaluationTaskSyncRequest,
@@ -248,6 +334,98 @@ async def sync_evaluation_task(
 
 
 
+@router.post("/sync-evaluation-tasks", response_model=dict)
+async def sync_evaluation_tasks(
+    data: EvaluationTaskBulkSyncRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    批量接收管理端的考评任务分配信息
+
+    一次查询已存在的任务，新任务一次提交；已存在的任务跳过（重复分配幂等）。
+    """
+    try:
+        from app.models.material import EvaluationTaskModel
+
+        existing = {
+            task_id for task_id, in db.query(EvaluationTaskModel.task_id).filter(
+                EvaluationTaskModel.task_id.in_({t.task_id for t in data.tasks})
+            )
+        }
+
+        created = 0
+        now = datetime.now()
+        for t in data.tasks:
+            if t.task_id in existing:
+                continue
+            existing.add(t.task_id)
+            db.add(EvaluationTaskModel(
+                task_id=t.task_id,
+                template_id=t.template_id,
+                teacher_id=t.teacher_id,
+                template_name=t.template_name,
+                template_file_url=t.template_file_url,
+                template_file_type=t.template_file_type,
+                submission_requirements=t.submission_requirements or {},
+                scoring_criteria=t.scoring_criteria or [],
+                total_score=t.total_score,
+                status="pending",
+                deadline=_parse_sync_datetime(t.deadline),
+                created_at=now,
+                updated_at=now
+            ))
+            created += 1
+
+        db.commit()
+        print(f"批量考评任务同步成功: 新建 {created}，跳过 {len(data.tasks) - created}")
+
+        return {"message": "考评任务同步成功", "created": created, "existing": len(data.tasks) - created}
+
+    except Exception as e:
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"同步失败: {str(e)}"
+        )
+
+
+class ScoringRecordsSyncRequest(BaseModel):
+    """提交材料评分记录快照同步请求"""
+    submission_id: str
+    review_status: Optional[str] = None
+    scoring_result: Optional[dict] = None
+    records: List[dict] = []
+    updated_at: Optional[str] = None
+    etag: str
+
+
+@router.post("/sync-scoring-records", response_model=dict)
+async def sync_scoring_records(
+    data: ScoringRecordsSyncRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    接收管理端推送的评分记录快照，写入本地评分结果缓存
+    """
+    try:
+        from app.services.scoring_cache_service import store
+        
+        updated = store(db, data.model_dump())
+        db.commit()
+        return {"message": "评分记录同步成功", "updated": updated}
+        
+    except Exception as e:
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"同步失败: {str(e)}"
+        )
+
+
 class EvaluationScoreSyncRequest(BaseModel):
     """考评评分同步请求"""
     task_id: str
@@ -293,6 +471,9 @@ async def sync_evaluation_score(
                     scored_at = datetime.fromisoformat(data.scored_at)
             except Exception:
                 scored_at = datetime.now()
+
+        if _is_outdated(scored_at, task.scored_at):
+            return {"message": "已有更新的评分结果，忽略过期消息"}
         
         # 更新任务评分信息
         task.scores = data.scores
@@ -386,13 +386,11 @@ async def submit_evaluation_files(
         task.status = "submitted"
         task.updated_at = datetime.now()
         
-        db.commit()
-        
-        # 同步到管理端
-        import asyncio
-        from app.services.evaluation_sync_service import sync_evaluation_submission_to_admin
+        # 同步消息随任务更新一起写入发件箱，由后台分发器发送到管理端（失败自动重试）
+        from app.services.admin_outbox_service import enqueue_evaluation_submission, admin_outbox_dispatcher
         
-        asyncio.create_task(sync_evaluation_submission_to_admin(
+        enqueue_evaluation_submission(
+            db,
             task_id=task.task_id,
             template_id=task.template_id,
             teacher_id=CURRENT_TEACHER_ID,
@@ -400,7 +398,9 @@ async def submit_evaluation_files(
             files=files_info,
             notes=notes,
             submitted_at=task.submitted_at.isoformat()
-        ))
+        )
+        db.commit()
+        admin_outbox_dispatcher.notify()
         
         return {
             "task_id": task.task_id,
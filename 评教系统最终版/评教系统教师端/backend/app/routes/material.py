@@ -281,22 +281,22 @@ async def submit_materials(
         )
         
         db.add(submission)
-        db.commit()
-        db.refresh(submission)
         
-        # 【修改】异步调用同步服务，不阻塞返回
-        import asyncio
-        from app.services.admin_sync_service import sync_submission_to_admin
+        # 同步消息随提交记录一起写入发件箱，由后台分发器发送到管理端（失败自动重试）
+        from app.services.admin_outbox_service import enqueue_submission, admin_outbox_dispatcher
         
-        # 在后台执行同步，不等待结果
-        asyncio.create_task(sync_submission_to_admin(
+        enqueue_submission(
+            db,
             submission_id=submission.submission_id,
             teacher_id=CURRENT_TEACHER_ID,
             teacher_name=CURRENT_TEACHER_NAME,
             files=files_info,
             notes=submit_data.notes or "",
             submitted_at=submission.submitted_at.isoformat()
-        ))
+        )
+        db.commit()
+        db.refresh(submission)
+        admin_outbox_dispatcher.notify()
         
         return {
             "submission_id": submission.submission_id,
@@ -375,70 +375,12 @@ async def get_submission_scoring_results(
                 detail="提交记录不存在或无权访问"
             )
         
-        # 调用管理端API获取评分记录
-        import httpx
-        import json
+        # 读取本地评分结果缓存（由管理端推送），过期时向管理端条件请求重新验证
+        from app.services.scoring_cache_service import get_scoring_records, format_scoring_records
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"http://localhost:8001/api/scoring/records/{submission_id}",
-                    timeout=10.0
-                )
-                
-                if response.status_code == 404:
-                    # 还没有评分记录
-                    return {
-                        "submission_id": submission_id,
-                        "scoring_records": [],
-                        "has_scoring": False,
-                        "message": "暂无评分结果"
-                    }
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="获取评分结果失败"
-                    )
-                
-                data = response.json()
-                records = data.get("records", [])
-                
-                # 格式化评分记录
-                formatted_records = []
-                for record in records:
-                    score_details = record.get("score_details", {})
-                    if isinstance(score_details, str):
-                        try:
-                            score_details = json.loads(score_details)
-                        except:
-                            score_details = {}
-                    
-                    formatted_records.append({
-                        "id": record.get("id"),
-                        "file_name": record.get("file_name"),
-                        "file_type": record.get("file_type"),
-                        "final_score": record.get("final_score"),
-                        "grade": record.get("grade"),
-                        "base_score": record.get("base_score", 0),
-                        "bonus_score": record.get("bonus_score", 0),
-                        "score_details": score_details,
-                        "is_confirmed": record.get("is_confirmed", False),
-                        "scoring_type": record.get("scoring_type", "auto"),
-                        "scored_at": record.get("scored_at"),
-                        "veto_triggered": record.get("veto_triggered", False),
-                        "veto_reason": record.get("veto_reason")
-                    })
-                
-                return {
-                    "submission_id": submission_id,
-                    "scoring_records": formatted_records,
-                    "has_scoring": len(formatted_records) > 0,
-                    "total_records": len(formatted_records)
-                }
-        
-        except httpx.RequestError as e:
-            # 管理端API不可用
+        result = await get_scoring_records(db, submission_id)
+        if result["records"] is None:
+            # 管理端API不可用且没有缓存
             return {
                 "submission_id": submission_id,
                 "scoring_records": [],
@@ -446,6 +388,23 @@ async def get_submission_scoring_results(
                 "message": "评分服务暂不可用"
             }
         
+        formatted_records = format_scoring_records(result["records"])
+        if not formatted_records:
+            # 还没有评分记录
+            return {
+                "submission_id": submission_id,
+                "scoring_records": [],
+                "has_scoring": False,
+                "message": "暂无评分结果"
+            }
+        
+        return {
+            "submission_id": submission_id,
+            "scoring_records": formatted_records,
+            "has_scoring": True,
+            "total_records": len(formatted_records)
+        }
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,243 @@
+"""
+向管理端同步的发件箱服务
+
+提交接口把同步消息与提交记录在同一事务中写入 sync_outbox 表后立即返回，
+后台分发器复用一个 httpx 连接池发送到管理端，失败按指数退避重试，超过次数标记为 failed。
+管理端重启或暂时不可用时消息不会丢失，恢复后继续发送。
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.material import TeacherSubmission
+from app.models.sync_outbox import SyncOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(db: Session, idempotency_key: str, path: str, payload: Dict,
+            submission_id: Optional[str] = None):
+    """
+    将消息加入发件箱（由调用方随业务数据一起提交），幂等键已存在时跳过
+    """
+    # 会话未开启 autoflush，同一事务中尚未写入的消息需要单独检查
+    pending = any(
+        isinstance(obj, SyncOutbox) and obj.idempotency_key == idempotency_key for obj in db.new
+    )
+    if pending or db.query(SyncOutbox.id).filter(SyncOutbox.idempotency_key == idempotency_key).first():
+        return
+    db.add(SyncOutbox(
+        idempotency_key=idempotency_key,
+        path=path,
+        payload=payload,
+        submission_id=submission_id,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    ))
+
+
+def enqueue_submission(db: Session, submission_id: str, teacher_id: str, teacher_name: str,
+                       files: list, notes: str, submitted_at: str):
+    """材料提交同步消息（/api/teacher/sync-submission）"""
+    enqueue(
+        db,
+        f"submission:{submission_id}",
+        "/api/teacher/sync-submission",
+        {
+            "submission_id": submission_id,
+            "teacher_id": teacher_id,
+            "teacher_name": teacher_name,
+            "files": files,
+            "notes": notes,
+            "submitted_at": submitted_at
+        },
+        submission_id=submission_id
+    )
+
+
+def enqueue_evaluation_submission(db: Session, task_id: str, template_id: str, teacher_id: str,
+                                  teacher_name: str, files: list, notes: str, submitted_at: str):
+    """考评提交同步消息（/api/evaluation-tasks/sync-submission），每次提交是一条新消息"""
+    enqueue(
+        db,
+        f"evaluation-submission:{task_id}:{submitted_at}",
+        "/api/evaluation-tasks/sync-submission",
+        {
+            "task_id": task_id,
+            "template_id": template_id,
+            "teacher_id": teacher_id,
+            "teacher_name": teacher_name,
+            "files": files,
+            "notes": notes,
+            "submitted_at": submitted_at
+        }
+    )
+
+
+def backoff_delay(attempts: int) -> float:
+    """第 attempts 次发送失败后的等待秒数"""
+    return min(settings.SYNC_OUTBOX_BACKOFF_BASE * (2 ** max(0, attempts - 1)),
+               settings.SYNC_OUTBOX_BACKOFF_MAX)
+
+
+class AdminOutboxDispatcher:
+    """
+    发件箱分发器：领取到期消息，有限并发发送到管理端，记录结果
+
+    每个 uvicorn worker 进程各自运行一个分发器，领取时把消息的 next_attempt_at 推迟一个租期
+    （以原 next_attempt_at 为条件更新，只有更新成功的进程发送该消息），同一条消息不会被多个进程同时发送。
+    """
+
+    def __init__(self, session_factory=SessionLocal, base_url: str = settings.ADMIN_API_URL,
+                 batch_size: int = settings.SYNC_OUTBOX_BATCH_SIZE,
+                 poll_interval: float = settings.SYNC_OUTBOX_POLL_INTERVAL,
+                 max_attempts: int = settings.SYNC_OUTBOX_MAX_ATTEMPTS,
+                 concurrency: int = settings.SYNC_OUTBOX_CONCURRENCY):
+        self.session_factory = session_factory
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.concurrency = max(1, concurrency)
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self):
+        """启动后台分发"""
+        if self._task is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency)
+        )
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台分发，未发送的消息留在发件箱中"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._client.aclose()
+        self._client = None
+
+    def notify(self):
+        """有新消息入队时调用，立即开始发送"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[同步发件箱] 分发异常: {str(e)}")
+                claimed = 0
+
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self) -> int:
+        """领取并发送一批到期消息，返回领取数"""
+        messages = await asyncio.to_thread(self._claim_due)
+        if not messages:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(message: Dict) -> Optional[str]:
+            async with semaphore:
+                try:
+                    response = await self._client.post(message["path"], json=message["payload"])
+                except httpx.HTTPError as e:
+                    return f"连接管理端失败: {str(e)}"
+                if response.status_code not in (200, 201):
+                    return f"{response.status_code} {response.text[:200]}"
+                return None
+
+        errors = await asyncio.gather(*(send(message) for message in messages))
+        await asyncio.to_thread(self._record, messages, errors)
+        return len(messages)
+
+    def _claim_due(self) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            rows = db.query(SyncOutbox).filter(
+                SyncOutbox.status == "pending",
+                SyncOutbox.next_attempt_at <= now
+            ).order_by(SyncOutbox.id).limit(self.batch_size).all()
+
+            lease_until = now + timedelta(seconds=settings.SYNC_OUTBOX_CLAIM_LEASE)
+            claimed = []
+            for row in rows:
+                # 以读取到的 next_attempt_at 为条件推迟租期，其他进程已领取的消息更新行数为 0
+                updated = db.query(SyncOutbox).filter(
+                    SyncOutbox.id == row.id,
+                    SyncOutbox.status == "pending",
+                    SyncOutbox.next_attempt_at == row.next_attempt_at
+                ).update({SyncOutbox.next_attempt_at: lease_until}, synchronize_session=False)
+                if updated:
+                    claimed.append({"id": row.id, "path": row.path, "payload": row.payload,
+                                    "submission_id": row.submission_id, "attempts": row.attempts or 0})
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record(self, messages: List[Dict], errors: List[Optional[str]]):
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            synced_submissions = []
+            for message, error in zip(messages, errors):
+                attempts = message["attempts"] + 1
+                values = {SyncOutbox.attempts: attempts, SyncOutbox.last_error: error}
+                if error is None:
+                    values[SyncOutbox.status] = "sent"
+                    values[SyncOutbox.sent_at] = now
+                    if message["submission_id"]:
+                        synced_submissions.append(message["submission_id"])
+                elif attempts >= self.max_attempts:
+                    values[SyncOutbox.status] = "failed"
+                    logger.error(f"[同步发件箱] 消息 {message['id']} 发送 {attempts} 次失败，已放弃: {error}")
+                else:
+                    values[SyncOutbox.next_attempt_at] = now + timedelta(seconds=backoff_delay(attempts))
+                db.query(SyncOutbox).filter(SyncOutbox.id == message["id"]).update(
+                    values, synchronize_session=False
+                )
+
+            if synced_submissions:
+                db.query(TeacherSubmission).filter(
+                    TeacherSubmission.submission_id.in_(synced_submissions)
+                ).update({TeacherSubmission.synced_to_admin: True}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# 全局分发器
+admin_outbox_dispatcher = AdminOutboxDispatcher()
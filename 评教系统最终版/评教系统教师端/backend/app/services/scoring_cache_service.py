@@ -0,0 +1,176 @@
+"""
+评分结果缓存服务
+
+管理端评分完成后把评分记录快照推送到教师端（/api/admin/sync-scoring-records），
+教师查看评分结果时直接读本地缓存，不再每次请求管理端。
+缓存超过 TTL 后用 If-None-Match 向管理端的服务间接口（/api/scoring/internal/records/{submission_id}，
+按 SYNC_SERVICE_TOKEN 认证）条件请求：未变化（304）只刷新时间，
+变化（200）更新缓存；管理端不可用或超时时返回已有缓存。
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.scoring_cache import ScoringRecordCache
+
+logger = logging.getLogger(__name__)
+
+# 复用的 httpx 客户端（连接池），应用关闭时 close_client
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.ADMIN_API_URL.rstrip("/"),
+            timeout=settings.SCORING_CACHE_REVALIDATE_TIMEOUT
+        )
+    return _client
+
+
+async def close_client():
+    """关闭复用的 HTTP 连接"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def store(db: Session, snapshot: Dict) -> bool:
+    """
+    写入管理端的评分记录快照（调用方提交事务）
+
+    比缓存中更旧的快照（推送乱序到达）会被忽略。
+
+    Returns:
+        是否更新了缓存
+    """
+    submission_id = snapshot["submission_id"]
+    updated_at = _parse_datetime(snapshot.get("updated_at"))
+    cached = db.query(ScoringRecordCache).filter(
+        ScoringRecordCache.submission_id == submission_id
+    ).first()
+
+    if cached is None:
+        cached = ScoringRecordCache(submission_id=submission_id)
+        db.add(cached)
+    elif cached.etag == snapshot["etag"]:
+        cached.refreshed_at = datetime.utcnow()
+        return False
+    elif cached.source_updated_at and updated_at and updated_at < cached.source_updated_at:
+        return False
+
+    cached.records = snapshot.get("records") or []
+    cached.scoring_result = snapshot.get("scoring_result")
+    cached.review_status = snapshot.get("review_status")
+    cached.etag = snapshot["etag"]
+    cached.source_updated_at = updated_at
+    cached.refreshed_at = datetime.utcnow()
+    return True
+
+
+def is_fresh(cached: ScoringRecordCache) -> bool:
+    return cached.refreshed_at is not None and \
+        datetime.utcnow() - cached.refreshed_at < timedelta(seconds=settings.SCORING_CACHE_TTL)
+
+
+async def revalidate(db: Session, submission_id: str,
+                     cached: Optional[ScoringRecordCache]) -> Optional[ScoringRecordCache]:
+    """
+    向管理端条件请求评分记录并更新缓存
+
+    Returns:
+        最新的缓存；管理端没有该提交时返回 None
+
+    Raises:
+        httpx.HTTPError: 管理端不可用、超时或返回错误
+    """
+    headers = {"If-None-Match": cached.etag} if cached else {}
+    if settings.SYNC_SERVICE_TOKEN:
+        headers["X-Sync-Token"] = settings.SYNC_SERVICE_TOKEN
+    response = await _get_client().get(f"/api/scoring/internal/records/{submission_id}", headers=headers)
+
+    if response.status_code == 304 and cached is not None:
+        cached.refreshed_at = datetime.utcnow()
+        db.commit()
+        return cached
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+
+    snapshot = response.json()
+    snapshot.setdefault("etag", response.headers.get("ETag", ""))
+    store(db, snapshot)
+    db.commit()
+    return db.query(ScoringRecordCache).filter(
+        ScoringRecordCache.submission_id == submission_id
+    ).first()
+
+
+def format_scoring_records(records: List[Dict]) -> List[Dict]:
+    """格式化评分记录（score_details 为字符串时解析为 JSON）"""
+    formatted_records = []
+    for record in records:
+        score_details = record.get("score_details", {})
+        if isinstance(score_details, str):
+            try:
+                score_details = json.loads(score_details)
+            except ValueError:
+                score_details = {}
+
+        formatted_records.append({
+            "id": record.get("id"),
+            "file_name": record.get("file_name"),
+            "file_type": record.get("file_type"),
+            "final_score": record.get("final_score"),
+            "grade": record.get("grade"),
+            "base_score": record.get("base_score", 0),
+            "bonus_score": record.get("bonus_score", 0),
+            "score_details": score_details,
+            "is_confirmed": record.get("is_confirmed", False),
+            "scoring_type": record.get("scoring_type", "auto"),
+            "scored_at": record.get("scored_at"),
+            "veto_triggered": record.get("veto_triggered", False),
+            "veto_reason": record.get("veto_reason")
+        })
+    return formatted_records
+
+
+async def get_scoring_records(db: Session, submission_id: str) -> Dict:
+    """
+    获取评分记录：新鲜缓存直接返回，过期或缺失时向管理端重新验证
+
+    Returns:
+        {"records": 原始评分记录列表 | None, "stale": 是否为未能重新验证的旧缓存, "available": 管理端是否可用}
+    """
+    cached = db.query(ScoringRecordCache).filter(
+        ScoringRecordCache.submission_id == submission_id
+    ).first()
+    if cached is not None and is_fresh(cached):
+        return {"records": cached.records, "stale": False, "available": True}
+
+    try:
+        latest = await revalidate(db, submission_id, cached)
+    except httpx.HTTPError as e:
+        logger.warning(f"重新验证评分记录失败 {submission_id}: {str(e)}")
+        db.rollback()
+        if cached is not None:
+            return {"records": cached.records, "stale": True, "available": False}
+        return {"records": None, "stale": False, "available": False}
+
+    return {"records": latest.records if latest else [], "stale": False, "available": True}
@@ -1,50 +1,148 @@
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
 from typing import Dict, List, Optional
+import asyncio
 import json
 
+from app.config import settings
+from app.pubsub import InMemoryBackplane, create_backplane
+
 router = APIRouter()
 
 
+class Subscriber:
+    """
+    单个连接的有界发送队列及发送协程
+
+    每个连接独立发送，慢连接或卡住的连接不会阻塞其他用户的通知；
+    队列满时丢弃最旧的消息，单条消息发送超时或失败时断开该连接。
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, manager: "ConnectionManager",
+                 queue_size: int, send_timeout: float):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.manager = manager
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def cancel(self):
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def offer(self, message: dict):
+        """放入发送队列（不等待）"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def _run(self):
+        try:
+            while True:
+                message = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_json(message), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 发送超时或连接已断开
+            print(f"WebSocket send failed, disconnecting user {self.user_id}: {type(e).__name__}")
+            self.manager.disconnect(self.user_id, self.websocket)
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+
+
 class ConnectionManager:
-    """WebSocket连接管理器"""
+    """
+    WebSocket连接管理器
+
+    个人消息和广播先发布到 backplane（多 worker 部署时为 Redis），
+    每个进程收到后放入本进程各连接的发送队列，因此连接在哪个 worker 上都能收到。
+    """
     
-    def __init__(self):
+    def __init__(self, backplane=None, queue_size: Optional[int] = None, send_timeout: Optional[float] = None):
         # 存储活跃的WebSocket连接，格式：{user_id: websocket}
         self.active_connections: Dict[str, WebSocket] = {}
         # 存储用户订阅的频道，格式：{user_id: [channel1, channel2, ...]}
         self.user_subscriptions: Dict[str, List[str]] = {}
+        # 每个连接的发送队列，格式：{user_id: Subscriber}
+        self.subscribers: Dict[str, Subscriber] = {}
+        self.queue_size = queue_size or settings.WEBSOCKET_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WEBSOCKET_SEND_TIMEOUT
+        # 跨进程广播，默认为本管理器独占的进程内广播
+        self.backplane = backplane if backplane is not None else InMemoryBackplane()
+        self.backplane.subscribe(self._on_backplane_message)
+    
+    async def start(self):
+        """启动跨进程广播（应用启动时调用）"""
+        await self.backplane.start()
+    
+    async def stop(self):
+        """停止各连接的发送协程及跨进程广播（应用停止时调用）"""
+        self.backplane.unsubscribe(self._on_backplane_message)
+        await self.backplane.stop()
+        subscribers = list(self.subscribers.values())
+        self.subscribers = {}
+        for subscriber in subscribers:
+            subscriber.cancel()
+        await asyncio.gather(*(s._task for s in subscribers if s._task is not None), return_exceptions=True)
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """接受WebSocket连接"""
         await websocket.accept()
+        previous = self.subscribers.pop(user_id, None)
+        if previous is not None:
+            previous.cancel()
         self.active_connections[user_id] = websocket
         self.user_subscriptions[user_id] = []
+        subscriber = Subscriber(websocket, user_id, self, self.queue_size, self.send_timeout)
+        self.subscribers[user_id] = subscriber
+        subscriber.start()
         print(f"User {user_id} connected")
     
-    def disconnect(self, user_id: str):
-        """断开WebSocket连接"""
+    def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None):
+        """断开WebSocket连接（指定 websocket 时，只有它仍是该用户的当前连接才断开）"""
+        if websocket is not None and self.active_connections.get(user_id) is not websocket:
+            return
         if user_id in self.active_connections:
             del self.active_connections[user_id]
         if user_id in self.user_subscriptions:
             del self.user_subscriptions[user_id]
+        subscriber = self.subscribers.pop(user_id, None)
+        if subscriber is not None:
+            subscriber.cancel()
         print(f"User {user_id} disconnected")
     
     async def send_personal_message(self, message: dict, user_id: str):
-        """发送个人消息"""
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            await websocket.send_json(message)
+        """发送个人消息（用户连接在任一 worker 上均可收到）"""
+        self.backplane.publish(json.dumps({"user_id": user_id, "message": message}, ensure_ascii=False))
     
     async def broadcast(self, message: dict, channel: Optional[str] = None):
-        """广播消息到指定频道或所有用户"""
-        for user_id, websocket in self.active_connections.items():
-            # 如果指定了频道，只发送给订阅了该频道的用户
-            if channel:
-                if user_id in self.user_subscriptions and channel in self.user_subscriptions[user_id]:
-                    await websocket.send_json(message)
-            else:
-                # 否则发送给所有用户
-                await websocket.send_json(message)
+        """广播消息到指定频道或所有用户（所有 worker）"""
+        self.backplane.publish(json.dumps({"channel": channel, "message": message}, ensure_ascii=False))
+    
+    def _on_backplane_message(self, data: str):
+        """推送给本进程的连接（只放入各连接的发送队列，不等待发送）"""
+        envelope = json.loads(data)
+        message = envelope["message"]
+        if envelope.get("user_id") is not None:
+            subscriber = self.subscribers.get(envelope["user_id"])
+            targets = [subscriber] if subscriber is not None else []
+        else:
+            # 如果指定了频道，只发送给订阅了该频道的用户，否则发送给所有用户
+            channel = envelope.get("channel")
+            targets = [
+                subscriber for user_id, subscriber in list(self.subscribers.items())
+                if not channel or channel in self.user_subscriptions.get(user_id, [])
+            ]
+        for subscriber in targets:
+            subscriber.offer(message)
     
     def subscribe(self, user_id: str, channel: str):
         """用户订阅频道"""
@@ -61,7 +159,7 @@ class ConnectionManager:
 
 
 # 创建全局连接管理器实例
-manager = ConnectionManager()
+manager = ConnectionManager(backplane=create_backplane())
 
 
 @router.websocket("/ws/{user_id}")
@@ -99,7 +197,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     await manager.broadcast({"content": content})
     except WebSocketDisconnect:
         # 断开连接
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, websocket)
 
 
 async def send_notification(user_id: str, title: str, message: str):
@@ -5,8 +5,10 @@ import uvicorn
 
 from app.config import settings
 from app.routes import api_router
-from app.websocket import router as websocket_router
+from app.websocket import router as websocket_router, manager as websocket_manager
 from app.database import init_db
+from app.services.admin_outbox_service import admin_outbox_dispatcher
+from app.services.scoring_cache_service import close_client as close_scoring_cache_client
 
 
 @asynccontextmanager
@@ -16,9 +18,16 @@ async def lifespan(app: FastAPI):
     # 初始化数据库
     init_db()
     print("Database initialized")
+    # 连接 WebSocket 推送的跨进程广播
+    await websocket_manager.start()
+    # 启动向管理端同步的发件箱分发器
+    await admin_outbox_dispatcher.start()
     yield
     # Shutdown
     print("Shutting down...")
+    await admin_outbox_dispatcher.stop()
+    await close_scoring_cache_client()
+    await websocket_manager.stop()
     # 关闭数据库连接、Redis 等
 
 
@@ -0,0 +1,181 @@
+"""
+向管理端同步的发件箱测试
+
+测试分发器发送失败后按退避重试、成功后标记提交记录已同步，
+多个 worker 进程的分发器不会重复领取同一条消息，
+以及管理端乱序送达的审核/评分消息不会覆盖更新的状态。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from app.models import Base, EvaluationTaskModel, SyncOutbox, TeacherSubmission
+from app.routes import admin_sync
+from app.services.admin_outbox_service import AdminOutboxDispatcher, enqueue_submission
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """基于临时文件的 SQLite 数据库"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'teacher.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _submit(session_factory, submission_id: str = "sub_1"):
+    db = session_factory()
+    db.add(TeacherSubmission(
+        submission_id=submission_id, teacher_id="t1", files=[], submitted_at=datetime(2026, 1, 1)
+    ))
+    enqueue_submission(db, submission_id, "t1", "教师1", [], "", "2026-01-01T00:00:00")
+    db.commit()
+    db.close()
+
+
+def _dispatcher(session_factory, handler) -> AdminOutboxDispatcher:
+    dispatcher = AdminOutboxDispatcher(session_factory=session_factory, base_url="http://admin.test")
+    dispatcher._client = httpx.AsyncClient(base_url="http://admin.test", transport=httpx.MockTransport(handler))
+    return dispatcher
+
+
+class TestAdminOutboxDispatcher:
+    """发件箱分发器测试"""
+
+    def test_retry_after_failure(self, session_factory):
+        """测试管理端返回 503 后按退避推迟重试，恢复后发送成功并标记已同步"""
+        responses = [503, 200]
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(responses[len(calls) - 1], json={})
+
+        _submit(session_factory)
+        dispatcher = _dispatcher(session_factory, handler)
+
+        assert asyncio.run(dispatcher.dispatch_once()) == 1
+        db = session_factory()
+        row = db.query(SyncOutbox).one()
+        assert (row.status, row.attempts) == ("pending", 1)
+        assert row.last_error.startswith("503")
+        assert row.next_attempt_at > datetime.utcnow()
+
+        # 退避期间不会再次发送
+        assert asyncio.run(dispatcher.dispatch_once()) == 0
+
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        db.close()
+
+        assert asyncio.run(dispatcher.dispatch_once()) == 1
+        db = session_factory()
+        row = db.query(SyncOutbox).one()
+        assert (row.status, row.attempts, row.last_error) == ("sent", 2, None)
+        assert db.get(TeacherSubmission, "sub_1").synced_to_admin is True
+        db.close()
+        assert calls == ["/api/teacher/sync-submission"] * 2
+
+    def test_gives_up_after_max_attempts(self, session_factory):
+        _submit(session_factory)
+        dispatcher = _dispatcher(session_factory, lambda request: httpx.Response(500, text="error"))
+        dispatcher.max_attempts = 1
+
+        asyncio.run(dispatcher.dispatch_once())
+
+        db = session_factory()
+        assert db.query(SyncOutbox).one().status == "failed"
+        assert db.get(TeacherSubmission, "sub_1").synced_to_admin is False
+        db.close()
+
+    def test_claimed_messages_leased(self, session_factory):
+        """测试一个进程领取后，其他进程的分发器在租期内不会重复领取"""
+        for i in range(3):
+            _submit(session_factory, f"sub_{i}")
+        first = AdminOutboxDispatcher(session_factory=session_factory)
+        second = AdminOutboxDispatcher(session_factory=session_factory)
+
+        claimed = first._claim_due()
+
+        assert [m["submission_id"] for m in claimed] == ["sub_0", "sub_1", "sub_2"]
+        assert second._claim_due() == []
+
+
+@pytest.fixture
+def client(session_factory):
+    app = FastAPI()
+    app.include_router(admin_sync.router, prefix="/api")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+class TestOutOfOrderSync:
+    """管理端消息乱序到达测试"""
+
+    def test_older_review_ignored(self, session_factory, client):
+        _submit(session_factory)
+
+        def review(status, reviewed_at):
+            return client.put("/api/admin/sync-review", json={
+                "submission_id": "sub_1", "status": status, "feedback": status, "reviewed_at": reviewed_at
+            })
+
+        assert review("rejected", "2026-01-02T10:00:00").status_code == 200
+        # 更早的审核结果（重试后才送达）不覆盖
+        assert review("approved", "2026-01-02T09:00:00").status_code == 200
+
+        db = session_factory()
+        submission = db.get(TeacherSubmission, "sub_1")
+        assert (submission.review_status, submission.reviewed_at) == ("rejected", datetime(2026, 1, 2, 10))
+        db.close()
+
+        assert review("approved", "2026-01-02T11:00:00").status_code == 200
+        db = session_factory()
+        assert db.get(TeacherSubmission, "sub_1").review_status == "approved"
+        db.close()
+
+    def test_older_score_ignored(self, session_factory, client):
+        db = session_factory()
+        now = datetime(2026, 1, 1)
+        db.add(EvaluationTaskModel(
+            task_id="tpl_1_t1", template_id="tpl_1", teacher_id="t1", template_name="考评表",
+            template_file_url="/uploads/tpl.pdf", deadline=now, created_at=now, updated_at=now
+        ))
+        db.commit()
+        db.close()
+
+        def score(total, scored_at):
+            return client.post("/api/admin/sync-evaluation-score", json={
+                "task_id": "tpl_1_t1", "template_id": "tpl_1", "teacher_id": "t1",
+                "scores": {"完成度": total}, "total_score": total, "scored_at": scored_at
+            })
+
+        assert score(90, "2026-01-03T10:00:00").status_code == 200
+        assert score(70, "2026-01-03T08:00:00").status_code == 200
+
+        db = session_factory()
+        assert db.get(EvaluationTaskModel, "tpl_1_t1").final_score == 90
+        db.close()
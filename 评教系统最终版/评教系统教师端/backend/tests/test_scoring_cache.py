@@ -0,0 +1,133 @@
+"""
+评分结果缓存测试
+
+在子进程中启动真实的管理端服务（不覆盖任何依赖），测试教师端缓存缺失或过期时
+通过管理端服务间接口重新验证：首次取回快照写入缓存，内容不变时 304 只刷新时间，
+令牌错误时返回不可用。
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.models import Base, ScoringRecordCache
+from app.services import scoring_cache_service
+from app.services.scoring_cache_service import get_scoring_records
+
+
+ADMIN_BACKEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "评教系统管理端", "backend_8fMBP", "backend"
+)
+SYNC_TOKEN = "test-sync-token"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def admin_server(tmp_path_factory):
+    """启动管理端服务（临时数据库），返回其地址"""
+    tmp_path = tmp_path_factory.mktemp("admin")
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'admin.db'}",
+        "PARSE_CACHE_DIR": str(tmp_path / "parse_cache"),
+        "TEACHER_API_URL": "http://127.0.0.1:9",
+        "SYNC_SERVICE_TOKEN": SYNC_TOKEN,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ADMIN_BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while True:
+        if process.poll() is not None:
+            pytest.skip("管理端服务无法启动（依赖未安装）")
+        try:
+            httpx.get(f"{url}/docs", timeout=1)
+            break
+        except httpx.HTTPError:
+            if time.time() > deadline:
+                process.terminate()
+                pytest.skip("管理端服务启动超时")
+            time.sleep(0.2)
+
+    # 通过教师端同步接口在管理端创建提交记录
+    response = httpx.post(f"{url}/api/teacher/sync-submission", json={
+        "submission_id": "sub_cache_1", "teacher_id": "t1", "teacher_name": "教师1",
+        "files": [], "notes": "", "submitted_at": datetime.utcnow().isoformat()
+    })
+    assert response.status_code == 200
+
+    yield url
+    process.terminate()
+    process.wait(timeout=10)
+
+
+@pytest.fixture
+def db(tmp_path, admin_server, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_URL", admin_server)
+    monkeypatch.setattr(settings, "SYNC_SERVICE_TOKEN", SYNC_TOKEN)
+    monkeypatch.setattr(scoring_cache_service, "_client", None)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'teacher.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _get(db, submission_id="sub_cache_1"):
+    async def run():
+        try:
+            return await get_scoring_records(db, submission_id)
+        finally:
+            await scoring_cache_service.close_client()
+
+    return asyncio.run(run())
+
+
+class TestRevalidateAgainstAdmin:
+    """向真实管理端接口重新验证"""
+
+    def test_fetch_then_not_modified(self, db):
+        assert _get(db) == {"records": [], "stale": False, "available": True}
+        cached = db.query(ScoringRecordCache).one()
+        assert cached.etag and cached.review_status == "pending"
+
+        # 缓存过期后条件请求：内容未变化，只刷新时间
+        expired_at = datetime.utcnow() - timedelta(seconds=settings.SCORING_CACHE_TTL + 1)
+        cached.refreshed_at = expired_at
+        etag = cached.etag
+        db.commit()
+
+        assert _get(db)["available"] is True
+        cached = db.query(ScoringRecordCache).one()
+        assert cached.etag == etag
+        assert cached.refreshed_at > expired_at
+
+    def test_unknown_submission(self, db):
+        assert _get(db, "sub_unknown") == {"records": [], "stale": False, "available": True}
+
+    def test_wrong_token_reported_unavailable(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "SYNC_SERVICE_TOKEN", "wrong")
+        assert _get(db) == {"records": None, "stale": False, "available": False}
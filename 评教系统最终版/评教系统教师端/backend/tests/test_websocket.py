@@ -0,0 +1,125 @@
+"""
+WebSocket 通知推送测试
+
+测试通知经 backplane 跨连接管理器（模拟多个 worker 进程）送达，
+卡住的连接不阻塞其他用户的通知且超时后被断开，发送失败的连接被移除。
+"""
+
+import asyncio
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.pubsub import InMemoryBackplane
+from app.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, stall: bool = False, fail: bool = False):
+        self.stall = stall
+        self.fail = fail
+        self.messages = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        if self.stall:
+            await asyncio.Event().wait()
+        self.messages.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+async def _until(condition, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.01)
+
+
+class TestConnectionManager:
+    """连接管理器测试"""
+
+    def test_delivery_across_managers(self):
+        """测试连接在另一个 worker 上时个人消息和频道广播都能送达"""
+        async def run():
+            backplane = InMemoryBackplane()
+            worker_a, worker_b = ConnectionManager(backplane), ConnectionManager(backplane)
+            teacher, other = FakeWebSocket(), FakeWebSocket()
+            await worker_b.connect(teacher, "t1")
+            await worker_b.connect(other, "t2")
+            worker_b.subscribe("t1", "course_c1")
+
+            await worker_a.send_personal_message({"title": "评分完成"}, "t1")
+            await worker_a.broadcast({"type": "evaluation_update"}, channel="course_c1")
+            await _until(lambda: len(teacher.messages) == 2)
+            await asyncio.sleep(0.05)
+
+            await worker_a.stop()
+            await worker_b.stop()
+            return teacher.messages, other.messages
+
+        teacher_messages, other_messages = asyncio.run(run())
+
+        assert teacher_messages == [{"title": "评分完成"}, {"type": "evaluation_update"}]
+        assert other_messages == []
+
+    def test_stalled_connection_does_not_block_others(self):
+        """测试卡住的连接不影响其他用户，发送超时后被断开"""
+        async def run():
+            manager = ConnectionManager(send_timeout=0.2)
+            stalled, healthy = FakeWebSocket(stall=True), FakeWebSocket()
+            await manager.connect(stalled, "stalled")
+            await manager.connect(healthy, "healthy")
+
+            for i in range(3):
+                await manager.broadcast({"seq": i})
+            await _until(lambda: len(healthy.messages) == 3, timeout=0.15)
+            await _until(lambda: "stalled" not in manager.active_connections)
+
+            await manager.stop()
+            return stalled, healthy, manager
+
+        stalled, healthy, manager = asyncio.run(run())
+
+        assert healthy.messages == [{"seq": 0}, {"seq": 1}, {"seq": 2}]
+        assert stalled.closed
+        assert "stalled" not in manager.user_subscriptions
+
+    def test_failed_connection_removed(self):
+        async def run():
+            manager = ConnectionManager()
+            broken = FakeWebSocket(fail=True)
+            await manager.connect(broken, "t1")
+            await manager.send_personal_message({"title": "通知"}, "t1")
+            await _until(lambda: "t1" not in manager.active_connections)
+            await manager.stop()
+            return manager
+
+        manager = asyncio.run(run())
+        assert manager.subscribers == {}
+
+    def test_queue_bounded(self):
+        """测试连接的发送队列有界，满时丢弃最旧的消息"""
+        async def run():
+            manager = ConnectionManager(queue_size=2)
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, "t1")
+            for i in range(5):
+                await manager.send_personal_message({"seq": i}, "t1")
+            dropped = manager.subscribers["t1"].dropped
+            await _until(lambda: len(websocket.messages) == 2)
+            await manager.stop()
+            return websocket.messages, dropped
+
+        messages, dropped = asyncio.run(run())
+        assert messages == [{"seq": 3}, {"seq": 4}]
+        assert dropped == 3
@@ -0,0 +1,178 @@
+"""
+进程内后台任务池
+接口把耗时操作（如同步到教师端）交给后台 worker 执行后立即返回 job_id，
+通过 get_job 查询执行状态。队列有上限，队列满时 submit 抛出 QueueFullError；
+停止时不再接收新任务，并在 drain_timeout 内等待已排队的任务执行完毕。
+
+任务只保存在内存中，服务重启后丢失；需要可靠送达的数据应先写入发件箱（sync_outbox）。
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# worker 数量
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+# 排队任务上限
+BACKGROUND_QUEUE_SIZE = int(os.getenv("BACKGROUND_QUEUE_SIZE", "1000"))
+# 停止时等待排队任务执行完毕的最长时间（秒）
+BACKGROUND_DRAIN_TIMEOUT = float(os.getenv("BACKGROUND_DRAIN_TIMEOUT", "30"))
+# 保留的已结束任务数（供查询）
+BACKGROUND_MAX_FINISHED_JOBS = int(os.getenv("BACKGROUND_MAX_FINISHED_JOBS", "10000"))
+
+
+class QueueFullError(Exception):
+    """后台任务队列已满或任务池未运行"""
+    pass
+
+
+class BackgroundWorkerPool:
+    """
+    有界队列 + 固定数量 worker 的后台任务池
+
+    任务状态：queued -> running -> succeeded / failed；停止时未执行的任务为 cancelled。
+    """
+
+    def __init__(self, name: str, workers: int = BACKGROUND_WORKERS,
+                 queue_size: int = BACKGROUND_QUEUE_SIZE,
+                 drain_timeout: float = BACKGROUND_DRAIN_TIMEOUT,
+                 max_finished_jobs: int = BACKGROUND_MAX_FINISHED_JOBS):
+        """
+        初始化任务池
+
+        Args:
+            name: 任务池名称（用于日志）
+            workers: worker 数量
+            queue_size: 排队任务上限
+            drain_timeout: 停止时等待排队任务的最长时间（秒）
+            max_finished_jobs: 保留的已结束任务数
+        """
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.drain_timeout = drain_timeout
+        self.max_finished_jobs = max_finished_jobs
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._worker_tasks)
+
+    @property
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """启动 worker"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._accepting = True
+        logger.info(f"[{self.name}] 已启动 {self.workers} 个 worker")
+
+    async def stop(self):
+        """停止接收新任务，等待排队任务执行完毕（最多 drain_timeout 秒）后停止 worker"""
+        if not self.running:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{self.name}] 等待超时，取消剩余 {self._queue.qsize()} 个排队任务")
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+        while not self._queue.empty():
+            job_id, _ = self._queue.get_nowait()
+            self._finish(job_id, "cancelled", error="服务停止，任务未执行")
+        logger.info(f"[{self.name}] 已停止")
+
+    def submit(self, func: Callable[..., Awaitable], *args, name: str = "", **kwargs) -> str:
+        """
+        提交任务（不等待执行）
+
+        Args:
+            func: 异步函数
+            name: 任务名称（用于查询和日志）
+
+        Returns:
+            job_id
+
+        Raises:
+            QueueFullError: 队列已满或任务池未运行
+        """
+        if not self._accepting:
+            raise QueueFullError(f"{self.name} 未运行")
+
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        try:
+            self._queue.put_nowait((job_id, lambda: func(*args, **kwargs)))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.name} 队列已满（{self.queue_size}）")
+
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "name": name or getattr(func, "__name__", ""),
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """查询任务状态，不存在（或已被淘汰）时返回 None"""
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, call = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["status"] = "running"
+                    job["started_at"] = datetime.utcnow().isoformat()
+                try:
+                    result = await call()
+                except asyncio.CancelledError:
+                    self._finish(job_id, "cancelled", error="服务停止，任务被中断")
+                    raise
+                except Exception as e:
+                    logger.error(f"[{self.name}] 任务 {job_id} 执行失败: {str(e)}")
+                    self._finish(job_id, "failed", error=str(e))
+                else:
+                    self._finish(job_id, "succeeded", result=result)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job_id: str, status: str, result=None, error: Optional[str] = None):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(status=status, result=result, error=error,
+                   finished_at=datetime.utcnow().isoformat())
+
+        # 只保留最近的已结束任务
+        self._finished[job_id] = None
+        while len(self._finished) > self.max_finished_jobs:
+            old_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(old_id, None)
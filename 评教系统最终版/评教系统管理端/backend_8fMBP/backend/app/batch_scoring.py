@@ -0,0 +1,277 @@
+"""
+批量评分引擎
+加载待评分项、在解析进程池中解析文件并异步调用 DeepSeek API 评分，供批量评分任务队列（scoring_jobs）使用；
+可选将同一类型、同一评分标准的多份短文档合并为一次大模型请求
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, object_session
+
+from .file_parser import FileParser
+from .parse_executor import ParseExecutor, parse_executor as default_parse_executor
+from .models import MaterialSubmission, EvaluationAssignmentTask, EvaluationTemplate
+from .scoring_cache import fingerprint
+from .scoring_engine import ScoringEngine
+from .sync_outbox import enqueue_evaluation_score, enqueue_scoring_records
+
+logger = logging.getLogger(__name__)
+
+# 默认并发数（同时进行中的评分数量），可通过环境变量调整
+DEFAULT_CONCURRENCY = int(os.getenv("SCORING_BATCH_CONCURRENCY", "5"))
+# 多文档合并评分：每次请求最多合并的文档数（1 表示不合并）、可参与合并的文档最大字数
+PROMPT_BATCH_SIZE = int(os.getenv("SCORING_PROMPT_BATCH_SIZE", "1"))
+PROMPT_BATCH_MAX_CHARS = int(os.getenv("SCORING_PROMPT_BATCH_MAX_CHARS", "3000"))
+MAX_PROMPT_BATCH_SIZE = 4
+
+
+def build_scoring_record(scoring_result: Dict) -> Dict:
+    """
+    将评分引擎结果转换为保存到数据库的评分记录
+
+    Args:
+        scoring_result: ScoringEngine.score_file 的返回值
+
+    Returns:
+        评分记录
+    """
+    return {
+        "base_score": scoring_result.get("base_score", 0),
+        "bonus_score": scoring_result.get("bonus_score", 0),
+        "final_score": scoring_result.get("final_score", 0),
+        "grade": scoring_result.get("grade", ""),
+        "veto_triggered": scoring_result.get("veto_triggered", False),
+        "veto_reason": scoring_result.get("veto_reason", ""),
+        "score_details": scoring_result.get("score_details", []),
+        "summary": scoring_result.get("summary", ""),
+        "scored_at": datetime.utcnow().isoformat()
+    }
+
+
+def apply_scoring_result(target, scoring_result: Dict) -> Dict:
+    """
+    将评分结果写入提交记录或考评任务，并把同步到教师端的消息加入发件箱（不提交事务）
+
+    Args:
+        target: MaterialSubmission 或 EvaluationAssignmentTask
+        scoring_result: ScoringEngine.score_file 的返回值
+
+    Returns:
+        写入的评分记录
+    """
+    record = build_scoring_record(scoring_result)
+
+    if isinstance(target, EvaluationAssignmentTask):
+        target.status = "scored"
+        target.scored_at = datetime.utcnow()
+        target.total_score = record["final_score"]
+        target.scoring_feedback = record["summary"]
+        target.scores = record
+    else:
+        target.review_status = "scored"
+        target.reviewed_at = datetime.utcnow()
+        target.scoring_result = record
+
+    db = object_session(target)
+    if db is not None:
+        if isinstance(target, EvaluationAssignmentTask):
+            enqueue_evaluation_score(db, target)
+        else:
+            enqueue_scoring_records(db, target.submission_id)
+
+    return record
+
+
+def load_scoring_targets(db: Session, submission_ids: List[str]) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """
+    批量加载评分对象（提交记录和考评任务各一次 IN 查询）
+
+    Args:
+        db: 数据库会话
+        submission_ids: 提交记录 ID 或考评任务 ID 列表
+
+    Returns:
+        (ID -> 提交记录/考评任务, template_id -> 考评表)
+    """
+    targets: Dict[str, object] = {}
+    unique_ids = list(dict.fromkeys(submission_ids))
+
+    submissions = db.query(MaterialSubmission).filter(
+        MaterialSubmission.submission_id.in_(unique_ids)
+    ).all() if unique_ids else []
+    for submission in submissions:
+        targets[submission.submission_id] = submission
+
+    task_ids = [i for i in unique_ids if i not in targets]
+    tasks = db.query(EvaluationAssignmentTask).filter(
+        EvaluationAssignmentTask.task_id.in_(task_ids)
+    ).all() if task_ids else []
+    for task in tasks:
+        targets[task.task_id] = task
+
+    template_ids = list({task.template_id for task in tasks if task.template_id})
+    templates = {
+        t.template_id: t for t in db.query(EvaluationTemplate).filter(
+            EvaluationTemplate.template_id.in_(template_ids)
+        ).all()
+    } if template_ids else {}
+
+    return targets, templates
+
+
+def build_scoring_item(submission_id: str, target, templates: Dict) -> Dict:
+    """
+    构建单个待评分项
+
+    Returns:
+        待评分项（文件路径、类型、总分、评分标准），无法评分时填写 error
+    """
+    item = {
+        "submission_id": submission_id,
+        "error": None,
+        "total_score": 100,
+        "scoring_criteria": None
+    }
+
+    if target is None:
+        item["error"] = "提交记录不存在"
+        return item
+
+    if isinstance(target, EvaluationAssignmentTask):
+        files = target.submitted_files or []
+        template = templates.get(target.template_id)
+        if template:
+            item["total_score"] = template.total_score or 100
+            item["scoring_criteria"] = template.scoring_criteria
+    else:
+        files = target.files or []
+
+    if not files:
+        item["error"] = "提交记录中没有文件"
+        return item
+
+    # 获取第一个文件
+    file_info = files[0]
+    file_path = file_info.get("file_url") or file_info.get("path")
+    file_type = FileParser.infer_scoring_type(file_info)
+
+    if not file_path or not file_type:
+        item["error"] = f"文件信息不完整: path={file_path}, type={file_type}"
+        return item
+
+    actual_file_path = FileParser.resolve_path(file_path)
+    if not actual_file_path:
+        item["error"] = f"文件不存在。原始路径: {file_path}"
+        return item
+
+    item["file_type"] = file_type
+    item["file_path"] = actual_file_path
+    item["file_hash"] = getattr(target, "file_hash", None)
+    return item
+
+
+class BatchScoringEngine:
+    """
+    批量评分引擎（逐项评分，由评分任务队列的 worker 调用）
+
+    1. 解析：在解析进程池中解析文件，多核并行且不阻塞事件循环
+    2. 评分：异步调用 DeepSeek API；启用合并评分时，同组（文件类型、总分、评分标准相同）的短文档
+       最多 prompt_batch_size 份合并为一次请求
+    """
+
+    def __init__(self, scoring_engine: ScoringEngine, parse_executor: Optional[ParseExecutor] = None,
+                 prompt_batch_size: Optional[int] = None):
+        """
+        初始化批量评分引擎
+
+        Args:
+            scoring_engine: 评分引擎
+            parse_executor: 文件解析进程池，默认使用全局解析进程池
+            prompt_batch_size: 每次请求最多合并的文档数，默认读取 SCORING_PROMPT_BATCH_SIZE
+        """
+        self.scoring_engine = scoring_engine
+        self.parse_executor = parse_executor or default_parse_executor
+        self.prompt_batch_size = min(max(1, prompt_batch_size or PROMPT_BATCH_SIZE), MAX_PROMPT_BATCH_SIZE)
+
+    async def score_item(self, item: Dict, bonus_items: Optional[List[Dict]] = None,
+                         on_partial: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """解析并评分单个待评分项，返回评分结果或 {"error": ...}（on_partial 为流式评分的中间结果回调）"""
+        parsed = await self.parse_item(item)
+        if "error" in parsed:
+            return parsed
+        return await self.score_parsed(item, parsed, bonus_items, on_partial)
+
+    async def parse_item(self, item: Dict) -> Dict:
+        """解析待评分项的文件，返回 {"content", "file_hash"} 或 {"error": ...}"""
+        loop = asyncio.get_running_loop()
+        file_path = item["file_path"]
+
+        try:
+            file_ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+            file_hash = item.get("file_hash") or await loop.run_in_executor(
+                None, FileParser.calculate_file_hash, file_path
+            )
+            content = await self.parse_executor.parse(file_path, file_ext, file_hash)
+        except Exception as e:
+            return {"error": f"文件解析失败: {str(e)}"}
+        return {"content": content, "file_hash": file_hash}
+
+    async def score_parsed(self, item: Dict, parsed: Dict, bonus_items: Optional[List[Dict]] = None,
+                           on_partial: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """评分已解析的单个待评分项"""
+        try:
+            scoring_result = await self.scoring_engine.score_file_async(
+                item["file_type"],
+                parsed["content"],
+                total_score=item["total_score"],
+                scoring_criteria=item["scoring_criteria"],
+                bonus_items=bonus_items,
+                file_hash=parsed["file_hash"],
+                on_partial=on_partial
+            )
+        except Exception as e:
+            logger.error(f"[批量评分] 评分异常: {str(e)}")
+            return {"error": f"异常: {str(e)}"}
+        return self._outcome(scoring_result)
+
+    async def score_group(self, entries: List[Tuple[Dict, Dict]],
+                          bonus_items: Optional[List[Dict]] = None) -> List[Dict]:
+        """合并评分同一分组的多份已解析文档（entries 为 (待评分项, 解析结果)，分组内文件类型、总分、评分标准相同）"""
+        item = entries[0][0]
+        try:
+            scoring_results = await self.scoring_engine.score_files_batch_async(
+                item["file_type"],
+                [parsed["content"] for _, parsed in entries],
+                total_score=item["total_score"],
+                scoring_criteria=item["scoring_criteria"],
+                bonus_items=bonus_items,
+                file_hashes=[parsed["file_hash"] for _, parsed in entries]
+            )
+        except Exception as e:
+            logger.error(f"[批量评分] 合并评分异常: {str(e)}")
+            return [{"error": f"异常: {str(e)}"} for _ in entries]
+        return [self._outcome(result) for result in scoring_results]
+
+    def batchable(self, parsed: Dict) -> bool:
+        """文档是否参与合并评分（启用合并且内容足够短）"""
+        return self.prompt_batch_size > 1 and len(parsed["content"] or "") <= PROMPT_BATCH_MAX_CHARS
+
+    @staticmethod
+    def group_key(item: Dict) -> str:
+        """合并评分的分组键（文件类型、总分、评分标准）"""
+        return fingerprint({
+            "file_type": item["file_type"],
+            "total_score": item["total_score"],
+            "criteria": item["scoring_criteria"]
+        })
+
+    @staticmethod
+    def _outcome(scoring_result: Dict) -> Dict:
+        """评分结果，失败时转换为 {"error": ...}"""
+        if not scoring_result.get("success"):
+            return {"error": f"评分失败: {scoring_result.get('error', '未知错误')}"}
+        return scoring_result
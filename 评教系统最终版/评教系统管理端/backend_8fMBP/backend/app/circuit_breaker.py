@@ -0,0 +1,131 @@
+"""
+熔断器
+外部服务（DeepSeek 评分接口）持续失败或持续超过延迟目标时熔断，熔断期间的调用立即失败，
+不再每次都等满 超时 × 重试次数；冷却时间过后放行一次探测请求（半开），探测成功则恢复。
+
+状态：
+- closed：正常放行，连续 failure_threshold 次失败（含超过 latency_slo 的慢响应）后转为 open
+- open：直接抛出 CircuitOpenError，reset_timeout 秒后转为 half_open
+- half_open：同一时间只放行一个探测请求，成功转为 closed，失败重新 open
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断期间调用被拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """线程安全的熔断器，同步和异步调用方共用"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 latency_slo: Optional[float] = None):
+        """
+        Args:
+            name: 名称（日志和错误信息使用）
+            failure_threshold: 连续失败多少次后熔断，0 表示不启用
+            reset_timeout: 熔断后多少秒放行探测请求
+            latency_slo: 延迟目标（秒），成功但超过该时间的调用也计为失败，None 表示不检查
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_slo = latency_slo
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+        self._short_circuited = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_started_at = None
+        return self._state
+
+    def before_call(self):
+        """
+        调用前检查，熔断中抛出 CircuitOpenError
+
+        半开状态下只放行一个探测请求；探测请求超过 reset_timeout 仍未返回结果时允许新的探测。
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and (
+                self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout
+            ):
+                self._probe_started_at = now
+                return
+            self._short_circuited += 1
+            retry_in = max(0.0, self.reset_timeout - (now - self._opened_at)) if state == OPEN else 0.0
+        raise CircuitOpenError(f"{self.name} 熔断中，{retry_in:.0f} 秒后重试")
+
+    def record_success(self, latency: Optional[float] = None):
+        """记录一次成功调用（latency 超过延迟目标时按失败处理）"""
+        if self.latency_slo is not None and latency is not None and latency > self.latency_slo:
+            logger.warning(f"[{self.name}] 响应耗时 {latency:.1f} 秒，超过延迟目标 {self.latency_slo} 秒")
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"[{self.name}] 探测成功，恢复调用")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probe_started_at = None
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._consecutive_failures += 1
+            if state == HALF_OPEN or (state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = now
+                self._probe_started_at = None
+                self._times_opened += 1
+                logger.error(
+                    f"[{self.name}] 连续失败 {self._consecutive_failures} 次，熔断 {self.reset_timeout} 秒"
+                )
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probe_started_at = None
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._current_state(time.monotonic()),
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self._times_opened,
+                "short_circuited": self._short_circuited
+            }
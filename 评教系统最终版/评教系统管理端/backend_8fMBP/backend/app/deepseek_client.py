@@ -1,17 +1,34 @@
 """
 DeepSeek API 客户端
 用于调用 DeepSeek API 进行自动评分
+所有客户端共用 deepseek_pool 中的连接池和限流器，429 时由限流器统一暂停所有请求；
+DeepSeek 持续故障时熔断器使调用立即失败，不再每次等满 超时 × 重试次数。
+异步客户端可启用流式响应（DEEPSEEK_STREAMING），边生成边解析评分 JSON，
+调用方可获取中间结果，并在所需字段已返回时提前停止生成。
 """
 
+import asyncio
 import requests
+import httpx
 import json
 import logging
+import os
 import time
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 from datetime import datetime
 
+from .circuit_breaker import CircuitOpenError
+from .deepseek_pool import (
+    DEEPSEEK_HEDGE_ENABLED, deepseek_circuit_breaker, deepseek_latency, deepseek_rate_limiter,
+    estimate_tokens, get_async_client, get_session
+)
+from .utils.json_stream import IncrementalJSONParser
+
 logger = logging.getLogger(__name__)
 
+# 异步客户端是否使用流式响应（SSE）
+DEEPSEEK_STREAMING = os.getenv("DEEPSEEK_STREAMING", "false").lower() == "true"
+
 
 class DeepseekAPIClient:
     """DeepSeek API 客户端"""
@@ -31,6 +48,70 @@ class DeepseekAPIClient:
         self.max_retries = 3
         self.timeout = 30
     
+    def _build_headers(self) -> Dict:
+        """构建请求头"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _build_payload(self, prompt: str, stream: bool = False, max_tokens: int = 2000) -> Dict:
+        """构建请求体"""
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            # 最后一个数据块附带 token 用量
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    def _extract_content(self, result: Dict) -> Dict:
+        """
+        从 API 原始响应中提取内容
+        
+        Args:
+            result: API 返回的 JSON
+            
+        Returns:
+            包含 content 和 usage 的结果
+            
+        Raises:
+            Exception: 响应格式错误
+        """
+        # 验证响应格式
+        if "choices" not in result or not result["choices"]:
+            raise Exception("API 返回格式错误: 缺少 choices 字段")
+        
+        # 提取内容
+        content = result["choices"][0].get("message", {}).get("content", "")
+        if not content:
+            raise Exception("API 返回内容为空")
+        
+        return {
+            "success": True,
+            "content": content,
+            "usage": result.get("usage", {})
+        }
+    
+    def _record_outcome(self, status_code: int, latency: float):
+        """记录调用结果到熔断器和延迟统计（5xx 计为失败；4xx 说明服务可用，计为成功）"""
+        if status_code >= 500:
+            deepseek_circuit_breaker.record_failure()
+        elif status_code == 200:
+            deepseek_circuit_breaker.record_success(latency)
+            deepseek_latency.record(latency)
+        else:
+            deepseek_circuit_breaker.record_success()
+    
     def call_api(self, prompt: str, max_retries: Optional[int] = None) -> Dict:
         """
         调用 DeepSeek API
@@ -48,38 +129,37 @@ class DeepseekAPIClient:
         if max_retries is None:
             max_retries = self.max_retries
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": self.temperature,
-            "max_tokens": 2000
-        }
+        headers = self._build_headers()
+        payload = self._build_payload(prompt)
+        reserved_tokens = estimate_tokens(prompt, payload["max_tokens"])
+        session = get_session()
         
         last_error = None
         
         for attempt in range(max_retries):
+            # 熔断立即失败时尚未预扣 token，无需退还
+            settled = True
             try:
+                # 熔断中立即失败；超出速率限制或服务端要求暂停时排队等待
+                deepseek_circuit_breaker.before_call()
+                deepseek_rate_limiter.acquire_sync(reserved_tokens)
+                settled = False
                 logger.info(f"调用 DeepSeek API (尝试 {attempt + 1}/{max_retries})")
                 
-                response = requests.post(
+                started = time.monotonic()
+                response = session.post(
                     self.api_url,
                     headers=headers,
                     json=payload,
                     timeout=self.timeout
                 )
+                self._record_outcome(response.status_code, time.monotonic() - started)
+                deepseek_rate_limiter.record_response(response.status_code, response.headers, attempt)
                 
                 # 检查响应状态
                 if response.status_code != 200:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
+                    settled = True
                     error_msg = f"API 返回错误: {response.status_code} - {response.text}"
                     logger.error(error_msg)
                     last_error = error_msg
@@ -88,35 +168,29 @@ class DeepseekAPIClient:
                     if response.status_code == 401:
                         raise Exception(f"API 认证失败: {error_msg}")
                     
-                    # 其他错误重试
+                    # 其他错误重试（429 的等待由限流器在下次 acquire 时统一处理）
                     if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt  # 指数退避
-                        logger.info(f"等待 {wait_time} 秒后重试...")
-                        time.sleep(wait_time)
+                        if response.status_code != 429:
+                            wait_time = 2 ** attempt  # 指数退避
+                            logger.info(f"等待 {wait_time} 秒后重试...")
+                            time.sleep(wait_time)
                         continue
                     else:
                         raise Exception(error_msg)
                 
                 # 解析响应
-                result = response.json()
-                
-                # 验证响应格式
-                if "choices" not in result or not result["choices"]:
-                    raise Exception("API 返回格式错误: 缺少 choices 字段")
-                
-                # 提取内容
-                content = result["choices"][0].get("message", {}).get("content", "")
-                if not content:
-                    raise Exception("API 返回内容为空")
+                result = self._extract_content(response.json())
+                deepseek_rate_limiter.settle(reserved_tokens, result["usage"].get("total_tokens"))
+                settled = True
                 
                 logger.info("API 调用成功")
-                return {
-                    "success": True,
-                    "content": content,
-                    "usage": result.get("usage", {})
-                }
+                return result
+                
+            except CircuitOpenError:
+                raise
                 
             except requests.exceptions.Timeout:
+                deepseek_circuit_breaker.record_failure()
                 error_msg = f"API 调用超时 (超过 {self.timeout} 秒)"
                 logger.warning(error_msg)
                 last_error = error_msg
@@ -130,6 +204,7 @@ class DeepseekAPIClient:
                     raise Exception(error_msg)
                     
             except requests.exceptions.ConnectionError as e:
+                deepseek_circuit_breaker.record_failure()
                 error_msg = f"网络连接失败: {str(e)}"
                 logger.warning(error_msg)
                 last_error = error_msg
@@ -154,6 +229,11 @@ class DeepseekAPIClient:
                     continue
                 else:
                     raise
+            
+            finally:
+                # 超时、网络异常或响应无法解析时退还本次预扣的 token
+                if not settled:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
         
         # 所有重试都失败
         raise Exception(f"API 调用失败 (已重试 {max_retries} 次): {last_error}")
@@ -243,3 +323,298 @@ class DeepseekAPIClient:
             raise Exception("base_score 应该是数字")
         
         return True
+
+
+
+class AsyncDeepseekAPIClient(DeepseekAPIClient):
+    """
+    DeepSeek API 异步客户端
+    
+    基于共享的 httpx.AsyncClient 连接池，重试和限流等待使用 asyncio.sleep，
+    调用期间不会阻塞事件循环，单个 worker 可同时处理多个评分请求。
+    """
+    
+    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1/chat/completions"):
+        """
+        初始化 DeepSeek API 异步客户端
+        
+        Args:
+            api_key: API 密钥
+            api_url: API 地址
+        """
+        super().__init__(api_key, api_url)
+        self._client: Optional[httpx.AsyncClient] = None
+        # 超过近期 p95 延迟仍未返回时发送对冲请求
+        self.hedge_enabled = DEEPSEEK_HEDGE_ENABLED
+        # 流式响应（启用后不发送对冲请求）
+        self.streaming = DEEPSEEK_STREAMING
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取 httpx 异步客户端：默认使用进程内共享的连接池，_client 可替换为独立客户端（如测试）"""
+        if self._client is not None and not self._client.is_closed:
+            return self._client
+        return get_async_client()
+    
+    async def aclose(self):
+        """关闭独立的 HTTP 客户端（共享连接池由应用停止时统一关闭）"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    async def call_api(self, prompt: str, max_retries: Optional[int] = None,
+                       on_partial: Optional[Callable[[Dict], None]] = None,
+                       stop_when: Optional[Callable[[Dict], bool]] = None,
+                       max_tokens: int = 2000) -> Dict:
+        """
+        异步调用 DeepSeek API
+        
+        重试与错误处理策略与同步客户端一致（401 不重试，其余错误指数退避）。
+        
+        Args:
+            prompt: 提示词
+            max_retries: 最大重试次数
+            on_partial: 流式响应时，每有新的字段或数组元素解析完成，以已解析的内容调用
+            stop_when: 流式响应时，以已完成解析的顶层字段调用，返回 True 则停止生成
+            max_tokens: 最大生成 token 数（多文档合并评分时按文档数放大）
+            
+        Returns:
+            API 返回结果；流式响应时另含 fields（已完成解析的顶层字段）和 stopped_early（是否提前停止）
+            
+        Raises:
+            Exception: API 调用失败
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        
+        headers = self._build_headers()
+        payload = self._build_payload(prompt, stream=self.streaming, max_tokens=max_tokens)
+        reserved_tokens = estimate_tokens(prompt, payload["max_tokens"])
+        client = self._get_client()
+        # 连接池满时排队等待空闲连接，不计入请求超时
+        timeout = httpx.Timeout(self.timeout, pool=None)
+        
+        last_error = None
+        
+        for attempt in range(max_retries):
+            # 熔断立即失败时尚未预扣 token，无需退还
+            settled = True
+            try:
+                # 熔断中立即失败；超出速率限制或服务端要求暂停时排队等待
+                deepseek_circuit_breaker.before_call()
+                await deepseek_rate_limiter.acquire(reserved_tokens)
+                settled = False
+                logger.info(f"异步调用 DeepSeek API (尝试 {attempt + 1}/{max_retries})")
+                
+                started = time.monotonic()
+                if self.streaming:
+                    response, result = await self._stream(client, headers, payload, timeout, on_partial, stop_when)
+                else:
+                    response, result = await self._post(client, headers, payload, timeout, reserved_tokens), None
+                self._record_outcome(response.status_code, time.monotonic() - started)
+                deepseek_rate_limiter.record_response(response.status_code, response.headers, attempt)
+                
+                # 检查响应状态
+                if response.status_code != 200:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
+                    settled = True
+                    error_msg = f"API 返回错误: {response.status_code} - {response.text}"
+                    logger.error(error_msg)
+                    last_error = error_msg
+                    
+                    # 如果是认证错误，不重试
+                    if response.status_code == 401:
+                        raise _AuthenticationFailed(f"API 认证失败: {error_msg}")
+                    
+                    # 其他错误重试（429 的等待由限流器在下次 acquire 时统一处理）
+                    if attempt < max_retries - 1:
+                        if response.status_code != 429:
+                            await self._backoff(attempt)
+                        continue
+                    else:
+                        raise Exception(error_msg)
+                
+                # 解析响应
+                if result is None:
+                    result = self._extract_content(response.json())
+                deepseek_rate_limiter.settle(reserved_tokens, result["usage"].get("total_tokens"))
+                settled = True
+                
+                logger.info("API 调用成功")
+                return result
+                
+            except _AuthenticationFailed as e:
+                raise Exception(str(e))
+                
+            except CircuitOpenError:
+                raise
+                
+            except httpx.TimeoutException:
+                deepseek_circuit_breaker.record_failure()
+                error_msg = f"API 调用超时 (超过 {self.timeout} 秒)"
+                logger.warning(error_msg)
+                last_error = error_msg
+                
+                if attempt < max_retries - 1:
+                    await self._backoff(attempt)
+                    continue
+                else:
+                    raise Exception(error_msg)
+                    
+            except httpx.TransportError as e:
+                deepseek_circuit_breaker.record_failure()
+                error_msg = f"网络连接失败: {str(e)}"
+                logger.warning(error_msg)
+                last_error = error_msg
+                
+                if attempt < max_retries - 1:
+                    await self._backoff(attempt)
+                    continue
+                else:
+                    raise Exception(error_msg)
+                    
+            except Exception as e:
+                error_msg = f"API 调用异常: {str(e)}"
+                logger.error(error_msg)
+                last_error = error_msg
+                
+                if attempt < max_retries - 1:
+                    await self._backoff(attempt)
+                    continue
+                else:
+                    raise
+            
+            finally:
+                # 超时、网络异常或响应无法解析时退还本次预扣的 token
+                if not settled:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
+        
+        # 所有重试都失败
+        raise Exception(f"API 调用失败 (已重试 {max_retries} 次): {last_error}")
+    
+    async def _post(self, client: httpx.AsyncClient, headers: Dict, payload: Dict,
+                    timeout: httpx.Timeout, reserved_tokens: int) -> httpx.Response:
+        """
+        发送请求（启用对冲时，超过近期 p95 延迟仍未返回则再发一个相同请求，取先成功返回的结果）
+        
+        对冲请求只在限流额度充足时发送，不排队等待。对冲请求额外预扣的一份 token
+        按未被采用的请求的实际用量修正（仍在进行中被取消的请求服务端可能已经生成，保留预扣）。
+        """
+        def send():
+            return asyncio.ensure_future(client.post(self.api_url, headers=headers, json=payload, timeout=timeout))
+        
+        def used_tokens(task) -> Optional[int]:
+            if not task.done() or task.cancelled():
+                return None
+            if task.exception() is not None or task.result().status_code != 200:
+                return 0
+            try:
+                return (task.result().json().get("usage") or {}).get("total_tokens")
+            except ValueError:
+                return 0
+        
+        primary = send()
+        delay = deepseek_latency.hedge_delay() if self.hedge_enabled else None
+        if delay is None:
+            return await primary
+        
+        pending = {primary}
+        hedge = winner = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done or not deepseek_rate_limiter.try_acquire(reserved_tokens):
+                pending = set()
+                return await primary
+            
+            logger.info(f"请求超过 {delay:.1f} 秒未返回，发送对冲请求")
+            deepseek_latency.hedged += 1
+            hedge = send()
+            pending = {primary, hedge}
+            finished = []
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished.extend(done)
+                succeeded = [t for t in done if t.exception() is None and t.result().status_code == 200]
+                if succeeded:
+                    winner = succeeded[0]
+                elif pending:
+                    continue
+                else:
+                    # 两个请求都失败：优先返回有响应的一个
+                    winner = next((t for t in finished if t.exception() is None), finished[0])
+                if winner is hedge:
+                    deepseek_latency.hedge_wins += 1
+                return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if hedge is not None:
+                loser = primary if winner is hedge else hedge
+                deepseek_rate_limiter.settle(reserved_tokens, used_tokens(loser))
+    
+    async def _stream(self, client: httpx.AsyncClient, headers: Dict, payload: Dict, timeout: httpx.Timeout,
+                      on_partial: Optional[Callable[[Dict], None]],
+                      stop_when: Optional[Callable[[Dict], bool]]):
+        """
+        流式调用：逐个读取 SSE 数据块并增量解析评分 JSON
+        
+        stop_when 返回 True 时关闭连接，服务端随即停止生成，不再消耗后续 token。
+        
+        Returns:
+            (response, result)：状态码不是 200 时 result 为 None，response 已读取完整响应体
+        """
+        parser = IncrementalJSONParser()
+        parts = []
+        usage = {}
+        stopped_early = False
+        
+        async with client.stream("POST", self.api_url, headers=headers, json=payload, timeout=timeout) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response, None
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or usage
+                changed = False
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        changed = parser.feed(delta) or changed
+                
+                if changed:
+                    if on_partial:
+                        on_partial(parser.snapshot())
+                    if stop_when and stop_when(dict(parser.fields)):
+                        logger.info("所需字段已返回，停止生成")
+                        stopped_early = True
+                        break
+        
+        content = "".join(parts)
+        if not content:
+            raise Exception("API 返回内容为空")
+        
+        return response, {
+            "success": True,
+            "content": content,
+            "usage": usage,
+            "fields": dict(parser.fields),
+            "stopped_early": stopped_early
+        }
+    
+    async def _backoff(self, attempt: int):
+        """指数退避（不阻塞事件循环）"""
+        wait_time = 2 ** attempt
+        logger.info(f"等待 {wait_time} 秒后重试...")
+        await asyncio.sleep(wait_time)
+
+
+class _AuthenticationFailed(Exception):
+    """认证失败（内部使用，用于跳过重试）"""
+    pass
@@ -0,0 +1,387 @@
+"""
+DeepSeek API 共享连接池与限流
+进程内所有 DeepSeek 客户端（app/deepseek_client.py、app/services/deepseek_client.py、
+app/services/deepseek_api_client.py）共用同一个 requests 会话、同一个 httpx 异步客户端和同一个限流器：
+
+- 连接池大小由 DEEPSEEK_MAX_CONNECTIONS 控制，连接用尽时请求排队等待空闲连接；
+- 令牌桶同时限制每分钟请求数和每分钟 token 数，超出时请求按到达顺序排队等待，而不是直接打到接口上；
+- 收到 429 或限流响应头（Retry-After、x-ratelimit-remaining-*/x-ratelimit-reset-*）时，
+  所有请求一起暂停到服务端给出的时间，而不是各自盲目退避重试；
+- 熔断器：连续失败或持续超过延迟目标时熔断，熔断期间调用立即失败（见 circuit_breaker.py）；
+- 对冲请求（可选）：请求超过近期 p95 延迟仍未返回时再发一个相同请求，取先返回的结果；
+- metrics() 提供排队数、累计限流等待时间、熔断状态、对冲次数等指标。
+
+DeepSeek 没有公布固定的速率上限，令牌桶默认不限制（0），按账号实际额度配置。
+"""
+
+import asyncio
+import email.utils
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# 每分钟最多请求数 / token 数（0 表示不限制）
+DEEPSEEK_REQUESTS_PER_MINUTE = int(os.getenv("DEEPSEEK_REQUESTS_PER_MINUTE", "0"))
+DEEPSEEK_TOKENS_PER_MINUTE = int(os.getenv("DEEPSEEK_TOKENS_PER_MINUTE", "0"))
+# 连接池大小（同时进行的请求数上限）
+DEEPSEEK_MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20"))
+DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# 429 且没有 Retry-After 时的最长暂停时间（秒）
+DEEPSEEK_MAX_BACKOFF = float(os.getenv("DEEPSEEK_MAX_BACKOFF", "60"))
+# 熔断：连续失败次数（0 表示不启用）、熔断后放行探测请求的冷却时间（秒）
+DEEPSEEK_BREAKER_FAILURE_THRESHOLD = int(os.getenv("DEEPSEEK_BREAKER_FAILURE_THRESHOLD", "5"))
+DEEPSEEK_BREAKER_RESET_TIMEOUT = float(os.getenv("DEEPSEEK_BREAKER_RESET_TIMEOUT", "30"))
+# 延迟目标（秒）：成功但超过该时间的响应也计入熔断失败次数，默认不启用
+# （评分请求正常耗时可能较长，启用时应按实际延迟分布设置）
+DEEPSEEK_LATENCY_SLO = float(os.getenv("DEEPSEEK_LATENCY_SLO")) if os.getenv("DEEPSEEK_LATENCY_SLO") else None
+# 对冲请求：是否启用、p95 至少基于多少个样本、最短对冲等待时间（秒）
+DEEPSEEK_HEDGE_ENABLED = os.getenv("DEEPSEEK_HEDGE_ENABLED", "false").lower() == "true"
+DEEPSEEK_HEDGE_MIN_SAMPLES = int(os.getenv("DEEPSEEK_HEDGE_MIN_SAMPLES", "20"))
+DEEPSEEK_HEDGE_MIN_DELAY = float(os.getenv("DEEPSEEK_HEDGE_MIN_DELAY", "1"))
+
+
+def estimate_tokens(prompt: str, max_tokens: int = 0) -> int:
+    """
+    估算一次请求消耗的 token 数（提示词 + 最大输出）
+
+    DeepSeek 约 1 个中文字符 0.6 token、1 个英文字符 0.3 token，按 0.6 偏保守估算，
+    请求完成后用接口返回的实际用量修正（RateLimiter.settle）。
+    """
+    return int(len(prompt) * 0.6) + max_tokens
+
+
+def _parse_duration(value) -> Optional[float]:
+    """解析秒数或 1s / 6m0s / 20ms 格式的时长"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    seconds = _parse_duration(value)
+    if seconds is not None or not isinstance(value, str):
+        return seconds
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RateLimiter:
+    """
+    请求数 + token 数双令牌桶（线程安全，同步和异步调用方共用）
+
+    reserve 立即扣减令牌（可为负）并返回需要等待的时间，先到的请求等待时间短，
+    因此等待中的请求按到达顺序依次放行。
+    """
+
+    def __init__(self, requests_per_minute: int = DEEPSEEK_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = DEEPSEEK_TOKENS_PER_MINUTE,
+                 max_backoff: float = DEEPSEEK_MAX_BACKOFF):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._request_level = float(requests_per_minute)
+        self._token_level = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        # 服务端要求暂停到的时间点（monotonic）
+        self._blocked_until = 0.0
+
+        self._waiting = 0
+        self._max_waiting = 0
+        self._requests = 0
+        self._throttled_requests = 0
+        self._throttled_seconds = 0.0
+        self._rate_limited_responses = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute > 0:
+            self._request_level = min(float(self.requests_per_minute),
+                                      self._request_level + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute > 0:
+            self._token_level = min(float(self.tokens_per_minute),
+                                    self._token_level + elapsed * self.tokens_per_minute / 60)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """不等待：额度充足时扣减并返回 True，否则不扣减并返回 False（对冲请求使用）"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return False
+            if self.requests_per_minute > 0 and self._request_level < 1:
+                return False
+            tokens = min(tokens, self.tokens_per_minute)
+            if self.tokens_per_minute > 0 and self._token_level < tokens:
+                return False
+            if self.requests_per_minute > 0:
+                self._request_level -= 1
+            if self.tokens_per_minute > 0:
+                self._token_level -= tokens
+            self._requests += 1
+            return True
+
+    def reserve(self, tokens: int = 0) -> float:
+        """扣减一次请求和 tokens 个 token，返回放行前需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = max(0.0, self._blocked_until - now)
+            if self.requests_per_minute > 0:
+                self._request_level -= 1
+                if self._request_level < 0:
+                    delay = max(delay, -self._request_level * 60 / self.requests_per_minute)
+            if self.tokens_per_minute > 0:
+                # 单个请求超过每分钟额度时按满额度计，否则永远无法放行
+                self._token_level -= min(tokens, self.tokens_per_minute)
+                if self._token_level < 0:
+                    delay = max(delay, -self._token_level * 60 / self.tokens_per_minute)
+            self._requests += 1
+            return delay
+
+    def _block_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+    def _enter_wait(self):
+        with self._lock:
+            self._waiting += 1
+            self._throttled_requests += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+
+    def _leave_wait(self, waited: float):
+        with self._lock:
+            self._waiting -= 1
+            self._throttled_seconds += waited
+
+    def acquire_sync(self, tokens: int = 0):
+        """同步等待放行（在线程中调用）"""
+        delay = self.reserve(tokens)
+        if delay <= 0:
+            return
+        self._enter_wait()
+        started = time.monotonic()
+        try:
+            # 排队期间服务端可能再次要求暂停
+            while delay > 0:
+                time.sleep(delay)
+                delay = self._block_remaining()
+        finally:
+            self._leave_wait(time.monotonic() - started)
+
+    async def acquire(self, tokens: int = 0):
+        """异步等待放行（不阻塞事件循环）"""
+        delay = self.reserve(tokens)
+        if delay <= 0:
+            return
+        self._enter_wait()
+        started = time.monotonic()
+        try:
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._block_remaining()
+        finally:
+            self._leave_wait(time.monotonic() - started)
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """按实际用量修正预扣的 token（退还多扣的部分或补扣不足的部分）"""
+        if self.tokens_per_minute <= 0 or used is None:
+            return
+        with self._lock:
+            self._token_level += reserved - used
+
+    def record_response(self, status_code: int, headers, attempt: int = 0) -> float:
+        """
+        根据响应状态码和限流响应头设置全局暂停
+
+        Args:
+            status_code: HTTP 状态码
+            headers: 响应头（requests / httpx 的大小写不敏感字典）
+            attempt: 当前重试次数（429 没有 Retry-After 时用于指数退避）
+
+        Returns:
+            暂停秒数，0 表示无需暂停
+        """
+        def header(name):
+            try:
+                return headers.get(name)
+            except Exception:
+                return None
+
+        pause = 0.0
+        if status_code == 429:
+            retry_after = parse_retry_after(header("Retry-After"))
+            pause = retry_after if retry_after is not None else min(2 ** attempt, self.max_backoff)
+        for kind in ("requests", "tokens"):
+            remaining = _parse_duration(header(f"x-ratelimit-remaining-{kind}"))
+            reset = _parse_duration(header(f"x-ratelimit-reset-{kind}"))
+            if remaining is not None and remaining <= 0 and reset is not None:
+                pause = max(pause, reset)
+
+        with self._lock:
+            if status_code == 429:
+                self._rate_limited_responses += 1
+            if pause > 0:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        if pause > 0:
+            logger.warning(f"DeepSeek API 限流，所有请求暂停 {pause:.1f} 秒")
+        return pause
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests": self._requests,
+                "queue_depth": self._waiting,
+                "max_queue_depth": self._max_waiting,
+                "throttled_requests": self._throttled_requests,
+                "throttled_seconds": round(self._throttled_seconds, 3),
+                "rate_limited_responses": self._rate_limited_responses,
+                "paused_seconds_remaining": round(max(0.0, self._blocked_until - time.monotonic()), 3)
+            }
+
+
+class LatencyTracker:
+    """记录最近成功请求的耗时，计算对冲等待时间（p95）"""
+
+    def __init__(self, window: int = 200, min_samples: int = DEEPSEEK_HEDGE_MIN_SAMPLES,
+                 min_delay: float = DEEPSEEK_HEDGE_MIN_DELAY):
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲等待时间，样本不足时返回 None（不对冲）"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+        return max(self.min_delay, self.percentile(0.95))
+
+    def metrics(self) -> Dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "hedged_requests": self.hedged,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+# 进程内共享的限流器、熔断器和延迟统计
+deepseek_rate_limiter = RateLimiter()
+deepseek_circuit_breaker = CircuitBreaker(
+    "DeepSeek API",
+    failure_threshold=DEEPSEEK_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=DEEPSEEK_BREAKER_RESET_TIMEOUT,
+    latency_slo=DEEPSEEK_LATENCY_SLO
+)
+deepseek_latency = LatencyTracker()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_session() -> requests.Session:
+    """
+    获取共享的 requests 会话
+
+    连接池满时阻塞等待空闲连接（pool_block），不额外建立连接；
+    不配置 urllib3 自动重试，重试与等待由客户端和限流器处理。
+    认证头按请求传入，会话本身不带任何客户端的密钥。
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DEEPSEEK_MAX_CONNECTIONS, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """获取共享的 httpx 异步客户端（绑定当前事件循环，循环变化时重建）"""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=DEEPSEEK_MAX_CONNECTIONS,
+                max_keepalive_connections=DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_clients():
+    """关闭共享连接（应用停止时调用）"""
+    global _session, _async_client, _async_client_loop
+    if _async_client is not None and not _async_client.is_closed and \
+            _async_client_loop is asyncio.get_running_loop():
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def metrics() -> Dict:
+    """限流、熔断、延迟与连接池指标"""
+    return {
+        **deepseek_rate_limiter.metrics(),
+        **deepseek_latency.metrics(),
+        "hedge_enabled": DEEPSEEK_HEDGE_ENABLED,
+        "circuit_breaker": deepseek_circuit_breaker.metrics(),
+        "max_connections": DEEPSEEK_MAX_CONNECTIONS
+    }
@@ -5,14 +5,124 @@
 
 import logging
 import os
-from typing import Optional
+from typing import Iterator, Optional, Tuple
+
+from .utils.parse_cache import parse_cache, calculate_file_hash
+from .utils.text_budget import PARSE_MAX_CHARS, collect_pages, render_collected, truncate_text
 
 logger = logging.getLogger(__name__)
 
 
+# 教师端后端目录（评教系统最终版/评教系统教师端/backend），教师上传的文件保存在该目录下
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEACHER_BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(_BASE_DIR)), "评教系统教师端", "backend")
+
+
 class FileParser:
     """文件解析器"""
     
+    # 解析器版本，修改提取逻辑（输出文本格式变化）后需要递增，使旧的解析缓存失效
+    PARSER_VERSION = 1
+    
+    # 扩展名到评分文件类型的映射
+    SCORING_TYPE_MAPPING = {
+        'pdf': '教案',  # 默认将PDF视为教案
+        'docx': '教学反思',  # 默认将DOCX视为教学反思
+        'doc': '教学反思',
+        'pptx': '课件',
+        'ppt': '课件',
+        'txt': '教学反思'
+    }
+    
+    @staticmethod
+    def infer_scoring_type(file_info: dict) -> str:
+        """
+        从提交的文件信息推断评分文件类型
+        
+        Args:
+            file_info: 提交记录中的文件信息（file_name/type）
+            
+        Returns:
+            评分文件类型，无法识别时默认为教案
+        """
+        file_name = file_info.get("file_name")
+        if file_name:
+            file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
+            return FileParser.SCORING_TYPE_MAPPING.get(file_ext, '教案')
+        return file_info.get("type", '教案')
+    
+    @staticmethod
+    def resolve_path(file_path: str) -> Optional[str]:
+        """
+        解析提交记录中的文件路径
+        
+        依次尝试原始路径和教师端后端目录下的相对路径，兼容 Windows 分隔符。
+        
+        Args:
+            file_path: 提交记录中保存的文件路径
+            
+        Returns:
+            实际存在的文件路径，找不到时返回 None
+        """
+        # 规范化文件路径（处理Windows反斜杠和混合分隔符）
+        file_path = os.path.normpath(file_path.replace('\\', '/'))
+        
+        possible_paths = [
+            file_path,
+            os.path.join(TEACHER_BACKEND_DIR, file_path)
+        ]
+        
+        for path in possible_paths:
+            normalized_path = os.path.normpath(path)
+            if os.path.exists(normalized_path):
+                logger.info(f"找到文件: {normalized_path}")
+                return normalized_path
+        
+        logger.warning(f"文件不存在，已尝试: {possible_paths}")
+        return None
+    
+    @staticmethod
+    def calculate_file_hash(file_path: str) -> str:
+        """
+        计算文件 SHA-256 哈希值
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            十六进制哈希值
+        """
+        return calculate_file_hash(file_path)
+    
+    @staticmethod
+    def parse_file_cached(file_path: str, file_type: Optional[str] = None,
+                          file_hash: Optional[str] = None,
+                          max_chars: Optional[int] = PARSE_MAX_CHARS) -> str:
+        """
+        带磁盘缓存的 parse_file，供评分使用
+        
+        同一文件（按内容哈希）只解析一次，重试、重新评分和批量评分直接复用提取的文本。
+        默认按评分提示词的字数预算提取，超出部分不解析。
+        
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型（可选）
+            file_hash: 文件 SHA-256（已知时传入，避免重复计算）
+            max_chars: 字数预算，默认读取 PARSE_MAX_CHARS，None 或 0 表示不限制
+            
+        Returns:
+            提取的文本内容
+        """
+        return parse_cache.get_or_parse(
+            file_path,
+            file_type,
+            lambda: FileParser.parse_file(file_path, file_type, max_chars),
+            parser_name="legacy",
+            parser_version=FileParser.PARSER_VERSION,
+            file_hash=file_hash,
+            max_chars=max_chars
+        )
+    
     @staticmethod
     def parse_docx(file_path: str) -> str:
         """
@@ -62,15 +172,54 @@ class FileParser:
                 raise Exception(f"DOCX 文件解析失败: {str(e)}，纯文本读取也失败: {str(txt_error)}")
     
     @staticmethod
-    def parse_pdf(file_path: str) -> str:
+    def iter_pdf_pages(pdf_reader) -> Iterator[Tuple[int, str]]:
+        """
+        逐页提取 PDF 文本（生成器，停止迭代后不再解析后续页面）
+        
+        Args:
+            pdf_reader: PyPDF2.PdfReader 实例
+            
+        Yields:
+            (页码, 页面文本)，页码从 1 开始，无文本的页面跳过
+        """
+        for page_num, page in enumerate(pdf_reader.pages):
+            text = page.extract_text()
+            if text.strip():
+                yield page_num + 1, text
+    
+    @staticmethod
+    def iter_pptx_slides(prs) -> Iterator[Tuple[int, str]]:
+        """
+        逐张提取 PPTX 幻灯片文本（生成器，停止迭代后不再解析后续幻灯片）
+        
+        Args:
+            prs: pptx.Presentation 实例
+            
+        Yields:
+            (幻灯片序号, 幻灯片文本)，序号从 1 开始，无文本的幻灯片跳过
+        """
+        for slide_num, slide in enumerate(prs.slides):
+            slide_text = []
+            
+            # 提取文本框内容
+            for shape in slide.shapes:
+                if hasattr(shape, "text") and shape.text.strip():
+                    slide_text.append(shape.text)
+            
+            if slide_text:
+                yield slide_num + 1, f"[幻灯片 {slide_num + 1}]\n" + "\n".join(slide_text)
+    
+    @staticmethod
+    def parse_pdf(file_path: str, max_chars: Optional[int] = None) -> str:
         """
         解析 PDF 文件
         
         Args:
             file_path: 文件路径
+            max_chars: 字数预算，达到后停止解析后续页面（None 表示不限制）
             
         Returns:
-            提取的文本内容
+            提取的文本内容，截断时末尾附加采样页说明
             
         Raises:
             Exception: 解析失败
@@ -78,18 +227,18 @@ class FileParser:
         try:
             import PyPDF2
             
-            text_content = []
-            
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    if text.strip():
-                        text_content.append(text)
+                result = collect_pages(
+                    FileParser.iter_pdf_pages(pdf_reader), max_chars, "\n", len(pdf_reader.pages)
+                )
             
-            return "\n".join(text_content)
+            if result["truncated"]:
+                logger.info(
+                    f"PDF 达到字数预算 {max_chars}，提取页: {result['sampled_pages']}，"
+                    f"总页数: {result['total_pages']}"
+                )
+            return render_collected(result, unit="页")
             
         except ImportError:
             raise Exception("缺少 PyPDF2 库，请安装: pip install PyPDF2")
@@ -97,15 +246,16 @@ class FileParser:
             raise Exception(f"PDF 文件解析失败: {str(e)}")
     
     @staticmethod
-    def parse_pptx(file_path: str) -> str:
+    def parse_pptx(file_path: str, max_chars: Optional[int] = None) -> str:
         """
         解析 PPTX 文件
         
         Args:
             file_path: 文件路径
+            max_chars: 字数预算，达到后停止解析后续幻灯片（None 表示不限制）
             
         Returns:
-            提取的文本内容
+            提取的文本内容，截断时末尾附加采样幻灯片说明
             
         Raises:
             Exception: 解析失败
@@ -113,22 +263,15 @@ class FileParser:
         try:
             from pptx import Presentation
             
-            text_content = []
-            
             prs = Presentation(file_path)
+            result = collect_pages(FileParser.iter_pptx_slides(prs), max_chars, "\n", len(prs.slides))
             
-            for slide_num, slide in enumerate(prs.slides):
-                slide_text = []
-                
-                # 提取文本框内容
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        slide_text.append(shape.text)
-                
-                if slide_text:
-                    text_content.append(f"[幻灯片 {slide_num + 1}]\n" + "\n".join(slide_text))
-            
-            return "\n".join(text_content)
+            if result["truncated"]:
+                logger.info(
+                    f"PPTX 达到字数预算 {max_chars}，提取幻灯片: {result['sampled_pages']}，"
+                    f"总数: {result['total_pages']}"
+                )
+            return render_collected(result, unit="张幻灯片")
             
         except ImportError:
             raise Exception("缺少 python-pptx 库，请安装: pip install python-pptx")
@@ -163,13 +306,15 @@ class FileParser:
             raise Exception(f"TXT 文件解析失败: {str(e)}")
     
     @staticmethod
-    def parse_file(file_path: str, file_type: Optional[str] = None) -> str:
+    def parse_file(file_path: str, file_type: Optional[str] = None,
+                   max_chars: Optional[int] = None) -> str:
         """
         根据文件类型自动选择解析方法
         
         Args:
             file_path: 文件路径
             file_type: 文件类型（可选，如果不提供则从文件扩展名推断）
+            max_chars: 字数预算（可选），PDF/PPTX 达到后停止解析，DOCX/TXT 解析后截断
             
         Returns:
             提取的文本内容
@@ -194,13 +339,13 @@ class FileParser:
             
             # 根据文件类型选择解析方法
             if file_type in ['docx', 'doc']:
-                return FileParser.parse_docx(file_path)
+                return truncate_text(FileParser.parse_docx(file_path), max_chars)
             elif file_type == 'pdf':
-                return FileParser.parse_pdf(file_path)
+                return FileParser.parse_pdf(file_path, max_chars)
             elif file_type in ['pptx', 'ppt']:
-                return FileParser.parse_pptx(file_path)
+                return FileParser.parse_pptx(file_path, max_chars)
             elif file_type == 'txt':
-                return FileParser.parse_txt(file_path)
+                return truncate_text(FileParser.parse_txt(file_path), max_chars)
             else:
                 raise Exception(f"不支持的文件格式: {file_type}。支持的格式: docx, pdf, pptx, txt")
             
@@ -11,13 +11,14 @@ import os
 import shutil
 import uuid
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from .database import get_db, engine, Base
+from .database import get_db, engine, Base, db_writer
 from .models import (
     SystemConfig, EvaluationTask, EvaluationData, AnalysisReport, User,
     EvaluationForm, DistributionRecord, MaterialSubmission,
@@ -34,13 +35,49 @@ from .auth import (
     get_password_hash, verify_password, create_access_token,
     get_current_user, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from .routes.scoring import router as scoring_router
-from .services import sync_distribution_to_teacher, sync_review_status_to_teacher
+from .routes.scoring import router as scoring_router, scoring_job_manager
+from .parse_executor import parse_executor
+from .queries import (
+    InvalidCursorError,
+    query_evaluation_tasks, serialize_evaluation_task,
+    query_archived_scores, serialize_archived_score, archived_score_stats,
+    query_material_submissions, serialize_material_submission,
+    query_evaluation_templates, serialize_evaluation_template
+)
+from .task_distribution import distribute_template, load_target_teachers
+from .services import teacher_sync_client
+from .realtime import connection_manager, format_event, ALL_DEPARTMENTS
+from .deepseek_pool import close_clients as close_deepseek_clients
+from .sync_outbox import (
+    outbox_dispatcher, sync_workers, dispatch_in_background,
+    enqueue_distributions, enqueue_review_status, enqueue_evaluation_score
+)
 
 # 创建所有数据表
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 连接实时推送的跨进程广播（评分 worker 会推送进度，需先启动）
+    await connection_manager.start()
+    # 启动批量评分后台 worker（恢复上次中断的评分任务）
+    await scoring_job_manager.start()
+    # 启动同步发件箱分发器（继续发送上次未发送的消息）
+    await outbox_dispatcher.start()
+    await sync_workers.start()
+    yield
+    # 先等待已提交的同步任务执行完毕，再停止分发器
+    await sync_workers.stop()
+    await outbox_dispatcher.stop()
+    await scoring_job_manager.stop()
+    await connection_manager.close()
+    parse_executor.shutdown()
+    db_writer.shutdown()
+    await teacher_sync_client.aclose()
+    await close_deepseek_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # 从环境变量读取允许的源
 origins_env = os.getenv("ALLOWED_ORIGINS", "*")
@@ -63,36 +100,19 @@ app.include_router(scoring_router)
 # 暂时禁用Redis，使用内存存储
 redis_client = None
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict = {}
-
-    async def connect(self, websocket: WebSocket, department_id: str):
-        await websocket.accept()
-        if department_id not in self.active_connections:
-            self.active_connections[department_id] = []
-        self.active_connections[department_id].append(websocket)
-
-    def disconnect(self, websocket: WebSocket, department_id: str):
-        if department_id in self.active_connections:
-            self.active_connections[department_id].remove(websocket)
-            if not self.active_connections[department_id]:
-                del self.active_connections[department_id]
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str, department_id: str = None):
-        if department_id:
-            if department_id in self.active_connections:
-                for connection in self.active_connections[department_id]:
-                    await connection.send_text(message)
-        else:
-            for dept_connections in self.active_connections.values():
-                for connection in dept_connections:
-                    await connection.send_text(message)
+def publish_teacher_event(db: Session, event_type: str, teacher_id: str, data: dict, key: str = None):
+    """
+    推送与教师相关的实时事件（只推送给该教师所在部门及订阅 all 的连接）
 
-manager = ConnectionManager()
+    在写操作提交之后调用：推送失败（包括查询教师部门失败）只记录日志，
+    不能让已提交的请求返回 500 导致客户端重试。
+    """
+    try:
+        department_id = db.query(Teacher.department_id).filter(Teacher.teacher_id == teacher_id).scalar()
+        connection_manager.publish(event_type, data, department_id=department_id or ALL_DEPARTMENTS, key=key)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"实时事件推送失败: {event_type}, {str(e)}")
 
 # ==================== 认证接口 ====================
 
@@ -338,13 +358,22 @@ async def get_teachers(
 
 @app.websocket("/ws/monitoring/{department_id}")
 async def websocket_endpoint(websocket: WebSocket, department_id: str):
-    await manager.connect(websocket, department_id)
+    """
+    实时事件推送（评分任务进度、考评任务状态、新提交等）
+
+    department_id 为 all 时接收所有部门的事件；客户端发送 ping 时回复 pong（心跳）。
+    """
+    subscriber = await connection_manager.connect(websocket, department_id)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.send_personal_message(f"You: {data}", websocket)
+            if data == "ping":
+                # 心跳只回复当前连接，不经过跨进程广播
+                subscriber.offer("pong", format_event("pong", {}, department_id))
     except WebSocketDisconnect:
-        manager.disconnect(websocket, department_id)
+        pass
+    finally:
+        connection_manager.disconnect(websocket, department_id)
 
 @app.post("/config/evaluation-plan")
 async def create_evaluation_plan(plan_data: dict, db: Session = Depends(get_db)):
@@ -600,14 +629,8 @@ async def distribute_materials(
                 for t in teachers
             ]
         else:
-            # 定向分发：获取指定教师
-            for teacher_id in distribute_data.target_teachers:
-                teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
-                if teacher:
-                    target_teachers.append({
-                        "teacher_id": teacher.teacher_id,
-                        "teacher_name": teacher.teacher_name
-                    })
+            # 定向分发：一次查询获取指定教师
+            target_teachers = load_target_teachers(db, distribute_data.target_teachers)
         
         if not target_teachers:
             raise HTTPException(
@@ -615,8 +638,11 @@ async def distribute_materials(
                 detail="未找到目标教师"
             )
         
-        # 为每个材料创建分发记录
+        # 为每个材料创建分发记录，同步消息随分发记录一起写入发件箱
         distribution_records = []
+        sync_keys = []
+        distributed_at = datetime.now().isoformat()
+        teacher_ids = [teacher["teacher_id"] for teacher in target_teachers]
         for material_id, material_type in zip(distribute_data.material_ids, distribute_data.material_types):
             # 获取材料名称
             material_name = ""
@@ -645,42 +671,26 @@ async def distribute_materials(
             
             db.add(distribution)
             distribution_records.append(distribution)
+            sync_keys += enqueue_distributions(
+                db,
+                material_id=material_id,
+                material_name=material_name,
+                material_type=material_type,
+                file_url=f"/uploads/{material_id}",
+                teacher_ids=teacher_ids,
+                distributed_at=distributed_at
+            )
         
         db.commit()
         
-        print(f"开始同步分发信息，材料数量: {len(distribute_data.material_ids)}, 教师数量: {len(target_teachers)}")
-        
-        # 同步到教师端
-        for material_id, material_type in zip(distribute_data.material_ids, distribute_data.material_types):
-            # 获取材料名称
-            material_name = ""
-            if material_type == "evaluation_form":
-                form = db.query(EvaluationForm).filter(EvaluationForm.form_id == material_id).first()
-                if form:
-                    material_name = form.name
-            else:
-                material_name = material_id
-            
-            print(f"准备同步材料: {material_name} ({material_id})")
-            
-            # 为每个教师同步
-            for teacher in target_teachers:
-                print(f"调用sync_distribution_to_teacher for {teacher['teacher_id']}")
-                await sync_distribution_to_teacher(
-                    material_id=material_id,
-                    material_name=material_name,
-                    material_type=material_type,
-                    file_url=f"/uploads/{material_id}",
-                    teacher_ids=[teacher["teacher_id"]],
-                    distributed_at=datetime.now().isoformat()
-                )
-        
-        print("同步完成")
+        # 交给后台任务同步到教师端，不等待教师端响应
+        sync_job_id = dispatch_in_background(sync_keys)
         
         return {
             "distribution_id": distribution_records[0].distribution_id if distribution_records else "",
             "message": "材料分发成功",
-            "distributed_count": len(target_teachers)
+            "distributed_count": len(target_teachers),
+            "sync_job_id": sync_job_id
         }
         
     except HTTPException:
@@ -762,6 +772,8 @@ async def get_distribution_records(
 async def get_material_submissions(
     status_filter: Optional[str] = Query(None, alias="status", description="审核状态筛选"),
     teacher_id: Optional[str] = Query(None, description="教师ID筛选"),
+    after: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量（不传则返回全部）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -771,42 +783,27 @@ async def get_material_submissions(
     - 支持审核状态筛选
     - 支持教师ID筛选
     - 返回提交材料列表（按提交时间倒序）
+    - 支持游标分页：传入 limit，下一页传入上一页返回的 next_cursor
     """
     try:
-        query = db.query(MaterialSubmission)
-        
-        # 审核状态筛选
-        if status_filter:
-            query = query.filter(MaterialSubmission.review_status == status_filter)
-        
-        # 教师ID筛选
-        if teacher_id:
-            query = query.filter(MaterialSubmission.teacher_id == teacher_id)
-        
         # 按提交时间倒序排列，最新的在前
-        submissions = query.order_by(MaterialSubmission.submitted_at.desc()).all()
+        submissions, next_cursor = query_material_submissions(db, status_filter, teacher_id, after, limit)
         
         print(f"查询提交材料: 总数={len(submissions)}")
         if submissions:
             print(f"最新提交: {submissions[0].submission_id} - {submissions[0].submitted_at}")
         
         # 转换为响应格式
-        submissions_data = []
-        for submission in submissions:
-            submissions_data.append({
-                "submission_id": submission.submission_id,
-                "teacher_id": submission.teacher_id,
-                "teacher_name": submission.teacher_name,
-                "files": submission.files,
-                "submission_time": submission.submitted_at.isoformat() if submission.submitted_at else "",
-                "review_status": submission.review_status
-            })
+        submissions_data = [serialize_material_submission(submission) for submission in submissions]
         
         return {
             "submissions": submissions_data,
-            "total": len(submissions_data)
+            "total": len(submissions_data),
+            "next_cursor": next_cursor
         }
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -843,6 +840,13 @@ async def sync_teacher_submission(
         db.commit()
         db.refresh(submission)
         
+        publish_teacher_event(db, "submission_created", submission.teacher_id, {
+            "submission_id": submission.submission_id,
+            "teacher_id": submission.teacher_id,
+            "teacher_name": submission.teacher_name,
+            "submitted_at": submission.submitted_at.isoformat()
+        })
+        
         return {
             "message": "材料提交同步成功",
             "submission_id": submission.submission_id
@@ -887,18 +891,25 @@ async def update_review_status(
         submission.reviewed_by = current_user.id
         submission.reviewed_at = datetime.utcnow()
         
-        db.commit()
-        
-        # 同步审核状态到教师端
-        await sync_review_status_to_teacher(
+        # 审核状态同步消息随审核结果一起提交，由后台任务发送到教师端
+        sync_keys = enqueue_review_status(
+            db,
             submission_id=submission_id,
             status=review_data.status,
             feedback=review_data.feedback or "",
             reviewed_at=submission.reviewed_at.isoformat()
         )
+        db.commit()
+        sync_job_id = dispatch_in_background(sync_keys)
+        
+        publish_teacher_event(db, "submission_status", submission.teacher_id, {
+            "submission_id": submission_id,
+            "review_status": review_data.status
+        }, key=submission_id)
         
         return {
-            "message": "审核状态更新成功"
+            "message": "审核状态更新成功",
+            "sync_job_id": sync_job_id
         }
         
     except HTTPException:
@@ -1037,6 +1048,13 @@ async def sync_teacher_submission(
         
         print(f"提交记录已保存: {data.submission_id}")
         
+        publish_teacher_event(db, "submission_created", data.teacher_id, {
+            "submission_id": data.submission_id,
+            "teacher_id": data.teacher_id,
+            "teacher_name": data.teacher_name,
+            "submitted_at": submitted_at.isoformat()
+        })
+        
         return {"message": "同步成功"}
         
     except Exception as e:
@@ -1196,6 +1214,26 @@ async def upload_evaluation_template(
         )
 
 
+@app.get("/api/sync-jobs/{job_id}", response_model=dict)
+async def get_sync_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    查询同步到教师端的后台任务状态
+
+    - status: queued / running / succeeded / failed / cancelled
+    - result: {"claimed", "sent", "retry", "failed"}，retry 的消息由分发器稍后重试
+    """
+    job = sync_workers.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="同步任务不存在或已过期"
+        )
+    return job
+
+
 @app.post("/api/evaluation-templates/{template_id}/distribute", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def distribute_evaluation_template(
     template_id: str,
@@ -1224,8 +1262,7 @@ async def distribute_evaluation_template(
         
         # 获取目标教师
         if distribution_type == "batch":
-            teachers = db.query(Teacher).all()
-            target_teacher_ids = [t.teacher_id for t in teachers]
+            target_teacher_ids = None
         else:
             if not target_teachers:
                 raise HTTPException(
@@ -1234,44 +1271,16 @@ async def distribute_evaluation_template(
                 )
             target_teacher_ids = target_teachers
         
-        # 为每个教师创建考评任务
-        created_tasks = []
-        for teacher_id in target_teacher_ids:
-            teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
-            if not teacher:
-                continue
-            
-            # 生成任务ID：template_id_teacher_id
-            task_id = f"{template_id}_{teacher_id}"
-            
-            task = EvaluationAssignmentTask(
-                task_id=task_id,
-                template_id=template_id,
-                teacher_id=teacher_id,
-                teacher_name=teacher.teacher_name,
-                deadline=template.deadline,
-                status="pending"
-            )
-            
-            db.add(task)
-            created_tasks.append(task)
-        
-        db.commit()
-        
-        # 更新模板状态
-        template.status = "published"
-        template.target_teachers = [
-            {"teacher_id": t.teacher_id, "teacher_name": t.teacher_name}
-            for t in db.query(Teacher).filter(Teacher.teacher_id.in_(target_teacher_ids)).all()
-        ]
-        db.commit()
-        
-        # 同步到教师端
-        await sync_evaluation_tasks_to_teacher(template, target_teacher_ids)
+        # 批量创建考评任务（任务ID：template_id_teacher_id），重复分配时跳过已存在的任务；
+        # 同步消息在同一事务中写入发件箱，交给后台任务发送到教师端，不等待教师端响应
+        result = distribute_template(db, template, target_teacher_ids)
+        sync_job_id = dispatch_in_background(result["sync_keys"])
         
         return {
             "message": "考评表分配成功",
-            "distributed_count": len(created_tasks)
+            "distributed_count": result["created"],
+            "existing_count": result["existing"],
+            "sync_job_id": sync_job_id
         }
         
     except HTTPException:
@@ -1296,27 +1305,9 @@ async def get_evaluation_templates(
     获取考评表列表
     """
     try:
-        query = db.query(EvaluationTemplate)
-        
-        if status_filter:
-            query = query.filter(EvaluationTemplate.status == status_filter)
-        
-        templates = query.order_by(EvaluationTemplate.created_at.desc()).all()
-        
-        templates_data = []
-        for template in templates:
-            templates_data.append({
-                "template_id": template.template_id,
-                "name": template.name,
-                "description": template.description,
-                "file_name": template.file_name,
-                "file_type": template.file_type,
-                "total_score": template.total_score,
-                "deadline": template.deadline.isoformat(),
-                "status": template.status,
-                "target_count": len(template.target_teachers),
-                "created_at": template.created_at.isoformat()
-            })
+        templates = query_evaluation_templates(db, status_filter)
+        
+        templates_data = [serialize_evaluation_template(template) for template in templates]
         
         return {
             "templates": templates_data,
@@ -1395,6 +1386,8 @@ async def get_evaluation_tasks(
     template_id: Optional[str] = Query(None, description="考评表ID筛选"),
     teacher_id: Optional[str] = Query(None, description="教师ID筛选"),
     status_filter: Optional[str] = Query(None, description="状态筛选"),
+    after: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量（不传则返回全部）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -1402,55 +1395,22 @@ async def get_evaluation_tasks(
     获取考评任务列表
     
     - 支持按考评表、教师、状态筛选
+    - 支持游标分页：传入 limit，下一页传入上一页返回的 next_cursor
     """
     try:
-        query = db.query(EvaluationAssignmentTask)
+        # 考评表信息通过 LEFT JOIN 一次查出
+        rows, next_cursor = query_evaluation_tasks(db, template_id, teacher_id, status_filter, after, limit)
         
-        if template_id:
-            query = query.filter(EvaluationAssignmentTask.template_id == template_id)
-        
-        if teacher_id:
-            query = query.filter(EvaluationAssignmentTask.teacher_id == teacher_id)
-        
-        if status_filter:
-            query = query.filter(EvaluationAssignmentTask.status == status_filter)
-        
-        tasks = query.order_by(EvaluationAssignmentTask.created_at.desc()).all()
-        
-        tasks_data = []
-        for task in tasks:
-            template = db.query(EvaluationTemplate).filter(
-                EvaluationTemplate.template_id == task.template_id
-            ).first()
-            
-            tasks_data.append({
-                "task_id": task.task_id,
-                "template_id": task.template_id,
-                "template_name": template.name if template else "",
-                "teacher_id": task.teacher_id,
-                "teacher_name": task.teacher_name,
-                "status": task.status,  # 使用实际的任务状态
-                "display_status": "viewed" if (task.is_viewed and task.status == "pending") else task.status,  # 显示状态
-                "is_viewed": task.is_viewed,
-                "viewed_at": task.viewed_at.isoformat() if task.viewed_at else None,
-                "submitted_files": task.submitted_files,
-                "submitted_at": task.submitted_at.isoformat() if task.submitted_at else None,
-                "submission_notes": task.submission_notes,
-                "scoring_criteria": template.scoring_criteria if template else [],
-                "total_score": template.total_score if template else 0,
-                "scores": task.scores,
-                "score": task.total_score,
-                "scoring_feedback": task.scoring_feedback,
-                "scored_at": task.scored_at.isoformat() if task.scored_at else None,
-                "deadline": task.deadline.isoformat(),
-                "created_at": task.created_at.isoformat()
-            })
+        tasks_data = [serialize_evaluation_task(*row) for row in rows]
         
         return {
             "tasks": tasks_data,
-            "total": len(tasks_data)
+            "total": len(tasks_data),
+            "next_cursor": next_cursor
         }
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1519,15 +1479,24 @@ async def score_evaluation_task(
         task.score_history = score_history
         task.status = "scored"
         
+        # 评分结果同步消息随评分一起提交，交给后台任务发送到教师端，不等待教师端响应
+        sync_keys = enqueue_evaluation_score(db, task)
         db.commit()
+        sync_job_id = dispatch_in_background(sync_keys)
         
-        # 同步评分结果到教师端
-        await sync_evaluation_score_to_teacher(task)
+        publish_teacher_event(db, "task_status", task.teacher_id, {
+            "task_id": task_id,
+            "template_id": task.template_id,
+            "teacher_id": task.teacher_id,
+            "status": task.status,
+            "total_score": total_score
+        }, key=task_id)
         
         return {
             "message": "评分成功",
             "task_id": task_id,
-            "total_score": total_score
+            "total_score": total_score,
+            "sync_job_id": sync_job_id
         }
         
     except HTTPException:
@@ -1542,72 +1511,6 @@ async def score_evaluation_task(
         )
 
 
-# 同步函数
-async def sync_evaluation_tasks_to_teacher(template: EvaluationTemplate, teacher_ids: List[str]):
-    """同步考评任务到教师端"""
-    import httpx
-    import json
-    
-    TEACHER_API_BASE = os.getenv("TEACHER_API_URL", "http://localhost:8000")
-    
-    for teacher_id in teacher_ids:
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{TEACHER_API_BASE}/api/admin/sync-evaluation-task",
-                    json={
-                        "task_id": f"{template.template_id}_{teacher_id}",
-                        "template_id": template.template_id,
-                        "teacher_id": teacher_id,
-                        "template_name": template.name,
-                        "template_file_url": template.file_url,
-                        "template_file_type": template.file_type,
-                        "submission_requirements": template.submission_requirements,
-                        "scoring_criteria": template.scoring_criteria,
-                        "total_score": template.total_score,
-                        "deadline": template.deadline.isoformat()
-                    },
-                    timeout=30.0
-                )
-                print(f"同步考评任务到教师 {teacher_id} 响应: {response.status_code}")
-                if response.status_code not in [200, 201]:
-                    print(f"同步失败: {response.text}")
-        except Exception as e:
-            print(f"同步考评任务到教师 {teacher_id} 异常: {str(e)}")
-            import traceback
-            traceback.print_exc()
-
-
-async def sync_evaluation_score_to_teacher(task: EvaluationAssignmentTask):
-    """同步评分结果到教师端"""
-    import httpx
-    
-    TEACHER_API_BASE = os.getenv("TEACHER_API_URL", "http://localhost:8000")
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{TEACHER_API_BASE}/api/admin/sync-evaluation-score",
-                json={
-                    "task_id": task.task_id,
-                    "template_id": task.template_id,
-                    "teacher_id": task.teacher_id,
-                    "scores": task.scores,
-                    "total_score": task.total_score,
-                    "scoring_feedback": task.scoring_feedback,
-                    "scored_at": task.scored_at.isoformat() if task.scored_at else None
-                },
-                timeout=30.0
-            )
-            print(f"同步评分结果到教师 {task.teacher_id} 响应: {response.status_code}")
-            if response.status_code not in [200, 201]:
-                print(f"同步失败: {response.text}")
-    except Exception as e:
-        print(f"同步评分结果到教师 {task.teacher_id} 异常: {str(e)}")
-        import traceback
-        traceback.print_exc()
-
-
 @app.post("/api/evaluation-tasks/sync-submission", response_model=dict)
 async def sync_evaluation_submission(
     data: dict,
@@ -1656,6 +1559,13 @@ async def sync_evaluation_submission(
         
         print(f"考评提交已保存: {task_id}")
         
+        publish_teacher_event(db, "task_status", task.teacher_id, {
+            "task_id": task_id,
+            "template_id": task.template_id,
+            "teacher_id": task.teacher_id,
+            "status": task.status
+        }, key=task_id)
+        
         return {"message": "同步成功"}
         
     except HTTPException:
@@ -1780,95 +1690,43 @@ async def get_archived_scores(
     sortOrder: Optional[str] = Query("desc", description="排序方式: desc(最新在前) 或 asc(最早在前)"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页数量"),
+    after: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor，传入时忽略 page）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取已归档的评分记录
+    
+    - 支持页码分页，以及游标分页（深翻页时使用 next_cursor，速度与第一页相同）
     """
     try:
-        # 查询已评分的任务
-        query = db.query(EvaluationAssignmentTask).filter(
-            EvaluationAssignmentTask.status == "scored"
-        )
-        
+        # 查询已评分的任务（考评表信息通过 LEFT JOIN 一次查出）
         # 注意：semester字段不存在，暂时忽略该筛选
-        # if semester:
-        #     query = query.filter(EvaluationAssignmentTask.semester == semester)
-        
-        if teacher_id:
-            query = query.filter(EvaluationAssignmentTask.teacher_id == teacher_id)
-        
-        if template_name:
-            # 通过模板名称筛选
-            templates = db.query(EvaluationTemplate).filter(
-                EvaluationTemplate.name.like(f"%{template_name}%")
-            ).all()
-            template_ids = [t.template_id for t in templates]
-            if template_ids:
-                query = query.filter(EvaluationAssignmentTask.template_id.in_(template_ids))
-        
-        # 分页 - 按归档时间（评分时间）排序，支持升序和降序
-        total = query.count()
-        
-        # 根据sortOrder参数决定排序方式
-        if sortOrder == "asc":
-            # 升序：最早的在前
-            order_clause = EvaluationAssignmentTask.scored_at.asc().nullslast()
-        else:
-            # 降序：最新的在前（默认）
-            order_clause = EvaluationAssignmentTask.scored_at.desc().nullslast()
-        
-        tasks = query.order_by(
-            order_clause,
-            EvaluationAssignmentTask.task_id.desc()  # 如果scored_at相同，按task_id降序
-        ).offset((page - 1) * page_size).limit(page_size).all()
+        rows, total, next_cursor = query_archived_scores(
+            db,
+            teacher_id=teacher_id,
+            template_name=template_name,
+            sort_order=sortOrder,
+            page=page,
+            page_size=page_size,
+            after=after
+        )
         
         # 构建返回数据
-        scores_data = []
-        for task in tasks:
-            template = db.query(EvaluationTemplate).filter(
-                EvaluationTemplate.template_id == task.template_id
-            ).first()
-            
-            scores_data.append({
-                "archive_id": f"ARC_{task.task_id}",
-                "task_id": task.task_id,
-                "teacher_id": task.teacher_id,
-                "teacher_name": task.teacher_name or task.teacher_id,
-                "template_id": task.template_id,
-                "template_name": template.name if template else "未知",
-                "score": task.total_score or 0,
-                "total_score": template.total_score if template else 100,
-                "scores": task.scores,
-                "feedback": task.scoring_feedback,
-                "semester": "2025-2026-1",  # 默认学期，因为模型中没有semester字段
-                "scored_at": task.scored_at.isoformat() if task.scored_at else None,
-                "archived_at": task.scored_at.isoformat() if task.scored_at else None
-            })
-        
-        # 统计信息
-        all_scored_tasks = db.query(EvaluationAssignmentTask).filter(
-            EvaluationAssignmentTask.status == "scored"
-        ).all()
-        
-        total_score_sum = sum([t.total_score or 0 for t in all_scored_tasks])
-        avg_score = total_score_sum / len(all_scored_tasks) if all_scored_tasks else 0
-        unique_teachers = len(set([t.teacher_id for t in all_scored_tasks]))
+        scores_data = [serialize_archived_score(*row) for row in rows]
         
-        stats = {
-            "total": len(all_scored_tasks),
-            "teachers": unique_teachers,
-            "avgScore": round(avg_score, 1),
-            "dataSize": round(len(all_scored_tasks) * 0.5, 1)  # 估算数据大小
-        }
+        # 统计信息（SQL 聚合）
+        stats = archived_score_stats(db)
         
         return {
             "scores": scores_data,
             "total": total,
+            "next_cursor": next_cursor,
             "stats": stats
         }
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(f"获取归档评分失败: {str(e)}")
         import traceback
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 from app.database import Base
 import enum
 import uuid
 from datetime import datetime
 
+# JSON 列：PostgreSQL 上使用 JSONB（二进制存储，读取时无需重新解析），其他数据库使用 JSON
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+
 class StatusEnum(str, enum.Enum):
     enable = "enable"
     disable = "disable"
@@ -37,8 +43,8 @@ class SystemConfig(Base):
     __tablename__ = "system_config"
     id = Column(Integer, primary_key=True, index=True)
     academic_year = Column(String, index=True)
-    evaluation_plan = Column(JSON)
-    time_windows = Column(JSON)
+    evaluation_plan = Column(JSONType)
+    time_windows = Column(JSONType)
     status = Column(Enum(StatusEnum))
 
 class EvaluationTask(Base):
@@ -56,7 +62,7 @@ class EvaluationData(Base):
     record_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     task_id = Column(String, index=True)
     student_hash = Column(String, index=True)
-    dimension_scores = Column(JSON)
+    dimension_scores = Column(JSONType)
     text_feedback = Column(Text)
     submission_time = Column(DateTime, default=datetime.utcnow)
     validity_flag = Column(Boolean, default=True)
@@ -65,11 +71,11 @@ class AnalysisReport(Base):
     __tablename__ = "analysis_reports"
     report_id = Column(Integer, primary_key=True, index=True)
     report_type = Column(Enum(ReportTypeEnum))
-    target_scope = Column(JSON)
+    target_scope = Column(JSONType)
     data_period = Column(String)
     generated_time = Column(DateTime, default=datetime.utcnow)
     file_path = Column(String)
-    access_log = Column(JSON)
+    access_log = Column(JSONType)
 
 class Course(Base):
     __tablename__ = "courses"
@@ -99,9 +105,9 @@ class EvaluationForm(Base):
     name = Column(String(200), nullable=False)
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=False)
-    dimensions = Column(JSON, nullable=False)  # ["teaching_attitude", "teaching_content", ...]
-    participants = Column(JSON, nullable=False)  # ["teacher_id_1", "teacher_id_2", ...]
-    form_data = Column(JSON, nullable=False)  # 考评表数据
+    dimensions = Column(JSONType, nullable=False)  # ["teaching_attitude", "teaching_content", ...]
+    participants = Column(JSONType, nullable=False)  # ["teacher_id_1", "teacher_id_2", ...]
+    form_data = Column(JSONType, nullable=False)  # 考评表数据
     created_by = Column(Integer, nullable=True)  # ForeignKey("users.id")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -117,7 +123,7 @@ class DistributionRecord(Base):
     material_type = Column(String(20), nullable=False)  # "file" or "evaluation_form"
     material_name = Column(String(200), nullable=False)
     distribution_type = Column(String(20), nullable=False)  # "batch" or "targeted"
-    target_teachers = Column(JSON, nullable=False)  # [{"teacher_id": "xxx", "teacher_name": "xxx"}, ...]
+    target_teachers = Column(JSONType, nullable=False)  # [{"teacher_id": "xxx", "teacher_name": "xxx"}, ...]
     distributed_by = Column(Integer, nullable=True)  # ForeignKey("users.id")
     distributed_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String(20), default="completed")  # pending, completed, failed
@@ -130,7 +136,7 @@ class MaterialSubmission(Base):
     submission_id = Column(String, primary_key=True, default=lambda: f"sub_{uuid.uuid4().hex[:8]}")
     teacher_id = Column(String, nullable=False, index=True)
     teacher_name = Column(String(100), nullable=False)
-    files = Column(JSON, nullable=False)  # [{"file_id": "xxx", "file_name": "xxx", "file_size": 123, "file_url": "xxx"}, ...]
+    files = Column(JSONType, nullable=False)  # [{"file_id": "xxx", "file_name": "xxx", "file_size": 123, "file_url": "xxx"}, ...]
     notes = Column(Text)
     submitted_at = Column(DateTime, default=datetime.utcnow)
     review_status = Column(String(20), default="pending")  # pending, approved, rejected, needs_revision
@@ -140,10 +146,19 @@ class MaterialSubmission(Base):
     
     # 自动评分系统扩展字段
     scoring_status = Column(String(20), default="pending")  # pending, scoring, scored, failed
-    parsed_content = Column(Text)  # 解析后的文本内容
+    parsed_content = deferred(Column(Text))  # 解析后的文本内容（延迟加载，查询提交记录时不读取大文本）
     file_hash = Column(String(64))  # 文件哈希值
     encrypted_path = Column(String(500))  # 加密后的文件路径
-    scoring_result = Column(JSON)  # 评分结果 {"base_score": 85, "bonus_score": 5, "final_score": 90, "grade": "优秀", ...}
+    scoring_result = Column(JSONType)  # 评分结果 {"base_score": 85, "bonus_score": 5, "final_score": 90, "grade": "优秀", ...}
+    
+    __table_args__ = (
+        # 提交材料列表游标分页：ORDER BY submitted_at DESC, submission_id DESC
+        Index("ix_material_submissions_submitted_at_id", "submitted_at", "submission_id"),
+        # 按教师查询提交记录（任务管理器检查未提交、列表按教师筛选）
+        Index("ix_material_submissions_teacher_submitted_at", "teacher_id", "submitted_at"),
+        # 提交材料列表按审核状态筛选
+        Index("ix_material_submissions_review_status_submitted_at", "review_status", "submitted_at"),
+    )
 
 
 # ==================== 考评表相关模型 ====================
@@ -161,15 +176,15 @@ class EvaluationTemplate(Base):
     file_size = Column(Integer)  # 文件大小
     
     # 评分标准
-    scoring_criteria = Column(JSON, nullable=False)  # [{"name": "完成度", "max_score": 10}, ...]
+    scoring_criteria = Column(JSONType, nullable=False)  # [{"name": "完成度", "max_score": 10}, ...]
     total_score = Column(Integer, default=100)  # 总分
     
     # 提交要求
-    submission_requirements = Column(JSON, nullable=False)  # {"file_types": ["pdf", "excel"], "max_files": 3, "description": "..."}
+    submission_requirements = Column(JSONType, nullable=False)  # {"file_types": ["pdf", "excel"], "max_files": 3, "description": "..."}
     deadline = Column(DateTime, nullable=False)  # 截止时间
     
     # 分配信息
-    target_teachers = Column(JSON, nullable=False)  # [{"teacher_id": "xxx", "teacher_name": "xxx"}, ...]
+    target_teachers = Column(JSONType, nullable=False)  # [{"teacher_id": "xxx", "teacher_name": "xxx"}, ...]
     distribution_type = Column(String(20), default="batch")  # batch, targeted
     
     # 状态
@@ -196,22 +211,22 @@ class EvaluationAssignmentTask(Base):
     viewed_at = Column(DateTime, nullable=True)  # 查收时间
     
     # 提交信息
-    submitted_files = Column(JSON)  # [{"file_id": "xxx", "file_name": "xxx", "file_size": 123, "file_url": "xxx"}, ...]
+    submitted_files = Column(JSONType)  # [{"file_id": "xxx", "file_name": "xxx", "file_size": 123, "file_url": "xxx"}, ...]
     submitted_at = Column(DateTime, nullable=True)
     submission_notes = Column(Text)
     
     # 评分信息
-    scores = Column(JSON)  # {"完成度": 8, "准确性": 9, "规范性": 7}
+    scores = Column(JSONType)  # {"完成度": 8, "准确性": 9, "规范性": 7}
     total_score = Column(Float, nullable=True)
     scoring_feedback = Column(Text)
     scored_by = Column(Integer, nullable=True)  # ForeignKey("users.id")
     scored_at = Column(DateTime, nullable=True)
     
     # 修改记录
-    score_history = Column(JSON)  # [{"old_score": 20, "new_score": 25, "reason": "...", "changed_at": "...", "changed_by": "..."}, ...]
+    score_history = Column(JSONType)  # [{"old_score": 20, "new_score": 25, "reason": "...", "changed_at": "...", "changed_by": "..."}, ...]
     
     # 自动评分系统扩展字段
-    required_file_types = Column(JSON)  # JSON格式的必需文件类型列表 ["教案", "教学反思", ...]
+    required_file_types = Column(JSONType)  # JSON格式的必需文件类型列表 ["教案", "教学反思", ...]
     bonus_enabled = Column(Boolean, default=True)  # 是否启用加分项
     max_bonus_score = Column(Float, default=10)  # 最大加分值
     auto_scoring_enabled = Column(Boolean, default=True)  # 是否启用自动评分
@@ -219,6 +234,17 @@ class EvaluationAssignmentTask(Base):
     deadline = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # 归档评分游标分页：WHERE status = 'scored' ORDER BY scored_at, task_id
+        Index("ix_assignment_tasks_status_scored_at_id", "status", "scored_at", "task_id"),
+        # 考评任务列表游标分页：ORDER BY created_at DESC, task_id DESC
+        Index("ix_assignment_tasks_created_at_id", "created_at", "task_id"),
+        # 超时检查：WHERE status = 'pending' AND deadline < now
+        Index("ix_assignment_tasks_status_deadline", "status", "deadline"),
+        # 分配任务时检查重复：WHERE template_id = ? AND teacher_id = ?
+        Index("ix_assignment_tasks_template_teacher", "template_id", "teacher_id"),
+    )
 
 
 
@@ -269,6 +295,11 @@ class ScoringRecord(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # 随机抽查：WHERE scoring_type = 'auto' AND is_confirmed = 1
+        Index("ix_scoring_records_type_confirmed", "scoring_type", "is_confirmed"),
+    )
 
 
 class ScoringAppeal(Base):
@@ -291,6 +322,11 @@ class ScoringAppeal(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # 异议列表：WHERE status = ? ORDER BY created_at DESC
+        Index("ix_scoring_appeals_status_created_at", "status", "created_at"),
+    )
 
 
 class ReviewRecord(Base):
@@ -312,6 +348,13 @@ class ReviewRecord(Base):
     reviewed_at = Column(DateTime, default=datetime.utcnow)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # 试运行差异报告：WHERE review_type = ? AND reviewed_at 范围 ORDER BY reviewed_at DESC
+        Index("ix_review_records_type_reviewed_at", "review_type", "reviewed_at"),
+        # 一致性统计：WHERE reviewed_at 范围（不限复核类型）
+        Index("ix_review_records_reviewed_at", "reviewed_at"),
+    )
 
 
 class BonusItem(Base):
@@ -326,7 +369,7 @@ class BonusItem(Base):
     item_name = Column(String(100), nullable=False)  # 加分项名称：获奖、论文、创新等
     score = Column(Float, nullable=False)  # 加分值
     evidence = Column(Text)  # 佐证材料描述
-    evidence_files = Column(JSON)  # 佐证文件列表
+    evidence_files = Column(JSONType)  # 佐证文件列表
     
     # 审核状态
     status = Column(String(20), default="pending")  # pending/approved/rejected
@@ -373,3 +416,63 @@ class SystemScoringConfig(Base):
     updated_by = Column(Integer, nullable=True)  # ForeignKey("users.id")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScoringJob(Base):
+    """批量评分任务表 - 持久化的后台评分队列"""
+    __tablename__ = "scoring_jobs"
+    
+    job_id = Column(String, primary_key=True, default=lambda: f"job_{uuid.uuid4().hex[:8]}")
+    status = Column(String(20), default="pending", index=True)  # pending/running/completed
+    total = Column(Integer, default=0)  # 评分项总数
+    success_count = Column(Integer, default=0)  # 评分成功数
+    failed_count = Column(Integer, default=0)  # 评分失败数
+    
+    created_by = Column(Integer, nullable=True)  # ForeignKey("users.id")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ScoringJobItem(Base):
+    """批量评分任务明细表 - 每个待评分的提交记录/考评任务一行"""
+    __tablename__ = "scoring_job_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, nullable=False, index=True)  # ForeignKey("scoring_jobs.job_id")
+    position = Column(Integer, nullable=False)  # 在任务中的顺序
+    submission_id = Column(String, nullable=False)  # 提交记录 ID 或考评任务 ID
+    
+    status = Column(String(20), default="pending", index=True)  # pending/scoring/scored/failed
+    attempts = Column(Integer, default=0)  # 已尝试次数（重启恢复时累计）
+    error = Column(Text)  # 失败原因
+    scoring_result = Column(JSONType)  # 评分结果
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SyncOutbox(Base):
+    """跨系统同步发件箱 - 与业务数据在同一事务中写入，由后台分发器发送到教师端"""
+    __tablename__ = "sync_outbox"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(200), nullable=False, unique=True)  # 同一消息只入队一次
+    method = Column(String(10), default="POST")
+    path = Column(String(200), nullable=False)  # 逐条同步接口
+    bulk_path = Column(String(200), nullable=True)  # 批量同步接口（可选，同一批次合并发送）
+    bulk_key = Column(String(50), nullable=True)  # 批量请求体中列表的字段名
+    payload = Column(JSONType, nullable=False)
+    
+    status = Column(String(20), default="pending")  # pending/sent/failed
+    attempts = Column(Integer, default=0)  # 已发送次数
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # 下次发送时间（退避重试）
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # 分发器领取到期消息：WHERE status = 'pending' AND next_attempt_at <= now ORDER BY id
+        Index("ix_sync_outbox_status_next_attempt", "status", "next_attempt_at", "id"),
+    )
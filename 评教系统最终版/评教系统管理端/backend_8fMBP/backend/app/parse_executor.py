@@ -0,0 +1,298 @@
+"""
+文件解析进程池
+PDF/DOCX/PPTX 文本提取是纯 Python 的 CPU 密集型操作，放到独立进程中执行，
+批量评分时可以同时利用所有 CPU 核心，且不会阻塞 API 进程的事件循环
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows 不支持 resource 模块，跳过内存限制
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 解析进程数、单文件超时（秒）、文件大小上限（MB）、单个解析进程内存上限（MB），可通过环境变量调整
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "120"))
+PARSE_MAX_FILE_MB = int(os.getenv("PARSE_MAX_FILE_MB", "100"))
+PARSE_MEMORY_LIMIT_MB = int(os.getenv("PARSE_MEMORY_LIMIT_MB", "2048"))
+# 解析进程启动（含导入解析库）的超时（秒），不计入单文件解析超时
+WORKER_START_TIMEOUT = 60.0
+
+
+class ParseExecutorError(Exception):
+    """解析进程池异常基类"""
+    pass
+
+
+class ParseTimeoutError(ParseExecutorError):
+    """解析超时"""
+    pass
+
+
+class FileTooLargeError(ParseExecutorError):
+    """文件超过大小上限"""
+    pass
+
+
+def _init_worker(memory_limit_mb: int):
+    """解析进程初始化：限制进程地址空间，超限时解析抛出 MemoryError 而不是拖垮整机"""
+    if resource is None or memory_limit_mb <= 0:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"设置解析进程内存上限失败: {str(e)}")
+
+
+def _warm_up() -> int:
+    """解析进程启动后预先导入解析器，避免首个文件的解析时间包含导入耗时"""
+    from . import file_parser  # noqa: F401
+    from .utils import file_parser as utils_file_parser  # noqa: F401
+    return os.getpid()
+
+
+def _parse_in_worker(parser_name: str, file_path: str, file_type: Optional[str],
+                     file_hash: Optional[str]) -> str:
+    """在解析进程中执行（带磁盘缓存的）解析"""
+    if parser_name == "utils":
+        from .utils.file_parser import file_parser
+        return file_parser.parse_file_cached(file_path, file_type, file_hash)
+
+    from .file_parser import FileParser
+    return FileParser.parse_file_cached(file_path, file_type, file_hash)
+
+
+class _WorkerSlots:
+    """
+    解析进程占用槽位（同时支持线程中同步等待和事件循环中异步等待）
+
+    每个槽位对应一个解析进程，拿到槽位的解析立即在该进程中开始执行，
+    超时只从真正开始解析时计算，不包含排队等待的时间。
+    """
+
+    def __init__(self, count: int):
+        self._idle = deque(range(count))
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.popleft(), None
+            waiter = concurrent.futures.Future()
+            self._waiters.append(waiter)
+            return None, waiter
+
+    def acquire_sync(self) -> int:
+        slot, waiter = self._try_acquire()
+        return slot if waiter is None else waiter.result()
+
+    async def acquire(self) -> int:
+        slot, waiter = self._try_acquire()
+        if waiter is None:
+            return slot
+        try:
+            return await asyncio.wrap_future(waiter)
+        except asyncio.CancelledError:
+            # 取消等待时槽位可能已经分配给本次等待，需要归还
+            with self._lock:
+                granted = waiter.done() and not waiter.cancelled()
+            if granted:
+                self.release(waiter.result())
+            raise
+
+    def release(self, slot: int):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(slot)
+                    return
+            self._idle.append(slot)
+
+
+class ParseExecutor:
+    """
+    文件解析进程池
+
+    - 进程数可配置，默认等于 CPU 核心数；每个进程同一时刻只解析一个文件，
+      超出进程数的解析在父进程中排队，不占用超时时间
+    - 单文件超时：从文件在解析进程中开始解析时计时，超时后只终止该文件所在的进程，
+      其他正在解析的文件不受影响
+    - 内存保护：解析前检查文件大小，解析进程限制地址空间
+    - 进程异常退出（BrokenProcessPool）后重建该进程并重试一次
+
+    使用 spawn 方式启动子进程，避免在已有线程的 API 进程中 fork 导致死锁；
+    进程启动（导入解析库）在开始计时之前完成。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 max_file_mb: Optional[int] = None, memory_limit_mb: Optional[int] = None):
+        """
+        初始化解析进程池（进程在第一次解析时才启动）
+
+        Args:
+            max_workers: 解析进程数，默认读取 PARSE_WORKERS
+            timeout: 单文件解析超时（秒），默认读取 PARSE_TIMEOUT
+            max_file_mb: 文件大小上限（MB），默认读取 PARSE_MAX_FILE_MB
+            memory_limit_mb: 单个解析进程内存上限（MB），默认读取 PARSE_MEMORY_LIMIT_MB
+        """
+        self.max_workers = max(1, max_workers or PARSE_WORKERS)
+        self.timeout = timeout if timeout is not None else PARSE_TIMEOUT
+        self.max_file_mb = max_file_mb if max_file_mb is not None else PARSE_MAX_FILE_MB
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else PARSE_MEMORY_LIMIT_MB
+
+        # 每个槽位一个单进程执行器，None 表示尚未启动或已回收
+        self._workers: List[Optional[ProcessPoolExecutor]] = [None] * self.max_workers
+        self._slots = _WorkerSlots(self.max_workers)
+        self._lock = threading.Lock()
+
+    def _new_worker(self, slot: int) -> Tuple[ProcessPoolExecutor, bool]:
+        """获取槽位对应的解析进程，返回 (执行器, 是否新建)"""
+        with self._lock:
+            worker = self._workers[slot]
+            if worker is not None:
+                return worker, False
+            worker = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,)
+            )
+            self._workers[slot] = worker
+            return worker, True
+
+    def _get_worker_sync(self, slot: int) -> ProcessPoolExecutor:
+        worker, created = self._new_worker(slot)
+        if created:
+            worker.submit(_warm_up).result(timeout=WORKER_START_TIMEOUT)
+            logger.info(f"解析进程 {slot} 已启动")
+        return worker
+
+    async def _get_worker(self, slot: int) -> ProcessPoolExecutor:
+        worker, created = self._new_worker(slot)
+        if created:
+            await asyncio.wait_for(asyncio.wrap_future(worker.submit(_warm_up)), timeout=WORKER_START_TIMEOUT)
+            logger.info(f"解析进程 {slot} 已启动")
+        return worker
+
+    def _recycle_worker(self, slot: int, worker: ProcessPoolExecutor):
+        """终止并丢弃槽位对应的解析进程（仅当它仍是该槽位的当前进程时）"""
+        with self._lock:
+            if self._workers[slot] is not worker:
+                return
+            self._workers[slot] = None
+
+        # ProcessPoolExecutor 没有公开的终止接口，超时任务只能连同进程一起结束
+        for process in list((getattr(worker, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        worker.shutdown(wait=False, cancel_futures=True)
+        logger.warning(f"解析进程 {slot} 已回收")
+
+    def _check_file_size(self, file_path: str):
+        if self.max_file_mb <= 0 or not os.path.exists(file_path):
+            return
+        file_size = os.path.getsize(file_path)
+        if file_size > self.max_file_mb * 1024 * 1024:
+            raise FileTooLargeError(
+                f"文件过大（{file_size / 1024 / 1024:.1f} MB），超过解析上限 {self.max_file_mb} MB"
+            )
+
+    async def parse(self, file_path: str, file_type: Optional[str] = None,
+                    file_hash: Optional[str] = None, parser_name: str = "legacy") -> str:
+        """
+        在解析进程中解析文件（异步）
+
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型（可选）
+            file_hash: 文件 SHA-256（可选，用于解析缓存）
+            parser_name: 使用的解析器，legacy（app.file_parser）或 utils（app.utils.file_parser）
+
+        Returns:
+            提取的文本内容
+
+        Raises:
+            FileTooLargeError: 文件超过大小上限
+            ParseTimeoutError: 解析超时
+            ParseExecutorError: 解析进程异常退出
+            Exception: 解析器抛出的解析异常
+        """
+        self._check_file_size(file_path)
+        slot = await self._slots.acquire()
+        try:
+            for attempt in range(2):
+                worker = None
+                try:
+                    worker = await self._get_worker(slot)
+                    future = asyncio.wrap_future(
+                        worker.submit(_parse_in_worker, parser_name, file_path, file_type, file_hash)
+                    )
+                    return await asyncio.wait_for(future, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    self._recycle_worker(slot, self._workers[slot] if worker is None else worker)
+                    raise ParseTimeoutError(f"文件解析超时（超过 {self.timeout} 秒）: {file_path}")
+                except BrokenProcessPool:
+                    self._recycle_worker(slot, self._workers[slot] if worker is None else worker)
+                    if attempt == 0:
+                        logger.warning(f"解析进程已中断，重试解析: {file_path}")
+                        continue
+                    raise ParseExecutorError(f"解析进程异常退出: {file_path}")
+        finally:
+            self._slots.release(slot)
+
+    def parse_sync(self, file_path: str, file_type: Optional[str] = None,
+                   file_hash: Optional[str] = None, parser_name: str = "legacy") -> str:
+        """
+        在解析进程中解析文件（同步，供线程池中的同步代码使用）
+
+        参数、返回值和异常与 parse 相同。
+        """
+        self._check_file_size(file_path)
+        slot = self._slots.acquire_sync()
+        try:
+            for attempt in range(2):
+                worker = None
+                try:
+                    worker = self._get_worker_sync(slot)
+                    future = worker.submit(_parse_in_worker, parser_name, file_path, file_type, file_hash)
+                    return future.result(timeout=self.timeout)
+                except concurrent.futures.TimeoutError:
+                    self._recycle_worker(slot, self._workers[slot] if worker is None else worker)
+                    raise ParseTimeoutError(f"文件解析超时（超过 {self.timeout} 秒）: {file_path}")
+                except BrokenProcessPool:
+                    self._recycle_worker(slot, self._workers[slot] if worker is None else worker)
+                    if attempt == 0:
+                        logger.warning(f"解析进程已中断，重试解析: {file_path}")
+                        continue
+                    raise ParseExecutorError(f"解析进程异常退出: {file_path}")
+        finally:
+            self._slots.release(slot)
+
+    def shutdown(self):
+        """关闭所有解析进程"""
+        with self._lock:
+            workers, self._workers = self._workers, [None] * self.max_workers
+        started = [worker for worker in workers if worker is not None]
+        for worker in started:
+            worker.shutdown(wait=True, cancel_futures=True)
+        if started:
+            logger.info("解析进程池已关闭")
+
+
+# 全局解析进程池（管理端进程内共享）
+parse_executor = ParseExecutor()
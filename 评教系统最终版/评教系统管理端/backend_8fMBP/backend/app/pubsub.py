@@ -0,0 +1,162 @@
+"""
+实时推送的跨进程广播（backplane）
+多个 uvicorn worker 部署时，连接分散在不同进程中。事件先发布到 backplane，
+每个进程订阅 backplane 并推送给本进程的连接，因此连接在哪个 worker 上都能收到事件。
+
+- InMemoryBackplane：进程内广播，单 worker 部署的默认实现；测试中多个连接管理器共用一个实例即可模拟多 worker
+- RedisBackplane：Redis pub/sub，REALTIME_BACKPLANE=redis 且安装了 redis 时使用
+
+publish 不等待：Redis 实现先放入有界队列，由后台协程按顺序发布。
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, List, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# memory | redis
+REALTIME_BACKPLANE = os.getenv("REALTIME_BACKPLANE", "memory")
+REALTIME_REDIS_URL = os.getenv("REALTIME_REDIS_URL", "redis://localhost:6379/0")
+REALTIME_REDIS_CHANNEL = os.getenv("REALTIME_REDIS_CHANNEL", "evaluation:realtime")
+# 等待发布到 Redis 的最大消息数，超出时丢弃新消息
+REALTIME_PUBLISH_QUEUE_SIZE = int(os.getenv("REALTIME_PUBLISH_QUEUE_SIZE", "10000"))
+# Redis 订阅断开后的重连间隔（秒）
+REALTIME_REDIS_RETRY_INTERVAL = float(os.getenv("REALTIME_REDIS_RETRY_INTERVAL", "1"))
+
+MessageHandler = Callable[[str], None]
+
+
+class InMemoryBackplane:
+    """进程内广播：publish 直接调用本实例上的所有订阅回调"""
+
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+
+    def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: MessageHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, message: str):
+        for handler in list(self._handlers):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.error(f"[实时推送] 处理广播消息失败: {str(e)}")
+
+
+class RedisBackplane:
+    """Redis pub/sub 广播：所有进程订阅同一个频道，发布的消息（包括本进程发布的）由订阅协程分发"""
+
+    def __init__(self, url: str = REALTIME_REDIS_URL, channel: str = REALTIME_REDIS_CHANNEL,
+                 queue_size: int = REALTIME_PUBLISH_QUEUE_SIZE,
+                 retry_interval: float = REALTIME_REDIS_RETRY_INTERVAL):
+        if aioredis is None:
+            raise RuntimeError("未安装 redis，无法使用 Redis 广播")
+        self.url = url
+        self.channel = channel
+        self.queue_size = queue_size
+        self.retry_interval = retry_interval
+        self.dropped = 0
+
+        self._handlers: List[MessageHandler] = []
+        self._redis = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: MessageHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._subscribe_loop())
+        ]
+        logger.info(f"[实时推送] 已连接 Redis 广播频道 {self.channel}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def publish(self, message: str):
+        if self._queue is None:
+            logger.warning("[实时推送] Redis 广播未启动，消息被丢弃")
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"[实时推送] 待发布消息超过 {self.queue_size} 条，消息被丢弃")
+
+    async def _publish_loop(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._redis.publish(self.channel, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f"[实时推送] 发布到 Redis 失败: {str(e)}")
+
+    async def _subscribe_loop(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    for handler in list(self._handlers):
+                        try:
+                            handler(item["data"])
+                        except Exception as e:
+                            logger.error(f"[实时推送] 处理广播消息失败: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[实时推送] Redis 订阅断开，{self.retry_interval} 秒后重连: {str(e)}")
+                await asyncio.sleep(self.retry_interval)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+def create_backplane():
+    """按 REALTIME_BACKPLANE 创建广播实现，Redis 不可用时回退到进程内广播"""
+    if REALTIME_BACKPLANE == "redis":
+        if aioredis is not None:
+            return RedisBackplane()
+        logger.warning("[实时推送] REALTIME_BACKPLANE=redis 但未安装 redis，使用进程内广播（多 worker 时事件只推送给本进程的连接）")
+    return InMemoryBackplane()
@@ -0,0 +1,380 @@
+"""
+列表查询
+考评任务、归档评分、提交材料、考评表列表的共享查询与序列化，
+每个列表请求的 SQL 条数固定，不随行数增长（避免逐行查询考评表的 N+1 问题）
+
+列表支持游标（keyset）分页：按 (排序时间, ID) 的稳定顺序，
+下一页从上一页最后一行之后开始查询，第 N 页与第 1 页一样快。
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session, load_only
+
+from .models import EvaluationAssignmentTask, EvaluationTemplate, MaterialSubmission
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无效"""
+    pass
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: str) -> str:
+    """将 (排序时间, ID) 编码为不透明的分页游标"""
+    payload = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """
+    解码分页游标
+
+    Raises:
+        InvalidCursorError: 游标格式不正确
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(row_id, str):
+            raise ValueError("ID 必须是字符串")
+        return (datetime.fromisoformat(sort_value) if sort_value else None), row_id
+    except (ValueError, TypeError, UnicodeError, binascii.Error) as e:
+        raise InvalidCursorError(f"无效的分页游标: {cursor}") from e
+
+
+def _keyset_page(query, sort_column, id_column, after: Optional[str] = None,
+                 limit: Optional[int] = None, ascending: bool = False,
+                 entity: Callable = lambda row: row, offset: int = 0) -> Tuple[List, Optional[str]]:
+    """
+    按 (sort_column, id_column) 游标分页
+
+    排序为 sort_column 升序/降序（NULL 在最后），相同时按 id_column 降序。
+
+    Args:
+        query: 已加好筛选条件的查询
+        sort_column: 排序时间列
+        id_column: 主键列（保证顺序稳定）
+        after: 上一页返回的游标
+        limit: 每页数量，None 表示不分页
+        ascending: 是否按时间升序
+        entity: 从结果行取出模型对象（结果行带额外列时使用）
+        offset: 跳过的行数（兼容按页码分页）
+
+    Returns:
+        (结果行, 下一页游标)，没有下一页时游标为 None
+    """
+    if after:
+        sort_value, row_id = decode_cursor(after)
+        if sort_value is None:
+            query = query.filter(and_(sort_column.is_(None), id_column < row_id))
+        else:
+            beyond = sort_column > sort_value if ascending else sort_column < sort_value
+            query = query.filter(or_(
+                beyond,
+                and_(sort_column == sort_value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+
+    order_clause = sort_column.asc().nullslast() if ascending else sort_column.desc().nullslast()
+    query = query.order_by(order_clause, id_column.desc())
+    if offset:
+        query = query.offset(offset)
+
+    if not limit:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = entity(rows[-1])
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+# 考评任务列表需要的考评表字段（不加载考评表文件信息、提交要求等大字段）
+TASK_TEMPLATE_COLUMNS = (
+    EvaluationTemplate.name,
+    EvaluationTemplate.total_score,
+    EvaluationTemplate.scoring_criteria,
+)
+
+
+def _with_template_columns(query):
+    """LEFT JOIN 考评表，只取列表需要的列（考评表被删除的任务仍然返回）"""
+    return query.add_columns(*TASK_TEMPLATE_COLUMNS).outerjoin(
+        EvaluationTemplate,
+        EvaluationTemplate.template_id == EvaluationAssignmentTask.template_id
+    )
+
+
+def query_evaluation_tasks(db: Session, template_id: Optional[str] = None,
+                           teacher_id: Optional[str] = None,
+                           status: Optional[str] = None,
+                           after: Optional[str] = None,
+                           limit: Optional[int] = None) -> Tuple[List[Tuple], Optional[str]]:
+    """
+    查询考评任务列表及对应考评表信息（一条 SQL）
+
+    Args:
+        db: 数据库会话
+        template_id: 考评表ID筛选
+        teacher_id: 教师ID筛选
+        status: 状态筛选
+        after: 分页游标
+        limit: 每页数量，None 表示返回全部
+
+    Returns:
+        ((任务, 考评表名称, 考评表总分, 评分标准) 列表, 下一页游标)，按创建时间倒序；
+        考评表不存在时后三项为 None
+    """
+    query = db.query(EvaluationAssignmentTask)
+
+    if template_id:
+        query = query.filter(EvaluationAssignmentTask.template_id == template_id)
+
+    if teacher_id:
+        query = query.filter(EvaluationAssignmentTask.teacher_id == teacher_id)
+
+    if status:
+        query = query.filter(EvaluationAssignmentTask.status == status)
+
+    return _keyset_page(
+        _with_template_columns(query),
+        EvaluationAssignmentTask.created_at,
+        EvaluationAssignmentTask.task_id,
+        after=after,
+        limit=limit,
+        entity=lambda row: row[0]
+    )
+
+
+def serialize_evaluation_task(task: EvaluationAssignmentTask, template_name: Optional[str],
+                              template_total_score: Optional[int],
+                              scoring_criteria: Optional[list]) -> Dict:
+    """考评任务列表项"""
+    return {
+        "task_id": task.task_id,
+        "template_id": task.template_id,
+        "template_name": template_name or "",
+        "teacher_id": task.teacher_id,
+        "teacher_name": task.teacher_name,
+        "status": task.status,  # 使用实际的任务状态
+        "display_status": "viewed" if (task.is_viewed and task.status == "pending") else task.status,  # 显示状态
+        "is_viewed": task.is_viewed,
+        "viewed_at": task.viewed_at.isoformat() if task.viewed_at else None,
+        "submitted_files": task.submitted_files,
+        "submitted_at": task.submitted_at.isoformat() if task.submitted_at else None,
+        "submission_notes": task.submission_notes,
+        "scoring_criteria": scoring_criteria if scoring_criteria is not None else [],
+        "total_score": template_total_score if template_total_score is not None else 0,
+        "scores": task.scores,
+        "score": task.total_score,
+        "scoring_feedback": task.scoring_feedback,
+        "scored_at": task.scored_at.isoformat() if task.scored_at else None,
+        "deadline": task.deadline.isoformat(),
+        "created_at": task.created_at.isoformat()
+    }
+
+
+def query_archived_scores(db: Session, teacher_id: Optional[str] = None,
+                          template_name: Optional[str] = None, sort_order: str = "desc",
+                          page: int = 1, page_size: int = 10,
+                          after: Optional[str] = None) -> Tuple[List[Tuple], int, Optional[str]]:
+    """
+    分页查询已评分（归档）的考评任务及对应考评表信息
+
+    传入 after 游标时按游标分页（忽略 page），否则按页码分页。
+
+    Args:
+        db: 数据库会话
+        teacher_id: 教师ID筛选
+        template_name: 考评表名称模糊筛选（没有匹配的考评表时不筛选）
+        sort_order: asc（最早在前）或 desc（最新在前）
+        page: 页码
+        page_size: 每页数量
+        after: 分页游标
+
+    Returns:
+        ((任务, 考评表名称, 考评表总分, 评分标准) 列表, 总数, 下一页游标)
+    """
+    query = db.query(EvaluationAssignmentTask).filter(
+        EvaluationAssignmentTask.status == "scored"
+    )
+
+    if teacher_id:
+        query = query.filter(EvaluationAssignmentTask.teacher_id == teacher_id)
+
+    if template_name:
+        # 通过模板名称筛选
+        template_ids = [
+            row.template_id for row in db.query(EvaluationTemplate.template_id).filter(
+                EvaluationTemplate.name.like(f"%{template_name}%")
+            )
+        ]
+        if template_ids:
+            query = query.filter(EvaluationAssignmentTask.template_id.in_(template_ids))
+
+    total = query.count()
+
+    # 按归档时间（评分时间）排序，scored_at 相同时按 task_id 降序
+    rows, next_cursor = _keyset_page(
+        _with_template_columns(query),
+        EvaluationAssignmentTask.scored_at,
+        EvaluationAssignmentTask.task_id,
+        after=after,
+        limit=page_size,
+        ascending=sort_order == "asc",
+        entity=lambda row: row[0],
+        offset=0 if after else (page - 1) * page_size
+    )
+    return rows, total, next_cursor
+
+
+def serialize_archived_score(task: EvaluationAssignmentTask, template_name: Optional[str],
+                             template_total_score: Optional[int],
+                             scoring_criteria: Optional[list] = None) -> Dict:
+    """归档评分列表项"""
+    return {
+        "archive_id": f"ARC_{task.task_id}",
+        "task_id": task.task_id,
+        "teacher_id": task.teacher_id,
+        "teacher_name": task.teacher_name or task.teacher_id,
+        "template_id": task.template_id,
+        "template_name": template_name if template_name is not None else "未知",
+        "score": task.total_score or 0,
+        "total_score": template_total_score if template_total_score is not None else 100,
+        "scores": task.scores,
+        "feedback": task.scoring_feedback,
+        "semester": "2025-2026-1",  # 默认学期，因为模型中没有semester字段
+        "scored_at": task.scored_at.isoformat() if task.scored_at else None,
+        "archived_at": task.scored_at.isoformat() if task.scored_at else None
+    }
+
+
+def archived_score_stats(db: Session) -> Dict:
+    """
+    归档评分统计（一条聚合 SQL，不加载评分记录）
+
+    Returns:
+        {"total": 已评分数, "teachers": 教师数, "avgScore": 平均分, "dataSize": 估算数据大小}
+    """
+    total, teachers, avg_score = db.query(
+        func.count(EvaluationAssignmentTask.task_id),
+        func.count(func.distinct(EvaluationAssignmentTask.teacher_id)),
+        func.avg(func.coalesce(EvaluationAssignmentTask.total_score, 0))
+    ).filter(
+        EvaluationAssignmentTask.status == "scored"
+    ).one()
+
+    return {
+        "total": total,
+        "teachers": teachers,
+        # PostgreSQL 的 AVG 返回 Decimal，统一转为 float
+        "avgScore": round(float(avg_score or 0), 1),
+        "dataSize": round(total * 0.5, 1)  # 估算数据大小
+    }
+
+
+def query_material_submissions(db: Session, review_status: Optional[str] = None,
+                               teacher_id: Optional[str] = None,
+                               after: Optional[str] = None,
+                               limit: Optional[int] = None) -> Tuple[List[MaterialSubmission], Optional[str]]:
+    """
+    查询提交材料列表（只加载列表字段，不读取解析文本和评分结果）
+
+    Args:
+        db: 数据库会话
+        review_status: 审核状态筛选
+        teacher_id: 教师ID筛选
+        after: 分页游标
+        limit: 每页数量，None 表示返回全部
+
+    Returns:
+        (提交记录列表, 下一页游标)，按提交时间倒序
+    """
+    query = db.query(MaterialSubmission).options(load_only(
+        MaterialSubmission.submission_id,
+        MaterialSubmission.teacher_id,
+        MaterialSubmission.teacher_name,
+        MaterialSubmission.files,
+        MaterialSubmission.submitted_at,
+        MaterialSubmission.review_status,
+    ))
+
+    if review_status:
+        query = query.filter(MaterialSubmission.review_status == review_status)
+
+    if teacher_id:
+        query = query.filter(MaterialSubmission.teacher_id == teacher_id)
+
+    return _keyset_page(
+        query,
+        MaterialSubmission.submitted_at,
+        MaterialSubmission.submission_id,
+        after=after,
+        limit=limit
+    )
+
+
+def serialize_material_submission(submission: MaterialSubmission) -> Dict:
+    """提交材料列表项"""
+    return {
+        "submission_id": submission.submission_id,
+        "teacher_id": submission.teacher_id,
+        "teacher_name": submission.teacher_name,
+        "files": submission.files,
+        "submission_time": submission.submitted_at.isoformat() if submission.submitted_at else "",
+        "review_status": submission.review_status
+    }
+
+
+def query_evaluation_templates(db: Session, status: Optional[str] = None) -> List[EvaluationTemplate]:
+    """
+    查询考评表列表（只加载列表字段，不读取评分标准和提交要求）
+
+    Args:
+        db: 数据库会话
+        status: 状态筛选
+
+    Returns:
+        考评表列表，按创建时间倒序
+    """
+    query = db.query(EvaluationTemplate).options(load_only(
+        EvaluationTemplate.template_id,
+        EvaluationTemplate.name,
+        EvaluationTemplate.description,
+        EvaluationTemplate.file_name,
+        EvaluationTemplate.file_type,
+        EvaluationTemplate.total_score,
+        EvaluationTemplate.deadline,
+        EvaluationTemplate.status,
+        EvaluationTemplate.target_teachers,
+        EvaluationTemplate.created_at,
+    ))
+
+    if status:
+        query = query.filter(EvaluationTemplate.status == status)
+
+    return query.order_by(EvaluationTemplate.created_at.desc()).all()
+
+
+def serialize_evaluation_template(template: EvaluationTemplate) -> Dict:
+    """考评表列表项"""
+    return {
+        "template_id": template.template_id,
+        "name": template.name,
+        "description": template.description,
+        "file_name": template.file_name,
+        "file_type": template.file_type,
+        "total_score": template.total_score,
+        "deadline": template.deadline.isoformat(),
+        "status": template.status,
+        "target_count": len(template.target_teachers),
+        "created_at": template.created_at.isoformat()
+    }
@@ -0,0 +1,224 @@
+"""
+实时事件推送（WebSocket）
+评分任务进度、考评任务状态变化、新提交等事件通过 /ws/monitoring/{department_id} 推送给管理端页面，
+部门事件只推送给该部门的连接，department_id 为 all 的连接接收所有事件。
+
+每个连接有独立的有界发送队列和发送协程：
+- publish 只把消息放入各连接的队列，不等待任何连接发送，慢连接不会拖慢其他连接；
+- 带 key 的事件（如同一评分任务的进度）在队列中合并，只保留最新一条；
+- 队列满时丢弃最旧的消息；单次发送超过 REALTIME_SEND_TIMEOUT 的连接被断开。
+
+多 worker 部署时事件经 backplane（见 pubsub.py）广播到所有进程，再由各进程推送给本进程的连接。
+
+publish 必须在事件循环线程中调用。
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import WebSocket
+
+from .pubsub import InMemoryBackplane, create_backplane
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多排队的消息数
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+# 单条消息发送超时（秒），超时视为慢连接并断开
+REALTIME_SEND_TIMEOUT = float(os.getenv("REALTIME_SEND_TIMEOUT", "10"))
+# 订阅所有部门事件的连接使用的部门 ID
+ALL_DEPARTMENTS = "all"
+
+
+def format_event(event_type: str, data: Dict, department_id: Optional[str] = None) -> str:
+    """序列化推送给客户端的事件"""
+    return json.dumps({
+        "type": event_type,
+        "department_id": department_id,
+        "data": data,
+        "timestamp": datetime.utcnow().isoformat()
+    }, ensure_ascii=False, default=str)
+
+
+class Subscriber:
+    """单个 WebSocket 连接的发送队列及发送协程"""
+
+    def __init__(self, websocket: WebSocket, department_id: str, manager: "ConnectionManager",
+                 queue_size: int = REALTIME_QUEUE_SIZE, send_timeout: float = REALTIME_SEND_TIMEOUT):
+        self.websocket = websocket
+        self.department_id = department_id
+        self.manager = manager
+        self.queue_size = max(1, queue_size)
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.sent = 0
+
+        self._pending: "OrderedDict[object, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def cancel(self):
+        # 先置关闭标志：Python 3.11 的 wait_for 在发送恰好完成时可能吞掉取消
+        self._closed = True
+        self._ready.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def stop(self):
+        self.cancel()
+        if self._task is not None and self._task is not asyncio.current_task():
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def offer(self, key, text: str):
+        """
+        放入发送队列（不等待）
+
+        Args:
+            key: 合并键，队列中已有相同键的消息时原位替换为最新消息
+            text: 已序列化的消息
+        """
+        if key not in self._pending and len(self._pending) >= self.queue_size:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = text
+        self._ready.set()
+
+    async def _run(self):
+        try:
+            while not self._closed:
+                await self._ready.wait()
+                while self._pending and not self._closed:
+                    _, text = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout)
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 发送超时或连接已断开
+            logger.info(f"[实时推送] 断开连接（部门 {self.department_id}）: {type(e).__name__}")
+            self.manager.disconnect(self.websocket, self.department_id)
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+
+
+class ConnectionManager:
+    """按部门管理 WebSocket 连接并推送事件"""
+
+    def __init__(self, queue_size: int = REALTIME_QUEUE_SIZE, send_timeout: float = REALTIME_SEND_TIMEOUT,
+                 backplane=None):
+        """
+        Args:
+            backplane: 跨进程广播，默认为本管理器独占的进程内广播
+        """
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        # department_id -> {websocket: Subscriber}
+        self.active_connections: Dict[str, Dict[WebSocket, Subscriber]] = {}
+        self._sequence = itertools.count()
+        self.backplane = backplane if backplane is not None else InMemoryBackplane()
+        self.backplane.subscribe(self._on_backplane_message)
+
+    async def start(self):
+        """启动跨进程广播（应用启动时调用）"""
+        await self.backplane.start()
+
+    async def connect(self, websocket: WebSocket, department_id: str) -> Subscriber:
+        await websocket.accept()
+        subscriber = Subscriber(websocket, department_id, self,
+                                queue_size=self.queue_size, send_timeout=self.send_timeout)
+        self.active_connections.setdefault(department_id, {})[websocket] = subscriber
+        subscriber.start()
+        return subscriber
+
+    def disconnect(self, websocket: WebSocket, department_id: str):
+        connections = self.active_connections.get(department_id)
+        if not connections:
+            return
+        subscriber = connections.pop(websocket, None)
+        if not connections:
+            del self.active_connections[department_id]
+        if subscriber is not None:
+            subscriber.cancel()
+
+    async def close(self):
+        """关闭所有连接的发送协程及跨进程广播（应用停止时调用）"""
+        subscribers = [s for connections in self.active_connections.values() for s in connections.values()]
+        self.active_connections = {}
+        await asyncio.gather(*(s.stop() for s in subscribers), return_exceptions=True)
+        self.backplane.unsubscribe(self._on_backplane_message)
+        await self.backplane.stop()
+
+    def _targets(self, department_id: Optional[str]):
+        if department_id and department_id != ALL_DEPARTMENTS:
+            return list(self.active_connections.get(department_id, {}).values()) + \
+                list(self.active_connections.get(ALL_DEPARTMENTS, {}).values())
+        return [s for connections in self.active_connections.values() for s in connections.values()]
+
+    def _fan_out(self, text: str, department_id: Optional[str], key=None) -> int:
+        """推送给本进程的连接"""
+        if key is None:
+            key = ("seq", next(self._sequence))
+        targets = self._targets(department_id)
+        for subscriber in targets:
+            subscriber.offer(key, text)
+        return len(targets)
+
+    def _on_backplane_message(self, message: str):
+        envelope = json.loads(message)
+        key = envelope.get("key")
+        self._fan_out(envelope["text"], envelope.get("department_id"), key=tuple(key) if key else None)
+
+    def _publish(self, text: str, department_id: Optional[str], key=None):
+        self.backplane.publish(json.dumps({
+            "department_id": department_id,
+            "key": list(key) if key else None,
+            "text": text
+        }, ensure_ascii=False))
+
+    def publish(self, event_type: str, data: Dict, department_id: Optional[str] = None,
+                key: Optional[str] = None):
+        """
+        推送事件（不等待发送），经 backplane 推送给所有进程的连接
+
+        Args:
+            event_type: 事件类型，如 scoring_job_progress / task_status / submission_created
+            data: 事件数据
+            department_id: 只推送给该部门（及订阅 all）的连接，None 表示所有连接
+            key: 合并键，队列中尚未发送的同键事件只保留最新一条
+        """
+        self._publish(format_event(event_type, data, department_id), department_id,
+                      key=(event_type, key) if key else None)
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        await websocket.send_text(message)
+
+    async def broadcast(self, message: str, department_id: str = None):
+        """推送文本消息（经 backplane 放入各连接的发送队列，不等待发送）"""
+        self._publish(message, department_id)
+
+    def stats(self) -> Dict:
+        subscribers = self._targets(None)
+        return {
+            "connections": len(subscribers),
+            "departments": len(self.active_connections),
+            "pending": sum(len(s._pending) for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers)
+        }
+
+
+# 全局连接管理器
+connection_manager = ConnectionManager(backplane=create_backplane())
@@ -4,16 +4,24 @@
 
 import logging
 import os
+import secrets
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
 
 from ..database import get_db
-from ..models import User, MaterialSubmission
+from ..models import User, MaterialSubmission, EvaluationAssignmentTask, EvaluationTemplate
 from ..auth import get_current_active_user
 from ..scoring_engine import ScoringEngine
+from ..scoring_cache import scoring_result_cache
+from ..batch_scoring import apply_scoring_result
+from ..scoring_jobs import ScoringJobManager
 from ..file_parser import FileParser
+from ..parse_executor import parse_executor
+from ..scoring_records import scoring_records_snapshot
+from .. import deepseek_pool
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +31,21 @@ router = APIRouter(prefix="/api/scoring", tags=["scoring"])
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-b6ca926900534f1fa31067d49980ec56")
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
 
+# 教师端服务间调用的共享令牌（请求头 X-Sync-Token）；未设置时不校验，此时服务间接口应只在内网开放
+SYNC_SERVICE_TOKEN = os.getenv("SYNC_SERVICE_TOKEN")
+
 # 初始化评分引擎
-scoring_engine = ScoringEngine(DEEPSEEK_API_KEY, DEEPSEEK_API_URL)
+scoring_engine = ScoringEngine(DEEPSEEK_API_KEY, DEEPSEEK_API_URL, result_cache=scoring_result_cache)
+
+# 批量评分后台任务队列（随应用启动/停止）
+scoring_job_manager = ScoringJobManager(scoring_engine)
 
 
 @router.post("/score/{submission_id}")
 async def score_submission(
     submission_id: str,
     bonus_items: Optional[List[dict]] = None,
+    force_rescore: bool = Query(False, description="跳过评分缓存，强制重新调用大模型评分"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -44,20 +59,20 @@ async def score_submission(
     Args:
         submission_id: 提交记录 ID 或任务 ID
         bonus_items: 加分项列表
+        force_rescore: 是否跳过评分缓存（同一文件、同一评分标准的结果会被缓存复用）
         
     Returns:
         评分结果
     """
     try:
-        from ..models import EvaluationAssignmentTask
-        
         # 先尝试作为MaterialSubmission查找
-        submission = db.query(MaterialSubmission).filter(
+        target = db.query(MaterialSubmission).filter(
             MaterialSubmission.submission_id == submission_id
         ).first()
         
         # 如果不是MaterialSubmission，尝试作为EvaluationAssignmentTask查找
-        if not submission:
+        task = None
+        if not target:
             task = db.query(EvaluationAssignmentTask).filter(
                 EvaluationAssignmentTask.task_id == submission_id
             ).first()
@@ -67,180 +82,20 @@ async def score_submission(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"提交记录或任务不存在: {submission_id}"
                 )
-            
-            # 使用EvaluationAssignmentTask的数据
-            files = task.submitted_files or []
-            if not files:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="任务中没有提交文件"
-                )
-            
-            # 获取第一个文件
-            file_info = files[0]
-            file_path = file_info.get("file_url") or file_info.get("path")
-            file_name = file_info.get("file_name")
-            
-            # 从文件名推断文件类型
-            file_type_mapping = {
-                'pdf': '教案',
-                'docx': '教学反思',
-                'doc': '教学反思',
-                'pptx': '课件',
-                'ppt': '课件',
-                'txt': '教学反思'
-            }
-            
-            if file_name:
-                file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
-                file_type = file_type_mapping.get(file_ext, '教案')
-            else:
-                file_type = file_info.get("type", '教案')
-            
-            if not file_path or not file_type:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"文件信息不完整: path={file_path}, type={file_type}"
-                )
-            
-            # 规范化文件路径（处理Windows反斜杠和混合分隔符）
-            logger.info(f"原始文件路径: {file_path}")
-            file_path = file_path.replace('\\', '/')  # 先统一为正斜杠
-            file_path = os.path.normpath(file_path)  # 再规范化为系统路径
-            logger.info(f"规范化后路径: {file_path}")
-            
-            # 尝试多个可能的文件路径
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-            logger.info(f"基础目录: {base_dir}")
-            
-            # 从backend_8fMBP向上两级到评教系统最终版目录
-            parent_dir = os.path.dirname(os.path.dirname(base_dir))
-            
-            possible_paths = [
-                file_path,
-                os.path.join(parent_dir, "评教系统教师端", "backend", file_path),
-                os.path.join(base_dir, "..", "..", "评教系统教师端", "backend", file_path),
-                os.path.normpath(os.path.join(os.path.dirname(__file__), "../../../../评教系统教师端/backend", file_path))
-            ]
-            
-            actual_file_path = None
-            for i, path in enumerate(possible_paths, 1):
-                normalized_path = os.path.normpath(path)
-                logger.info(f"尝试路径 {i}: {normalized_path}")
-                logger.info(f"  文件存在: {os.path.exists(normalized_path)}")
-                if os.path.exists(normalized_path):
-                    actual_file_path = normalized_path
-                    logger.info(f"✅ 找到文件: {actual_file_path}")
-                    break
-            
-            if not actual_file_path:
-                error_msg = f"文件不存在。原始路径: {file_info.get('file_url') or file_info.get('path')}, 规范化路径: {file_path}"
-                logger.error(error_msg)
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=error_msg
-                )
-            
-            # 解析文件内容
-            logger.info(f"开始解析文件: {actual_file_path}")
-            try:
-                file_ext = os.path.splitext(actual_file_path)[1].lower().lstrip('.')
-                content = FileParser.parse_file(actual_file_path, file_ext)
-            except Exception as e:
-                logger.error(f"文件解析失败: {str(e)}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"文件解析失败: {str(e)}"
-                )
-            
-            # 获取考评表信息（总分和评分标准）
-            from ..models import EvaluationTemplate
-            template = db.query(EvaluationTemplate).filter(
-                EvaluationTemplate.template_id == task.template_id
-            ).first()
-            
-            total_score = 100  # 默认100分
-            scoring_criteria = None
-            
-            if template:
-                total_score = template.total_score or 100
-                scoring_criteria = template.scoring_criteria
-                logger.info(f"使用考评表总分: {total_score}分")
-                if scoring_criteria:
-                    logger.info(f"使用考评表评分标准: {len(scoring_criteria)}个指标")
-            
-            # 进行评分
-            logger.info(f"开始评分: {submission_id}")
-            scoring_result = scoring_engine.score_file(
-                file_type, 
-                content, 
-                total_score=total_score,
-                scoring_criteria=scoring_criteria,
-                bonus_items=bonus_items
-            )
-            
-            if not scoring_result.get("success"):
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"评分失败: {scoring_result.get('error', '未知错误')}"
-                )
-            
-            # 更新任务状态
-            task.status = "scored"
-            task.scored_at = datetime.utcnow()
-            task.total_score = scoring_result.get("final_score", 0)
-            task.scoring_feedback = scoring_result.get("summary", "")
-            
-            # 保存详细评分结果到scores字段
-            task.scores = {
-                "base_score": scoring_result.get("base_score", 0),
-                "bonus_score": scoring_result.get("bonus_score", 0),
-                "final_score": scoring_result.get("final_score", 0),
-                "grade": scoring_result.get("grade", ""),
-                "veto_triggered": scoring_result.get("veto_triggered", False),
-                "veto_reason": scoring_result.get("veto_reason", ""),
-                "score_details": scoring_result.get("score_details", []),
-                "summary": scoring_result.get("summary", ""),
-                "scored_at": datetime.utcnow().isoformat()
-            }
-            
-            db.commit()
-            
-            return {
-                "success": True,
-                "submission_id": submission_id,
-                "scoring_result": task.scores
-            }
+            target = task
         
-        # 原有的MaterialSubmission处理逻辑
         # 获取文件信息
-        files = submission.files or []
+        files = (task.submitted_files if task else target.files) or []
         if not files:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="提交记录中没有文件"
+                detail="任务中没有提交文件" if task else "提交记录中没有文件"
             )
         
         # 获取第一个文件
         file_info = files[0]
         file_path = file_info.get("file_url") or file_info.get("path")
-        file_name = file_info.get("file_name")
-        
-        # 从文件名推断文件类型
-        file_type_mapping = {
-            'pdf': '教案',  # 默认将PDF视为教案
-            'docx': '教学反思',  # 默认将DOCX视为教学反思
-            'doc': '教学反思',
-            'pptx': '课件',
-            'ppt': '课件',
-            'txt': '教学反思'
-        }
-        
-        if file_name:
-            file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
-            file_type = file_type_mapping.get(file_ext, '教案')  # 默认为教案
-        else:
-            file_type = file_info.get("type", '教案')
+        file_type = FileParser.infer_scoring_type(file_info)
         
         if not file_path or not file_type:
             raise HTTPException(
@@ -248,49 +103,23 @@ async def score_submission(
                 detail=f"文件信息不完整: path={file_path}, type={file_type}"
             )
         
-        # 规范化文件路径（处理Windows反斜杠和混合分隔符）
-        logger.info(f"原始文件路径: {file_path}")
-        file_path = file_path.replace('\\', '/')  # 先统一为正斜杠
-        file_path = os.path.normpath(file_path)  # 再规范化为系统路径
-        logger.info(f"规范化后路径: {file_path}")
-        
-        # 尝试多个可能的文件路径
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-        logger.info(f"基础目录: {base_dir}")
-        
-        # 从backend_8fMBP向上两级到评教系统最终版目录
-        parent_dir = os.path.dirname(os.path.dirname(base_dir))
-        
-        possible_paths = [
-            file_path,
-            os.path.join(parent_dir, "评教系统教师端", "backend", file_path),
-            os.path.join(base_dir, "..", "..", "评教系统教师端", "backend", file_path),
-            os.path.normpath(os.path.join(os.path.dirname(__file__), "../../../../评教系统教师端/backend", file_path))
-        ]
-        
-        actual_file_path = None
-        for i, path in enumerate(possible_paths, 1):
-            normalized_path = os.path.normpath(path)
-            logger.info(f"尝试路径 {i}: {normalized_path}")
-            logger.info(f"  文件存在: {os.path.exists(normalized_path)}")
-            if os.path.exists(normalized_path):
-                actual_file_path = normalized_path
-                logger.info(f"找到文件: {actual_file_path}")
-                break
-        
-        # 检查文件是否存在
+        actual_file_path = FileParser.resolve_path(file_path)
         if not actual_file_path:
+            error_msg = f"文件不存在。原始路径: {file_path}"
+            logger.error(error_msg)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"文件不存在: {file_path}。尝试的路径: {possible_paths}"
+                detail=error_msg
             )
         
-        # 解析文件内容
+        # 解析文件内容（在解析进程池中执行，不阻塞事件循环）
         logger.info(f"开始解析文件: {actual_file_path}")
         try:
-            # 从文件路径获取扩展名用于解析
             file_ext = os.path.splitext(actual_file_path)[1].lower().lstrip('.')
-            content = FileParser.parse_file(actual_file_path, file_ext)
+            file_hash = getattr(target, "file_hash", None) or await run_in_threadpool(
+                FileParser.calculate_file_hash, actual_file_path
+            )
+            content = await parse_executor.parse(actual_file_path, file_ext, file_hash)
         except Exception as e:
             logger.error(f"文件解析失败: {str(e)}")
             raise HTTPException(
@@ -298,9 +127,30 @@ async def score_submission(
                 detail=f"文件解析失败: {str(e)}"
             )
         
+        # 获取考评表信息（总分和评分标准）
+        total_score = 100  # 默认100分
+        scoring_criteria = None
+        
+        if task:
+            template = db.query(EvaluationTemplate).filter(
+                EvaluationTemplate.template_id == task.template_id
+            ).first()
+            if template:
+                total_score = template.total_score or 100
+                scoring_criteria = template.scoring_criteria
+                logger.info(f"使用考评表总分: {total_score}分")
+        
         # 进行评分
         logger.info(f"开始评分: {submission_id}")
-        scoring_result = scoring_engine.score_file(file_type, content, bonus_items)
+        scoring_result = await scoring_engine.score_file_async(
+            file_type,
+            content,
+            total_score=total_score,
+            scoring_criteria=scoring_criteria,
+            bonus_items=bonus_items,
+            file_hash=file_hash,
+            force_rescore=force_rescore
+        )
         
         if not scoring_result.get("success"):
             raise HTTPException(
@@ -308,29 +158,14 @@ async def score_submission(
                 detail=f"评分失败: {scoring_result.get('error', '未知错误')}"
             )
         
-        # 更新提交记录
-        submission.review_status = "scored"
-        submission.reviewed_at = datetime.utcnow()
-        
         # 保存评分结果
-        submission.scoring_result = {
-            "base_score": scoring_result.get("base_score", 0),
-            "bonus_score": scoring_result.get("bonus_score", 0),
-            "final_score": scoring_result.get("final_score", 0),
-            "grade": scoring_result.get("grade", ""),
-            "veto_triggered": scoring_result.get("veto_triggered", False),
-            "veto_reason": scoring_result.get("veto_reason", ""),
-            "score_details": scoring_result.get("score_details", []),
-            "summary": scoring_result.get("summary", ""),
-            "scored_at": datetime.utcnow().isoformat()
-        }
-        
+        record = apply_scoring_result(target, scoring_result)
         db.commit()
         
         return {
             "success": True,
             "submission_id": submission_id,
-            "scoring_result": submission.scoring_result
+            "scoring_result": record
         }
         
     except HTTPException:
@@ -346,188 +181,22 @@ async def score_submission(
 @router.post("/batch-score")
 async def batch_score(
     submission_ids: List[str],
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     批量评分
     
+    创建持久化的后台评分任务后立即返回，评分由后台 worker 池完成，
+    通过 GET /api/scoring/jobs/{job_id} 查询进度；服务重启后会继续未完成的评分项。
+    
     Args:
-        submission_ids: 提交记录 ID 列表
+        submission_ids: 提交记录 ID 或考评任务 ID 列表
         
     Returns:
-        批量评分结果
+        任务概要（job_id、状态、总数）
     """
     try:
-        results = []
-        success_count = 0
-        failed_count = 0
-        
-        for submission_id in submission_ids:
-            try:
-                # 查找提交记录
-                submission = db.query(MaterialSubmission).filter(
-                    MaterialSubmission.submission_id == submission_id
-                ).first()
-                
-                if not submission:
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": "提交记录不存在"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 获取文件信息
-                files = submission.files or []
-                if not files:
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": "提交记录中没有文件"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 获取第一个文件
-                file_info = files[0]
-                file_path = file_info.get("file_url") or file_info.get("path")
-                file_name = file_info.get("file_name")
-                
-                # 从文件名推断文件类型
-                file_type_mapping = {
-                    'pdf': '教案',  # 默认将PDF视为教案
-                    'docx': '教学反思',  # 默认将DOCX视为教学反思
-                    'doc': '教学反思',
-                    'pptx': '课件',
-                    'ppt': '课件',
-                    'txt': '教学反思'
-                }
-                
-                if file_name:
-                    file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
-                    file_type = file_type_mapping.get(file_ext, '教案')  # 默认为教案
-                else:
-                    file_type = file_info.get("type", '教案')
-                
-                if not file_path or not file_type:
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": f"文件信息不完整: path={file_path}, type={file_type}"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 规范化文件路径（处理Windows反斜杠和混合分隔符）
-                logger.info(f"[批量评分] 原始文件路径: {file_path}")
-                file_path = file_path.replace('\\', '/')  # 先统一为正斜杠
-                file_path = os.path.normpath(file_path)  # 再规范化为系统路径
-                logger.info(f"[批量评分] 规范化后路径: {file_path}")
-                
-                base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-                logger.info(f"[批量评分] 基础目录: {base_dir}")
-                
-                # 从backend_8fMBP向上两级到评教系统最终版目录
-                parent_dir = os.path.dirname(os.path.dirname(base_dir))
-                
-                # 尝试多个可能的文件路径
-                possible_paths = [
-                    file_path,
-                    os.path.join(parent_dir, "评教系统教师端", "backend", file_path),
-                    os.path.join(base_dir, "..", "..", "评教系统教师端", "backend", file_path),
-                    os.path.normpath(os.path.join(os.path.dirname(__file__), "../../../../评教系统教师端/backend", file_path))
-                ]
-                
-                actual_file_path = None
-                for i, path in enumerate(possible_paths, 1):
-                    normalized_path = os.path.normpath(path)
-                    logger.info(f"[批量评分] 尝试路径 {i}: {normalized_path}")
-                    logger.info(f"[批量评分]   文件存在: {os.path.exists(normalized_path)}")
-                    if os.path.exists(normalized_path):
-                        actual_file_path = normalized_path
-                        logger.info(f"[批量评分] ✅ 找到文件: {actual_file_path}")
-                        break
-                
-                # 检查文件是否存在
-                if not actual_file_path:
-                    error_msg = f"文件不存在。原始路径: {file_info.get('file_url') or file_info.get('path')}, 规范化路径: {file_path}"
-                    logger.error(f"[批量评分] {error_msg}")
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": error_msg
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 解析文件内容
-                try:
-                    # 从文件路径获取扩展名用于解析
-                    file_ext = os.path.splitext(actual_file_path)[1].lower().lstrip('.')
-                    content = FileParser.parse_file(actual_file_path, file_ext)
-                except Exception as e:
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": f"文件解析失败: {str(e)}"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 进行评分
-                scoring_result = scoring_engine.score_file(file_type, content)
-                
-                if not scoring_result.get("success"):
-                    results.append({
-                        "submission_id": submission_id,
-                        "success": False,
-                        "error": f"评分失败: {scoring_result.get('error', '未知错误')}"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 更新提交记录
-                submission.review_status = "scored"
-                submission.reviewed_at = datetime.utcnow()
-                submission.scoring_result = {
-                    "base_score": scoring_result.get("base_score", 0),
-                    "bonus_score": scoring_result.get("bonus_score", 0),
-                    "final_score": scoring_result.get("final_score", 0),
-                    "grade": scoring_result.get("grade", ""),
-                    "veto_triggered": scoring_result.get("veto_triggered", False),
-                    "veto_reason": scoring_result.get("veto_reason", ""),
-                    "score_details": scoring_result.get("score_details", []),
-                    "summary": scoring_result.get("summary", ""),
-                    "scored_at": datetime.utcnow().isoformat()
-                }
-                
-                results.append({
-                    "submission_id": submission_id,
-                    "success": True,
-                    "scoring_result": submission.scoring_result
-                })
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"批量评分异常: {str(e)}")
-                results.append({
-                    "submission_id": submission_id,
-                    "success": False,
-                    "error": f"异常: {str(e)}"
-                })
-                failed_count += 1
-        
-        # 提交所有更改
-        db.commit()
-        
-        return {
-            "total": len(submission_ids),
-            "success": success_count,
-            "failed": failed_count,
-            "results": results
-        }
+        return await scoring_job_manager.enqueue(submission_ids, created_by=current_user.id)
         
     except Exception as e:
         logger.error(f"批量评分异常: {str(e)}")
@@ -537,41 +206,45 @@ async def batch_score(
         )
 
 
-@router.get("/records/{submission_id}")
-async def get_scoring_record(
-    submission_id: str,
-    db: Session = Depends(get_db),
+@router.get("/jobs/{job_id}")
+async def get_scoring_job(
+    job_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    获取评分记录
+    查询批量评分任务进度
     
     Args:
-        submission_id: 提交记录 ID
+        job_id: 任务 ID
         
     Returns:
-        评分记录
+        任务状态、成功/失败/待处理数量及逐项状态（results 与提交顺序一致）
     """
+    job = await run_in_threadpool(scoring_job_manager.get_job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="评分任务不存在"
+        )
+    return job
+
+
+def _scoring_records_response(db: Session, submission_id: str, if_none_match: Optional[str]) -> Response:
+    """评分记录快照响应：带 ETag，If-None-Match 与当前 ETag 相同时返回 304"""
     try:
-        submission = db.query(MaterialSubmission).filter(
-            MaterialSubmission.submission_id == submission_id
-        ).first()
+        snapshot = scoring_records_snapshot(db, submission_id)
         
-        if not submission:
+        if not snapshot:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="提交记录不存在"
             )
         
-        return {
-            "submission_id": submission.submission_id,
-            "teacher_id": submission.teacher_id,
-            "teacher_name": submission.teacher_name,
-            "review_status": submission.review_status,
-            "scoring_result": submission.scoring_result or {},
-            "submitted_at": submission.submitted_at.isoformat() if submission.submitted_at else None,
-            "reviewed_at": submission.reviewed_at.isoformat() if submission.reviewed_at else None
-        }
+        etag = snapshot["etag"]
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        
+        return JSONResponse(content=snapshot, headers={"ETag": etag})
         
     except HTTPException:
         raise
@@ -583,6 +256,78 @@ async def get_scoring_record(
         )
 
 
+@router.get("/records/{submission_id}")
+async def get_scoring_record(
+    submission_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取评分记录
+    
+    响应带 ETag；请求头 If-None-Match 与当前 ETag 相同时返回 304（无响应体）。
+    
+    Args:
+        submission_id: 提交记录 ID
+        
+    Returns:
+        评分记录（提交信息、scoring_result 及逐条评分记录 records）
+    """
+    return _scoring_records_response(db, submission_id, if_none_match)
+
+
+@router.get("/internal/records/{submission_id}")
+async def get_scoring_record_for_teacher_service(
+    submission_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    sync_token: Optional[str] = Header(None, alias="X-Sync-Token"),
+    db: Session = Depends(get_db)
+):
+    """
+    教师端重新验证评分记录缓存（服务间调用，与 /api/teacher/sync-submission 一样不需要用户登录）
+    
+    设置了 SYNC_SERVICE_TOKEN 时校验请求头 X-Sync-Token。响应与 /records/{submission_id} 相同。
+    """
+    if SYNC_SERVICE_TOKEN and not secrets.compare_digest(sync_token or "", SYNC_SERVICE_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="服务间令牌无效"
+        )
+    return _scoring_records_response(db, submission_id, if_none_match)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取评分结果缓存统计（条目数、命中/未命中次数、命中率）
+    """
+    return scoring_result_cache.stats()
+
+
+@router.get("/deepseek/metrics")
+async def get_deepseek_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取 DeepSeek API 限流与连接池指标（排队数、累计限流等待时间、429 次数等）
+    """
+    return deepseek_pool.metrics()
+
+
+@router.delete("/cache")
+async def clear_cache(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    清空评分结果缓存（修改评分模板或提示词后使用）
+    """
+    scoring_result_cache.clear()
+    return {"message": "评分缓存已清空"}
+
+
 @router.get("/health")
 async def health_check():
     """
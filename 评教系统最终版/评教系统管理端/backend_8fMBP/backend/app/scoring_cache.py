@@ -0,0 +1,147 @@
+"""
+评分结果缓存
+以 (文件 SHA-256, 文件类型, 模板/评分标准指纹, 模型, 温度) 为键缓存大模型的评分结果，
+相同文件重复评分时直接复用，避免重复调用 DeepSeek API
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存容量与过期时间，可通过环境变量调整
+SCORING_CACHE_SIZE = int(os.getenv("SCORING_CACHE_SIZE", "1000"))
+SCORING_CACHE_TTL = int(os.getenv("SCORING_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def fingerprint(value: Any) -> str:
+    """
+    计算任意可 JSON 序列化对象的指纹
+
+    Args:
+        value: 模板、评分标准等
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def content_hash(content: str) -> str:
+    """计算文本内容的 SHA-256（无文件哈希时使用）"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ScoringResultCache:
+    """
+    评分结果缓存（TTL + LRU，线程安全）
+
+    缓存的是大模型返回并校验通过的原始评分结果，加分项、总分封顶和等级
+    在读取后重新计算，因此同一文件在不同加分项下也可以复用。
+    """
+
+    def __init__(self, max_size: int = SCORING_CACHE_SIZE, ttl: int = SCORING_CACHE_TTL):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大缓存条目数，超出后淘汰最久未使用的条目（0 表示禁用缓存）
+            ttl: 条目过期时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(file_hash: str, file_type: str, criteria_fingerprint: str,
+                 model: str, temperature: float) -> str:
+        """
+        构建缓存键
+
+        Args:
+            file_hash: 文件 SHA-256
+            file_type: 文件类型
+            criteria_fingerprint: 模板/评分标准指纹
+            model: 模型名称
+            temperature: 温度
+
+        Returns:
+            缓存键
+        """
+        return "|".join([file_hash, file_type, criteria_fingerprint, model, str(temperature)])
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的评分结果副本，未命中或已过期时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        """删除指定缓存条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        获取缓存统计
+
+        Returns:
+            条目数、容量、TTL、命中/未命中次数、命中率、淘汰次数
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions
+            }
+
+
+# 全局评分结果缓存（管理端进程内共享）
+scoring_result_cache = ScoringResultCache()
@@ -3,18 +3,35 @@
 负责调用 DeepSeek API 进行评分并处理结果
 """
 
+import asyncio
 import logging
 import json
-from typing import Dict, List, Optional
+import os
+import textwrap
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-from .deepseek_client import DeepseekAPIClient
+from .deepseek_client import DeepseekAPIClient, AsyncDeepseekAPIClient
+from .scoring_cache import ScoringResultCache, fingerprint, content_hash
 
 logger = logging.getLogger(__name__)
 
+# 流式评分时，大模型判定触发否决项后是否立即停止生成（不再等待得分明细和总结）
+STREAM_STOP_ON_VETO = os.getenv("DEEPSEEK_STREAM_STOP_ON_VETO", "true").lower() == "true"
+
+# 大模型评分结果的必需字段
+REQUIRED_FIELDS = ("veto_check", "score_details", "base_score", "grade_suggestion", "summary")
+
+# 单份文档评分的最大生成 token 数，以及多文档合并评分的上限（DeepSeek 单次最多输出 8K token）
+MAX_TOKENS_PER_DOCUMENT = 2000
+MAX_BATCH_TOKENS = 8192
+
 
 class ScoringEngine:
     """自动评分引擎"""
     
+    # 提示词版本，修改 build_prompt 的提示词结构后需要递增，使旧的缓存结果失效
+    PROMPT_VERSION = 1
+    
     # 评分模板
     TEMPLATES = {
         "教案": {
@@ -84,15 +101,19 @@ class ScoringEngine:
         }
     }
     
-    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1/chat/completions"):
+    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1/chat/completions",
+                 result_cache: Optional[ScoringResultCache] = None):
         """
         初始化评分引擎
         
         Args:
             api_key: DeepSeek API 密钥
             api_url: DeepSeek API 地址
+            result_cache: 评分结果缓存，不提供时使用引擎自己的缓存
         """
         self.api_client = DeepseekAPIClient(api_key, api_url)
+        self.async_api_client = AsyncDeepseekAPIClient(api_key, api_url)
+        self.result_cache = result_cache if result_cache is not None else ScoringResultCache()
     
     def build_prompt(self, file_type: str, content: str, total_score: int = 100, 
                      scoring_criteria: Optional[List[Dict]] = None, bonus_rules: Optional[Dict] = None) -> str:
@@ -109,6 +130,27 @@ class ScoringEngine:
         Returns:
             完整的提示词
         """
+        template_name, rubric = self._build_rubric(file_type, total_score, scoring_criteria)
+        
+        prompt = f"""{rubric}
+
+【待评分{template_name}内容】
+{content}
+
+【输出格式要求】
+请严格按照以下JSON格式输出评分结果：
+{self._result_format()}
+"""
+        return prompt
+    
+    def _build_rubric(self, file_type: str, total_score: int = 100,
+                      scoring_criteria: Optional[List[Dict]] = None):
+        """
+        构建提示词中的评分标准部分（评分规则、否决项、核心指标、等级标准）
+        
+        Returns:
+            (模板名称, 评分标准文本)
+        """
         # 如果提供了自定义评分标准，使用自定义标准；否则使用默认模板
         if scoring_criteria and len(scoring_criteria) > 0:
             # 使用考评表的自定义评分标准
@@ -144,7 +186,7 @@ class ScoringEngine:
         good_threshold = int(total_score * 0.8)       # 80%
         pass_threshold = int(total_score * 0.6)       # 60%
         
-        prompt = f"""你是一位专业的教学评估专家，请根据以下标准对{template_name}进行评分。
+        rubric = f"""你是一位专业的教学评估专家，请根据以下标准对{template_name}进行评分。
 
 【评分规则】
 1. 首先检查一票否决项，如果触发则直接判定为不合格
@@ -166,35 +208,72 @@ class ScoringEngine:
 - 优秀：{excellent_threshold}-{total_score}分
 - 良好：{good_threshold}-{excellent_threshold-1}分
 - 合格：{pass_threshold}-{good_threshold-1}分
-- 不合格：<{pass_threshold}分
-
-【待评分{template_name}内容】
-{content}
-
-【输出格式要求】
-请严格按照以下JSON格式输出评分结果：
-{{
-    "veto_check": {{
+- 不合格：<{pass_threshold}分"""
+        return template_name, rubric
+    
+    @staticmethod
+    def _result_format(document_field: bool = False) -> str:
+        """评分结果 JSON 格式说明（document_field 为 True 时包含文档序号字段，用于多文档评分）"""
+        result_format = """{
+    "veto_check": {
         "triggered": false,
         "reason": ""
-    }},
+    },
     "score_details": [
-        {{
+        {
             "indicator": "指标名称",
             "score": 分数,
             "max_score": 满分,
             "reason": "评分理由"
-        }}
+        }
     ],
     "base_score": 总分,
     "grade_suggestion": "等级",
     "summary": "总体评价和改进建议（请按以下结构化格式输出）：\n\n【总体评价】\n简要总结整体表现（2-3句话）\n\n【专业反思深度】\n分析教师对教学实践的反思是否深入、系统，是否能够从理论层面进行分析，是否触及教学本质问题。\n• 反思的系统性和深度\n• 理论分析的水平\n• 对教学本质的认识\n\n【改进措施可操作性】\n评估提出的改进措施是否具体、可行，是否有明确的实施步骤和时间节点，是否考虑了实际教学条件。\n• 措施的具体性和可行性\n• 实施步骤的清晰度\n• 与实际条件的匹配度\n\n【专业发展规划】\n考察教师是否有明确的专业成长目标，是否制定了短期、中期、长期发展计划，是否体现了持续学习和自我提升的意识。\n• 发展目标的明确性\n• 发展计划的完整性\n• 持续学习的意识"
-}}
+}"""
+        if document_field:
+            result_format = result_format.replace("{\n", '{\n    "document": 文档序号,\n', 1)
+        return result_format
+    
+    def build_batch_prompt(self, file_type: str, contents: List[str], total_score: int = 100,
+                           scoring_criteria: Optional[List[Dict]] = None) -> str:
+        """
+        构建多文档评分提示词
+        
+        评分标准只出现一次，各文档按序号分别评分，结果以 JSON 数组返回。
+        
+        Args:
+            file_type: 文件类型（所有文档相同）
+            contents: 各文档内容
+            total_score: 考评表总分
+            scoring_criteria: 考评表评分标准
+            
+        Returns:
+            完整的提示词
+        """
+        template_name, rubric = self._build_rubric(file_type, total_score, scoring_criteria)
+        count = len(contents)
+        documents = "\n\n".join(
+            f"【文档 {i}】\n{content}" for i, content in enumerate(contents, 1)
+        )
+        item_format = textwrap.indent(self._result_format(document_field=True), "    ")
+        
+        prompt = f"""{rubric}
+
+【待评分{template_name}内容】（共 {count} 份，请逐份独立评分，互不影响）
+{documents}
+
+【输出格式要求】
+请严格按照以下JSON数组格式输出评分结果，每份文档一个对象，document 为文档序号（1-{count}），共 {count} 个对象：
+[
+{item_format}
+]
 """
         return prompt
     
     def score_file(self, file_type: str, content: str, total_score: int = 100,
-                   scoring_criteria: Optional[List[Dict]] = None, bonus_items: Optional[List[Dict]] = None) -> Dict:
+                   scoring_criteria: Optional[List[Dict]] = None, bonus_items: Optional[List[Dict]] = None,
+                   file_hash: Optional[str] = None, force_rescore: bool = False) -> Dict:
         """
         对文件进行评分
         
@@ -204,103 +283,394 @@ class ScoringEngine:
             total_score: 考评表总分（默认100分）
             scoring_criteria: 考评表评分标准
             bonus_items: 加分项列表
+            file_hash: 文件 SHA-256（用于结果缓存，不提供时使用内容哈希）
+            force_rescore: 是否跳过缓存强制重新评分
             
         Returns:
             评分结果
         """
         try:
-            # 验证文件类型（如果没有自定义标准，则需要验证）
-            if not scoring_criteria and file_type not in self.TEMPLATES:
-                raise ValueError(f"不支持的文件类型: {file_type}")
+            empty_result = self._check_input(file_type, content, scoring_criteria)
+            if empty_result:
+                return empty_result
             
-            # 验证内容
-            if not content or content.strip() == "":
-                return {
-                    "success": False,
-                    "error": "文件内容为空",
-                    "veto_triggered": True,
-                    "veto_reason": "未提交核心文件（文件内容为空）",
-                    "final_score": 0,
-                    "grade": "不合格"
-                }
+            cache_key = self._cache_key(file_type, content, total_score, scoring_criteria, file_hash)
+            parsed_result = None if force_rescore else self.result_cache.get(cache_key)
             
-            # 构建提示词
-            prompt = self.build_prompt(file_type, content, total_score, scoring_criteria)
+            if parsed_result is None:
+                # 构建提示词
+                prompt = self.build_prompt(file_type, content, total_score, scoring_criteria)
+                
+                # 调用 API
+                logger.info(f"开始评分 {file_type}，总分: {total_score}分...")
+                api_response = self.api_client.call_api(prompt)
+                
+                parsed_result = self._parse_api_response(api_response)
+                self.result_cache.set(cache_key, parsed_result)
+            else:
+                logger.info(f"命中评分缓存 {file_type}，总分: {total_score}分")
             
-            # 调用 API
-            logger.info(f"开始评分 {file_type}，总分: {total_score}分...")
-            api_response = self.api_client.call_api(prompt)
+            return self._build_result(parsed_result, total_score, bonus_items)
             
-            if not api_response.get("success"):
-                raise Exception(f"API 调用失败: {api_response.get('error', '未知错误')}")
-            
-            # 解析响应
-            response_text = api_response.get("content", "")
-            parsed_result = self.api_client.parse_response(response_text)
+        except Exception as e:
+            logger.error(f"评分失败: {str(e)}")
+            return self._failed_result(e)
+    
+    async def score_file_async(self, file_type: str, content: str, total_score: int = 100,
+                               scoring_criteria: Optional[List[Dict]] = None,
+                               bonus_items: Optional[List[Dict]] = None,
+                               file_hash: Optional[str] = None, force_rescore: bool = False,
+                               on_partial: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        对文件进行评分（异步版本）
+        
+        与 score_file 的参数和返回结构完全一致，但通过异步客户端调用 API，
+        在等待 DeepSeek 响应期间不会阻塞事件循环。
+        客户端启用流式响应时，所需字段返回后（或触发否决项后）即停止生成。
+        
+        Args:
+            file_type: 文件类型
+            content: 文件内容
+            total_score: 考评表总分（默认100分）
+            scoring_criteria: 考评表评分标准
+            bonus_items: 加分项列表
+            file_hash: 文件 SHA-256（用于结果缓存，不提供时使用内容哈希）
+            force_rescore: 是否跳过缓存强制重新评分
+            on_partial: 流式响应时的中间结果回调（参数为已解析的评分字段）
             
-            # 验证响应格式
-            self.api_client.validate_response(parsed_result)
+        Returns:
+            评分结果
+        """
+        try:
+            empty_result = self._check_input(file_type, content, scoring_criteria)
+            if empty_result:
+                return empty_result
             
-            # 检查否决项
-            veto_check = parsed_result.get("veto_check", {})
-            if veto_check.get("triggered"):
-                return {
-                    "success": True,
-                    "veto_triggered": True,
-                    "veto_reason": veto_check.get("reason", "触发否决项"),
-                    "base_score": 0,
-                    "final_score": 0,
-                    "grade": "不合格",
-                    "score_details": parsed_result.get("score_details", []),
-                    "summary": parsed_result.get("summary", "")
-                }
+            cache_key = self._cache_key(file_type, content, total_score, scoring_criteria, file_hash)
+            # 触发否决项提前停止的结果（未生成的字段是补齐的默认值）单独缓存：
+            # 否决判定对同一缓存键是确定的，但只有同样会在否决时停止生成的评分才能直接使用
+            veto_cache_key = f"{cache_key}|veto"
+            stops_on_veto = self.async_api_client.streaming and STREAM_STOP_ON_VETO
+            parsed_result = None
+            if not force_rescore:
+                parsed_result = self.result_cache.get(cache_key)
+                if parsed_result is None and stops_on_veto:
+                    parsed_result = self.result_cache.get(veto_cache_key)
             
-            # 获取基础分
-            base_score = parsed_result.get("base_score", 0)
+            if parsed_result is None:
+                # 构建提示词
+                prompt = self.build_prompt(file_type, content, total_score, scoring_criteria)
+                
+                # 异步调用 API
+                logger.info(f"开始异步评分 {file_type}，总分: {total_score}分...")
+                api_response = await self.async_api_client.call_api(
+                    prompt, on_partial=on_partial, stop_when=self._generation_complete
+                )
+                
+                parsed_result = self._parse_api_response(api_response)
+                complete = not api_response.get("stopped_early") or all(
+                    field in api_response["fields"] for field in REQUIRED_FIELDS
+                )
+                self.result_cache.set(cache_key if complete else veto_cache_key, parsed_result)
+            else:
+                logger.info(f"命中评分缓存 {file_type}，总分: {total_score}分")
             
-            # 计算加分项（最多为总分的10%）
-            max_bonus = int(total_score * 0.1)
-            bonus_score = 0
-            bonus_details = []
-            if bonus_items:
-                for item in bonus_items:
-                    score = item.get("score", 0)
-                    bonus_score += score
-                    bonus_details.append({
-                        "name": item.get("name", ""),
-                        "score": score
-                    })
+            return self._build_result(parsed_result, total_score, bonus_items)
             
-            # 限制加分不超过总分的10%
-            if bonus_score > max_bonus:
-                bonus_score = max_bonus
+        except Exception as e:
+            logger.error(f"评分失败: {str(e)}")
+            return self._failed_result(e)
+    
+    async def score_files_batch_async(self, file_type: str, contents: List[str], total_score: int = 100,
+                                      scoring_criteria: Optional[List[Dict]] = None,
+                                      bonus_items: Optional[List[Dict]] = None,
+                                      file_hashes: Optional[List[Optional[str]]] = None,
+                                      force_rescore: bool = False) -> List[Dict]:
+        """
+        多文档合并评分（异步）
+        
+        同一文件类型、同一评分标准的多份短文档合并为一次请求，评分标准只发送一次；
+        返回的 JSON 数组逐项校验后拆分为与 score_file_async 结构相同的结果，并分别写入缓存。
+        命中缓存的文档不再请求；合并请求失败，或某一项缺失、格式错误时，该项改为单独评分。
+        
+        Args:
+            file_type: 文件类型
+            contents: 各文档内容
+            total_score: 考评表总分
+            scoring_criteria: 考评表评分标准
+            bonus_items: 加分项列表（所有文档相同）
+            file_hashes: 各文档的文件 SHA-256（用于结果缓存）
+            force_rescore: 是否跳过缓存强制重新评分
             
-            # 计算最终分数（不超过总分）
-            final_score = min(base_score + bonus_score, total_score)
+        Returns:
+            与 contents 顺序一致的评分结果列表
+        """
+        file_hashes = file_hashes or [None] * len(contents)
+        results: List[Optional[Dict]] = [None] * len(contents)
+        pending = []
+        
+        for index, content in enumerate(contents):
+            try:
+                empty_result = self._check_input(file_type, content, scoring_criteria)
+                if empty_result:
+                    results[index] = empty_result
+                    continue
+                
+                cache_key = self._cache_key(file_type, content, total_score, scoring_criteria, file_hashes[index])
+                parsed_result = None if force_rescore else self.result_cache.get(cache_key)
+                if parsed_result is None:
+                    pending.append((index, cache_key))
+                else:
+                    results[index] = self._build_result(parsed_result, total_score, bonus_items)
+            except Exception as e:
+                logger.error(f"评分失败: {str(e)}")
+                results[index] = self._failed_result(e)
+        
+        parsed_results: List[Optional[Dict]] = [None] * len(pending)
+        if len(pending) > 1:
+            try:
+                prompt = self.build_batch_prompt(
+                    file_type, [contents[index] for index, _ in pending], total_score, scoring_criteria
+                )
+                logger.info(f"开始合并评分 {file_type}，共 {len(pending)} 份，总分: {total_score}分...")
+                api_response = await self.async_api_client.call_api(
+                    prompt, max_tokens=min(MAX_TOKENS_PER_DOCUMENT * len(pending), MAX_BATCH_TOKENS)
+                )
+                parsed_results = self._split_batch_response(api_response, len(pending))
+            except Exception as e:
+                logger.warning(f"合并评分失败，改为逐份评分: {str(e)}")
+        
+        fallback = []
+        for (index, cache_key), parsed_result in zip(pending, parsed_results):
+            if parsed_result is None:
+                fallback.append(index)
+                continue
+            self.result_cache.set(cache_key, parsed_result)
+            results[index] = self._build_result(parsed_result, total_score, bonus_items)
+        
+        if fallback:
+            if len(pending) > 1:
+                logger.info(f"合并评分中 {len(fallback)} 份未返回有效结果，逐份重新评分")
+            singles = await asyncio.gather(*(
+                self.score_file_async(
+                    file_type, contents[index], total_score, scoring_criteria, bonus_items,
+                    file_hash=file_hashes[index], force_rescore=True
+                )
+                for index in fallback
+            ))
+            for index, result in zip(fallback, singles):
+                results[index] = result
+        
+        return results
+    
+    def _split_batch_response(self, api_response: Dict, count: int) -> List[Optional[Dict]]:
+        """
+        将多文档评分响应拆分为各文档的评分结果
+        
+        每一项单独校验，缺失、重复或格式错误的项返回 None。
+        
+        Args:
+            api_response: call_api 的返回值
+            count: 文档数量
             
-            # 确定等级（根据总分比例）
-            grade = self.determine_grade(final_score, total_score)
+        Returns:
+            按文档序号排列的评分结果（与 _parse_api_response 的返回值结构相同）
+        """
+        if not api_response.get("success"):
+            raise Exception(f"API 调用失败: {api_response.get('error', '未知错误')}")
+        
+        parsed = self.api_client.parse_response(api_response.get("content", ""))
+        if isinstance(parsed, dict):
+            # 部分情况下模型会把数组包在对象里
+            parsed = next((value for value in parsed.values() if isinstance(value, list)), None)
+        if not isinstance(parsed, list):
+            raise Exception("合并评分响应不是 JSON 数组")
+        
+        results: List[Optional[Dict]] = [None] * count
+        for position, entry in enumerate(parsed):
+            if not isinstance(entry, dict):
+                continue
+            entry = dict(entry)
+            document = entry.pop("document", None)
+            if isinstance(document, int) and not isinstance(document, bool):
+                index = document - 1
+            elif document is None and len(parsed) == count:
+                # 没有序号时，只有数量一致才按顺序对应
+                index = position
+            else:
+                continue
+            if not 0 <= index < count or results[index] is not None:
+                continue
+            try:
+                self.api_client.validate_response(entry)
+            except Exception as e:
+                logger.warning(f"合并评分第 {index + 1} 份结果无效: {str(e)}")
+                continue
+            results[index] = entry
+        return results
+    
+    def _cache_key(self, file_type: str, content: str, total_score: int,
+                   scoring_criteria: Optional[List[Dict]], file_hash: Optional[str]) -> str:
+        """
+        构建评分结果缓存键
+        
+        模板/评分标准指纹覆盖所有影响提示词的输入：提示词版本、总分、
+        自定义评分标准或内置模板。
+        """
+        criteria_fingerprint = fingerprint({
+            "prompt_version": self.PROMPT_VERSION,
+            "total_score": total_score,
+            "criteria": scoring_criteria or self.TEMPLATES.get(file_type)
+        })
+        return self.result_cache.make_key(
+            file_hash or content_hash(content),
+            file_type,
+            criteria_fingerprint,
+            self.api_client.model,
+            self.api_client.temperature
+        )
+    
+    def _check_input(self, file_type: str, content: str,
+                     scoring_criteria: Optional[List[Dict]] = None) -> Optional[Dict]:
+        """
+        校验评分输入
+        
+        Returns:
+            内容为空时返回否决结果，否则返回 None
             
+        Raises:
+            ValueError: 不支持的文件类型
+        """
+        # 验证文件类型（如果没有自定义标准，则需要验证）
+        if not scoring_criteria and file_type not in self.TEMPLATES:
+            raise ValueError(f"不支持的文件类型: {file_type}")
+        
+        # 验证内容
+        if not content or content.strip() == "":
             return {
-                "success": True,
-                "veto_triggered": False,
-                "base_score": base_score,
-                "bonus_score": bonus_score,
-                "bonus_details": bonus_details,
-                "final_score": final_score,
-                "grade": grade,
-                "score_details": parsed_result.get("score_details", []),
-                "summary": parsed_result.get("summary", "")
+                "success": False,
+                "error": "文件内容为空",
+                "veto_triggered": True,
+                "veto_reason": "未提交核心文件（文件内容为空）",
+                "final_score": 0,
+                "grade": "不合格"
             }
+        return None
+    
+    def _parse_api_response(self, api_response: Dict) -> Dict:
+        """
+        解析并校验 API 响应中的评分结果
+        
+        Args:
+            api_response: call_api 的返回值
             
-        except Exception as e:
-            logger.error(f"评分失败: {str(e)}")
+        Returns:
+            大模型给出的评分结果（否决项、得分明细、基础分、总结）
+        """
+        if not api_response.get("success"):
+            raise Exception(f"API 调用失败: {api_response.get('error', '未知错误')}")
+        
+        if api_response.get("stopped_early"):
+            # 流式响应提前停止：直接使用已解析的字段，触发否决项时未生成的字段按不合格补齐
+            parsed_result = {
+                "score_details": [],
+                "base_score": 0,
+                "grade_suggestion": "不合格",
+                "summary": "",
+                **api_response["fields"]
+            }
+            self.api_client.validate_response(parsed_result)
+            return parsed_result
+        
+        # 解析响应
+        response_text = api_response.get("content", "")
+        parsed_result = self.api_client.parse_response(response_text)
+        
+        # 验证响应格式
+        self.api_client.validate_response(parsed_result)
+        return parsed_result
+    
+    @staticmethod
+    def _generation_complete(fields: Dict) -> bool:
+        """流式评分是否可以停止生成：必需字段均已返回，或已判定触发否决项"""
+        veto_check = fields.get("veto_check")
+        if STREAM_STOP_ON_VETO and isinstance(veto_check, dict) and veto_check.get("triggered"):
+            return True
+        return all(field in fields for field in REQUIRED_FIELDS)
+    
+    def _build_result(self, parsed_result: Dict, total_score: int = 100,
+                      bonus_items: Optional[List[Dict]] = None) -> Dict:
+        """
+        根据大模型评分结果计算最终评分结果
+        
+        Args:
+            parsed_result: _parse_api_response 的返回值
+            total_score: 考评表总分
+            bonus_items: 加分项列表
+            
+        Returns:
+            评分结果
+        """
+        # 检查否决项
+        veto_check = parsed_result.get("veto_check", {})
+        if veto_check.get("triggered"):
             return {
-                "success": False,
-                "error": str(e),
+                "success": True,
+                "veto_triggered": True,
+                "veto_reason": veto_check.get("reason", "触发否决项"),
+                "base_score": 0,
                 "final_score": 0,
-                "grade": "评分失败"
+                "grade": "不合格",
+                "score_details": parsed_result.get("score_details", []),
+                "summary": parsed_result.get("summary", "")
             }
+        
+        # 获取基础分
+        base_score = parsed_result.get("base_score", 0)
+        
+        # 计算加分项（最多为总分的10%）
+        max_bonus = int(total_score * 0.1)
+        bonus_score = 0
+        bonus_details = []
+        if bonus_items:
+            for item in bonus_items:
+                score = item.get("score", 0)
+                bonus_score += score
+                bonus_details.append({
+                    "name": item.get("name", ""),
+                    "score": score
+                })
+        
+        # 限制加分不超过总分的10%
+        if bonus_score > max_bonus:
+            bonus_score = max_bonus
+        
+        # 计算最终分数（不超过总分）
+        final_score = min(base_score + bonus_score, total_score)
+        
+        # 确定等级（根据总分比例）
+        grade = self.determine_grade(final_score, total_score)
+        
+        return {
+            "success": True,
+            "veto_triggered": False,
+            "base_score": base_score,
+            "bonus_score": bonus_score,
+            "bonus_details": bonus_details,
+            "final_score": final_score,
+            "grade": grade,
+            "score_details": parsed_result.get("score_details", []),
+            "summary": parsed_result.get("summary", "")
+        }
+    
+    def _failed_result(self, error: Exception) -> Dict:
+        """构建评分失败结果"""
+        return {
+            "success": False,
+            "error": str(error),
+            "final_score": 0,
+            "grade": "评分失败"
+        }
     
     def determine_grade(self, score: float, total_score: int = 100) -> str:
         """
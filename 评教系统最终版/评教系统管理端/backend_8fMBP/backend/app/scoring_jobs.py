@@ -0,0 +1,532 @@
+"""
+批量评分后台任务队列
+批量评分请求写入数据库（scoring_jobs / scoring_job_items）后立即返回，
+由后台 worker 池逐项消费；服务重启后从中断处继续。
+每完成一项通过 WebSocket 推送任务进度（scoring_job_progress，同一任务的未发送进度只保留最新一条）；
+流式评分时推送单项的中间结果（scoring_partial，同一项只保留最新一条）。
+启用多文档合并评分（SCORING_PROMPT_BATCH_SIZE > 1）时，worker 领取短文档后一并领取同组的其他待评分项，
+合并为一次大模型请求评分。
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .batch_scoring import (
+    BatchScoringEngine, DEFAULT_CONCURRENCY,
+    apply_scoring_result, build_scoring_item, load_scoring_targets
+)
+from .database import SessionLocal, db_writer
+from .models import MaterialSubmission, ScoringJob, ScoringJobItem
+from .realtime import ConnectionManager, connection_manager
+from .scoring_engine import ScoringEngine
+
+logger = logging.getLogger(__name__)
+
+# 后台评分 worker 数量（同时进行中的评分数量）
+JOB_WORKERS = int(os.getenv("SCORING_JOB_WORKERS", str(DEFAULT_CONCURRENCY)))
+# 单项最多尝试次数（服务在评分过程中重启会累计一次）
+MAX_ATTEMPTS = 3
+# 无待处理项时的轮询间隔（秒）
+POLL_INTERVAL = 2.0
+# 数据库操作失败（如 SQLite database is locked）时的重试次数与退避基数（秒）
+DB_RETRY_ATTEMPTS = int(os.getenv("SCORING_JOB_DB_RETRIES", "5"))
+DB_RETRY_DELAY = 0.5
+# 退避上限（秒）
+DB_RETRY_MAX_DELAY = 30.0
+# 合并评分时查找同组待评分项的范围（按入队顺序最多检查的 pending 明细数）
+GROUP_SCAN_LIMIT = 50
+
+
+class ScoringJobManager:
+    """
+    批量评分任务管理器
+
+    - enqueue: 创建任务及明细，状态均为 pending
+    - worker: 按入队顺序领取 pending 明细，评分后写回结果并更新任务进度；
+      启用合并评分时，短文档连同同组（文件类型、总分、评分标准相同）的其他 pending 明细合并评分
+    - start: 启动时将中断的 scoring 明细重置为 pending，实现断点续评
+
+    所有数据库操作都在全局单写线程 db_writer 中完成，领取明细天然串行，不会重复领取。
+    数据库操作失败时退避重试；worker 意外退出时自动重启，保证队列持续消费。
+    """
+
+    def __init__(self, scoring_engine: ScoringEngine, session_factory=SessionLocal,
+                 workers: Optional[int] = None, poll_interval: float = POLL_INTERVAL,
+                 events: Optional[ConnectionManager] = None, prompt_batch_size: Optional[int] = None):
+        """
+        初始化任务管理器
+
+        Args:
+            scoring_engine: 评分引擎
+            session_factory: 数据库会话工厂
+            workers: worker 数量，默认读取 SCORING_JOB_WORKERS
+            poll_interval: 空闲轮询间隔（秒）
+            events: 实时事件推送，默认使用全局连接管理器
+            prompt_batch_size: 每次请求最多合并的文档数，默认读取 SCORING_PROMPT_BATCH_SIZE
+        """
+        self.batch_engine = BatchScoringEngine(scoring_engine, prompt_batch_size=prompt_batch_size)
+        self.session_factory = session_factory
+        self.workers = max(1, workers or JOB_WORKERS)
+        self.poll_interval = poll_interval
+        self.events = events or connection_manager
+
+        self._worker_tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._worker_tasks)
+
+    async def start(self):
+        """恢复中断的任务并启动 worker 池"""
+        if self.running:
+            return
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        recovered = await self._run_db(self._recover)
+        if recovered:
+            logger.info(f"[评分队列] 恢复中断的评分项 {recovered} 个")
+
+        self._worker_tasks = [self._spawn_worker(i) for i in range(self.workers)]
+        logger.info(f"[评分队列] 已启动 {self.workers} 个 worker")
+
+    async def stop(self):
+        """停止 worker 池，正在评分的明细重置为 pending，下次启动继续"""
+        if not self.running:
+            return
+
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+        await self._run_db(self._recover)
+        logger.info("[评分队列] 已停止")
+
+    async def enqueue(self, submission_ids: List[str], created_by: Optional[int] = None) -> Dict:
+        """
+        创建批量评分任务
+
+        Args:
+            submission_ids: 提交记录 ID 或考评任务 ID 列表
+            created_by: 创建人
+
+        Returns:
+            任务概要
+        """
+        if self.running:
+            job = await self._run_db(self._create_job, submission_ids, created_by)
+            self._wakeup.set()
+        else:
+            job = self._create_job(submission_ids, created_by)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        查询任务进度及逐项状态
+
+        Returns:
+            任务详情，不存在时返回 None
+        """
+        db = self.session_factory()
+        try:
+            job = db.query(ScoringJob).filter(ScoringJob.job_id == job_id).first()
+            if not job:
+                return None
+
+            items = db.query(ScoringJobItem).filter(
+                ScoringJobItem.job_id == job_id
+            ).order_by(ScoringJobItem.position).all()
+
+            return {
+                **self._job_summary(job),
+                "results": [
+                    {
+                        "submission_id": item.submission_id,
+                        "status": item.status,
+                        "success": item.status == "scored",
+                        "error": item.error,
+                        "scoring_result": item.scoring_result
+                    }
+                    for item in items
+                ]
+            }
+        finally:
+            db.close()
+
+    # ==================== worker ====================
+
+    def _spawn_worker(self, index: int) -> asyncio.Task:
+        task = asyncio.create_task(self._worker(index))
+        task.add_done_callback(lambda t: self._on_worker_done(index, t))
+        return task
+
+    def _on_worker_done(self, index: int, task: asyncio.Task):
+        """worker 意外退出时记录日志并重启（停止时的取消不重启）"""
+        if self._stopping or task.cancelled():
+            return
+        error = task.exception()
+        logger.error(f"[评分队列] worker {index} 意外退出，正在重启: {error!r}")
+        if task in self._worker_tasks:
+            self._worker_tasks[self._worker_tasks.index(task)] = self._spawn_worker(index)
+
+    async def _worker(self, index: int):
+        """worker 主循环：领取 -> 评分 -> 写回"""
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self._run_db(self._claim_next)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[评分队列] worker {index} 领取评分项失败，稍后重试: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # 合并评分时同组领取的明细追加到 batch，评分异常时一并记为失败
+            batch = [claimed]
+            try:
+                outcomes = await self._score_claimed(claimed, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[评分队列] worker {index} 评分异常: {str(e)}")
+                outcomes = [{"error": f"异常: {str(e)}"}] * len(batch)
+
+            for entry, outcome in zip(batch, outcomes):
+                await self._finish(entry, outcome)
+
+    async def _finish(self, claimed: Dict, outcome: Dict):
+        """写回单个明细的评分结果并推送任务进度"""
+        progress = await self._run_db_retry(self._finish_item, claimed["item_id"], outcome)
+        if progress is None:
+            # 多次写回失败：明细重置为 pending 重新评分（领取时已累计尝试次数，超过上限后记为失败），
+            # 重置也失败时持续退避重试，避免明细停留在 scoring 导致任务无法完成
+            logger.error(f"[评分队列] 评分结果写回失败，重新排队: {claimed['submission_id']}")
+            while await self._run_db_retry(self._release_item, claimed["item_id"]) is None:
+                pass
+            return
+        self.events.publish("scoring_job_progress", progress, key=progress["job_id"])
+
+    async def _score_claimed(self, claimed: Dict, batch: List[Dict]) -> List[Dict]:
+        """
+        评分已领取的明细，返回与 batch 顺序一致的评分结果或 {"error": ...}
+
+        启用合并评分且文档较短时，再领取同组的其他 pending 明细追加到 batch，合并为一次请求评分；
+        同组明细解析后不够短的单独评分。
+        """
+        if claimed["attempts"] > MAX_ATTEMPTS:
+            return [{"error": f"评分多次中断（{MAX_ATTEMPTS} 次），已放弃"}]
+
+        item = await self._run_db(self._load_item, claimed["submission_id"])
+        if item["error"]:
+            return [{"error": item["error"]}]
+
+        engine = self.batch_engine
+        on_partial = self._partial_publisher(claimed)
+        if engine.prompt_batch_size <= 1:
+            return [await engine.score_item(item, on_partial=on_partial)]
+
+        parsed = await engine.parse_item(item)
+        if "error" in parsed:
+            return [parsed]
+        if not engine.batchable(parsed):
+            return [await engine.score_parsed(item, parsed, on_partial=on_partial)]
+
+        extras = await self._run_db(self._claim_group, item, engine.prompt_batch_size - 1)
+        batch.extend(extra for extra, _ in extras)
+        if not extras:
+            return [await engine.score_parsed(item, parsed, on_partial=on_partial)]
+
+        extra_items = [extra_item for _, extra_item in extras]
+        extra_parsed = await asyncio.gather(*(engine.parse_item(extra_item) for extra_item in extra_items))
+
+        outcomes: List[Optional[Dict]] = [None] * len(batch)
+        group = [(0, item, parsed)]
+        singles = []
+        for position, (extra_item, result) in enumerate(zip(extra_items, extra_parsed), 1):
+            if "error" in result:
+                outcomes[position] = result
+            elif engine.batchable(result):
+                group.append((position, extra_item, result))
+            else:
+                singles.append((position, extra_item, result))
+
+        async def score_group():
+            if len(group) == 1:
+                return [await engine.score_parsed(item, parsed, on_partial=on_partial)]
+            return await engine.score_group([(entry_item, entry_parsed) for _, entry_item, entry_parsed in group])
+
+        group_outcomes, *single_outcomes = await asyncio.gather(
+            score_group(),
+            *(engine.score_parsed(single_item, single_parsed) for _, single_item, single_parsed in singles)
+        )
+        for (position, _, _), outcome in zip(group, group_outcomes):
+            outcomes[position] = outcome
+        for (position, _, _), outcome in zip(singles, single_outcomes):
+            outcomes[position] = outcome
+        return outcomes
+
+    def _partial_publisher(self, claimed: Dict) -> Callable[[Dict], None]:
+        """流式评分中间结果的推送回调"""
+        def on_partial(fields: Dict):
+            self.events.publish("scoring_partial", {
+                "job_id": claimed["job_id"],
+                "submission_id": claimed["submission_id"],
+                "fields": fields
+            }, key=f"{claimed['job_id']}:{claimed['submission_id']}")
+
+        return on_partial
+
+    async def _run_db(self, func, *args):
+        """在全局单写线程中运行同步函数"""
+        return await db_writer.run_async(func, *args)
+
+    async def _run_db_retry(self, func, *args):
+        """
+        运行数据库操作，失败时指数退避重试
+
+        Returns:
+            操作结果，重试 DB_RETRY_ATTEMPTS 次仍失败时返回 None
+        """
+        for attempt in range(DB_RETRY_ATTEMPTS):
+            try:
+                return await self._run_db(func, *args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[评分队列] 数据库操作 {func.__name__} 失败（第 {attempt + 1} 次）: {str(e)}")
+                if attempt + 1 < DB_RETRY_ATTEMPTS:
+                    await asyncio.sleep(min(DB_RETRY_DELAY * (2 ** attempt), DB_RETRY_MAX_DELAY))
+        return None
+
+    # ==================== 数据库操作（仅在 db_writer 中调用） ====================
+
+    def _create_job(self, submission_ids: List[str], created_by: Optional[int]) -> Dict:
+        db = self.session_factory()
+        try:
+            job = ScoringJob(
+                total=len(submission_ids),
+                created_by=created_by,
+                status="pending" if submission_ids else "completed",
+                finished_at=None if submission_ids else datetime.utcnow()
+            )
+            db.add(job)
+            db.flush()
+
+            db.add_all([
+                ScoringJobItem(job_id=job.job_id, position=position, submission_id=submission_id)
+                for position, submission_id in enumerate(submission_ids)
+            ])
+
+            if submission_ids:
+                db.query(MaterialSubmission).filter(
+                    MaterialSubmission.submission_id.in_(submission_ids)
+                ).update({MaterialSubmission.scoring_status: "pending"}, synchronize_session=False)
+
+            db.commit()
+            logger.info(f"[评分队列] 创建任务 {job.job_id}，共 {job.total} 项")
+            return self._job_summary(job)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _recover(self) -> int:
+        """将中断的 scoring 明细重置为 pending"""
+        db = self.session_factory()
+        try:
+            interrupted = db.query(ScoringJobItem).filter(ScoringJobItem.status == "scoring").all()
+            if not interrupted:
+                return 0
+
+            for item in interrupted:
+                item.status = "pending"
+
+            db.query(MaterialSubmission).filter(
+                MaterialSubmission.submission_id.in_([item.submission_id for item in interrupted]),
+                MaterialSubmission.scoring_status == "scoring"
+            ).update({MaterialSubmission.scoring_status: "pending"}, synchronize_session=False)
+
+            db.commit()
+            return len(interrupted)
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[Dict]:
+        """按入队顺序领取下一个 pending 明细"""
+        db = self.session_factory()
+        try:
+            item = db.query(ScoringJobItem).filter(
+                ScoringJobItem.status == "pending"
+            ).order_by(ScoringJobItem.id).first()
+            if not item:
+                return None
+
+            claimed = self._mark_claimed(db, item)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _claim_group(self, item: Dict, limit: int) -> List[Tuple[Dict, Dict]]:
+        """
+        按入队顺序领取与 item 同组（文件类型、总分、评分标准相同）的其他 pending 明细，用于合并评分
+
+        Returns:
+            [(领取信息, 待评分项)]，最多 limit 个
+        """
+        db = self.session_factory()
+        try:
+            candidates = db.query(ScoringJobItem).filter(
+                ScoringJobItem.status == "pending"
+            ).order_by(ScoringJobItem.id).limit(GROUP_SCAN_LIMIT).all()
+            targets, templates = load_scoring_targets(db, [c.submission_id for c in candidates])
+            group_key = self.batch_engine.group_key(item)
+
+            claimed = []
+            for candidate in candidates:
+                if len(claimed) >= limit:
+                    break
+                # 即将达到尝试上限的明细留给单独领取，由 _score_claimed 判定是否放弃
+                if (candidate.attempts or 0) >= MAX_ATTEMPTS:
+                    continue
+                scoring_item = build_scoring_item(
+                    candidate.submission_id, targets.get(candidate.submission_id), templates
+                )
+                if scoring_item["error"] or self.batch_engine.group_key(scoring_item) != group_key:
+                    continue
+                claimed.append((self._mark_claimed(db, candidate), scoring_item))
+
+            if claimed:
+                db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_claimed(db: Session, item: ScoringJobItem) -> Dict:
+        """将明细标记为 scoring 并累计尝试次数（不提交事务），返回领取信息"""
+        item.status = "scoring"
+        item.attempts = (item.attempts or 0) + 1
+
+        job = db.query(ScoringJob).filter(ScoringJob.job_id == item.job_id).first()
+        if job and job.status == "pending":
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+
+        db.query(MaterialSubmission).filter(
+            MaterialSubmission.submission_id == item.submission_id
+        ).update({MaterialSubmission.scoring_status: "scoring"}, synchronize_session=False)
+
+        return {
+            "item_id": item.id,
+            "job_id": item.job_id,
+            "submission_id": item.submission_id,
+            "attempts": item.attempts
+        }
+
+    def _release_item(self, item_id: int) -> bool:
+        """将写回失败的 scoring 明细重置为 pending"""
+        db = self.session_factory()
+        try:
+            item = db.query(ScoringJobItem).filter(ScoringJobItem.id == item_id).first()
+            if item is None or item.status != "scoring":
+                return True
+
+            item.status = "pending"
+            db.query(MaterialSubmission).filter(
+                MaterialSubmission.submission_id == item.submission_id,
+                MaterialSubmission.scoring_status == "scoring"
+            ).update({MaterialSubmission.scoring_status: "pending"}, synchronize_session=False)
+
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    def _load_item(self, submission_id: str) -> Dict:
+        db = self.session_factory()
+        try:
+            targets, templates = load_scoring_targets(db, [submission_id])
+            return build_scoring_item(submission_id, targets.get(submission_id), templates)
+        finally:
+            db.close()
+
+    def _finish_item(self, item_id: int, outcome: Dict) -> Dict:
+        """写回评分结果并更新任务进度，返回任务概要"""
+        db = self.session_factory()
+        try:
+            item = db.query(ScoringJobItem).filter(ScoringJobItem.id == item_id).first()
+            job = db.query(ScoringJob).filter(ScoringJob.job_id == item.job_id).first()
+            error = outcome.get("error")
+
+            if not error:
+                try:
+                    targets, _ = load_scoring_targets(db, [item.submission_id])
+                    target = targets[item.submission_id]
+                    item.scoring_result = apply_scoring_result(target, outcome)
+                    if isinstance(target, MaterialSubmission):
+                        target.scoring_status = "scored"
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"[评分队列] 保存结果失败: {item.submission_id}, {str(e)}")
+                    error = f"异常: {str(e)}"
+                    item = db.query(ScoringJobItem).filter(ScoringJobItem.id == item_id).first()
+                    job = db.query(ScoringJob).filter(ScoringJob.job_id == item.job_id).first()
+
+            if error:
+                item.status = "failed"
+                item.error = error
+                job.failed_count = (job.failed_count or 0) + 1
+                db.query(MaterialSubmission).filter(
+                    MaterialSubmission.submission_id == item.submission_id
+                ).update({MaterialSubmission.scoring_status: "failed"}, synchronize_session=False)
+            else:
+                item.status = "scored"
+                job.success_count = (job.success_count or 0) + 1
+
+            if job.success_count + job.failed_count >= job.total:
+                job.status = "completed"
+                job.finished_at = datetime.utcnow()
+                logger.info(
+                    f"[评分队列] 任务 {job.job_id} 完成，成功: {job.success_count}, 失败: {job.failed_count}"
+                )
+
+            db.commit()
+            return self._job_summary(job)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job_summary(job: ScoringJob) -> Dict:
+        success = job.success_count or 0
+        failed = job.failed_count or 0
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "total": job.total,
+            "success": success,
+            "failed": failed,
+            "pending": job.total - success - failed,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
@@ -0,0 +1,80 @@
+"""
+提交材料的评分记录快照
+/api/scoring/records/{submission_id} 与推送到教师端的评分记录使用同一份快照，
+ETag 由快照内容计算，内容不变时 ETag 不变，教师端可用 If-None-Match 条件请求重新验证缓存。
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import MaterialSubmission, ScoringRecord
+
+
+def serialize_scoring_record(record: ScoringRecord) -> Dict:
+    """序列化单条评分记录（score_details 保持数据库中的原始格式，由教师端解析）"""
+    return {
+        "id": record.id,
+        "file_name": record.file_name,
+        "file_type": record.file_type,
+        "final_score": record.final_score,
+        "grade": record.grade,
+        "base_score": record.base_score,
+        "bonus_score": record.bonus_score,
+        "score_details": record.score_details,
+        "is_confirmed": record.is_confirmed,
+        "scoring_type": record.scoring_type,
+        "scored_at": record.scored_at.isoformat() if record.scored_at else None,
+        "veto_triggered": record.veto_triggered,
+        "veto_reason": record.veto_reason
+    }
+
+
+def compute_etag(body: Dict) -> str:
+    """按内容计算 ETag（带引号的强校验值）"""
+    digest = hashlib.sha1(
+        json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def scoring_records_snapshot(db: Session, submission_id: str) -> Optional[Dict]:
+    """
+    生成提交材料的评分记录快照
+
+    Args:
+        db: 数据库会话（会先 flush，快照包含当前事务中尚未提交的修改）
+        submission_id: 提交记录 ID
+
+    Returns:
+        {"submission_id", "teacher_id", "teacher_name", "review_status", "scoring_result",
+         "records", "submitted_at", "reviewed_at", "updated_at", "etag"}，提交记录不存在时返回 None
+    """
+    db.flush()
+    submission = db.query(MaterialSubmission).filter(
+        MaterialSubmission.submission_id == submission_id
+    ).first()
+    if not submission:
+        return None
+
+    records = db.query(ScoringRecord).filter(
+        ScoringRecord.submission_id == submission_id
+    ).order_by(ScoringRecord.id).all()
+
+    timestamps = [submission.reviewed_at] + [r.updated_at or r.scored_at for r in records]
+    timestamps = [t for t in timestamps if t is not None]
+
+    body = {
+        "submission_id": submission.submission_id,
+        "teacher_id": submission.teacher_id,
+        "teacher_name": submission.teacher_name,
+        "review_status": submission.review_status,
+        "scoring_result": submission.scoring_result or {},
+        "records": [serialize_scoring_record(r) for r in records],
+        "submitted_at": submission.submitted_at.isoformat() if submission.submitted_at else None,
+        "reviewed_at": submission.reviewed_at.isoformat() if submission.reviewed_at else None,
+        "updated_at": max(timestamps).isoformat() if timestamps else None
+    }
+    return {**body, "etag": compute_etag(body)}
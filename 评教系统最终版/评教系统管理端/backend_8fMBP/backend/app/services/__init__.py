@@ -5,6 +5,6 @@
 """
 
 from .template_manager import TemplateManager
-from .sync_services import sync_distribution_to_teacher, sync_review_status_to_teacher
+from .sync_services import teacher_sync_client
 
-__all__ = ['TemplateManager', 'sync_distribution_to_teacher', 'sync_review_status_to_teacher']
+__all__ = ['TemplateManager', 'teacher_sync_client']
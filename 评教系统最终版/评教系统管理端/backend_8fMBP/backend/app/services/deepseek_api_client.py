@@ -10,8 +10,8 @@ import logging
 import time
 from typing import Dict, Optional
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from app.deepseek_pool import deepseek_rate_limiter, estimate_tokens, get_session
 
 logger = logging.getLogger(__name__)
 
@@ -75,26 +75,12 @@ class DeepseekAPIClient:
         self.max_retries = max_retries
         self.timeout = timeout
         
-        # 配置 requests 会话
-        self.session = requests.Session()
-        
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=max_retries,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
-            backoff_factor=1
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        
-        # 设置默认请求头
-        self.session.headers.update({
+        # 使用进程内共享的连接池（认证头按请求传入）
+        self.session = get_session()
+        self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
-        })
+        }
         
         logger.info(f"Deepseek API 客户端初始化完成: {self.api_url}")
     
@@ -131,19 +117,28 @@ class DeepseekAPIClient:
         }
         
         logger.info(f"开始调用 Deepseek API, 提示词长度: {len(prompt)}")
+        reserved_tokens = estimate_tokens(prompt, request_data["max_tokens"])
         
         for attempt in range(self.max_retries):
+            settled = False
             try:
+                # 超出速率限制或服务端要求暂停时排队等待
+                deepseek_rate_limiter.acquire_sync(reserved_tokens)
                 start_time = time.time()
                 
                 response = self.session.post(
                     self.api_url,
+                    headers=self.headers,
                     json=request_data,
                     timeout=self.timeout
                 )
                 
                 elapsed_time = time.time() - start_time
                 logger.info(f"API 调用完成, 耗时: {elapsed_time:.2f}秒, 状态码: {response.status_code}")
+                deepseek_rate_limiter.record_response(response.status_code, response.headers, attempt)
+                if response.status_code != 200:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
+                    settled = True
                 
                 # 检查 HTTP 状态码
                 if response.status_code == 401:
@@ -151,7 +146,7 @@ class DeepseekAPIClient:
                 elif response.status_code == 429:
                     logger.warning(f"API 调用频率限制, 尝试 {attempt + 1}/{self.max_retries}")
                     if attempt < self.max_retries - 1:
-                        time.sleep(2 ** attempt)  # 指数退避
+                        # 等待由限流器在下次 acquire 时统一处理（Retry-After 或指数退避）
                         continue
                     else:
                         raise APICallError("API 调用频率限制，已达到最大重试次数")
@@ -170,6 +165,8 @@ class DeepseekAPIClient:
                 
                 # 提取评分结果
                 scoring_result = self._extract_scoring_result(response_data)
+                deepseek_rate_limiter.settle(reserved_tokens, (response_data.get("usage") or {}).get("total_tokens"))
+                settled = True
                 
                 # 验证响应格式
                 self._validate_api_response(scoring_result)
@@ -194,6 +191,11 @@ class DeepseekAPIClient:
                 if attempt == self.max_retries - 1:
                     raise ValidationError(f"API 响应格式错误: {str(e)}")
                 time.sleep(1)  # 短暂等待后重试
+            
+            finally:
+                # 超时、请求异常或响应无法解析时退还本次预扣的 token
+                if not settled:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
         
         # 如果所有重试都失败了
         raise APICallError(f"API 调用失败，已重试 {self.max_retries} 次")
@@ -9,8 +9,8 @@ import logging
 import time
 from typing import Optional, Dict
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from app.deepseek_pool import deepseek_rate_limiter, estimate_tokens, get_session
 
 logger = logging.getLogger(__name__)
 
@@ -69,34 +69,11 @@ class DeepseekAPIClient:
         self.max_retries = max_retries
         self.timeout = timeout
         
-        # 创建会话并配置重试策略
-        self.session = self._create_session()
+        # 使用进程内共享的连接池
+        self.session = get_session()
         
         logger.info(f"Deepseek API 客户端初始化成功: {api_url}, 模型: {model}")
     
-    def _create_session(self) -> requests.Session:
-        """
-        创建带有重试策略的 requests 会话
-        
-        Returns:
-            requests.Session: 配置好的会话对象
-        """
-        session = requests.Session()
-        
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=self.max_retries,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST"]
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        return session
-    
     def call_api(self, prompt: str) -> Dict:
         """
         调用 Deepseek API 进行评分
@@ -129,11 +106,15 @@ class DeepseekAPIClient:
             "max_tokens": 2000
         }
         
+        reserved_tokens = estimate_tokens(prompt, payload["max_tokens"])
         attempt = 0
         last_error = None
         
         while attempt < self.max_retries:
+            settled = False
             try:
+                # 超出速率限制或服务端要求暂停时排队等待
+                deepseek_rate_limiter.acquire_sync(reserved_tokens)
                 logger.debug(f"调用 Deepseek API，尝试 {attempt + 1}/{self.max_retries}")
                 
                 response = self.session.post(
@@ -142,13 +123,21 @@ class DeepseekAPIClient:
                     json=payload,
                     timeout=self.timeout
                 )
+                deepseek_rate_limiter.record_response(response.status_code, response.headers, attempt)
                 
                 # 检查响应状态码
                 if response.status_code != 200:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
+                    settled = True
                     error_msg = f"API 返回错误状态码: {response.status_code}"
                     logger.warning(f"{error_msg}, 响应: {response.text}")
                     
-                    if response.status_code >= 500:
+                    if response.status_code == 429:
+                        # 频率限制，等待由限流器在下次 acquire 时统一处理
+                        attempt += 1
+                        if attempt < self.max_retries:
+                            continue
+                    elif response.status_code >= 500:
                         # 服务器错误，可以重试
                         attempt += 1
                         if attempt < self.max_retries:
@@ -160,7 +149,10 @@ class DeepseekAPIClient:
                     raise APICallError(error_msg)
                 
                 # 解析响应
-                result = self._parse_response(response.json())
+                response_data = response.json()
+                result = self._parse_response(response_data)
+                deepseek_rate_limiter.settle(reserved_tokens, (response_data.get("usage") or {}).get("total_tokens"))
+                settled = True
                 
                 logger.info(f"API 调用成功，返回结果长度: {len(str(result))}")
                 return result
@@ -193,6 +185,11 @@ class DeepseekAPIClient:
                 # 响应格式错误，不重试
                 logger.error(f"API 响应格式错误: {str(e)}")
                 raise
+            
+            finally:
+                # 超时、请求异常或响应无法解析时退还本次预扣的 token
+                if not settled:
+                    deepseek_rate_limiter.settle(reserved_tokens, 0)
         
         # 如果所有重试都失败
         if last_error:
@@ -302,10 +299,8 @@ class DeepseekAPIClient:
         return True
     
     def close(self):
-        """关闭会话"""
-        if self.session:
-            self.session.close()
-            logger.info("Deepseek API 客户端会话已关闭")
+        """关闭客户端（会话为进程内共享的连接池，由应用停止时统一关闭，这里不关闭）"""
+        logger.info("Deepseek API 客户端已关闭")
     
     def __enter__(self):
         """上下文管理器入口"""
@@ -5,7 +5,9 @@
 """
 
 import logging
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -18,9 +20,14 @@ from app.models import (
 from app.services.deepseek_api_client import DeepseekAPIClient, create_deepseek_client
 from app.services.template_manager import TemplateManager
 from app.utils.file_parser import FileParser
+from app.scoring_cache import ScoringResultCache, fingerprint, content_hash
+from app.parse_executor import parse_executor
 
 logger = logging.getLogger(__name__)
 
+# 批量评分默认并发数（同时进行中的评分数量）
+BATCH_SCORING_CONCURRENCY = int(os.getenv("SCORING_BATCH_CONCURRENCY", "5"))
+
 
 class ScoringEngineError(Exception):
     """评分引擎异常基类"""
@@ -56,14 +63,17 @@ class ScoringEngine:
     7. 结果存储
     """
     
-    def __init__(self, api_client: Optional[DeepseekAPIClient] = None):
+    def __init__(self, api_client: Optional[DeepseekAPIClient] = None,
+                 result_cache: Optional[ScoringResultCache] = None):
         """
         初始化评分引擎
         
         Args:
             api_client: Deepseek API 客户端，如果不提供则使用默认配置
+            result_cache: 评分结果缓存，不提供时使用引擎自己的缓存
         """
         self.api_client = api_client or create_deepseek_client()
+        self.result_cache = result_cache if result_cache is not None else ScoringResultCache()
         # 注意：TemplateManager需要数据库会话，在实际使用时会通过get_db()获取
         self.template_manager = None  # 延迟初始化
         self.file_parser = FileParser()
@@ -78,13 +88,15 @@ class ScoringEngine:
         
         logger.info("评分引擎初始化完成")
     
-    def score_file(self, submission_id: int, bonus_items: Optional[List[Dict]] = None) -> Dict:
+    def score_file(self, submission_id: int, bonus_items: Optional[List[Dict]] = None,
+                   force_rescore: bool = False) -> Dict:
         """
         对单个文件进行评分
         
         Args:
             submission_id: 材料提交ID
             bonus_items: 加分项列表
+            force_rescore: 是否跳过评分缓存强制重新评分
         
         Returns:
             dict: 评分结果
@@ -119,7 +131,7 @@ class ScoringEngine:
             # 如果有加密路径，使用加密路径，否则使用file_url
             file_path = submission.encrypted_path or file_url
             
-            file_content = self._parse_file_content(file_path)
+            file_content = self._parse_file_content(file_path, submission.file_hash)
             
             # 3. 确定文件类型
             file_type = self._determine_file_type(file_name, file_content)
@@ -127,8 +139,20 @@ class ScoringEngine:
             # 4. 获取提示词模板并构建提示词
             prompt = self._build_scoring_prompt(file_type, file_content, file_name)
             
-            # 5. 调用 API 进行评分
-            api_result = self.api_client.call_api(prompt)
+            # 5. 调用 API 进行评分（相同文件、相同提示词模板的结果从缓存读取）
+            cache_key = self.result_cache.make_key(
+                submission.file_hash or content_hash(file_content),
+                file_type,
+                fingerprint(prompt),
+                getattr(self.api_client, 'model', ''),
+                getattr(self.api_client, 'temperature', '')
+            )
+            api_result = None if force_rescore else self.result_cache.get(cache_key)
+            if api_result is None:
+                api_result = self.api_client.call_api(prompt)
+                self.result_cache.set(cache_key, api_result)
+            else:
+                logger.info(f"命中评分缓存: {submission.submission_id}")
             
             # 6. 解析 API 结果
             parsed_result = self._parse_api_result(api_result)
@@ -165,26 +189,40 @@ class ScoringEngine:
         finally:
             db.close()
     
-    def batch_score(self, submission_ids: List[int], bonus_items: Optional[List[Dict]] = None) -> List[Dict]:
+    def batch_score(self, submission_ids: List[int], bonus_items: Optional[List[Dict]] = None,
+                    max_workers: Optional[int] = None) -> List[Dict]:
         """
         批量评分
         
+        各文件的评分在线程池中并发执行（评分耗时主要在等待 API 响应），
+        返回结果与 submission_ids 顺序一致。
+        
         Args:
             submission_ids: 提交ID列表
             bonus_items: 加分项列表
+            max_workers: 最大并发数，默认读取 SCORING_BATCH_CONCURRENCY
         
         Returns:
             list: 评分结果列表
         """
-        results = []
-        failed_count = 0
+        max_workers = max(1, max_workers or BATCH_SCORING_CONCURRENCY)
         
-        logger.info(f"开始批量评分，共 {len(submission_ids)} 个文件")
+        logger.info(f"开始批量评分，共 {len(submission_ids)} 个文件，并发数: {max_workers}")
         
-        for submission_id in submission_ids:
+        if not submission_ids:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(submission_ids))) as executor:
+            futures = [
+                executor.submit(self.score_file, submission_id, bonus_items)
+                for submission_id in submission_ids
+            ]
+        
+        results = []
+        failed_count = 0
+        for submission_id, future in zip(submission_ids, futures):
             try:
-                result = self.score_file(submission_id, bonus_items)
-                results.append(result)
+                results.append(future.result())
             except Exception as e:
                 logger.error(f"批量评分中文件 {submission_id} 失败: {str(e)}")
                 failed_count += 1
@@ -198,18 +236,19 @@ class ScoringEngine:
         
         return results
     
-    def _parse_file_content(self, file_path: str) -> str:
+    def _parse_file_content(self, file_path: str, file_hash: Optional[str] = None) -> str:
         """
-        解析文件内容
+        解析文件内容（在解析进程池中执行，同一文件的解析结果从磁盘缓存复用）
         
         Args:
             file_path: 文件路径
+            file_hash: 文件 SHA-256（可选）
         
         Returns:
             str: 文件内容
         """
         try:
-            return self.file_parser.parse_file(file_path)
+            return parse_executor.parse_sync(file_path, file_hash=file_hash, parser_name="utils")
         except Exception as e:
             raise ScoringFailedError(f"文件解析失败: {str(e)}")
     
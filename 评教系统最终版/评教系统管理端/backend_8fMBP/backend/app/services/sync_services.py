@@ -1,79 +1,210 @@
 """
 跨系统通信服务
+
+所有请求共用一个长连接池的 httpx.AsyncClient（HTTP keep-alive），不再每次请求新建连接；
+分发给多位教师时使用教师端的批量接口，按批次有限并发发送。
+教师端尚未提供批量接口（404/405）时，自动退回逐条同步（同样有限并发）。
+
+业务接口不直接调用教师端，而是写入发件箱（app/sync_outbox.py），由后台分发器调用客户端发送，
+这里只提供客户端和各类同步消息体的构建函数。
 """
-import httpx
-from typing import List, Dict
+import asyncio
 import os
+from typing import Awaitable, Dict, List, Optional
+
+import httpx
 
 # 教师端API地址
 TEACHER_API_BASE = os.getenv("TEACHER_API_URL", "http://localhost:8000")
 
+# 同时进行的同步请求数（也是连接池大小）
+TEACHER_SYNC_CONCURRENCY = int(os.getenv("TEACHER_SYNC_CONCURRENCY", "10"))
+# 批量接口每个请求携带的条数
+TEACHER_SYNC_BATCH_SIZE = int(os.getenv("TEACHER_SYNC_BATCH_SIZE", "200"))
+TEACHER_SYNC_TIMEOUT = float(os.getenv("TEACHER_SYNC_TIMEOUT", "30"))
+
 
-async def sync_distribution_to_teacher(
-    material_id: str,
-    material_name: str,
-    material_type: str,
-    file_url: str,
-    teacher_ids: List[str],
-    distributed_at: str
-):
+class TeacherSyncClient:
     """
-    将分发信息同步到教师端
+    教师端同步客户端
+
+    复用同一个连接池，请求失败只记录日志，不影响管理端自身的业务流程。
     """
-    print(f"开始同步分发信息到教师端: {teacher_ids}")
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        for teacher_id in teacher_ids:
-            try:
-                print(f"正在同步到教师 {teacher_id}...")
-                response = await client.post(
-                    f"{TEACHER_API_BASE}/api/admin/sync-distribution",
-                    json={
-                        "material_id": material_id,
-                        "teacher_id": teacher_id,
-                        "material_name": material_name,
-                        "material_type": material_type,
-                        "file_url": file_url,
-                        "distributed_at": distributed_at
-                    },
-                    timeout=30.0
+
+    def __init__(self, base_url: str = TEACHER_API_BASE, concurrency: int = TEACHER_SYNC_CONCURRENCY,
+                 batch_size: int = TEACHER_SYNC_BATCH_SIZE, timeout: float = TEACHER_SYNC_TIMEOUT):
+        """
+        初始化同步客户端
+
+        Args:
+            base_url: 教师端API地址
+            concurrency: 最大并发请求数
+            batch_size: 批量接口每批条数
+            timeout: 请求超时（秒）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取（必要时创建）复用的 httpx 异步客户端，连接池绑定在当前事件循环上"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
                 )
-                print(f"同步响应状态码: {response.status_code}")
-                if response.status_code not in [200, 201]:
-                    print(f"同步到教师 {teacher_id} 失败: {response.text}")
-                else:
-                    print(f"同步到教师 {teacher_id} 成功！")
-            except Exception as e:
-                print(f"同步到教师 {teacher_id} 异常: {str(e)}")
-                import traceback
-                traceback.print_exc()
-
-
-async def sync_review_status_to_teacher(
-    submission_id: str,
-    status: str,
-    feedback: str,
-    reviewed_at: str
-):
-    """
-    将审核状态同步到教师端
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.put(
-                f"{TEACHER_API_BASE}/api/admin/sync-review",
-                json={
-                    "submission_id": submission_id,
-                    "status": status,
-                    "feedback": feedback,
-                    "reviewed_at": reviewed_at
-                },
-                timeout=10.0
             )
-            if response.status_code not in [200, 201]:
-                print(f"同步审核状态失败: {response.text}")
-            else:
-                print(f"同步审核状态成功")
-        except Exception as e:
-            print(f"同步审核状态异常: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        return self._client
+
+    async def aclose(self):
+        """关闭底层 HTTP 连接"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def request(self, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """
+        发送请求
+
+        Returns:
+            响应；连接失败、超时时返回 None
+        """
+        try:
+            return await self._get_client().request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            print(f"请求教师端 {method} {path} 异常: {str(e)}")
+            return None
+
+    async def gather_bounded(self, coroutines: List[Awaitable]) -> List:
+        """并发执行，最多 concurrency 个同时进行，结果与输入顺序一致"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(run(c) for c in coroutines))
+
+    async def send(self, method: str, path: str, payload: Dict,
+                   headers: Optional[Dict] = None) -> Optional[str]:
+        """
+        发送单条同步请求
+
+        Returns:
+            None 表示成功，否则为失败原因
+        """
+        response = await self.request(method, path, json=payload, headers=headers)
+        if response is None:
+            return "连接教师端失败"
+        if response.status_code not in (200, 201):
+            return f"{response.status_code} {response.text[:200]}"
+        return None
+
+    async def send_each(self, path: str, items: List[Dict], method: str = "POST") -> List[Optional[str]]:
+        """逐条发送（有限并发），返回与 items 顺序一致的失败原因列表（None 表示成功）"""
+        return await self.gather_bounded([self.send(method, path, item) for item in items])
+
+    async def send_bulk(self, bulk_path: str, single_path: str, key: str,
+                        items: List[Dict]) -> List[Optional[str]]:
+        """
+        通过批量接口发送
+
+        按 batch_size 分批，批次之间有限并发；批量接口不存在（404/405）时该批退回逐条接口。
+
+        Args:
+            bulk_path: 批量接口路径，请求体为 {key: [...]}
+            single_path: 逐条接口路径
+            key: 批量请求体中列表的字段名
+            items: 逐条请求体列表
+
+        Returns:
+            与 items 顺序一致的失败原因列表（None 表示成功）
+        """
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+        async def send_batch(batch: List[Dict]) -> List[Optional[str]]:
+            response = await self.request("POST", bulk_path, json={key: batch})
+            if response is not None and response.status_code in (404, 405):
+                return await self.send_each(single_path, batch)
+            if response is None:
+                return ["连接教师端失败"] * len(batch)
+            if response.status_code not in (200, 201):
+                print(f"批量同步失败 {bulk_path}: {response.status_code} {response.text}")
+                return [f"{response.status_code} {response.text[:200]}"] * len(batch)
+            return [None] * len(batch)
+
+        results = await self.gather_bounded([send_batch(batch) for batch in batches])
+        return [error for batch_errors in results for error in batch_errors]
+
+    async def post_bulk(self, bulk_path: str, single_path: str, key: str, items: List[Dict]) -> Dict:
+        """通过批量接口同步，返回 {"success": 成功条数, "failed": 失败条数}"""
+        errors = await self.send_bulk(bulk_path, single_path, key, items)
+        failed = sum(1 for error in errors if error is not None)
+        return {"success": len(items) - failed, "failed": failed}
+
+
+# 全局同步客户端
+teacher_sync_client = TeacherSyncClient()
+
+
+# ==================== 同步消息体 ====================
+
+def distribution_payload(material_id: str, teacher_id: str, material_name: str,
+                         material_type: str, file_url: str, distributed_at: str) -> Dict:
+    """材料分发同步消息体（/api/admin/sync-distribution）"""
+    return {
+        "material_id": material_id,
+        "teacher_id": teacher_id,
+        "material_name": material_name,
+        "material_type": material_type,
+        "file_url": file_url,
+        "distributed_at": distributed_at
+    }
+
+
+def evaluation_task_payload(template, teacher_id: str) -> Dict:
+    """考评任务同步消息体（/api/admin/sync-evaluation-task），template 为 EvaluationTemplate"""
+    return {
+        "task_id": f"{template.template_id}_{teacher_id}",
+        "template_id": template.template_id,
+        "teacher_id": teacher_id,
+        "template_name": template.name,
+        "template_file_url": template.file_url,
+        "template_file_type": template.file_type,
+        "submission_requirements": template.submission_requirements,
+        "scoring_criteria": template.scoring_criteria,
+        "total_score": template.total_score,
+        "deadline": template.deadline.isoformat()
+    }
+
+
+def evaluation_score_payload(task) -> Dict:
+    """评分结果同步消息体（/api/admin/sync-evaluation-score），task 为 EvaluationAssignmentTask"""
+    return {
+        "task_id": task.task_id,
+        "template_id": task.template_id,
+        "teacher_id": task.teacher_id,
+        "scores": task.scores,
+        "total_score": task.total_score,
+        "scoring_feedback": task.scoring_feedback,
+        "scored_at": task.scored_at.isoformat() if task.scored_at else None
+    }
+
+
+def review_payload(submission_id: str, status: str, feedback: str, reviewed_at: str) -> Dict:
+    """审核状态同步消息体（/api/admin/sync-review）"""
+    return {
+        "submission_id": submission_id,
+        "status": status,
+        "feedback": feedback,
+        "reviewed_at": reviewed_at
+    }
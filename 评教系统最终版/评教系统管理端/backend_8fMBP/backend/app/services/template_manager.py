@@ -7,18 +7,30 @@
 - 教研/听课记录
 - 成绩/学情分析
 - 课件
+
+已解析的模板和预先渲染好的评分标准部分缓存在进程内（CompiledTemplateCache），
+构建提示词时只需拼接文件内容；创建、更新、删除模板时递增版本号使缓存失效。
 """
 
+import copy
 import json
 import logging
-from typing import Optional, Dict, List
+import os
+import threading
+import time
+import weakref
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 
 from sqlalchemy.orm import Session
 from app.models import ScoringTemplate
+from app.scoring_cache import fingerprint
 
 logger = logging.getLogger(__name__)
 
+# 已编译模板的最长缓存时间（秒），用于感知其他进程对模板的修改；0 表示不缓存
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", "60"))
+
 
 # 教案评分模板
 LESSON_PLAN_TEMPLATE = {
@@ -413,6 +425,109 @@ DEFAULT_TEMPLATES = {
     "课件": COURSEWARE_TEMPLATE
 }
 
+# 提示词末尾的输出格式要求
+OUTPUT_FORMAT_PROMPT = """
+【输出格式要求】
+请严格按照以下JSON格式输出评分结果：
+{
+    "veto_check": {
+        "triggered": false,
+        "reason": ""
+    },
+    "score_details": [
+        {
+            "indicator": "指标名称",
+            "score": 分数,
+            "max_score": 满分,
+            "reason": "评分理由"
+        }
+    ],
+    "base_score": 总分,
+    "grade_suggestion": "等级",
+    "summary": "总体评价和改进建议"
+}
+"""
+
+
+class CompiledTemplateCache:
+    """
+    进程内的已编译模板缓存
+
+    - 模板：按 (数据库, 文件类型) 缓存解析后的模板及其渲染好的提示词前缀（评分规则、否决项、核心指标、等级标准），
+      命中时不再查询 scoring_templates 表、json.loads 和渲染评分标准
+    - 评分标准：按 (文件类型, 模板指纹) 缓存渲染结果，内容相同的模板共用
+
+    create_template / update_template / delete_template 调用 invalidate() 递增版本号，
+    旧版本读到的模板不会写入缓存；其他进程的修改在 TEMPLATE_CACHE_TTL 秒内生效。
+    """
+
+    def __init__(self, ttl: float = TEMPLATE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        # 数据库引擎 -> {文件类型: (版本号, 缓存时间, (模板, 评分标准文本))}，引擎释放后自动清除
+        self._templates: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._rubrics: Dict[Tuple[str, str], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get_template(self, bind, file_type: str) -> Optional[Tuple[Dict, str]]:
+        """获取缓存的 (模板, 评分标准文本)（未命中、版本过期或超过 TTL 时返回 None）"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._templates.get(bind, {}).get(file_type)
+            if entry and entry[0] == self._version and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def set_template(self, bind, file_type: str, compiled: Tuple[Dict, str], version: int):
+        """缓存 (模板, 评分标准文本)（version 为查询前读取的版本号，期间模板被修改则不缓存）"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._templates.setdefault(bind, {})[file_type] = (version, time.monotonic(), compiled)
+
+    def get_rubric(self, template: Dict, render) -> str:
+        """获取渲染好的评分标准部分，未缓存时调用 render(template) 渲染"""
+        key = (template.get("file_type", ""), fingerprint(template))
+        with self._lock:
+            rubric = self._rubrics.get(key)
+        if rubric is None:
+            rubric = render(template)
+            with self._lock:
+                self._rubrics[key] = rubric
+        return rubric
+
+    def invalidate(self):
+        """模板被修改：递增版本号并清空缓存"""
+        with self._lock:
+            self._version += 1
+            self._templates = weakref.WeakKeyDictionary()
+            self._rubrics.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "templates": sum(len(entries) for entries in self._templates.values()),
+                "rubrics": len(self._rubrics),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 进程内共享的已编译模板缓存
+compiled_template_cache = CompiledTemplateCache()
+
 
 
 class TemplateManager:
@@ -422,14 +537,16 @@ class TemplateManager:
     负责管理5类教学文件的评分标准模板
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: Optional[CompiledTemplateCache] = None):
         """
         初始化模板管理器
         
         Args:
             db: 数据库会话
+            cache: 已编译模板缓存，默认使用进程内共享的缓存
         """
         self.db = db
+        self.cache = cache if cache is not None else compiled_template_cache
     
     def get_template(self, file_type: str) -> Optional[Dict]:
         """
@@ -441,14 +558,28 @@ class TemplateManager:
         Returns:
             dict: 模板内容，如果不存在则返回 None
         """
+        compiled = self._get_compiled_template(file_type)
+        return copy.deepcopy(compiled[0]) if compiled is not None else None
+    
+    def _get_compiled_template(self, file_type: str) -> Optional[Tuple[Dict, str]]:
+        """获取 (模板, 评分标准文本)，优先使用缓存（返回的模板为缓存对象，不可修改）"""
+        bind = self.db.get_bind()
+        compiled = self.cache.get_template(bind, file_type)
+        if compiled is not None:
+            return compiled
+        
         try:
-            template = self.db.query(ScoringTemplate).filter(
+            version = self.cache.version
+            record = self.db.query(ScoringTemplate).filter(
                 ScoringTemplate.file_type == file_type,
                 ScoringTemplate.is_active == True
             ).first()
             
-            if template:
-                return json.loads(template.template_content)
+            if record:
+                template = json.loads(record.template_content)
+                compiled = (template, self.cache.get_rubric(template, self._render_rubric))
+                self.cache.set_template(bind, file_type, compiled, version)
+                return compiled
             
             logger.warning(f"模板不存在: {file_type}")
             return None
@@ -490,6 +621,7 @@ class TemplateManager:
             
             self.db.add(template)
             self.db.commit()
+            self.cache.invalidate()
             
             logger.info(f"模板创建成功: {file_type}, ID: {template.id}")
             return template.id
@@ -526,6 +658,7 @@ class TemplateManager:
             template.updated_at = datetime.utcnow()
             
             self.db.commit()
+            self.cache.invalidate()
             
             logger.info(f"模板更新成功: ID {template_id}")
             return True
@@ -547,13 +680,14 @@ class TemplateManager:
             str: 完整的提示词
         """
         try:
-            template = self.get_template(file_type)
+            compiled = self._get_compiled_template(file_type)
             
-            if not template:
+            if not compiled:
                 raise ValueError(f"模板不存在: {file_type}")
             
-            # 构建提示词
-            prompt = self._build_prompt_from_template(template, content, bonus_rules)
+            # 构建提示词（评分标准部分已预先渲染）
+            template, rubric = compiled
+            prompt = self._assemble_prompt(template, rubric, content)
             
             logger.debug(f"提示词构建成功: {file_type}, 长度: {len(prompt)}")
             return prompt
@@ -619,6 +753,26 @@ class TemplateManager:
         Returns:
             str: 完整的提示词
         """
+        rubric = self.cache.get_rubric(template, self._render_rubric)
+        return self._assemble_prompt(template, rubric, content)
+    
+    @staticmethod
+    def _assemble_prompt(template: Dict, rubric: str, content: str) -> str:
+        """拼接评分标准、待评分内容和输出格式要求"""
+        file_type = template.get("file_type", "")
+        return f"{rubric}\n【待评分{file_type}内容】\n{content}\n{OUTPUT_FORMAT_PROMPT}"
+    
+    @staticmethod
+    def _render_rubric(template: Dict) -> str:
+        """
+        渲染提示词中文件内容之前的评分标准部分（评分规则、否决项、核心指标、等级标准）
+        
+        Args:
+            template: 模板数据
+        
+        Returns:
+            str: 评分标准文本
+        """
         file_type = template.get("file_type", "")
         
         # 构建基础提示词
@@ -666,32 +820,6 @@ class TemplateManager:
                 grade_range = grade_standards[grade_key]
                 prompt += f"- {grade_name}：{grade_range['min']}-{grade_range['max']}分\n"
         
-        # 添加待评分内容
-        prompt += f"\n【待评分{file_type}内容】\n{content}\n"
-        
-        # 添加输出格式要求
-        prompt += """
-【输出格式要求】
-请严格按照以下JSON格式输出评分结果：
-{
-    "veto_check": {
-        "triggered": false,
-        "reason": ""
-    },
-    "score_details": [
-        {
-            "indicator": "指标名称",
-            "score": 分数,
-            "max_score": 满分,
-            "reason": "评分理由"
-        }
-    ],
-    "base_score": 总分,
-    "grade_suggestion": "等级",
-    "summary": "总体评价和改进建议"
-}
-"""
-        
         return prompt
     
     def list_templates(self) -> List[Dict]:
@@ -744,6 +872,7 @@ class TemplateManager:
             template.updated_at = datetime.utcnow()
             
             self.db.commit()
+            self.cache.invalidate()
             
             logger.info(f"模板删除成功: ID {template_id}")
             return True
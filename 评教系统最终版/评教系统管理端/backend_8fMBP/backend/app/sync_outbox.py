@@ -0,0 +1,380 @@
+"""
+跨系统同步发件箱（transactional outbox）
+业务接口把要同步到教师端的消息写入 sync_outbox 表，与业务数据在同一事务中提交后立即返回；
+后台分发器按批领取到期消息发送到教师端，失败按指数退避重试，超过次数标记为 failed。
+
+每条消息带幂等键（如 task:{task_id}），同一幂等键只入队一次；
+教师端的同步接口本身也按业务主键去重，重复投递不会产生重复数据。
+
+接口提交后通过 dispatch_in_background 把本次的消息交给后台任务池立即发送并返回 job_id，
+任务池不可用（队列已满）时由分发器轮询发送。
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .background_workers import BackgroundWorkerPool, QueueFullError
+from .database import SessionLocal, db_writer, insert_ignoring_conflicts
+from .models import SyncOutbox
+from .scoring_records import scoring_records_snapshot
+from .services.sync_services import (
+    TeacherSyncClient, teacher_sync_client,
+    distribution_payload, evaluation_task_payload, evaluation_score_payload, review_payload
+)
+
+logger = logging.getLogger(__name__)
+
+# 每次领取的消息数
+OUTBOX_BATCH_SIZE = int(os.getenv("SYNC_OUTBOX_BATCH_SIZE", "500"))
+# 无到期消息时的轮询间隔（秒）
+OUTBOX_POLL_INTERVAL = float(os.getenv("SYNC_OUTBOX_POLL_INTERVAL", "2"))
+# 单条消息最多发送次数，超过后标记为 failed
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("SYNC_OUTBOX_MAX_ATTEMPTS", "10"))
+# 退避：第 n 次失败后等待 min(BASE * 2^(n-1), MAX) 秒
+OUTBOX_BACKOFF_BASE = float(os.getenv("SYNC_OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("SYNC_OUTBOX_BACKOFF_MAX", "600"))
+# 领取后的租期（秒）：租期内其他领取者跳过该消息，进程在发送中退出时租期过后重新发送
+OUTBOX_CLAIM_LEASE = float(os.getenv("SYNC_OUTBOX_CLAIM_LEASE", "300"))
+
+
+# ==================== 入队（在业务事务中调用，由调用方提交） ====================
+
+def enqueue(db: Session, messages: List[Dict]) -> List[str]:
+    """
+    将消息加入发件箱（幂等键已存在的消息跳过）
+
+    Args:
+        db: 业务使用的数据库会话，消息随业务数据一起提交
+        messages: [{"idempotency_key", "path", "payload", "method"?, "bulk_path"?, "bulk_key"?}]
+
+    Returns:
+        消息的幂等键列表（用于 dispatch_in_background）
+    """
+    now = datetime.utcnow()
+    rows = list({
+        message["idempotency_key"]: {
+            "method": "POST",
+            "bulk_path": None,
+            "bulk_key": None,
+            **message,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for message in messages
+    }.values())
+    insert_ignoring_conflicts(db, SyncOutbox, rows, key="idempotency_key")
+    return [row["idempotency_key"] for row in rows]
+
+
+def enqueue_evaluation_tasks(db: Session, template, teacher_ids: List[str]) -> List[str]:
+    """考评任务分配（可合并到批量接口）"""
+    return enqueue(db, [
+        {
+            "idempotency_key": f"task:{template.template_id}_{teacher_id}",
+            "path": "/api/admin/sync-evaluation-task",
+            "bulk_path": "/api/admin/sync-evaluation-tasks",
+            "bulk_key": "tasks",
+            "payload": evaluation_task_payload(template, teacher_id),
+        }
+        for teacher_id in teacher_ids
+    ])
+
+
+def enqueue_distributions(db: Session, material_id: str, material_name: str, material_type: str,
+                          file_url: str, teacher_ids: List[str], distributed_at: str) -> List[str]:
+    """材料分发（可合并到批量接口）"""
+    return enqueue(db, [
+        {
+            "idempotency_key": f"distribution:{material_id}:{teacher_id}",
+            "path": "/api/admin/sync-distribution",
+            "bulk_path": "/api/admin/sync-distributions",
+            "bulk_key": "distributions",
+            "payload": distribution_payload(
+                material_id, teacher_id, material_name, material_type, file_url, distributed_at
+            ),
+        }
+        for teacher_id in teacher_ids
+    ])
+
+
+def enqueue_evaluation_score(db: Session, task) -> List[str]:
+    """评分结果，每次评分（scored_at 不同）是一条新消息"""
+    payload = evaluation_score_payload(task)
+    return enqueue(db, [{
+        "idempotency_key": f"score:{task.task_id}:{payload['scored_at']}",
+        "path": "/api/admin/sync-evaluation-score",
+        "payload": payload,
+    }])
+
+
+def enqueue_review_status(db: Session, submission_id: str, status: str, feedback: str,
+                          reviewed_at: str) -> List[str]:
+    """审核状态，每次审核（reviewed_at 不同）是一条新消息"""
+    return enqueue(db, [{
+        "idempotency_key": f"review:{submission_id}:{reviewed_at}",
+        "method": "PUT",
+        "path": "/api/admin/sync-review",
+        "payload": review_payload(submission_id, status, feedback, reviewed_at),
+    }])
+
+
+def enqueue_scoring_records(db: Session, submission_id: str) -> List[str]:
+    """提交材料的评分记录快照（教师端缓存），内容不变（ETag 相同）时不重复入队"""
+    snapshot = scoring_records_snapshot(db, submission_id)
+    if snapshot is None:
+        return []
+    return enqueue(db, [{
+        "idempotency_key": f"scoring-records:{submission_id}:{snapshot['etag']}",
+        "path": "/api/admin/sync-scoring-records",
+        "payload": snapshot,
+    }])
+
+
+def backoff_delay(attempts: int) -> float:
+    """第 attempts 次发送失败后的等待秒数"""
+    return min(OUTBOX_BACKOFF_BASE * (2 ** max(0, attempts - 1)), OUTBOX_BACKOFF_MAX)
+
+
+# ==================== 分发器 ====================
+
+class OutboxDispatcher:
+    """
+    发件箱分发器
+
+    - 领取：按 id 顺序取出到期的 pending 消息，每次最多 batch_size 条，
+      并把 next_attempt_at 推迟一个租期，轮询和后台任务同时发送时不会重复领取
+    - 发送：有批量接口的消息按接口合并发送，其余逐条发送（有限并发）
+    - 记录：成功标记 sent；失败累计次数并按指数退避设置下次发送时间，超过次数标记 failed
+
+    数据库操作都在全局单写线程 db_writer 中完成。
+    """
+
+    def __init__(self, session_factory=SessionLocal, client: Optional[TeacherSyncClient] = None,
+                 batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        """
+        初始化分发器
+
+        Args:
+            session_factory: 数据库会话工厂
+            client: 教师端同步客户端，默认使用全局客户端
+            batch_size: 每次领取的消息数
+            poll_interval: 空闲轮询间隔（秒）
+            max_attempts: 单条消息最多发送次数
+        """
+        self.session_factory = session_factory
+        self.client = client or teacher_sync_client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """启动后台分发"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("[同步发件箱] 分发器已启动")
+
+    async def stop(self):
+        """停止后台分发，未发送的消息留在发件箱中，下次启动继续"""
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("[同步发件箱] 分发器已停止")
+
+    def notify(self):
+        """有新消息入队时调用，立即开始发送而不必等待轮询"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                result = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[同步发件箱] 分发异常: {str(e)}")
+                result = {"claimed": 0}
+
+            # 领满一批说明可能还有积压，继续发送
+            if result["claimed"] >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self, keys: Optional[List[str]] = None) -> Dict:
+        """
+        领取并发送一批到期消息
+
+        Args:
+            keys: 只发送这些幂等键的消息（最多 batch_size 个），None 表示任意到期消息
+
+        Returns:
+            {"claimed": 领取数, "sent": 成功数, "retry": 待重试数, "failed": 放弃数}
+        """
+        messages = await db_writer.run_async(self._claim_due, keys)
+        if not messages:
+            return {"claimed": 0, "sent": 0, "retry": 0, "failed": 0}
+
+        errors = await self._send(messages)
+        return await db_writer.run_async(self._record, messages, errors)
+
+    async def dispatch_keys(self, keys: List[str]) -> Dict:
+        """
+        立即发送指定的消息（按 batch_size 分批），已发送或已被其他领取者领取的消息跳过
+
+        Returns:
+            各批结果之和
+        """
+        total = {"claimed": 0, "sent": 0, "retry": 0, "failed": 0}
+        for start in range(0, len(keys), self.batch_size):
+            result = await self.dispatch_once(keys[start:start + self.batch_size])
+            for name in total:
+                total[name] += result[name]
+        return total
+
+    async def _send(self, messages: List[Dict]) -> List[Optional[str]]:
+        """发送消息，返回与 messages 顺序一致的失败原因列表（None 表示成功）"""
+        errors: Dict[int, Optional[str]] = {}
+
+        def group_key(message):
+            return message["bulk_path"] or "", message["bulk_key"] or "", message["path"], message["method"]
+
+        async def send_group(key, group: List[Dict]):
+            bulk_path, bulk_key, path, method = key
+            payloads = [message["payload"] for message in group]
+            if bulk_path:
+                results = await self.client.send_bulk(bulk_path, path, bulk_key, payloads)
+            else:
+                results = await self.client.send_each(path, payloads, method=method)
+            for message, error in zip(group, results):
+                errors[message["id"]] = error
+
+        groups = [
+            (key, list(group))
+            for key, group in groupby(sorted(messages, key=group_key), key=group_key)
+        ]
+        await asyncio.gather(*(send_group(key, group) for key, group in groups))
+        return [errors[message["id"]] for message in messages]
+
+    # ==================== 数据库操作（仅在 db_writer 中调用） ====================
+
+    def _claim_due(self, keys: Optional[List[str]] = None) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            query = db.query(SyncOutbox).filter(
+                SyncOutbox.status == "pending",
+                SyncOutbox.next_attempt_at <= now
+            )
+            if keys is not None:
+                query = query.filter(SyncOutbox.idempotency_key.in_(keys))
+            rows = query.order_by(SyncOutbox.id).limit(self.batch_size).all()
+            if not rows:
+                return []
+
+            db.query(SyncOutbox).filter(SyncOutbox.id.in_([row.id for row in rows])).update(
+                {SyncOutbox.next_attempt_at: now + timedelta(seconds=OUTBOX_CLAIM_LEASE)},
+                synchronize_session=False
+            )
+            db.commit()
+            return [
+                {
+                    "id": row.id,
+                    "method": row.method or "POST",
+                    "path": row.path,
+                    "bulk_path": row.bulk_path,
+                    "bulk_key": row.bulk_key,
+                    "payload": row.payload,
+                    "attempts": row.attempts or 0,
+                }
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+    def _record(self, messages: List[Dict], errors: List[Optional[str]]) -> Dict:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            sent_ids = [m["id"] for m, error in zip(messages, errors) if error is None]
+            if sent_ids:
+                db.query(SyncOutbox).filter(SyncOutbox.id.in_(sent_ids)).update(
+                    {SyncOutbox.status: "sent", SyncOutbox.sent_at: now,
+                     SyncOutbox.attempts: SyncOutbox.attempts + 1, SyncOutbox.last_error: None},
+                    synchronize_session=False
+                )
+
+            retry = failed = 0
+            for message, error in zip(messages, errors):
+                if error is None:
+                    continue
+                attempts = message["attempts"] + 1
+                values = {SyncOutbox.attempts: attempts, SyncOutbox.last_error: error}
+                if attempts >= self.max_attempts:
+                    values[SyncOutbox.status] = "failed"
+                    failed += 1
+                    logger.error(f"[同步发件箱] 消息 {message['id']} 发送 {attempts} 次失败，已放弃: {error}")
+                else:
+                    values[SyncOutbox.next_attempt_at] = now + timedelta(seconds=backoff_delay(attempts))
+                    retry += 1
+                db.query(SyncOutbox).filter(SyncOutbox.id == message["id"]).update(
+                    values, synchronize_session=False
+                )
+
+            db.commit()
+            return {"claimed": len(messages), "sent": len(sent_ids), "retry": retry, "failed": failed}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# 全局分发器
+outbox_dispatcher = OutboxDispatcher()
+
+# 同步后台任务池
+sync_workers = BackgroundWorkerPool("同步任务")
+
+
+def dispatch_in_background(keys: List[str]) -> Optional[str]:
+    """
+    把刚提交的消息交给后台任务池立即发送
+
+    Args:
+        keys: enqueue_* 返回的幂等键
+
+    Returns:
+        job_id（通过 sync_workers.get_job 查询）；任务池不可用时返回 None，消息由分发器轮询发送
+    """
+    if not keys:
+        return None
+    try:
+        return sync_workers.submit(outbox_dispatcher.dispatch_keys, keys, name="sync_outbox")
+    except QueueFullError as e:
+        logger.warning(f"[同步发件箱] {str(e)}，等待分发器轮询发送")
+        outbox_dispatcher.notify()
+        return None
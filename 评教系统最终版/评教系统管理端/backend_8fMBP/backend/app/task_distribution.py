@@ -0,0 +1,106 @@
+"""
+考评表分发
+一次查询加载全部目标教师，一条 INSERT ... ON CONFLICT DO NOTHING（executemany）
+批量创建考评任务；任务 ID 为 {template_id}_{teacher_id}，重复分发只补建缺少的任务。
+同步到教师端的消息在同一事务中写入发件箱（sync_outbox），由后台分发器发送。
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .database import insert_ignoring_conflicts
+from .models import EvaluationAssignmentTask, EvaluationTemplate, Teacher
+from .sync_outbox import enqueue_evaluation_tasks
+
+# IN 查询每批的 ID 数量（低于各数据库的绑定参数上限）
+ID_CHUNK_SIZE = 500
+
+
+def _chunks(items: List[str], size: int = ID_CHUNK_SIZE) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def load_target_teachers(db: Session, teacher_ids: Optional[List[str]] = None) -> List[Dict]:
+    """
+    加载目标教师（只取 ID 和姓名）
+
+    Args:
+        db: 数据库会话
+        teacher_ids: 教师ID列表，None 表示全部教师
+
+    Returns:
+        [{"teacher_id", "teacher_name"}]，按 teacher_ids 顺序，不存在的教师被忽略
+    """
+    query = db.query(Teacher.teacher_id, Teacher.teacher_name)
+    if teacher_ids is None:
+        return [
+            {"teacher_id": teacher_id, "teacher_name": teacher_name}
+            for teacher_id, teacher_name in query.order_by(Teacher.teacher_id)
+        ]
+
+    wanted = list(dict.fromkeys(teacher_ids))
+    names = {}
+    for chunk in _chunks(wanted):
+        names.update(query.filter(Teacher.teacher_id.in_(chunk)).all())
+    return [
+        {"teacher_id": teacher_id, "teacher_name": names[teacher_id]}
+        for teacher_id in wanted if teacher_id in names
+    ]
+
+
+def _count_template_tasks(db: Session, template_id: str) -> int:
+    return db.query(func.count(EvaluationAssignmentTask.task_id)).filter(
+        EvaluationAssignmentTask.template_id == template_id
+    ).scalar()
+
+
+def distribute_template(db: Session, template: EvaluationTemplate,
+                        teacher_ids: Optional[List[str]] = None) -> Dict:
+    """
+    将考评表分发给教师，创建考评任务并发布考评表
+
+    SQL 条数固定（加载教师、插入前后计数、插入任务和同步消息、更新考评表），不随教师人数增长。
+    重复分发是幂等的：已存在的任务保持不变（包括已提交、已评分的任务），
+    已入队的同步消息也不会重复入队。
+
+    Args:
+        db: 数据库会话
+        template: 考评表
+        teacher_ids: 目标教师ID列表，None 表示全部教师
+
+    Returns:
+        {"teachers": 目标教师列表, "created": 新建任务数, "existing": 已存在任务数,
+         "sync_keys": 本次分发的同步消息幂等键}
+    """
+    teachers = load_target_teachers(db, teacher_ids)
+
+    before = _count_template_tasks(db, template.template_id)
+    sync_keys = []
+    if teachers:
+        insert_ignoring_conflicts(db, EvaluationAssignmentTask, [
+            {
+                "task_id": f"{template.template_id}_{teacher['teacher_id']}",
+                "template_id": template.template_id,
+                "teacher_id": teacher["teacher_id"],
+                "teacher_name": teacher["teacher_name"],
+                "deadline": template.deadline,
+                "status": "pending",
+            }
+            for teacher in teachers
+        ], key="task_id")
+        sync_keys = enqueue_evaluation_tasks(db, template, [teacher["teacher_id"] for teacher in teachers])
+    created = _count_template_tasks(db, template.template_id) - before
+
+    template.status = "published"
+    template.target_teachers = teachers
+    db.commit()
+
+    return {
+        "teachers": teachers,
+        "created": created,
+        "existing": len(teachers) - created,
+        "sync_keys": sync_keys,
+    }
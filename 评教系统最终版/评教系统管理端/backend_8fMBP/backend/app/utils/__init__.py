@@ -1,7 +1,7 @@
 """
 工具模块
 
-包含文件解析、加密、哈希等工具函数
+包含文件解析、加密、哈希、流式 JSON 解析等工具函数
 """
 
 from .file_parser import (
@@ -14,6 +14,9 @@ from .file_parser import (
     get_file_info,
     is_supported_format
 )
+from .parse_cache import ParseCache, parse_cache, calculate_file_hash
+from .text_budget import PARSE_MAX_CHARS, collect_pages, truncate_text
+from .json_stream import IncrementalJSONParser
 
 __all__ = [
     'FileParser',
@@ -23,5 +26,12 @@ __all__ = [
     'FileCorruptedError',
     'parse_file',
     'get_file_info',
-    'is_supported_format'
+    'is_supported_format',
+    'ParseCache',
+    'parse_cache',
+    'calculate_file_hash',
+    'PARSE_MAX_CHARS',
+    'collect_pages',
+    'truncate_text',
+    'IncrementalJSONParser'
 ]
@@ -11,9 +11,12 @@
 
 import os
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterator, Tuple
 from pathlib import Path
 
+from .parse_cache import parse_cache
+from .text_budget import PARSE_MAX_CHARS, collect_pages, render_collected, truncate_text
+
 # 文件解析库
 try:
     from docx import Document
@@ -61,6 +64,9 @@ class FileParser:
     负责提取不同格式文件的文本内容
     """
     
+    # 解析器版本，修改提取逻辑（输出文本格式变化）后需要递增，使旧的解析缓存失效
+    PARSER_VERSION = 1
+    
     # 支持的文件格式
     SUPPORTED_FORMATS = {
         'docx': 'Word文档',
@@ -87,13 +93,15 @@ class FileParser:
         if missing_deps:
             logger.warning(f"缺少依赖库: {', '.join(missing_deps)}")
     
-    def parse_file(self, file_path: str, file_type: Optional[str] = None) -> str:
+    def parse_file(self, file_path: str, file_type: Optional[str] = None,
+                   max_chars: Optional[int] = None) -> str:
         """
         根据文件类型自动选择解析方法
         
         Args:
             file_path: 文件路径
             file_type: 文件类型（可选，如果不提供则从文件扩展名推断）
+            max_chars: 字数预算（可选），PDF/PPTX 达到后停止解析，DOCX 解析后截断
         
         Returns:
             str: 提取的文本内容
@@ -129,11 +137,11 @@ class FileParser:
         # 根据文件类型选择解析方法
         try:
             if file_type == 'docx':
-                content = self.parse_docx(file_path)
+                content = truncate_text(self.parse_docx(file_path), max_chars)
             elif file_type == 'pdf':
-                content = self.parse_pdf(file_path)
+                content = self.parse_pdf(file_path, max_chars)
             elif file_type in ['pptx', 'ppt']:
-                content = self.parse_pptx(file_path)
+                content = self.parse_pptx(file_path, max_chars)
             else:
                 raise UnsupportedFormatError(f"不支持的文件格式: {file_type}")
             
@@ -150,6 +158,34 @@ class FileParser:
             logger.error(f"解析文件失败: {file_path}, 错误: {str(e)}")
             raise FileCorruptedError(f"文件可能已损坏或格式不正确: {str(e)}")
     
+    def parse_file_cached(self, file_path: str, file_type: Optional[str] = None,
+                          file_hash: Optional[str] = None,
+                          max_chars: Optional[int] = PARSE_MAX_CHARS) -> str:
+        """
+        带磁盘缓存的 parse_file，供评分使用
+        
+        同一文件（按内容哈希）只解析一次，重试、重新评分和批量评分直接复用提取的文本。
+        默认按评分提示词的字数预算提取，超出部分不解析。
+        
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型（可选）
+            file_hash: 文件 SHA-256（已知时传入，避免重复计算）
+            max_chars: 字数预算，默认读取 PARSE_MAX_CHARS，None 或 0 表示不限制
+        
+        Returns:
+            str: 提取的文本内容
+        """
+        return parse_cache.get_or_parse(
+            file_path,
+            file_type,
+            lambda: self.parse_file(file_path, file_type, max_chars),
+            parser_name="utils",
+            parser_version=self.PARSER_VERSION,
+            file_hash=file_hash,
+            max_chars=max_chars
+        )
+    
     def parse_docx(self, file_path: str) -> str:
         """
         解析 DOCX 文件
@@ -193,15 +229,67 @@ class FileParser:
             logger.error(f"DOCX解析失败: {file_path}, 错误: {str(e)}")
             raise FileCorruptedError(f"DOCX文件解析失败: {str(e)}")
     
-    def parse_pdf(self, file_path: str) -> str:
+    def iter_pdf_pages(self, reader) -> Iterator[Tuple[int, str]]:
+        """
+        逐页提取 PDF 文本（生成器，停止迭代后不再解析后续页面）
+        
+        Args:
+            reader: PdfReader 实例
+        
+        Yields:
+            (页码, 页面文本)，页码从 1 开始，无文本或提取失败的页面跳过
+        """
+        for page_num, page in enumerate(reader.pages):
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                logger.warning(f"PDF第{page_num+1}页提取失败: {str(e)}")
+                continue
+            if text and text.strip():
+                yield page_num + 1, text.strip()
+    
+    def iter_pptx_slides(self, prs) -> Iterator[Tuple[int, str]]:
+        """
+        逐张提取 PPTX 幻灯片文本（生成器，停止迭代后不再解析后续幻灯片）
+        
+        Args:
+            prs: Presentation 实例
+        
+        Yields:
+            (幻灯片序号, 幻灯片文本)，序号从 1 开始，无文本的幻灯片跳过
+        """
+        for slide_num, slide in enumerate(prs.slides):
+            slide_content = []
+            
+            # 提取幻灯片中所有形状的文本
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    text = shape.text.strip()
+                    if text:
+                        slide_content.append(text)
+                
+                # 如果是表格，提取表格内容
+                if shape.has_table:
+                    table = shape.table
+                    for row in table.rows:
+                        for cell in row.cells:
+                            text = cell.text.strip()
+                            if text:
+                                slide_content.append(text)
+            
+            if slide_content:
+                yield slide_num + 1, f"[幻灯片 {slide_num + 1}]\n" + '\n'.join(slide_content)
+    
+    def parse_pdf(self, file_path: str, max_chars: Optional[int] = None) -> str:
         """
         解析 PDF 文件
         
         Args:
             file_path: PDF 文件路径
+            max_chars: 字数预算，达到后停止解析后续页面（None 表示不限制）
         
         Returns:
-            str: 提取的文本内容
+            str: 提取的文本内容，截断时末尾附加采样页说明
         
         Raises:
             FileCorruptedError: 文件损坏或无法解析
@@ -211,36 +299,31 @@ class FileParser:
         
         try:
             reader = PdfReader(file_path)
+            total_pages = len(reader.pages)
             
-            # 提取所有页面的文本
-            pages_text = []
-            for page_num, page in enumerate(reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text and text.strip():
-                        pages_text.append(text.strip())
-                except Exception as e:
-                    logger.warning(f"PDF第{page_num+1}页提取失败: {str(e)}")
-                    continue
-            
-            content = '\n'.join(pages_text)
+            result = collect_pages(self.iter_pdf_pages(reader), max_chars, '\n', total_pages)
+            content = render_collected(result, unit="页")
             
-            logger.debug(f"PDF解析完成: {file_path}, 页数: {len(reader.pages)}, 提取页数: {len(pages_text)}")
+            logger.debug(
+                f"PDF解析完成: {file_path}, 页数: {total_pages}, "
+                f"提取页数: {len(result['sampled_pages'])}, 截断: {result['truncated']}"
+            )
             return content
             
         except Exception as e:
             logger.error(f"PDF解析失败: {file_path}, 错误: {str(e)}")
             raise FileCorruptedError(f"PDF文件解析失败: {str(e)}")
     
-    def parse_pptx(self, file_path: str) -> str:
+    def parse_pptx(self, file_path: str, max_chars: Optional[int] = None) -> str:
         """
         解析 PPTX 文件
         
         Args:
             file_path: PPTX 文件路径
+            max_chars: 字数预算，达到后停止解析后续幻灯片（None 表示不限制）
         
         Returns:
-            str: 提取的文本内容
+            str: 提取的文本内容，截断时末尾附加采样幻灯片说明
         
         Raises:
             FileCorruptedError: 文件损坏或无法解析
@@ -250,34 +333,15 @@ class FileParser:
         
         try:
             prs = Presentation(file_path)
+            total_slides = len(prs.slides)
             
-            # 提取所有幻灯片的文本
-            slides_text = []
-            for slide_num, slide in enumerate(prs.slides):
-                slide_content = []
-                
-                # 提取幻灯片中所有形状的文本
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text = shape.text.strip()
-                        if text:
-                            slide_content.append(text)
-                    
-                    # 如果是表格，提取表格内容
-                    if shape.has_table:
-                        table = shape.table
-                        for row in table.rows:
-                            for cell in row.cells:
-                                text = cell.text.strip()
-                                if text:
-                                    slide_content.append(text)
-                
-                if slide_content:
-                    slides_text.append(f"[幻灯片 {slide_num + 1}]\n" + '\n'.join(slide_content))
+            result = collect_pages(self.iter_pptx_slides(prs), max_chars, '\n\n', total_slides)
+            content = render_collected(result, unit="张幻灯片")
             
-            content = '\n\n'.join(slides_text)
-            
-            logger.debug(f"PPTX解析完成: {file_path}, 幻灯片数: {len(prs.slides)}")
+            logger.debug(
+                f"PPTX解析完成: {file_path}, 幻灯片数: {total_slides}, "
+                f"提取幻灯片数: {len(result['sampled_pages'])}, 截断: {result['truncated']}"
+            )
             return content
             
         except Exception as e:
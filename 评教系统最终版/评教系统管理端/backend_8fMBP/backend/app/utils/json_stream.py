@@ -0,0 +1,133 @@
+"""
+流式 JSON 增量解析
+
+大模型以流式（SSE）逐段返回评分 JSON 时，每收到一段文本就继续解析，
+顶层字段（如 veto_check、base_score）一结束即可读取，
+数组字段（如 score_details）的元素逐个解析完成后即可读取，不必等整个响应返回。
+对象开始前的文本（如 ```json 代码块标记、说明文字）会被跳过。
+"""
+
+import json
+from typing import Dict, List, Optional
+
+_INVALID = object()
+
+
+class IncrementalJSONParser:
+    """
+    顶层 JSON 对象的增量解析器
+
+    用法：每收到一段文本调用 feed()，返回 True 表示有新的字段或数组元素解析完成，
+    通过 fields / items / snapshot() 读取已解析的内容。
+    """
+
+    def __init__(self):
+        # 已完成的顶层字段
+        self.fields: Dict = {}
+        # 数组字段中已完成的元素（字段输出过程中逐个追加）
+        self.items: Dict[str, List] = {}
+        # 顶层对象是否已结束
+        self.done = False
+
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start = 0
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        解析一段文本
+
+        Returns:
+            是否有新的顶层字段或数组元素解析完成
+        """
+        changed = False
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                continue
+
+            pos = len(self._buf)
+            self._buf.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None:
+                        key = self._load(self._key_start, pos + 1)
+                        self._key = key if isinstance(key, str) else ""
+                continue
+            if ch.isspace():
+                continue
+
+            if self._depth == 1:
+                if self._key is None:
+                    # 等待字段名
+                    if ch == '"':
+                        self._in_string = True
+                        self._key_start = pos
+                    elif ch == "}":
+                        self._depth = 0
+                        self.done = True
+                    continue
+                if ch in ",}":
+                    if self._value_start is not None:
+                        value = self._load(self._value_start, pos)
+                        if value is not _INVALID:
+                            self.fields[self._key] = value
+                            changed = True
+                    self._key = None
+                    self._value_start = None
+                    if ch == "}":
+                        self._depth = 0
+                        self.done = True
+                    continue
+                if self._value_start is None:
+                    if ch == ":":
+                        continue
+                    self._value_start = pos
+                    if ch == "[":
+                        self.items[self._key] = []
+                        self._item_start = None
+            elif self._depth == 2 and self._buf[self._value_start] == "[":
+                # 顶层数组字段的元素
+                if ch in ",]":
+                    if self._item_start is not None:
+                        item = self._load(self._item_start, pos)
+                        if item is not _INVALID:
+                            self.items[self._key].append(item)
+                            changed = True
+                    self._item_start = None
+                elif self._item_start is None:
+                    self._item_start = pos
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+        return changed
+
+    def snapshot(self) -> Dict:
+        """当前已解析的内容：已完成的字段，以及正在输出的数组字段中已完成的元素"""
+        result = {key: list(items) for key, items in self.items.items()}
+        result.update(self.fields)
+        return result
+
+    def _load(self, start: int, end: int):
+        try:
+            return json.loads("".join(self._buf[start:end]))
+        except ValueError:
+            return _INVALID
@@ -0,0 +1,266 @@
+"""
+文件解析结果缓存
+
+按 (文件 SHA-256, 解析器, 文件类型, 解析器版本, 字数预算) 将提取的文本保存到磁盘，
+重试、重新评分和批量评分时直接复用，不再重复解析 DOCX/PDF/PPTX。
+缓存总大小超过上限或条目长期未使用时，按最近使用时间淘汰。
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 管理端后端目录，默认缓存目录放在该目录下，不随进程工作目录变化
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 缓存目录，可通过环境变量调整；PARSE_CACHE_ENABLED=false 时禁用
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(_BACKEND_DIR, "parse_cache"))
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# 缓存总大小上限（MB），超过后淘汰最久未使用的条目
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", "512"))
+# 条目最长保留天数（按最近使用时间计算），0 表示不按时间淘汰
+PARSE_CACHE_MAX_AGE_DAYS = int(os.getenv("PARSE_CACHE_MAX_AGE_DAYS", "30"))
+# 两次完整清理之间的最短间隔（秒）；未超过大小上限时按该间隔清理过期条目
+PRUNE_INTERVAL = 3600
+# 超过上限时清理到上限的该比例，避免每次写入都触发清理
+PRUNE_LOW_WATERMARK = 0.9
+
+
+def calculate_file_hash(file_path: str) -> str:
+    """
+    计算文件 SHA-256 哈希值
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        十六进制哈希值
+    """
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(65536), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+
+class ParseCache:
+    """
+    磁盘解析缓存
+
+    每个条目是一个 UTF-8 文本文件（<cache_dir>/<哈希前两位>/<键>.txt），
+    先写临时文件再原子替换，多进程/多线程并发写入同一条目也不会读到半个文件。
+    解析器输出格式变化时递增解析器版本，旧条目不再被读取，由清理逻辑按时间和大小淘汰。
+    命中时更新条目的修改时间，清理时按修改时间淘汰最久未使用的条目（LRU）。
+    """
+
+    def __init__(self, cache_dir: str = PARSE_CACHE_DIR, enabled: bool = PARSE_CACHE_ENABLED,
+                 max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        """
+        初始化解析缓存
+
+        Args:
+            cache_dir: 缓存目录
+            enabled: 是否启用
+            max_bytes: 缓存总大小上限（字节），默认读取 PARSE_CACHE_MAX_MB，0 表示不限
+            max_age: 条目最长保留时间（秒），默认读取 PARSE_CACHE_MAX_AGE_DAYS，0 表示不限
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.max_bytes = PARSE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.max_age = PARSE_CACHE_MAX_AGE_DAYS * 86400 if max_age is None else max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 估算的缓存总大小，None 表示尚未扫描
+        self._size: Optional[int] = None
+        self._last_prune = 0.0
+
+    @staticmethod
+    def make_key(file_hash: str, parser_name: str, file_type: str, parser_version: int,
+                 max_chars: Optional[int] = None) -> str:
+        """构建缓存键（按字数预算截断的文本与完整文本分开缓存）"""
+        key = f"{file_hash}-{parser_name}-{file_type or 'auto'}-v{parser_version}"
+        if max_chars:
+            key += f"-c{max_chars}"
+        return key
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存的文本
+
+        Returns:
+            缓存的文本，未命中时返回 None
+        """
+        if not self.enabled:
+            return None
+
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(entry_path)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        except OSError as e:
+            logger.warning(f"读取解析缓存失败: {key}, {str(e)}")
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return text
+
+    def set(self, key: str, text: str):
+        """写入缓存（失败只记录日志，不影响解析结果）"""
+        if not self.enabled:
+            return
+
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, entry_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"写入解析缓存失败: {key}, {str(e)}")
+            return
+
+        self._after_write(len(text.encode("utf-8")))
+
+    def prune(self) -> int:
+        """
+        清理缓存：删除超过保留时间的条目，总大小超过上限时按最近使用时间淘汰到上限以下
+
+        Returns:
+            删除的条目数
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    # 跳过正在写入的临时文件
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        now = time.time()
+        target = int(self.max_bytes * PRUNE_LOW_WATERMARK)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age and now - mtime > self.max_age
+            oversized = self.max_bytes and total > target
+            if not expired and not oversized:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._size = total
+            self._last_prune = now
+            self.evictions += removed
+        if removed:
+            logger.info(f"清理解析缓存 {removed} 个条目，剩余 {total // 1024} KB")
+        return removed
+
+    def _after_write(self, size: int):
+        """累计写入大小，超过上限或到达清理间隔时清理"""
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            due = (
+                self._size is None
+                or (self.max_bytes and self._size > self.max_bytes)
+                or time.time() - self._last_prune > PRUNE_INTERVAL
+            )
+        if due:
+            try:
+                self.prune()
+            except OSError as e:
+                logger.warning(f"清理解析缓存失败: {str(e)}")
+
+    def get_or_parse(self, file_path: str, file_type: Optional[str], parse_func: Callable[[], str],
+                     parser_name: str, parser_version: int, file_hash: Optional[str] = None,
+                     max_chars: Optional[int] = None) -> str:
+        """
+        读取缓存，未命中时解析并写入缓存
+
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型（参与缓存键，不同解析方式结果不同）
+            parse_func: 未命中时调用的解析函数
+            parser_name: 解析器名称
+            parser_version: 解析器版本
+            file_hash: 文件 SHA-256（已知时传入，避免重复计算）
+            max_chars: parse_func 使用的字数预算（参与缓存键）
+
+        Returns:
+            提取的文本
+        """
+        if not self.enabled:
+            return parse_func()
+
+        if not file_hash:
+            try:
+                file_hash = calculate_file_hash(file_path)
+            except OSError:
+                # 文件不存在或不可读，交给解析函数抛出对应的解析异常
+                return parse_func()
+
+        key = self.make_key(file_hash, parser_name, file_type, parser_version, max_chars)
+        text = self.get(key)
+        if text is not None:
+            logger.info(f"命中解析缓存: {file_path}")
+            return text
+
+        text = parse_func()
+        self.set(key, text)
+        return text
+
+    def stats(self) -> Dict:
+        """获取命中统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+# 全局解析缓存
+parse_cache = ParseCache()
@@ -0,0 +1,105 @@
+"""
+提取文本字数预算
+
+评分提示词中的材料内容超过一定长度后对评分没有帮助，只会增加解析耗时和内存占用。
+PDF/PPTX 按页逐个提取，达到字数预算后立即停止，不再解析后续页面，
+并记录实际采样了哪些页。
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 评分用文本的字数上限，可通过环境变量调整；0 表示不限制
+PARSE_MAX_CHARS = int(os.getenv("PARSE_MAX_CHARS", "20000"))
+
+
+def collect_pages(pages: Iterable[Tuple[int, str]], max_chars: Optional[int] = None,
+                  separator: str = "\n", total_pages: Optional[int] = None) -> Dict:
+    """
+    按页收集文本，达到字数预算后停止迭代
+
+    pages 通常是生成器，停止迭代后剩余页面不会再被提取。
+
+    Args:
+        pages: (页码, 文本) 迭代器，页码从 1 开始
+        max_chars: 字数预算，None 或 0 表示不限制
+        separator: 页与页之间的分隔符
+        total_pages: 文档总页数（已知时传入，用于截断说明）
+
+    Returns:
+        {"text", "sampled_pages", "total_pages", "truncated"}
+    """
+    parts: List[str] = []
+    sampled_pages: List[int] = []
+    used = 0
+    truncated = False
+
+    for page_number, text in pages:
+        if not text:
+            continue
+
+        if max_chars:
+            remaining = max_chars - used - (len(separator) if parts else 0)
+            if remaining <= 0:
+                truncated = True
+                break
+            if len(text) > remaining:
+                text = text[:remaining]
+                truncated = True
+
+        if parts:
+            used += len(separator)
+        parts.append(text)
+        sampled_pages.append(page_number)
+        used += len(text)
+
+        if truncated:
+            break
+
+    return {
+        "text": separator.join(parts),
+        "sampled_pages": sampled_pages,
+        "total_pages": total_pages,
+        "truncated": truncated
+    }
+
+
+def format_page_ranges(pages: List[int]) -> str:
+    """将页码列表压缩为区间，如 [1, 2, 3, 5] -> "1-3, 5" """
+    ranges = []
+    start = prev = None
+    for page in pages:
+        if start is None:
+            start = prev = page
+        elif page == prev + 1:
+            prev = page
+        else:
+            ranges.append(f"{start}-{prev}" if start != prev else str(start))
+            start = prev = page
+    if start is not None:
+        ranges.append(f"{start}-{prev}" if start != prev else str(start))
+    return ", ".join(ranges)
+
+
+def render_collected(result: Dict, unit: str = "页") -> str:
+    """
+    生成最终文本：截断时在末尾附加采样说明，让评分模型知道材料不完整
+
+    说明随文本一起写入解析缓存和 parsed_content，事后也能看到采样范围。
+    """
+    if not result["truncated"]:
+        return result["text"]
+
+    total = f"共 {result['total_pages']} {unit}，" if result["total_pages"] else ""
+    note = (
+        f"[内容已截断：{total}已提取第 {format_page_ranges(result['sampled_pages'])} {unit}，"
+        f"超出 {len(result['text'])} 字的部分未提取]"
+    )
+    return f"{result['text']}\n\n{note}"
+
+
+def truncate_text(text: str, max_chars: Optional[int] = None) -> str:
+    """整篇文本（DOCX/TXT）按字数预算截断，截断时附加说明"""
+    if not max_chars or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n\n[内容已截断：全文 {len(text)} 字，仅保留前 {max_chars} 字]"
@@ -0,0 +1,200 @@
+"""
+异步评分链路单元测试
+
+测试 AsyncDeepseekAPIClient 的重试/退避行为，以及 ScoringEngine.score_file_async
+与同步版本结果一致、且多个评分请求可以在同一事件循环中并发执行。
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.deepseek_client import AsyncDeepseekAPIClient
+from app.scoring_engine import ScoringEngine
+
+
+SCORING_CONTENT = {
+    "veto_check": {"triggered": False, "reason": ""},
+    "score_details": [{"indicator": "教学目标", "score": 18, "reason": "明确"}],
+    "base_score": 85,
+    "grade_suggestion": "良好",
+    "summary": "整体良好"
+}
+
+
+def _api_body(content: dict) -> dict:
+    """构造 DeepSeek 接口响应体"""
+    return {
+        "choices": [{"message": {"content": json.dumps(content, ensure_ascii=False)}}],
+        "usage": {"total_tokens": 100}
+    }
+
+
+def _install_transport(client: AsyncDeepseekAPIClient, handler):
+    """为客户端注入 httpx.MockTransport"""
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestAsyncDeepseekAPIClient:
+    """异步 API 客户端测试"""
+
+    def test_call_api_success(self):
+        """测试调用成功时返回内容和用量"""
+        client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(client, lambda request: httpx.Response(200, json=_api_body(SCORING_CONTENT)))
+
+        result = asyncio.run(client.call_api("prompt"))
+
+        assert result["success"] is True
+        assert json.loads(result["content"])["base_score"] == 85
+        assert result["usage"] == {"total_tokens": 100}
+
+    def test_call_api_sends_same_payload_as_sync_client(self):
+        """测试异步客户端请求体与同步客户端一致"""
+        captured = {}
+
+        def handler(request):
+            captured["headers"] = request.headers
+            captured["body"] = json.loads(request.content)
+            return httpx.Response(200, json=_api_body(SCORING_CONTENT))
+
+        client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(client, handler)
+        asyncio.run(client.call_api("hello"))
+
+        assert captured["headers"]["Authorization"] == "Bearer test-key"
+        assert captured["body"] == client._build_payload("hello")
+
+    def test_retry_uses_asyncio_sleep(self):
+        """测试服务端错误时使用 asyncio.sleep 退避重试"""
+        calls = {"count": 0}
+
+        def handler(request):
+            calls["count"] += 1
+            if calls["count"] < 3:
+                return httpx.Response(503, text="busy")
+            return httpx.Response(200, json=_api_body(SCORING_CONTENT))
+
+        client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(client, handler)
+
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        with patch("app.deepseek_client.asyncio.sleep", fake_sleep), \
+                patch("app.deepseek_client.time.sleep") as blocking_sleep:
+            result = asyncio.run(client.call_api("prompt"))
+
+        assert result["success"] is True
+        assert calls["count"] == 3
+        assert sleeps == [1, 2]
+        blocking_sleep.assert_not_called()
+
+    def test_authentication_error_not_retried(self):
+        """测试认证失败时不重试"""
+        calls = {"count": 0}
+
+        def handler(request):
+            calls["count"] += 1
+            return httpx.Response(401, text="invalid key")
+
+        client = AsyncDeepseekAPIClient("bad-key", "https://mock.deepseek/v1/chat")
+        _install_transport(client, handler)
+
+        with pytest.raises(Exception, match="认证失败"):
+            asyncio.run(client.call_api("prompt"))
+        assert calls["count"] == 1
+
+    def test_timeout_exhausts_retries(self):
+        """测试持续超时时重试耗尽后抛出异常"""
+        def handler(request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(client, handler)
+
+        async def fake_sleep(seconds):
+            pass
+
+        with patch("app.deepseek_client.asyncio.sleep", fake_sleep):
+            with pytest.raises(Exception, match="超时"):
+                asyncio.run(client.call_api("prompt", max_retries=2))
+
+
+class TestScoreFileAsync:
+    """ScoringEngine.score_file_async 测试"""
+
+    def test_async_result_matches_sync(self):
+        """测试异步评分结果与同步评分结果一致"""
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        bonus_items = [{"name": "公开课", "score": 3}]
+
+        sync_response = {"success": True, "content": json.dumps(SCORING_CONTENT), "usage": {}}
+        with patch.object(engine.api_client, "call_api", return_value=sync_response):
+            sync_result = engine.score_file("教案", "教案内容", bonus_items=bonus_items)
+
+        _install_transport(
+            engine.async_api_client,
+            lambda request: httpx.Response(200, json=_api_body(SCORING_CONTENT))
+        )
+        async_result = asyncio.run(
+            engine.score_file_async("教案", "教案内容", bonus_items=bonus_items)
+        )
+
+        assert async_result == sync_result
+        assert async_result["final_score"] == 88
+
+    def test_async_empty_content_vetoed(self):
+        """测试内容为空时直接否决，不调用 API"""
+        engine = ScoringEngine("test-key")
+
+        result = asyncio.run(engine.score_file_async("教案", "   "))
+
+        assert result["success"] is False
+        assert result["veto_triggered"] is True
+        assert engine.async_api_client._client is None
+
+    def test_async_failure_returns_failed_result(self):
+        """测试 API 失败时返回评分失败结果而不是抛出异常"""
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(engine.async_api_client, lambda request: httpx.Response(401, text="denied"))
+
+        result = asyncio.run(engine.score_file_async("教案", "教案内容"))
+
+        assert result["success"] is False
+        assert result["grade"] == "评分失败"
+
+    def test_concurrent_calls_do_not_block_event_loop(self):
+        """测试多个评分请求在同一事件循环中并发执行"""
+        delay = 0.2
+        concurrency = 10
+
+        async def handler(request):
+            await asyncio.sleep(delay)
+            return httpx.Response(200, json=_api_body(SCORING_CONTENT))
+
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        _install_transport(engine.async_api_client, handler)
+
+        async def run_all():
+            return await asyncio.gather(*[
+                engine.score_file_async("教案", f"教案内容 {i}") for i in range(concurrency)
+            ])
+
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+        assert all(r["success"] for r in results)
+        # 串行需要 concurrency * delay 秒，并发应接近单次耗时
+        assert elapsed < delay * concurrency / 2
@@ -0,0 +1,119 @@
+"""
+进程内后台任务池测试
+
+测试任务执行与状态查询、队列上限、停止时等待排队任务执行完毕（drain）以及超时取消。
+"""
+
+import asyncio
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.background_workers import BackgroundWorkerPool, QueueFullError
+
+
+class TestBackgroundWorkerPool:
+    """后台任务池测试"""
+
+    def test_runs_jobs_and_reports_status(self):
+        async def add(a, b):
+            await asyncio.sleep(0.01)
+            return a + b
+
+        async def boom():
+            raise ValueError("出错了")
+
+        async def main():
+            pool = BackgroundWorkerPool("测试", workers=2)
+            await pool.start()
+            ok = pool.submit(add, 1, b=2, name="add")
+            bad = pool.submit(boom)
+            assert pool.get_job(ok)["status"] == "queued"
+            await pool.stop()
+            return pool.get_job(ok), pool.get_job(bad)
+
+        ok, bad = asyncio.run(main())
+
+        assert ok["status"] == "succeeded"
+        assert ok["result"] == 3
+        assert ok["name"] == "add"
+        assert ok["finished_at"] is not None
+        assert bad["status"] == "failed"
+        assert bad["error"] == "出错了"
+
+    def test_submit_requires_running_pool(self):
+        pool = BackgroundWorkerPool("测试")
+
+        async def noop():
+            return None
+
+        with pytest.raises(QueueFullError):
+            pool.submit(noop)
+
+    def test_bounded_queue(self):
+        async def main():
+            pool = BackgroundWorkerPool("测试", workers=1, queue_size=2)
+            await pool.start()
+            release = asyncio.Event()
+            pool.submit(release.wait)
+            await asyncio.sleep(0)  # worker 取走第一个任务
+            pool.submit(release.wait)
+            pool.submit(release.wait)
+            with pytest.raises(QueueFullError):
+                pool.submit(release.wait)
+            release.set()
+            await pool.stop()
+
+        asyncio.run(main())
+
+    def test_stop_drains_queued_jobs(self):
+        done = []
+
+        async def job(i):
+            await asyncio.sleep(0.01)
+            done.append(i)
+
+        async def main():
+            pool = BackgroundWorkerPool("测试", workers=2, drain_timeout=5)
+            await pool.start()
+            for i in range(10):
+                pool.submit(job, i)
+            await pool.stop()
+            # 停止后不再接收新任务
+            with pytest.raises(QueueFullError):
+                pool.submit(job, 99)
+
+        asyncio.run(main())
+        assert sorted(done) == list(range(10))
+
+    def test_stop_cancels_jobs_after_drain_timeout(self):
+        async def main():
+            pool = BackgroundWorkerPool("测试", workers=1, drain_timeout=0.05)
+            await pool.start()
+            slow = pool.submit(asyncio.sleep, 10)
+            queued = pool.submit(asyncio.sleep, 10)
+            await asyncio.sleep(0)
+            await pool.stop()
+            return pool.get_job(slow), pool.get_job(queued)
+
+        slow, queued = asyncio.run(main())
+        assert slow["status"] == "cancelled"
+        assert queued["status"] == "cancelled"
+
+    def test_evicts_oldest_finished_jobs(self):
+        async def noop():
+            return None
+
+        async def main():
+            pool = BackgroundWorkerPool("测试", workers=1, max_finished_jobs=3)
+            await pool.start()
+            ids = [pool.submit(noop) for _ in range(5)]
+            await pool.stop()
+            return pool, ids
+
+        pool, ids = asyncio.run(main())
+        assert pool.get_job(ids[0]) is None
+        assert pool.get_job(ids[-1])["status"] == "succeeded"
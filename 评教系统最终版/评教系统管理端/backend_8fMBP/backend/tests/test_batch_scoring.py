@@ -0,0 +1,97 @@
+"""
+多文档合并评分测试
+
+验证多文档提示词只发送一次评分标准，合并响应按文档拆分，缺失或格式错误的项改为单独评分。
+"""
+
+import asyncio
+import json
+
+import httpx
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scoring_engine import ScoringEngine
+
+
+MOCK_SCORING_CONTENT = {
+    "veto_check": {"triggered": False, "reason": ""},
+    "score_details": [{"indicator": "教学目标", "score": 18, "reason": "明确"}],
+    "base_score": 82,
+    "grade_suggestion": "良好",
+    "summary": "整体良好"
+}
+
+
+class TestBatchPrompt:
+    """多文档提示词与响应拆分测试"""
+
+    def _engine(self, handler):
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        engine.async_api_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return engine
+
+    def test_rubric_sent_once(self):
+        engine = ScoringEngine("test-key")
+        contents = ["反思一", "反思二", "反思三"]
+        prompt = engine.build_batch_prompt("教学反思", contents)
+        single = engine.build_prompt("教学反思", "反思一")
+
+        assert prompt.count("【一票否决项】") == 1
+        assert all(f"【文档 {i}】\n{c}" in prompt for i, c in enumerate(contents, 1))
+        assert '"document": 文档序号' in prompt
+        assert len(prompt) < len(single) * 1.5
+
+    def test_invalid_items_rescored_individually(self):
+        """测试合并响应中缺失或格式错误的项单独评分，其余项直接使用合并结果"""
+        prompts = []
+
+        def handler(request):
+            prompt = json.loads(request.content)["messages"][0]["content"]
+            prompts.append(prompt)
+            if "【文档 1】" in prompt:
+                content = [
+                    dict(MOCK_SCORING_CONTENT, document=3, base_score=70),
+                    {"document": 2, "base_score": "缺少字段"},
+                    dict(MOCK_SCORING_CONTENT, document=1, base_score=90)
+                ]
+            else:
+                content = dict(MOCK_SCORING_CONTENT, base_score=60)
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(content, ensure_ascii=False)}}],
+                "usage": {"total_tokens": 100}
+            })
+
+        engine = self._engine(handler)
+        results = asyncio.run(engine.score_files_batch_async(
+            "教学反思", ["反思一", "反思二", "反思三", "反思四", "  "]
+        ))
+
+        assert [r.get("base_score") for r in results[:4]] == [90, 60, 70, 60]
+        assert results[4]["veto_triggered"] is True
+        assert len(prompts) == 3
+
+        # 合并评分的结果写入缓存，单独评分时直接命中
+        prompts.clear()
+        result = asyncio.run(engine.score_file_async("教学反思", "反思三"))
+        assert result["base_score"] == 70
+        assert prompts == []
+
+    def test_batch_failure_falls_back(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(200, json={"choices": [{"message": {"content": "无法评分"}}]})
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(MOCK_SCORING_CONTENT, ensure_ascii=False)}}]
+            })
+
+        engine = self._engine(handler)
+        results = asyncio.run(engine.score_files_batch_async("教学反思", ["反思一", "反思二"]))
+
+        assert all(r["success"] and r["base_score"] == 82 for r in results)
+        assert len(calls) == 3
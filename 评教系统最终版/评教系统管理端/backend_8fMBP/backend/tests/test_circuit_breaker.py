@@ -0,0 +1,267 @@
+"""
+DeepSeek API 熔断器与对冲请求测试
+
+测试熔断器在连续失败或持续超过延迟目标后熔断、冷却后放行探测请求，
+以及评分接口故障时调用立即失败、慢请求超过 p95 延迟后发送对冲请求。
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import deepseek_pool
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.deepseek_client import AsyncDeepseekAPIClient, DeepseekAPIClient
+from app.deepseek_pool import LatencyTracker, RateLimiter
+
+
+def _api_body():
+    return {
+        "choices": [{"message": {"content": json.dumps({"base_score": 85})}}],
+        "usage": {"total_tokens": 100}
+    }
+
+
+class TestCircuitBreaker:
+    """熔断器状态转换测试"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.metrics()["short_circuited"] == 1
+        assert breaker.metrics()["times_opened"] == 1
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=3)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe(self):
+        """测试冷却后只放行一个探测请求，探测成功恢复、失败重新熔断"""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        time.sleep(0.12)
+        assert breaker.state == HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        time.sleep(0.12)
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        breaker.before_call()
+
+    def test_latency_slo_breach_counts_as_failure(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, latency_slo=1.0)
+        breaker.record_success(0.5)
+        breaker.record_success(3.0)
+        breaker.record_success(3.0)
+        assert breaker.state == OPEN
+
+    def test_slow_success_not_counted_by_default(self):
+        """测试默认不启用延迟目标，成功但较慢的评分请求不会触发熔断"""
+        breaker = deepseek_pool.deepseek_circuit_breaker
+        if os.getenv("DEEPSEEK_LATENCY_SLO") is None:
+            assert breaker.latency_slo is None
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        for _ in range(5):
+            breaker.record_success(120.0)
+        assert breaker.state == CLOSED
+
+    def test_disabled(self):
+        breaker = CircuitBreaker("test", failure_threshold=0)
+        for _ in range(10):
+            breaker.record_failure()
+        breaker.before_call()
+        assert breaker.state == CLOSED
+
+
+class TestClientFailFast:
+    """评分接口故障时快速失败"""
+
+    def test_async_client_fails_fast_when_open(self):
+        """测试熔断后不再请求接口，也不再等待重试退避"""
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503, text="unavailable")
+
+        async def run():
+            client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client._backoff = lambda attempt: asyncio.sleep(0)
+            with pytest.raises(Exception, match="熔断中"):
+                await client.call_api("prompt", max_retries=5)
+            started = time.monotonic()
+            with pytest.raises(CircuitOpenError):
+                await client.call_api("prompt", max_retries=5)
+            elapsed = time.monotonic() - started
+            await client.aclose()
+            return elapsed
+
+        with patch("app.deepseek_client.deepseek_circuit_breaker", breaker):
+            elapsed = asyncio.run(run())
+
+        assert len(calls) == 2
+        assert elapsed < 0.05
+        assert breaker.metrics()["short_circuited"] == 2
+
+    def test_client_errors_do_not_open_breaker(self):
+        """测试 4xx（如请求参数错误）不计为服务故障"""
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        client = DeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+        response = httpx.Response(400, text="bad request")
+        with patch("app.deepseek_client.deepseek_circuit_breaker", breaker), \
+                patch.object(deepseek_pool.get_session(), "post", return_value=response), \
+                patch("time.sleep"):
+            with pytest.raises(Exception):
+                client.call_api("prompt", max_retries=2)
+        assert breaker.state == CLOSED
+
+
+class TestHedging:
+    """对冲请求测试"""
+
+    def _tracker(self, latency=0.05):
+        tracker = LatencyTracker(min_samples=5, min_delay=0)
+        for _ in range(20):
+            tracker.record(latency)
+        return tracker
+
+    def _run(self, handler, tracker, hedge_enabled=True, limiter=None, max_retries=None):
+        async def run():
+            client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client.hedge_enabled = hedge_enabled
+            started = time.monotonic()
+            try:
+                result = await client.call_api("prompt", max_retries=max_retries)
+            finally:
+                await client.aclose()
+            return result, time.monotonic() - started
+
+        with patch("app.deepseek_client.deepseek_latency", tracker), \
+                patch("app.deepseek_client.deepseek_circuit_breaker", CircuitBreaker("test")), \
+                patch("app.deepseek_client.deepseek_rate_limiter", limiter or RateLimiter()):
+            return asyncio.run(run())
+
+    def test_slow_request_is_hedged(self):
+        """测试首个请求超过 p95 延迟未返回时发送对冲请求，取先返回的结果"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(2)
+            return httpx.Response(200, json=_api_body())
+
+        tracker = self._tracker()
+        result, elapsed = self._run(handler, tracker)
+
+        assert result["success"] is True
+        assert len(calls) == 2
+        assert elapsed < 1
+        assert tracker.hedged == 1
+        assert tracker.hedge_wins == 1
+
+    def test_fast_request_not_hedged(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json=_api_body())
+
+        tracker = self._tracker(latency=1)
+        result, _ = self._run(handler, tracker)
+        assert result["success"] is True
+        assert len(calls) == 1
+        assert tracker.hedged == 0
+
+    def test_hedge_failure_waits_for_primary(self):
+        """测试对冲请求失败时继续等待原请求"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(0.3)
+                return httpx.Response(200, json=_api_body())
+            return httpx.Response(500, text="error")
+
+        tracker = self._tracker()
+        result, elapsed = self._run(handler, tracker)
+        assert result["success"] is True
+        assert len(calls) == 2
+        assert elapsed >= 0.29
+        assert tracker.hedge_wins == 0
+
+    def test_hedge_tokens_settled(self):
+        """测试对冲请求预扣的 token 按未采用请求的实际用量退还"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(0.3)
+                return httpx.Response(200, json=_api_body())
+            return httpx.Response(500, text="error")
+
+        limiter = RateLimiter(tokens_per_minute=60000)
+        self._run(handler, self._tracker(), limiter=limiter)
+        # 每个请求预扣约 2000 个 token：原请求按实际用量 100 修正，失败的对冲请求全部退还
+        assert 60000 - 200 < limiter._token_level <= 60000
+
+    def test_both_failed_returns_response(self):
+        """测试两个请求都失败时返回有响应的一个，而不是后完成的网络异常"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(0.3)
+                raise httpx.ConnectError("reset")
+            return httpx.Response(503, text="busy")
+
+        with pytest.raises(Exception, match="503"):
+            self._run(handler, self._tracker(), max_retries=1)
+        assert len(calls) == 2
+
+    def test_no_hedge_without_samples_or_when_disabled(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json=_api_body())
+
+        self._run(handler, LatencyTracker(min_samples=5, min_delay=0))
+        self._run(handler, self._tracker(), hedge_enabled=False)
+        assert len(calls) == 2
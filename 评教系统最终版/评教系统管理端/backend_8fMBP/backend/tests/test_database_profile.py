@@ -0,0 +1,114 @@
+"""
+SQLite 生产配置测试
+
+测试新连接的 PRAGMA（WAL、synchronous、busy_timeout 等），
+以及多个线程经由单写线程并发写入时不会出现 "database is locked"。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import Column, Integer, String, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import (
+    DatabaseWriter, create_sqlite_engine, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB
+)
+
+
+TestBase = declarative_base()
+
+
+class Counter(TestBase):
+    __tablename__ = "counters"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    TestBase.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def writer():
+    writer = DatabaseWriter(thread_name_prefix="test-db-writer")
+    yield writer
+    writer.shutdown()
+
+
+class TestSqlitePragmas:
+    """连接 PRAGMA 测试"""
+
+    def test_file_database_pragmas(self, engine):
+        with engine.connect() as conn:
+            pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == SQLITE_BUSY_TIMEOUT_MS
+            assert pragma("cache_size") == -SQLITE_CACHE_SIZE_KB
+            assert pragma("temp_store") == 2  # MEMORY
+
+    def test_memory_database_keeps_memory_journal(self):
+        """测试内存数据库不切换 WAL，其余 PRAGMA 照常设置"""
+        engine = create_sqlite_engine("sqlite://")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "memory"
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == SQLITE_BUSY_TIMEOUT_MS
+
+    def test_reader_not_blocked_by_open_write(self, engine):
+        """测试 WAL 模式下未提交的写事务不阻塞读"""
+        with engine.connect() as writer_conn, engine.connect() as reader_conn:
+            writer_conn.execute(text("INSERT INTO counters (name) VALUES ('pending')"))
+            assert reader_conn.execute(text("SELECT COUNT(*) FROM counters")).scalar() == 0
+            writer_conn.commit()
+
+
+class TestDatabaseWriter:
+    """单写线程测试"""
+
+    def test_concurrent_writes_are_serialized(self, engine, writer):
+        """测试多个线程经由写线程并发写入全部成功，且都在同一个线程中执行"""
+        Session = sessionmaker(bind=engine)
+        thread_names = set()
+
+        def insert(index):
+            thread_names.add(threading.current_thread().name)
+            db = Session()
+            try:
+                db.add(Counter(name=f"row-{index}"))
+                db.commit()
+            finally:
+                db.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda i: writer.run(insert, i), range(200)))
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM counters")).scalar() == 200
+        assert len(thread_names) == 1
+        assert thread_names.pop().startswith("test-db-writer")
+
+    def test_run_async(self, writer):
+        async def main():
+            return await asyncio.gather(*(writer.run_async(lambda x=i: x * 2) for i in range(5)))
+
+        assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+
+    def test_nested_run_does_not_deadlock(self, writer):
+        """测试在写线程中再次调用 run 时直接执行"""
+        assert writer.run(lambda: writer.run(lambda: "inner")) == "inner"
+
+    def test_restarts_after_shutdown(self, writer):
+        assert writer.run(lambda: 1) == 1
+        writer.shutdown()
+        assert writer.run(lambda: 2) == 2
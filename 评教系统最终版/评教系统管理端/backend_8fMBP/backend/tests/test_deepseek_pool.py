@@ -0,0 +1,252 @@
+"""
+DeepSeek API 共享连接池与限流测试
+
+测试令牌桶按到达顺序排队、按实际用量修正 token、Retry-After / 限流响应头触发全局暂停，
+以及并发评分时请求排队而不是反复打到接口上。
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+import requests
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import deepseek_pool
+from app.circuit_breaker import CircuitBreaker
+from app.deepseek_client import AsyncDeepseekAPIClient, DeepseekAPIClient
+from app.deepseek_pool import RateLimiter, estimate_tokens, parse_retry_after
+from app.services import deepseek_api_client as service_api_client_module
+from app.services import deepseek_client as service_client_module
+from app.services.deepseek_api_client import DeepseekAPIClient as ServiceDeepseekAPIClient
+
+
+def _api_body(total_tokens=100):
+    return {
+        "choices": [{"message": {"content": json.dumps({"base_score": 85})}}],
+        "usage": {"total_tokens": total_tokens}
+    }
+
+
+class TestRateLimiter:
+    """令牌桶测试"""
+
+    def test_parse_durations(self):
+        assert parse_retry_after("2") == 2.0
+        assert parse_retry_after("1.5") == 1.5
+        assert parse_retry_after("6m0s") == 360.0
+        assert parse_retry_after("20ms") == 0.02
+        assert parse_retry_after("abc") is None
+        assert parse_retry_after(None) is None
+        assert 0 <= parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") < 1
+
+    def test_unlimited_by_default(self):
+        limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=0)
+        assert all(limiter.reserve(10000) == 0 for _ in range(1000))
+
+    def test_requests_queue_in_arrival_order(self):
+        """测试超出每分钟请求数后按到达顺序排队，等待时间依次递增"""
+        limiter = RateLimiter(requests_per_minute=60)
+        delays = [limiter.reserve() for _ in range(63)]
+
+        assert delays[:60] == [0] * 60
+        assert 0.9 < delays[60] < delays[61] < delays[62] < 3.1
+
+    def test_tokens_per_minute_and_settle(self):
+        """测试 token 额度用尽后排队，按实际用量退还多扣的 token"""
+        limiter = RateLimiter(tokens_per_minute=6000)
+        assert limiter.reserve(3000) == 0
+        assert limiter.reserve(3000) == 0
+        assert limiter.reserve(3000) > 25
+
+        limiter = RateLimiter(tokens_per_minute=6000)
+        assert limiter.reserve(3000) == 0
+        limiter.settle(3000, 500)
+        assert limiter.reserve(3000) == 0
+        assert limiter.reserve(2000) == 0
+
+    def test_failed_attempts_refund_tokens(self):
+        """测试超时、请求异常和响应无法解析时退还预扣的 token"""
+        not_json = requests.Response()
+        not_json.status_code, not_json._content = 200, b"not json"
+        failures = [requests.Timeout("timeout"), requests.ConnectionError("reset"), not_json]
+        for module in (service_api_client_module, service_client_module):
+            for failure in failures:
+                limiter = RateLimiter(tokens_per_minute=6000)
+                client = module.DeepseekAPIClient("test-key", max_retries=2)
+                post = {"side_effect": failure} if isinstance(failure, Exception) else {"return_value": failure}
+                with patch.object(module, "deepseek_rate_limiter", limiter), \
+                        patch.object(module.time, "sleep"), \
+                        patch.object(client.session, "post", **post), \
+                        pytest.raises(module.DeepseekAPIError):
+                    client.call_api("prompt")
+
+                assert limiter._token_level == pytest.approx(6000, abs=1)
+
+        # 评分引擎使用的同步客户端
+        for failure in failures:
+            limiter = RateLimiter(tokens_per_minute=6000)
+            post = {"side_effect": failure} if isinstance(failure, Exception) else {"return_value": failure}
+            with patch("app.deepseek_client.deepseek_rate_limiter", limiter), \
+                    patch("app.deepseek_client.deepseek_circuit_breaker", CircuitBreaker("test")), \
+                    patch("time.sleep"), \
+                    patch.object(deepseek_pool.get_session(), "post", **post), \
+                    pytest.raises(Exception):
+                DeepseekAPIClient("test-key").call_api("prompt", max_retries=2)
+
+            assert limiter._token_level == pytest.approx(6000, abs=1)
+
+        # 评分引擎使用的异步客户端
+        for failure in [httpx.ReadTimeout("timeout"), httpx.ConnectError("reset"), None]:
+            def handler(request, failure=failure):
+                if failure is not None:
+                    raise failure
+                return httpx.Response(200, text="not json")
+
+            async def run():
+                client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+                client.streaming = False
+                client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+                client._backoff = lambda attempt: asyncio.sleep(0)
+                try:
+                    await client.call_api("prompt", max_retries=2)
+                finally:
+                    await client.aclose()
+
+            limiter = RateLimiter(tokens_per_minute=6000)
+            with patch("app.deepseek_client.deepseek_rate_limiter", limiter), \
+                    patch("app.deepseek_client.deepseek_circuit_breaker", CircuitBreaker("test")), \
+                    pytest.raises(Exception):
+                asyncio.run(run())
+
+            assert limiter._token_level == pytest.approx(6000, abs=1)
+
+    def test_oversized_request_capped(self):
+        """测试单个请求超过每分钟额度时按满额度计，不会永远等待"""
+        limiter = RateLimiter(tokens_per_minute=1000)
+        assert limiter.reserve(5000) == 0
+        assert limiter.reserve(5000) < 61
+
+    def test_retry_after_pauses_all_requests(self):
+        """测试 429 的 Retry-After 使后续所有请求等待"""
+        limiter = RateLimiter()
+        assert limiter.record_response(429, httpx.Headers({"Retry-After": "5"})) == 5
+        assert 4 < limiter.reserve() <= 5
+        assert 4 < limiter.reserve() <= 5
+        assert limiter.metrics()["rate_limited_responses"] == 1
+
+    def test_429_without_retry_after_backs_off(self):
+        limiter = RateLimiter(max_backoff=3)
+        assert limiter.record_response(429, {}, attempt=1) == 2
+        assert limiter.record_response(429, {}, attempt=5) == 3
+
+    def test_rate_limit_headers(self):
+        """测试剩余额度为 0 时暂停到重置时间，有剩余额度时不暂停"""
+        limiter = RateLimiter()
+        headers = httpx.Headers({"x-ratelimit-remaining-requests": "3", "x-ratelimit-reset-requests": "10s"})
+        assert limiter.record_response(200, headers) == 0
+        headers = httpx.Headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "1m30s"})
+        assert limiter.record_response(200, headers) == 90
+        assert limiter.reserve() > 89
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("一" * 1000, 2000) == 2600
+
+
+class TestSharedPool:
+    """共享连接池测试"""
+
+    def test_clients_share_connection_pool(self):
+        """测试所有客户端实例共用同一个会话和异步客户端"""
+        async def shared_clients():
+            first = AsyncDeepseekAPIClient("key-1")._get_client()
+            second = AsyncDeepseekAPIClient("key-2")._get_client()
+            return first, second
+
+        first, second = asyncio.run(shared_clients())
+        assert first is second
+
+        session = deepseek_pool.get_session()
+        assert ServiceDeepseekAPIClient("key-1").session is session
+        assert ServiceDeepseekAPIClient("key-2").session is session
+        # 认证头按请求传入，共享会话不带任何客户端的密钥
+        assert "Authorization" not in session.headers
+
+    def test_sync_client_uses_shared_session(self):
+        client = DeepseekAPIClient("test-key")
+        response = httpx.Response(200, json=_api_body())
+        with patch.object(deepseek_pool.get_session(), "post", return_value=response) as post:
+            result = client.call_api("prompt")
+
+        assert result["success"] is True
+        assert post.call_args.kwargs["headers"]["Authorization"] == "Bearer test-key"
+
+
+class TestConcurrentScoring:
+    """并发评分时的排队与暂停"""
+
+    def test_requests_queue_under_rate_limit(self):
+        """测试并发请求超过速率时排队，指标记录排队数和等待时间"""
+        limiter = RateLimiter(requests_per_minute=600)
+        # 先用掉大部分额度，只剩 10 个请求可以立即发送
+        for _ in range(590):
+            limiter.reserve()
+        arrivals = []
+
+        def handler(request):
+            arrivals.append(time.monotonic())
+            return httpx.Response(200, json=_api_body())
+
+        async def run():
+            client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            await asyncio.gather(*(client.call_api(f"prompt {i}") for i in range(15)))
+            await client.aclose()
+
+        with patch("app.deepseek_client.deepseek_rate_limiter", limiter):
+            asyncio.run(run())
+
+        metrics = limiter.metrics()
+        assert len(arrivals) == 15
+        # 前 10 个立即发送，其余每 0.1 秒放行一个
+        assert arrivals[-1] - arrivals[0] >= 0.45
+        assert metrics["throttled_requests"] == 5
+        assert metrics["max_queue_depth"] == 5
+        assert metrics["queue_depth"] == 0
+        assert metrics["throttled_seconds"] > 1
+
+    def test_429_pauses_instead_of_stampeding(self):
+        """测试 429 后重试和新请求都等待 Retry-After，而不是立即重试"""
+        limiter = RateLimiter()
+        arrivals = []
+
+        def handler(request):
+            arrivals.append(time.monotonic())
+            if len(arrivals) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0.3"}, text="rate limited")
+            return httpx.Response(200, json=_api_body())
+
+        async def run():
+            client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            first = asyncio.create_task(client.call_api("first"))
+            await asyncio.sleep(0.05)
+            others = [client.call_api(f"prompt {i}") for i in range(3)]
+            results = await asyncio.gather(first, *others)
+            await client.aclose()
+            return results
+
+        with patch("app.deepseek_client.deepseek_rate_limiter", limiter):
+            results = asyncio.run(run())
+
+        assert all(r["success"] for r in results)
+        assert len(arrivals) == 5
+        assert all(t - arrivals[0] >= 0.29 for t in arrivals[1:])
+        assert limiter.metrics()["rate_limited_responses"] == 1
+        assert limiter.metrics()["throttled_requests"] == 4
@@ -0,0 +1,197 @@
+"""
+文件解析缓存测试
+
+测试磁盘解析缓存按文件哈希和解析器版本复用解析结果，
+以及 MaterialSubmission.parsed_content 延迟加载。
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.parse_cache import ParseCache, calculate_file_hash
+from app.utils.file_parser import FileParser as UtilsFileParser
+from app.file_parser import FileParser as LegacyFileParser
+from app.models import Base, MaterialSubmission
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(cache_dir=str(tmp_path / "cache"), enabled=True)
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    file_path = tmp_path / "reflection.txt"
+    file_path.write_text("教学反思内容", encoding="utf-8")
+    return str(file_path)
+
+
+class TestParseCache:
+    """ParseCache 测试"""
+
+    def test_get_or_parse_parses_once(self, cache, text_file):
+        """测试同一文件只解析一次"""
+        parse_func = Mock(return_value="提取的文本")
+
+        first = cache.get_or_parse(text_file, "txt", parse_func, "legacy", 1)
+        second = cache.get_or_parse(text_file, "txt", parse_func, "legacy", 1)
+
+        assert first == second == "提取的文本"
+        assert parse_func.call_count == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_cache_shared_across_instances(self, cache, text_file):
+        """测试缓存持久化在磁盘上，新实例（如重启后）可以复用"""
+        cache.get_or_parse(text_file, "txt", lambda: "文本", "legacy", 1)
+
+        reopened = ParseCache(cache_dir=cache.cache_dir, enabled=True)
+        parse_func = Mock(return_value="不应调用")
+        assert reopened.get_or_parse(text_file, "txt", parse_func, "legacy", 1) == "文本"
+        parse_func.assert_not_called()
+
+    def test_keyed_by_content_not_path(self, cache, tmp_path, text_file):
+        """测试相同内容的不同路径复用缓存，内容变化后重新解析"""
+        cache.get_or_parse(text_file, "txt", lambda: "文本", "legacy", 1)
+
+        copy_path = tmp_path / "copy.txt"
+        copy_path.write_text("教学反思内容", encoding="utf-8")
+        parse_func = Mock(return_value="新文本")
+        assert cache.get_or_parse(str(copy_path), "txt", parse_func, "legacy", 1) == "文本"
+
+        copy_path.write_text("修改后的内容", encoding="utf-8")
+        assert cache.get_or_parse(str(copy_path), "txt", parse_func, "legacy", 1) == "新文本"
+        assert parse_func.call_count == 1
+
+    def test_parser_version_invalidates(self, cache, text_file):
+        """测试解析器版本变化后重新解析"""
+        cache.get_or_parse(text_file, "txt", lambda: "v1 文本", "legacy", 1)
+        assert cache.get_or_parse(text_file, "txt", lambda: "v2 文本", "legacy", 2) == "v2 文本"
+
+    def test_parser_name_and_type_in_key(self, cache, text_file):
+        """测试不同解析器、不同文件类型互不复用"""
+        cache.get_or_parse(text_file, "txt", lambda: "legacy 文本", "legacy", 1)
+        assert cache.get_or_parse(text_file, "txt", lambda: "utils 文本", "utils", 1) == "utils 文本"
+        assert cache.get_or_parse(text_file, "docx", lambda: "docx 文本", "legacy", 1) == "docx 文本"
+
+    def test_known_file_hash_skips_hashing(self, cache, text_file):
+        """测试传入文件哈希时不再计算"""
+        file_hash = calculate_file_hash(text_file)
+        cache.get_or_parse(text_file, "txt", lambda: "文本", "legacy", 1, file_hash=file_hash)
+
+        with patch("app.utils.parse_cache.calculate_file_hash") as hasher:
+            cache.get_or_parse(text_file, "txt", lambda: "其他", "legacy", 1, file_hash=file_hash)
+            hasher.assert_not_called()
+
+    def test_parse_errors_not_cached(self, cache, text_file):
+        """测试解析失败不写入缓存"""
+        with pytest.raises(ValueError):
+            cache.get_or_parse(text_file, "txt", Mock(side_effect=ValueError("损坏")), "legacy", 1)
+        assert cache.get_or_parse(text_file, "txt", lambda: "文本", "legacy", 1) == "文本"
+
+    def test_missing_file_raises_parser_error(self, cache, tmp_path):
+        """测试文件不存在时由解析函数抛出原有异常"""
+        missing = str(tmp_path / "missing.pdf")
+        with pytest.raises(Exception, match="文件不存在"):
+            cache.get_or_parse(missing, "pdf", lambda: LegacyFileParser.parse_file(missing, "pdf"), "legacy", 1)
+
+    def test_disabled_cache(self, tmp_path, text_file):
+        """测试禁用时每次都解析且不写磁盘"""
+        cache = ParseCache(cache_dir=str(tmp_path / "disabled"), enabled=False)
+        parse_func = Mock(return_value="文本")
+        cache.get_or_parse(text_file, "txt", parse_func, "legacy", 1)
+        cache.get_or_parse(text_file, "txt", parse_func, "legacy", 1)
+        assert parse_func.call_count == 2
+        assert not os.path.exists(tmp_path / "disabled")
+
+    def test_default_dir_anchored_to_backend(self):
+        """测试默认缓存目录不随进程工作目录变化"""
+        import importlib
+        module = importlib.import_module("app.utils.parse_cache")
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if "PARSE_CACHE_DIR" not in os.environ:
+            assert module.PARSE_CACHE_DIR == os.path.join(backend_dir, "parse_cache")
+
+    def test_size_cap_evicts_least_recently_used(self, tmp_path):
+        """测试超过大小上限时淘汰最久未使用的条目"""
+        cache = ParseCache(cache_dir=str(tmp_path / "cache"), enabled=True, max_bytes=3500, max_age=0)
+        for i, key in enumerate(["aa-old", "bb-unused", "cc-new"]):
+            cache.set(key, "x" * 1000)
+            os.utime(cache._entry_path(key), (1000 + i, 1000 + i))
+
+        # 读取后 aa-old 变为最近使用，超过上限时淘汰的是 bb-unused
+        assert cache.get("aa-old") == "x" * 1000
+        cache.set("dd-latest", "x" * 1000)
+
+        assert cache.get("bb-unused") is None
+        assert cache.get("aa-old") is not None
+        assert cache.get("cc-new") is not None
+        assert cache.get("dd-latest") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entries_pruned(self, tmp_path):
+        """测试超过保留时间的条目被清理"""
+        cache = ParseCache(cache_dir=str(tmp_path / "cache"), enabled=True, max_bytes=0, max_age=60)
+        cache.set("aa-stale", "旧文本")
+        cache.set("bb-fresh", "新文本")
+        os.utime(cache._entry_path("aa-stale"), (1000, 1000))
+
+        assert cache.prune() == 1
+        assert cache.get("aa-stale") is None
+        assert cache.get("bb-fresh") == "新文本"
+
+
+class TestParserIntegration:
+    """两个文件解析器的缓存接入测试"""
+
+    def test_legacy_parser_cached(self, cache, text_file):
+        """测试 app.file_parser.FileParser.parse_file_cached"""
+        with patch("app.file_parser.parse_cache", cache):
+            assert LegacyFileParser.parse_file_cached(text_file, "txt") == "教学反思内容"
+            with patch.object(LegacyFileParser, "parse_txt") as parse_txt:
+                assert LegacyFileParser.parse_file_cached(text_file, "txt") == "教学反思内容"
+                parse_txt.assert_not_called()
+
+    def test_utils_parser_cached(self, cache, tmp_path):
+        """测试 app.utils.file_parser.FileParser.parse_file_cached"""
+        file_path = tmp_path / "plan.docx"
+        file_path.write_bytes(b"fake docx")
+        parser = UtilsFileParser()
+
+        with patch("app.utils.file_parser.parse_cache", cache), \
+                patch.object(parser, "parse_docx", return_value="教案文本") as parse_docx:
+            assert parser.parse_file_cached(str(file_path)) == "教案文本"
+            assert parser.parse_file_cached(str(file_path)) == "教案文本"
+            assert parse_docx.call_count == 1
+
+
+class TestParsedContentDeferred:
+    """parsed_content 延迟加载测试"""
+
+    def test_parsed_content_not_loaded_by_default(self):
+        """测试查询提交记录时不加载 parsed_content 大文本"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(MaterialSubmission(
+            submission_id="sub_1",
+            teacher_id="t1",
+            teacher_name="教师1",
+            files=[],
+            parsed_content="很长的文本" * 10000
+        ))
+        db.commit()
+        db.expunge_all()
+
+        submission = db.query(MaterialSubmission).first()
+        assert "parsed_content" in inspect(submission).unloaded
+        # 访问时按需加载
+        assert submission.parsed_content.startswith("很长的文本")
+        db.close()
@@ -0,0 +1,151 @@
+"""
+文件解析进程池测试
+
+测试 ParseExecutor 在子进程中解析文件、文件大小上限、超时只回收超时的解析进程，
+排队等待不计入超时，以及解析异常原样传回调用方。
+"""
+
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import parse_executor as parse_executor_module
+from app.parse_executor import (
+    ParseExecutor, ParseTimeoutError, FileTooLargeError, _init_worker
+)
+
+
+def _slow_parse(parser_name, file_path, file_type, file_hash):
+    """在解析进程中按 file_type 指定的秒数模拟耗时解析"""
+    time.sleep(float(file_type))
+    return os.path.basename(file_path)
+
+
+def _worker_pids(executor):
+    return {
+        pid
+        for worker in executor._workers if worker is not None
+        for pid in worker._processes
+    }
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    """独立的解析进程池，解析缓存写入临时目录"""
+    monkeypatch.setenv("PARSE_CACHE_DIR", str(tmp_path / "parse_cache"))
+    executor = ParseExecutor(max_workers=2, timeout=60, max_file_mb=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    file_path = tmp_path / "reflection.txt"
+    file_path.write_text("教学反思内容", encoding="utf-8")
+    return str(file_path)
+
+
+class TestParseExecutor:
+    """解析进程池测试"""
+
+    def test_parse_in_subprocess(self, executor, text_file):
+        """测试异步解析返回文本，且在子进程中执行"""
+        async def run():
+            return await asyncio.gather(*[executor.parse(text_file, "txt") for _ in range(4)])
+
+        results = asyncio.run(run())
+
+        assert results == ["教学反思内容"] * 4
+        worker_pids = _worker_pids(executor)
+        assert worker_pids and os.getpid() not in worker_pids
+
+    def test_parse_sync(self, executor, text_file):
+        """测试同步解析接口"""
+        assert executor.parse_sync(text_file, "txt") == "教学反思内容"
+
+    def test_parse_error_propagates(self, executor, tmp_path):
+        """测试解析器异常原样返回调用方"""
+        missing = str(tmp_path / "missing.pdf")
+        with pytest.raises(Exception, match="文件不存在"):
+            asyncio.run(executor.parse(missing, "pdf"))
+
+    def test_file_too_large(self, executor, tmp_path):
+        """测试超过大小上限的文件不进入解析进程"""
+        big_file = tmp_path / "big.txt"
+        big_file.write_bytes(b"a" * (1024 * 1024 + 1))
+
+        with pytest.raises(FileTooLargeError):
+            asyncio.run(executor.parse(str(big_file), "txt"))
+        with pytest.raises(FileTooLargeError):
+            executor.parse_sync(str(big_file), "txt")
+        assert executor._workers == [None, None]
+
+    def test_timeout_recycles_worker(self, executor, text_file, monkeypatch):
+        """测试超时后回收该解析进程，后续解析使用新进程"""
+        monkeypatch.setattr(parse_executor_module, "_parse_in_worker", _slow_parse)
+        executor.timeout = 0.5
+        with pytest.raises(ParseTimeoutError):
+            asyncio.run(executor.parse(text_file, "5"))
+        assert executor._workers == [None, None]
+
+        assert asyncio.run(executor.parse(text_file, "0")) == "reflection.txt"
+
+    def test_sync_timeout_recycles_worker(self, executor, text_file, monkeypatch):
+        """测试同步接口超时后回收该解析进程"""
+        monkeypatch.setattr(parse_executor_module, "_parse_in_worker", _slow_parse)
+        executor.timeout = 0.5
+        with pytest.raises(ParseTimeoutError):
+            executor.parse_sync(text_file, "5")
+        assert executor._workers == [None, None]
+
+    def test_queue_wait_not_counted_in_timeout(self, tmp_path, monkeypatch):
+        """测试文件数超过进程数时排队等待不计入超时"""
+        monkeypatch.setattr(parse_executor_module, "_parse_in_worker", _slow_parse)
+        executor = ParseExecutor(max_workers=1, timeout=1.5, max_file_mb=1)
+        try:
+            async def run():
+                return await asyncio.gather(*[
+                    executor.parse(str(tmp_path / f"file_{i}.txt"), "0.5") for i in range(5)
+                ])
+
+            assert asyncio.run(run()) == [f"file_{i}.txt" for i in range(5)]
+        finally:
+            executor.shutdown()
+
+    def test_timeout_only_kills_overrunning_worker(self, executor, tmp_path, monkeypatch):
+        """测试一个文件超时不影响其他进程中正在解析的文件"""
+        monkeypatch.setattr(parse_executor_module, "_parse_in_worker", _slow_parse)
+        executor.timeout = 2.0
+
+        async def run():
+            return await asyncio.gather(
+                executor.parse(str(tmp_path / "slow.txt"), "10"),
+                executor.parse(str(tmp_path / "normal.txt"), "0.5"),
+                return_exceptions=True
+            )
+
+        slow, normal = asyncio.run(run())
+
+        assert isinstance(slow, ParseTimeoutError)
+        assert normal == "normal.txt"
+        assert sum(worker is not None for worker in executor._workers) == 1
+
+    def test_worker_memory_limit(self):
+        """测试解析进程初始化时设置地址空间上限"""
+        resource = pytest.importorskip("resource")
+        with patch.object(resource, "setrlimit") as setrlimit:
+            _init_worker(512)
+        setrlimit.assert_called_once_with(resource.RLIMIT_AS, (512 * 1024 * 1024, 512 * 1024 * 1024))
+
+    def test_memory_limit_disabled(self):
+        """测试内存上限为 0 时不设置"""
+        resource = pytest.importorskip("resource")
+        with patch.object(resource, "setrlimit") as setrlimit:
+            _init_worker(0)
+        setrlimit.assert_not_called()
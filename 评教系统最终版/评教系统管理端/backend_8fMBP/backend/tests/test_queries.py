@@ -0,0 +1,322 @@
+"""
+列表查询测试
+
+测试考评任务、归档评分、提交材料、考评表列表的查询结果，
+以及每次列表请求的 SQL 条数不随行数增长。
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Base, EvaluationTemplate, EvaluationAssignmentTask, MaterialSubmission
+from app.queries import (
+    InvalidCursorError, encode_cursor, decode_cursor,
+    query_evaluation_tasks, serialize_evaluation_task,
+    query_archived_scores, serialize_archived_score, archived_score_stats,
+    query_material_submissions, serialize_material_submission,
+    query_evaluation_templates, serialize_evaluation_template
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@contextmanager
+def count_statements(engine):
+    """统计执行的 SQL 条数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _seed(db, task_count, template_count=3):
+    """创建考评表、考评任务（含已评分和考评表已删除的任务）和提交记录"""
+    now = datetime.utcnow()
+    for t in range(template_count):
+        db.add(EvaluationTemplate(
+            template_id=f"tpl_{t}",
+            name=f"考评表{t}",
+            file_url="/uploads/tpl.pdf",
+            file_name="tpl.pdf",
+            file_type="pdf",
+            scoring_criteria=[{"name": "完成度", "max_score": 10 * (t + 1)}],
+            total_score=10 * (t + 1),
+            submission_requirements={},
+            deadline=now + timedelta(days=7),
+            target_teachers=[{"teacher_id": "t1", "teacher_name": "教师1"}],
+            status="published",
+            created_at=now + timedelta(seconds=t)
+        ))
+    for i in range(task_count):
+        db.add(EvaluationAssignmentTask(
+            task_id=f"task_{i:05d}",
+            # 每 10 个任务中有 1 个对应的考评表已删除
+            template_id="tpl_deleted" if i % 10 == 5 else f"tpl_{i % template_count}",
+            teacher_id=f"t{i % 7}",
+            teacher_name=f"教师{i % 7}",
+            status="scored" if i % 2 else "pending",
+            total_score=80 + i % 20 if i % 2 else None,
+            scored_at=now + timedelta(minutes=i) if i % 2 else None,
+            deadline=now + timedelta(days=7),
+            created_at=now + timedelta(seconds=i)
+        ))
+        db.add(MaterialSubmission(
+            submission_id=f"sub_{i:05d}",
+            teacher_id=f"t{i % 7}",
+            teacher_name=f"教师{i % 7}",
+            files=[{"file_name": "教案.pdf"}],
+            submitted_at=now + timedelta(seconds=i),
+            parsed_content="很长的文本" * 100
+        ))
+    db.commit()
+    db.expunge_all()
+
+
+class TestQueryResults:
+    """查询结果测试"""
+
+    def test_evaluation_tasks_include_template_fields(self, db):
+        """测试任务列表带出考评表名称、总分和评分标准"""
+        _seed(db, 20)
+        rows, next_cursor = query_evaluation_tasks(db)
+        assert next_cursor is None
+        tasks = [serialize_evaluation_task(*row) for row in rows]
+
+        assert len(tasks) == 20
+        by_id = {task["task_id"]: task for task in tasks}
+        assert by_id["task_00001"]["template_name"] == "考评表1"
+        assert by_id["task_00001"]["total_score"] == 20
+        assert by_id["task_00001"]["scoring_criteria"] == [{"name": "完成度", "max_score": 20}]
+        # 考评表已删除的任务仍然返回，使用默认值
+        assert by_id["task_00005"]["template_name"] == ""
+        assert by_id["task_00005"]["total_score"] == 0
+        assert by_id["task_00005"]["scoring_criteria"] == []
+        # 按创建时间倒序
+        assert tasks[0]["task_id"] == "task_00019"
+
+    def test_evaluation_task_filters(self, db):
+        """测试按考评表、教师、状态筛选"""
+        _seed(db, 30)
+        rows, _ = query_evaluation_tasks(db, template_id="tpl_1", teacher_id="t1", status="scored")
+        assert rows
+        for task, name, _, _ in rows:
+            assert (task.template_id, task.teacher_id, task.status) == ("tpl_1", "t1", "scored")
+            assert name == "考评表1"
+
+    def test_archived_scores_paging_and_sort(self, db):
+        """测试归档评分分页、排序和考评表字段"""
+        _seed(db, 40)
+        rows, total, _ = query_archived_scores(db, page=1, page_size=5)
+        scores = [serialize_archived_score(*row) for row in rows]
+
+        assert total == 20
+        assert [s["task_id"] for s in scores] == [f"task_{i:05d}" for i in (39, 37, 35, 33, 31)]
+        assert scores[0]["template_name"] == "考评表0"
+        assert scores[0]["total_score"] == 10
+
+        rows, _, _ = query_archived_scores(db, sort_order="asc", page=1, page_size=3)
+        scores = [serialize_archived_score(*row) for row in rows]
+        assert [s["task_id"] for s in scores] == ["task_00001", "task_00003", "task_00005"]
+        # 考评表已删除时使用默认值
+        assert scores[2]["template_name"] == "未知"
+        assert scores[2]["total_score"] == 100
+
+    def test_archived_scores_filters(self, db):
+        """测试按教师和考评表名称筛选"""
+        _seed(db, 40)
+        rows, total, _ = query_archived_scores(db, teacher_id="t3", template_name="考评表2", page_size=100)
+        assert total == len(rows) > 0
+        for task, name, _, _ in rows:
+            assert task.teacher_id == "t3"
+            assert name == "考评表2"
+
+        # 没有匹配的考评表时不按名称筛选（与原有行为一致）
+        _, total, _ = query_archived_scores(db, template_name="不存在")
+        assert total == 20
+
+    def test_archived_score_stats(self, db):
+        """测试 SQL 聚合统计与逐条计算结果一致"""
+        _seed(db, 40)
+        scored = db.query(EvaluationAssignmentTask).filter(EvaluationAssignmentTask.status == "scored").all()
+        db.expunge_all()
+
+        stats = archived_score_stats(db)
+
+        assert stats == {
+            "total": len(scored),
+            "teachers": len({t.teacher_id for t in scored}),
+            "avgScore": round(sum(t.total_score or 0 for t in scored) / len(scored), 1),
+            "dataSize": round(len(scored) * 0.5, 1)
+        }
+
+    def test_archived_score_stats_empty(self, db):
+        """测试没有已评分任务时统计为 0"""
+        assert archived_score_stats(db) == {"total": 0, "teachers": 0, "avgScore": 0, "dataSize": 0}
+
+    def test_material_submissions_skip_large_columns(self, db):
+        """测试提交材料列表不加载解析文本"""
+        _seed(db, 5)
+        submissions, _ = query_material_submissions(db, review_status="pending", teacher_id="t1")
+
+        assert [s.submission_id for s in submissions] == ["sub_00001"]
+        assert "parsed_content" in inspect(submissions[0]).unloaded
+        assert "scoring_result" in inspect(submissions[0]).unloaded
+        assert serialize_material_submission(submissions[0])["files"] == [{"file_name": "教案.pdf"}]
+
+    def test_evaluation_templates(self, db):
+        """测试考评表列表"""
+        _seed(db, 1)
+        templates = [serialize_evaluation_template(t) for t in query_evaluation_templates(db, "published")]
+
+        assert [t["template_id"] for t in templates] == ["tpl_2", "tpl_1", "tpl_0"]
+        assert templates[0]["target_count"] == 1
+        assert query_evaluation_templates(db, "draft") == []
+
+
+def _walk_pages(fetch):
+    """按游标依次取完所有页，返回每页的 ID 列表"""
+    pages, cursor = [], None
+    while True:
+        ids, cursor = fetch(cursor)
+        pages.append(ids)
+        if cursor is None:
+            return pages
+
+
+class TestCursorPagination:
+    """游标分页测试"""
+
+    def test_cursor_roundtrip(self):
+        """测试游标编码/解码"""
+        moment = datetime(2025, 9, 1, 8, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(moment, "task_1")) == (moment, "task_1")
+        assert decode_cursor(encode_cursor(None, "task_1")) == (None, "task_1")
+
+    @pytest.mark.parametrize("cursor", ["不是游标", "e30", encode_cursor(None, "x")[:-3] + "!!!"])
+    def test_invalid_cursor(self, db, cursor):
+        """测试无效游标抛出 InvalidCursorError"""
+        with pytest.raises(InvalidCursorError):
+            query_evaluation_tasks(db, after=cursor, limit=5)
+
+    def test_evaluation_tasks_pages_cover_all_rows(self, db):
+        """测试考评任务逐页遍历：不重复、不遗漏、顺序与不分页一致"""
+        _seed(db, 23)
+        all_rows, _ = query_evaluation_tasks(db)
+
+        def fetch(cursor):
+            rows, next_cursor = query_evaluation_tasks(db, after=cursor, limit=5)
+            return [task.task_id for task, *_ in rows], next_cursor
+
+        pages = _walk_pages(fetch)
+        assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+        assert sum(pages, []) == [task.task_id for task, *_ in all_rows]
+
+    @pytest.mark.parametrize("sort_order", ["desc", "asc"])
+    def test_archived_scores_cursor_matches_offset(self, db, sort_order):
+        """测试归档评分游标分页与页码分页结果一致（含 scored_at 相同和为空的行）"""
+        _seed(db, 30)
+        tied = db.query(EvaluationAssignmentTask).filter(EvaluationAssignmentTask.status == "scored").all()
+        for task in tied[:4]:
+            task.scored_at = tied[0].scored_at
+        tied[5].scored_at = None
+        tied[6].scored_at = None
+        db.commit()
+
+        def fetch(cursor):
+            rows, _, next_cursor = query_archived_scores(db, sort_order=sort_order, page_size=4, after=cursor)
+            return [task.task_id for task, *_ in rows], next_cursor
+
+        by_cursor = _walk_pages(fetch)
+        by_page = [
+            [task.task_id for task, *_ in query_archived_scores(db, sort_order=sort_order, page=page, page_size=4)[0]]
+            for page in range(1, len(by_cursor) + 1)
+        ]
+        assert by_cursor == by_page
+        assert len(sum(by_cursor, [])) == 15
+
+    def test_material_submissions_cursor_with_filter(self, db):
+        """测试提交材料按筛选条件游标分页"""
+        _seed(db, 30)
+
+        def fetch(cursor):
+            rows, next_cursor = query_material_submissions(db, teacher_id="t2", after=cursor, limit=2)
+            return [s.submission_id for s in rows], next_cursor
+
+        ids = sum(_walk_pages(fetch), [])
+        assert ids == [f"sub_{i:05d}" for i in range(29, -1, -1) if i % 7 == 2]
+
+    def test_deep_page_uses_keyset(self, engine, db):
+        """测试游标分页不跳过行（OFFSET 为 0），由 WHERE 条件定位下一页"""
+        _seed(db, 30)
+        _, _, cursor = query_archived_scores(db, page_size=4, page=3)
+        executed = []
+
+        def before_cursor_execute(conn, cursor_, statement, parameters, context, executemany):
+            executed.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            query_archived_scores(db, page_size=4, after=cursor)
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        statement, parameters = executed[-1]
+        assert statement.rstrip().endswith("LIMIT ? OFFSET ?")
+        assert parameters[-2:] == (5, 0)
+
+
+class TestStatementCount:
+    """SQL 条数基准测试：列表请求的查询条数与行数无关"""
+
+    @pytest.mark.parametrize("list_func", [
+        lambda db: [serialize_evaluation_task(*row) for row in query_evaluation_tasks(db)[0]],
+        lambda db: [serialize_archived_score(*row)
+                    for row in query_archived_scores(db, template_name="考评表", page_size=100)[0]],
+        lambda db: [serialize_material_submission(s) for s in query_material_submissions(db)[0]],
+        lambda db: [serialize_evaluation_template(t) for t in query_evaluation_templates(db)],
+        archived_score_stats,
+    ], ids=["evaluation_tasks", "archived_scores", "material_submissions", "evaluation_templates",
+            "archived_score_stats"])
+    def test_statement_count_constant(self, engine, list_func):
+        """测试 10 行和 1000 行时 SQL 条数相同"""
+        counts = {}
+        for rows in (10, 1000):
+            Base.metadata.drop_all(bind=engine)
+            Base.metadata.create_all(bind=engine)
+            db = sessionmaker(bind=engine)()
+            _seed(db, rows, template_count=rows // 10)
+
+            with count_statements(engine) as statements:
+                list_func(db)
+            counts[rows] = len(statements)
+            db.close()
+
+        print(f"\nSQL 条数: {counts}")
+        assert counts[10] == counts[1000]
+        assert counts[1000] <= 3
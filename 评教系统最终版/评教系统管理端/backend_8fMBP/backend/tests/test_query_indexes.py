@@ -0,0 +1,154 @@
+"""
+查询索引测试
+
+对列表接口和管理器中的高频查询执行 EXPLAIN QUERY PLAN，
+任何一条退化为全表扫描都会失败；并测试索引迁移脚本可重复执行。
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Base
+from app.queries import (
+    query_evaluation_tasks, query_archived_scores, archived_score_stats, query_material_submissions
+)
+from app.services.task_manager import TaskManager
+from app.services.review_manager import ReviewManager
+from app.services.trial_run_manager import TrialRunManager
+from migrate_indexes import migrate_indexes
+
+
+# "SCAN <表名>" 且没有 USING INDEX 即为全表扫描
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING)(?:\s|$)")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@contextmanager
+def capture_selects(engine):
+    """记录执行的 SELECT 语句及参数"""
+    selects = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield selects
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_table_scans(engine, selects):
+    """返回查询计划中出现全表扫描的 (语句, 表名) 列表"""
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in selects:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            for row in plan:
+                match = FULL_SCAN.match(row[-1])
+                if match:
+                    scans.append((statement, match.group(1)))
+    return scans
+
+
+HOT_QUERIES = {
+    # main.py 列表接口
+    "evaluation_tasks_page": lambda db: query_evaluation_tasks(db, limit=20),
+    "evaluation_tasks_by_teacher": lambda db: query_evaluation_tasks(db, teacher_id="t1"),
+    "evaluation_tasks_by_template": lambda db: query_evaluation_tasks(db, template_id="tpl_1"),
+    "archived_scores": lambda db: query_archived_scores(db, page_size=10),
+    "archived_scores_asc": lambda db: query_archived_scores(db, sort_order="asc", page_size=10),
+    "archived_score_stats": archived_score_stats,
+    "material_submissions_page": lambda db: query_material_submissions(db, limit=20),
+    "material_submissions_by_teacher": lambda db: query_material_submissions(db, teacher_id="t1"),
+    "material_submissions_by_status": lambda db: query_material_submissions(db, review_status="pending"),
+    # task_manager.py
+    "check_deadline": lambda db: TaskManager(db).check_deadline(),
+    "pending_tasks": lambda db: TaskManager(db).get_pending_tasks(),
+    "tasks_by_teacher": lambda db: TaskManager(db).get_tasks_by_teacher("t1"),
+    # review_manager.py
+    "pending_appeals": lambda db: ReviewManager(db).get_pending_appeals("pending"),
+    "random_sample": lambda db: ReviewManager(db).random_sample(0.5),
+    "consistency_rate": lambda db: ReviewManager(db).calculate_consistency_rate("2025-01-01", "2025-12-31"),
+    # trial_run_manager.py
+    "trial_run_diff_report": lambda db: TrialRunManager(db).generate_trial_run_diff_report(
+        "2025-01-01", "2025-12-31"
+    ),
+}
+
+
+class TestHotQueryPlans:
+    """高频查询不得全表扫描"""
+
+    @pytest.mark.parametrize("name", list(HOT_QUERIES))
+    def test_no_full_table_scan(self, engine, db, name):
+        with capture_selects(engine) as selects:
+            HOT_QUERIES[name](db)
+
+        assert selects, f"{name} 没有执行查询"
+        assert full_table_scans(engine, selects) == []
+
+    def test_detects_full_table_scan(self, engine, db):
+        """测试检测本身有效：没有索引的列筛选会被识别为全表扫描"""
+        with capture_selects(engine) as selects:
+            db.execute(text("SELECT * FROM evaluation_assignment_tasks WHERE teacher_name = 'x'"))
+
+        assert full_table_scans(engine, selects) == [(selects[0][0], "evaluation_assignment_tasks")]
+
+
+class TestIndexMigration:
+    """索引迁移脚本测试"""
+
+    def _drop_declared_indexes(self, engine):
+        with engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    def test_creates_missing_indexes_idempotently(self, engine):
+        """测试为已有的表补建索引，重复执行不报错"""
+        self._drop_declared_indexes(engine)
+
+        first = migrate_indexes(engine)
+        second = migrate_indexes(engine)
+
+        declared = {
+            index.name for table in Base.metadata.sorted_tables for index in table.indexes
+        }
+        assert set(first["created"]) == declared
+        assert second["created"] == []
+        assert set(second["existing"]) == declared
+
+        indexes = {i["name"] for i in inspect(engine).get_indexes("evaluation_assignment_tasks")}
+        assert "ix_assignment_tasks_status_deadline" in indexes
+
+    def test_skips_missing_tables(self, tmp_path):
+        """测试表不存在时跳过（由 create_all 负责创建）"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+        result = migrate_indexes(engine)
+
+        assert result["created"] == []
+        assert "evaluation_assignment_tasks" in result["skipped_tables"]
@@ -0,0 +1,336 @@
+"""
+实时事件推送测试
+
+测试按部门分发、同键事件合并、队列满时丢弃最旧消息、慢连接隔离与超时断开，
+多 worker 共用 backplane 时的跨进程推送，写操作提交后推送失败不影响接口结果，
+以及 1000 个模拟连接下的推送延迟。
+"""
+
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import main, pubsub
+from app.database import get_db
+from app.models import Base, MaterialSubmission
+from app.pubsub import InMemoryBackplane
+from app.realtime import ALL_DEPARTMENTS, ConnectionManager
+
+
+class FakeWebSocket:
+    """记录收到的消息，可设置每次发送的延迟"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages = []
+        self.received_at = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(json.loads(text))
+        self.received_at.append(time.perf_counter())
+
+    async def close(self):
+        self.closed = True
+
+
+async def _wait_received(websocket, count, timeout=5.0):
+    """等待连接收到 count 条消息"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if len(websocket.messages) >= count:
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError(f"未在 {timeout} 秒内收到 {count} 条消息: {websocket.messages}")
+
+
+class TestConnectionManager:
+    """连接管理与推送测试"""
+
+    def test_department_routing(self):
+        """测试部门事件只推送给该部门及订阅 all 的连接"""
+        async def run():
+            manager = ConnectionManager()
+            dept_a, dept_b, watcher = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+            await manager.connect(dept_a, "1")
+            await manager.connect(dept_b, "2")
+            await manager.connect(watcher, ALL_DEPARTMENTS)
+
+            manager.publish("task_status", {"task_id": "t1"}, department_id="1")
+            manager.publish("submission_created", {"submission_id": "s1"})
+            await _wait_received(dept_a, 2)
+            await _wait_received(dept_b, 1)
+            await _wait_received(watcher, 2)
+            await manager.close()
+            return dept_a, dept_b, watcher
+
+        dept_a, dept_b, watcher = asyncio.run(run())
+
+        assert [m["type"] for m in dept_a.messages] == ["task_status", "submission_created"]
+        assert [m["type"] for m in dept_b.messages] == ["submission_created"]
+        assert [m["type"] for m in watcher.messages] == ["task_status", "submission_created"]
+        assert dept_a.messages[0]["department_id"] == "1"
+        assert dept_a.messages[0]["data"] == {"task_id": "t1"}
+
+    def test_disconnect(self):
+        """测试断开后不再推送，空部门被移除"""
+        async def run():
+            manager = ConnectionManager()
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, "1")
+            manager.disconnect(websocket, "1")
+            manager.publish("task_status", {}, department_id="1")
+            assert manager.active_connections == {}
+            await asyncio.sleep(0.01)
+            await manager.close()
+            return websocket
+
+        assert asyncio.run(run()).messages == []
+
+    def test_keyed_events_coalesce(self):
+        """测试慢连接队列中同键的进度事件只保留最新一条"""
+        async def run():
+            manager = ConnectionManager()
+            websocket = FakeWebSocket(delay=0.05)
+            await manager.connect(websocket, "1")
+
+            manager.publish("scoring_job_progress", {"completed": 0}, key="job_1")
+            await asyncio.sleep(0.01)  # 第一条正在发送
+            for completed in range(1, 50):
+                manager.publish("scoring_job_progress", {"completed": completed}, key="job_1")
+            manager.publish("scoring_job_progress", {"completed": 7}, key="job_2")
+
+            await _wait_received(websocket, 3)
+            await manager.close()
+            return websocket
+
+        websocket = asyncio.run(run())
+
+        progress = [m["data"]["completed"] for m in websocket.messages]
+        assert progress == [0, 49, 7]
+
+    def test_full_queue_drops_oldest(self):
+        """测试队列满时丢弃最旧的消息"""
+        async def run():
+            manager = ConnectionManager(queue_size=5)
+            websocket = FakeWebSocket(delay=0.05)
+            subscriber = await manager.connect(websocket, "1")
+
+            manager.publish("submission_created", {"n": 0})
+            await asyncio.sleep(0.01)
+            for n in range(1, 21):
+                manager.publish("submission_created", {"n": n})
+
+            await _wait_received(websocket, 6)
+            await manager.close()
+            return websocket, subscriber
+
+        websocket, subscriber = asyncio.run(run())
+
+        assert [m["data"]["n"] for m in websocket.messages] == [0, 16, 17, 18, 19, 20]
+        assert subscriber.dropped == 15
+
+    def test_slow_connection_does_not_block_others(self):
+        """测试慢连接不影响其他连接收到消息，publish 不等待发送"""
+        async def run():
+            manager = ConnectionManager()
+            slow, fast = FakeWebSocket(delay=1.0), FakeWebSocket()
+            await manager.connect(slow, "1")
+            await manager.connect(fast, "1")
+
+            started = time.perf_counter()
+            manager.publish("task_status", {"task_id": "t1"}, department_id="1")
+            await manager.broadcast(json.dumps({"type": "notice"}), "1")
+            elapsed = time.perf_counter() - started
+
+            await asyncio.sleep(0.05)
+            fast_received = list(fast.messages)
+            await manager.close()
+            return elapsed, fast_received, slow
+
+        elapsed, fast_received, slow = asyncio.run(run())
+
+        assert elapsed < 0.05
+        assert len(fast_received) == 2
+        assert slow.messages == []
+
+    def test_send_timeout_disconnects(self):
+        """测试发送超时的连接被断开并关闭"""
+        async def run():
+            manager = ConnectionManager(send_timeout=0.05)
+            stuck, healthy = FakeWebSocket(delay=10), FakeWebSocket()
+            await manager.connect(stuck, "1")
+            await manager.connect(healthy, "1")
+
+            manager.publish("task_status", {}, department_id="1")
+            await asyncio.sleep(0.2)
+            connections = manager.stats()["connections"]
+            manager.publish("task_status", {}, department_id="1")
+            await _wait_received(healthy, 2)
+            await manager.close()
+            return stuck, healthy, connections
+
+        stuck, healthy, connections = asyncio.run(run())
+
+        assert stuck.closed
+        assert connections == 1
+        assert len(healthy.messages) == 2
+
+
+class TestBackplane:
+    """跨 worker 推送测试"""
+
+    def test_events_reach_connections_on_other_workers(self):
+        """测试多个连接管理器（模拟多个 worker）共用 backplane 时，任一 worker 发布的事件都推送到所有 worker 的连接"""
+        async def run():
+            backplane = InMemoryBackplane()
+            workers = [ConnectionManager(backplane=backplane) for _ in range(3)]
+            sockets = [FakeWebSocket() for _ in workers]
+            for worker, websocket in zip(workers, sockets):
+                await worker.start()
+                await worker.connect(websocket, "1")
+            other_department = FakeWebSocket()
+            await workers[2].connect(other_department, "2")
+
+            workers[0].publish("scoring_job_progress", {"completed": 1}, department_id="1", key="job_1")
+            await workers[1].broadcast(json.dumps({"type": "notice"}), "1")
+            for websocket in sockets:
+                await _wait_received(websocket, 2)
+            await asyncio.sleep(0.01)
+
+            await workers[0].close()
+            workers[1].publish("task_status", {}, department_id="1")
+            await _wait_received(sockets[2], 3)
+            for worker in workers[1:]:
+                await worker.close()
+            return sockets, other_department
+
+        sockets, other_department = asyncio.run(run())
+
+        for websocket in sockets:
+            assert [m["type"] for m in websocket.messages[:2]] == ["scoring_job_progress", "notice"]
+        assert len(sockets[0].messages) == 2
+        assert other_department.messages == []
+
+    def test_keys_survive_backplane(self):
+        """测试经 backplane 传递后同键事件仍然合并"""
+        async def run():
+            manager = ConnectionManager(backplane=InMemoryBackplane())
+            websocket = FakeWebSocket(delay=0.05)
+            await manager.connect(websocket, "1")
+            manager.publish("scoring_job_progress", {"completed": 0}, key="job_1")
+            await asyncio.sleep(0.01)
+            for completed in range(1, 10):
+                manager.publish("scoring_job_progress", {"completed": completed}, key="job_1")
+            await _wait_received(websocket, 2)
+            await manager.close()
+            return websocket
+
+        assert [m["data"]["completed"] for m in asyncio.run(run()).messages] == [0, 9]
+
+    def test_redis_unavailable_falls_back_to_memory(self, monkeypatch):
+        """测试配置 Redis 但未安装 redis 时回退到进程内广播"""
+        monkeypatch.setattr(pubsub, "REALTIME_BACKPLANE", "redis")
+        monkeypatch.setattr(pubsub, "aioredis", None)
+        assert isinstance(pubsub.create_backplane(), InMemoryBackplane)
+
+
+class TestTeacherEvents:
+    """写操作提交后的教师事件推送"""
+
+    def test_publish_failure_does_not_fail_committed_write(self, monkeypatch):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+
+        def failing_publish(*args, **kwargs):
+            raise RuntimeError("推送异常")
+
+        monkeypatch.setattr(main.connection_manager, "publish", failing_publish)
+        main.app.dependency_overrides[get_db] = lambda: session
+        try:
+            response = TestClient(main.app).post("/api/teacher/sync-submission", json={
+                "submission_id": "sub_rt",
+                "teacher_id": "t1",
+                "teacher_name": "教师1",
+                "files": [],
+                "submitted_at": "2026-01-01T08:00:00"
+            })
+        finally:
+            main.app.dependency_overrides.pop(get_db)
+
+        assert response.status_code == 200
+        assert session.get(MaterialSubmission, "sub_rt") is not None
+        session.close()
+        engine.dispose()
+
+
+class TestFanOutLoad:
+    """1000 个模拟连接的推送延迟"""
+
+    @staticmethod
+    async def _measure(manager, sockets, department_id):
+        for websocket in sockets:
+            await manager.connect(websocket, department_id)
+        started = time.perf_counter()
+        manager.publish("task_status", {"task_id": "t1"}, department_id=department_id)
+        publish_ms = (time.perf_counter() - started) * 1000
+
+        fast = [ws for ws in sockets if not ws.delay]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+        while any(not ws.received_at for ws in fast) and loop.time() < deadline:
+            await asyncio.sleep(0.001)
+        deliver_ms = (max(ws.received_at[0] for ws in fast) - started) * 1000
+        await manager.close()
+        return publish_ms, deliver_ms
+
+    @staticmethod
+    async def _measure_sequential(sockets):
+        """改造前的实现：逐个 await send_text"""
+        started = time.perf_counter()
+        for websocket in sockets:
+            await websocket.send_text(json.dumps({"type": "task_status"}))
+        fast = [ws for ws in sockets if not ws.delay]
+        return (max(ws.received_at[0] for ws in fast) - started) * 1000
+
+    def test_broadcast_latency_flat_with_slow_sockets(self):
+        """测试 1000 个连接（含 10 个慢连接）时快连接的送达延迟不受慢连接影响"""
+        async def run():
+            results = {}
+            for count in (10, 100, 1000):
+                sockets = [FakeWebSocket() for _ in range(count)]
+                results[count] = await self._measure(ConnectionManager(), sockets, "1")
+
+            sockets = [FakeWebSocket(delay=0.2) for _ in range(10)] + [FakeWebSocket() for _ in range(990)]
+            results["1000+10 慢"] = await self._measure(ConnectionManager(), sockets, "1")
+
+            sockets = [FakeWebSocket(delay=0.2) for _ in range(10)] + [FakeWebSocket() for _ in range(990)]
+            sequential_ms = await self._measure_sequential(sockets)
+            return results, sequential_ms
+
+        results, sequential_ms = asyncio.run(run())
+
+        for label, (publish_ms, deliver_ms) in results.items():
+            print(f"{label} 个连接: publish {publish_ms:.2f} ms, 全部快连接送达 {deliver_ms:.2f} ms")
+        print(f"逐个 await 发送（1000+10 慢）: 全部快连接送达 {sequential_ms:.2f} ms")
+
+        # 慢连接的 200ms 延迟不会出现在快连接的送达时间中，逐个 await 时至少累加 10 × 200ms
+        assert results["1000+10 慢"][1] < 200
+        assert sequential_ms >= 2000
+        assert results[1000][0] < 100
@@ -0,0 +1,153 @@
+"""
+评分结果缓存测试
+
+测试 ScoringResultCache 的 TTL/LRU 淘汰与命中统计，
+以及 ScoringEngine 在缓存命中时跳过 API 调用、force_rescore 强制重新评分。
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scoring_cache import ScoringResultCache
+from app.scoring_engine import ScoringEngine
+
+
+SCORING_CONTENT = {
+    "veto_check": {"triggered": False, "reason": ""},
+    "score_details": [],
+    "base_score": 80,
+    "grade_suggestion": "良好",
+    "summary": "良好"
+}
+
+API_RESPONSE = {"success": True, "content": json.dumps(SCORING_CONTENT), "usage": {}}
+
+
+class TestScoringResultCache:
+    """缓存本身的测试"""
+
+    def test_hit_and_miss_counters(self):
+        """测试命中/未命中计数"""
+        cache = ScoringResultCache(max_size=10, ttl=60)
+        assert cache.get("a") is None
+        cache.set("a", {"base_score": 80})
+        assert cache.get("a") == {"base_score": 80}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["size"] == 1
+
+    def test_returns_copies(self):
+        """测试读取到的是副本，修改不影响缓存"""
+        cache = ScoringResultCache(max_size=10, ttl=60)
+        cache.set("a", {"score_details": [1]})
+        cache.get("a")["score_details"].append(2)
+        assert cache.get("a") == {"score_details": [1]}
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = ScoringResultCache(max_size=2, ttl=60)
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.get("a")  # a 变为最近使用
+        cache.set("c", {"v": 3})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+        assert cache.get("c") == {"v": 3}
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """测试条目过期后未命中"""
+        cache = ScoringResultCache(max_size=10, ttl=60)
+        with patch("app.scoring_cache.time.monotonic", return_value=1000.0):
+            cache.set("a", {"v": 1})
+        with patch("app.scoring_cache.time.monotonic", return_value=1059.0):
+            assert cache.get("a") == {"v": 1}
+        with patch("app.scoring_cache.time.monotonic", return_value=1061.0):
+            assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+
+    def test_disabled_cache(self):
+        """测试容量为 0 时不缓存"""
+        cache = ScoringResultCache(max_size=0, ttl=60)
+        cache.set("a", {"v": 1})
+        assert cache.get("a") is None
+
+
+class TestScoringEngineCache:
+    """评分引擎缓存集成测试"""
+
+    def setup_method(self):
+        self.engine = ScoringEngine("test-key")
+
+    def test_cache_hit_skips_api(self):
+        """测试相同文件第二次评分不调用 API"""
+        with patch.object(self.engine.api_client, "call_api", return_value=API_RESPONSE) as call_api:
+            first = self.engine.score_file("教案", "教案内容", file_hash="h1")
+            second = self.engine.score_file("教案", "教案内容", file_hash="h1")
+
+        assert call_api.call_count == 1
+        assert first["final_score"] == second["final_score"] == 80
+        assert self.engine.result_cache.stats()["hits"] == 1
+
+    def test_bonus_items_applied_after_cache_hit(self):
+        """测试缓存命中后加分项重新计算"""
+        with patch.object(self.engine.api_client, "call_api", return_value=API_RESPONSE) as call_api:
+            self.engine.score_file("教案", "教案内容", file_hash="h1")
+            result = self.engine.score_file(
+                "教案", "教案内容", file_hash="h1", bonus_items=[{"name": "获奖", "score": 5}]
+            )
+
+        assert call_api.call_count == 1
+        assert result["bonus_score"] == 5
+        assert result["final_score"] == 85
+
+    def test_force_rescore_bypasses_cache(self):
+        """测试 force_rescore 跳过缓存并刷新缓存结果"""
+        with patch.object(self.engine.api_client, "call_api", return_value=API_RESPONSE) as call_api:
+            self.engine.score_file("教案", "教案内容", file_hash="h1")
+            self.engine.score_file("教案", "教案内容", file_hash="h1", force_rescore=True)
+
+        assert call_api.call_count == 2
+
+    @pytest.mark.parametrize("changes", [
+        {"file_hash": "h2"},
+        {"file_type": "课件"},
+        {"total_score": 50},
+        {"scoring_criteria": [{"name": "完成度", "max_score": 100}]},
+    ])
+    def test_key_includes_scoring_inputs(self, changes):
+        """测试文件、类型、总分、评分标准变化时不复用缓存"""
+        base = {"file_type": "教案", "content": "内容", "file_hash": "h1"}
+        with patch.object(self.engine.api_client, "call_api", return_value=API_RESPONSE) as call_api:
+            self.engine.score_file(**base)
+            self.engine.score_file(**{**base, **changes})
+
+        assert call_api.call_count == 2
+
+    def test_key_includes_model_and_temperature(self):
+        """测试模型或温度变化时不复用缓存"""
+        with patch.object(self.engine.api_client, "call_api", return_value=API_RESPONSE) as call_api:
+            self.engine.score_file("教案", "内容", file_hash="h1")
+            self.engine.api_client.temperature = 0.5
+            self.engine.score_file("教案", "内容", file_hash="h1")
+
+        assert call_api.call_count == 2
+
+    def test_failed_scoring_not_cached(self):
+        """测试评分失败的结果不缓存"""
+        failed = {"success": True, "content": "不是 JSON", "usage": {}}
+        with patch.object(self.engine.api_client, "call_api", return_value=failed) as call_api:
+            assert self.engine.score_file("教案", "内容", file_hash="h1")["success"] is False
+            self.engine.score_file("教案", "内容", file_hash="h1")
+
+        assert call_api.call_count == 2
@@ -0,0 +1,556 @@
+"""
+批量评分后台任务队列测试
+
+验证任务持久化、worker 消费、进度查询、服务重启后的断点续评，以及短文档合并评分。
+"""
+
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import (
+    Base, EvaluationAssignmentTask, EvaluationTemplate, MaterialSubmission, ScoringJob, ScoringJobItem
+)
+from app.realtime import ConnectionManager
+from app.scoring_engine import ScoringEngine
+from app import scoring_jobs
+from app.scoring_jobs import ScoringJobManager, MAX_ATTEMPTS
+
+
+MOCK_SCORING_CONTENT = {
+    "veto_check": {"triggered": False, "reason": ""},
+    "score_details": [{"indicator": "反思深度", "score": 25, "reason": "深入"}],
+    "base_score": 82,
+    "grade_suggestion": "良好",
+    "summary": "整体良好"
+}
+
+SCORING_RESULT = {
+    "success": True,
+    "veto_triggered": False,
+    "base_score": 80,
+    "bonus_score": 0,
+    "final_score": 80,
+    "grade": "良好",
+    "score_details": [],
+    "summary": "良好"
+}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """基于临时文件的 SQLite 数据库"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def submission_ids(session_factory, tmp_path):
+    """创建 4 个带文本文件的提交记录"""
+    db = session_factory()
+    ids = []
+    for i in range(4):
+        file_path = tmp_path / f"reflection_{i}.txt"
+        file_path.write_text(f"教学反思 {i}", encoding="utf-8")
+        db.add(MaterialSubmission(
+            submission_id=f"sub_{i}",
+            teacher_id=f"t{i}",
+            teacher_name=f"教师{i}",
+            files=[{"file_name": file_path.name, "file_url": str(file_path)}]
+        ))
+        ids.append(f"sub_{i}")
+    db.commit()
+    db.close()
+    return ids
+
+
+def _make_manager(session_factory, scored, events=None):
+    """创建任务管理器，评分调用记录到 scored 列表"""
+    manager = ScoringJobManager(
+        ScoringEngine("test-key"), session_factory=session_factory, workers=2, poll_interval=0.05,
+        events=events or ConnectionManager()
+    )
+
+    async def fake_score_item(item, bonus_items=None, on_partial=None):
+        scored.append(item["submission_id"])
+        await asyncio.sleep(0.01)
+        return dict(SCORING_RESULT)
+
+    manager.batch_engine.score_item = fake_score_item
+    return manager
+
+
+def _mock_api_manager(session_factory, requests, prompt_batch_size=None):
+    """
+    创建使用模拟 DeepSeek 接口的任务管理器（不替换评分流程）
+
+    文件直接读取文本；requests 记录每个请求合并的文档数（单文档请求为 0）。
+    """
+    def handler(request):
+        prompt = json.loads(request.content)["messages"][0]["content"]
+        documents = len(re.findall(r"【文档 \d+】", prompt))
+        requests.append(documents)
+        if documents:
+            content = [dict(MOCK_SCORING_CONTENT, document=i) for i in range(1, documents + 1)]
+        else:
+            content = MOCK_SCORING_CONTENT
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": json.dumps(content, ensure_ascii=False)}}],
+            "usage": {"total_tokens": 100}
+        })
+
+    scoring_engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+    scoring_engine.async_api_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    manager = ScoringJobManager(
+        scoring_engine, session_factory=session_factory, workers=1, poll_interval=0.05,
+        events=ConnectionManager(), prompt_batch_size=prompt_batch_size
+    )
+
+    async def read_file(item):
+        with open(item["file_path"], encoding="utf-8") as f:
+            return {"content": f.read(), "file_hash": None}
+
+    manager.batch_engine.parse_item = read_file
+    return manager
+
+
+def _run_job(manager, ids):
+    """启动 worker 池并等待任务完成"""
+    async def run():
+        await manager.start()
+        try:
+            created = await manager.enqueue(ids)
+            return await _wait_completed(manager, created["job_id"])
+        finally:
+            await manager.stop()
+
+    return asyncio.run(run())
+
+
+async def _wait_completed(manager, job_id, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = manager.get_job(job_id)
+        if job["status"] == "completed":
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"任务未在 {timeout} 秒内完成: {manager.get_job(job_id)}")
+
+
+class TestScoringJobManager:
+    """任务队列测试"""
+
+    def test_enqueue_and_process(self, session_factory, submission_ids):
+        """测试入队后由 worker 完成评分，逐项状态可查询"""
+        scored = []
+        manager = _make_manager(session_factory, scored)
+        request_ids = submission_ids + ["sub_missing"]
+
+        async def run():
+            await manager.start()
+            try:
+                created = await manager.enqueue(request_ids, created_by=1)
+                assert created["status"] == "pending"
+                assert created["total"] == 5
+                return await _wait_completed(manager, created["job_id"])
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+
+        assert job["success"] == 4
+        assert job["failed"] == 1
+        assert job["pending"] == 0
+        assert [r["submission_id"] for r in job["results"]] == request_ids
+        assert job["results"][-1]["status"] == "failed"
+        assert job["results"][-1]["error"] == "提交记录不存在"
+        assert job["results"][0]["scoring_result"]["final_score"] == 80
+        assert sorted(scored) == submission_ids
+
+        db = session_factory()
+        for submission in db.query(MaterialSubmission).all():
+            assert submission.scoring_status == "scored"
+            assert submission.review_status == "scored"
+        db.close()
+
+    def test_progress_pushed_over_websocket(self, session_factory, submission_ids):
+        """测试每完成一项推送一次进度，最后一条为完成状态"""
+        class FakeWebSocket:
+            def __init__(self):
+                self.messages = []
+
+            async def accept(self):
+                pass
+
+            async def send_text(self, text):
+                self.messages.append(json.loads(text))
+
+        events = ConnectionManager()
+        websocket = FakeWebSocket()
+        manager = _make_manager(session_factory, [], events=events)
+
+        async def run():
+            await events.connect(websocket, "all")
+            await manager.start()
+            try:
+                created = await manager.enqueue(submission_ids, created_by=1)
+                await _wait_completed(manager, created["job_id"])
+                await asyncio.sleep(0.05)
+                return created["job_id"]
+            finally:
+                await manager.stop()
+                await events.close()
+
+        job_id = asyncio.run(run())
+
+        progress = [m["data"] for m in websocket.messages if m["type"] == "scoring_job_progress"]
+        assert progress
+        assert all(p["job_id"] == job_id for p in progress)
+        assert progress[-1]["status"] == "completed"
+        assert progress[-1]["success"] == 4
+
+    def test_enqueue_without_workers_persists_job(self, session_factory, submission_ids):
+        """测试 worker 未启动时任务仍持久化，启动后被消费"""
+        scored = []
+        manager = _make_manager(session_factory, scored)
+
+        created = asyncio.run(manager.enqueue(submission_ids[:2]))
+        assert manager.get_job(created["job_id"])["pending"] == 2
+        assert scored == []
+
+        async def run():
+            await manager.start()
+            try:
+                return await _wait_completed(manager, created["job_id"])
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+        assert job["success"] == 2
+
+    def test_resume_after_restart(self, session_factory, submission_ids):
+        """测试重启后中断的评分项重新评分，已完成的不重复评分"""
+        scored = []
+        manager = _make_manager(session_factory, scored)
+        created = asyncio.run(manager.enqueue(submission_ids))
+        job_id = created["job_id"]
+
+        # 模拟上次运行：第 1 项已完成，第 2 项评分中途服务重启
+        db = session_factory()
+        items = db.query(ScoringJobItem).filter(
+            ScoringJobItem.job_id == job_id
+        ).order_by(ScoringJobItem.position).all()
+        items[0].status = "scored"
+        items[0].attempts = 1
+        items[1].status = "scoring"
+        items[1].attempts = 1
+        job = db.query(ScoringJob).filter(ScoringJob.job_id == job_id).first()
+        job.status = "running"
+        job.success_count = 1
+        db.query(MaterialSubmission).filter(
+            MaterialSubmission.submission_id == submission_ids[1]
+        ).update({MaterialSubmission.scoring_status: "scoring"})
+        db.commit()
+        db.close()
+
+        async def run():
+            await manager.start()
+            try:
+                return await _wait_completed(manager, job_id)
+            finally:
+                await manager.stop()
+
+        result = asyncio.run(run())
+
+        assert result["success"] == 4
+        assert sorted(scored) == submission_ids[1:]
+
+        db = session_factory()
+        resumed = db.query(ScoringJobItem).filter(ScoringJobItem.job_id == job_id,
+                                                  ScoringJobItem.position == 1).first()
+        assert resumed.attempts == 2
+        db.close()
+
+    def test_item_interrupted_too_many_times_fails(self, session_factory, submission_ids):
+        """测试反复中断的评分项不会无限重试"""
+        scored = []
+        manager = _make_manager(session_factory, scored)
+        created = asyncio.run(manager.enqueue(submission_ids[:1]))
+
+        db = session_factory()
+        item = db.query(ScoringJobItem).filter(ScoringJobItem.job_id == created["job_id"]).first()
+        item.status = "scoring"
+        item.attempts = MAX_ATTEMPTS
+        db.commit()
+        db.close()
+
+        async def run():
+            await manager.start()
+            try:
+                return await _wait_completed(manager, created["job_id"])
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+
+        assert job["failed"] == 1
+        assert "多次中断" in job["results"][0]["error"]
+        assert scored == []
+
+    def test_stop_resets_in_flight_items(self, session_factory, submission_ids):
+        """测试停止时正在评分的项重置为 pending"""
+        manager = ScoringJobManager(
+            ScoringEngine("test-key"), session_factory=session_factory, workers=1, poll_interval=0.05
+        )
+        started = []
+
+        async def slow_score_item(item, bonus_items=None, on_partial=None):
+            started.append(item["submission_id"])
+            await asyncio.sleep(10)
+
+        manager.batch_engine.score_item = slow_score_item
+
+        async def run():
+            await manager.start()
+            created = await manager.enqueue(submission_ids[:1])
+            while not started:
+                await asyncio.sleep(0.01)
+            await manager.stop()
+            return created["job_id"]
+
+        job_id = asyncio.run(run())
+
+        job = manager.get_job(job_id)
+        assert job["results"][0]["status"] == "pending"
+        db = session_factory()
+        assert db.get(MaterialSubmission, submission_ids[0]).scoring_status == "pending"
+        db.close()
+
+    def test_db_errors_are_retried(self, session_factory, submission_ids, monkeypatch):
+        """测试领取与写回时数据库报错（如 database is locked）会退避重试，结果不丢失"""
+        monkeypatch.setattr(scoring_jobs, "DB_RETRY_DELAY", 0.01)
+        scored = []
+        manager = _make_manager(session_factory, scored)
+        failures = {"_claim_next": 1, "_finish_item": 2}
+
+        for name in failures:
+            original = getattr(manager, name)
+
+            def flaky(*args, _name=name, _original=original):
+                if failures[_name]:
+                    failures[_name] -= 1
+                    raise OperationalError("UPDATE", {}, Exception("database is locked"))
+                return _original(*args)
+
+            flaky.__name__ = name
+            setattr(manager, name, flaky)
+
+        async def run():
+            await manager.start()
+            try:
+                created = await manager.enqueue(submission_ids)
+                return await _wait_completed(manager, created["job_id"])
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+
+        assert failures == {"_claim_next": 0, "_finish_item": 0}
+        assert job["success"] == 4
+        assert sorted(scored) == submission_ids
+
+    def test_failed_write_back_requeues_item(self, session_factory, submission_ids, monkeypatch):
+        """测试写回多次失败的明细重新排队评分，任务最终完成"""
+        monkeypatch.setattr(scoring_jobs, "DB_RETRY_ATTEMPTS", 2)
+        monkeypatch.setattr(scoring_jobs, "DB_RETRY_DELAY", 0.01)
+        scored = []
+        manager = _make_manager(session_factory, scored)
+        manager.workers = 1
+        original = manager._finish_item
+        failures = [scoring_jobs.DB_RETRY_ATTEMPTS]
+
+        def flaky_finish(*args):
+            if failures[0]:
+                failures[0] -= 1
+                raise OperationalError("UPDATE", {}, Exception("database is locked"))
+            return original(*args)
+
+        flaky_finish.__name__ = "_finish_item"
+        manager._finish_item = flaky_finish
+
+        async def run():
+            await manager.start()
+            try:
+                created = await manager.enqueue(submission_ids)
+                return await _wait_completed(manager, created["job_id"])
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+
+        assert job["success"] == 4
+        assert scored == [submission_ids[0]] + submission_ids
+
+        db = session_factory()
+        first = db.query(ScoringJobItem).filter(ScoringJobItem.submission_id == submission_ids[0]).first()
+        assert first.attempts == 2
+        db.close()
+
+    def test_crashed_worker_restarted(self, session_factory, submission_ids):
+        """测试 worker 意外退出后自动重启，队列继续消费"""
+        events = ConnectionManager()
+        manager = _make_manager(session_factory, [], events=events)
+        manager.workers = 1
+        original_publish = events.publish
+        crashes = []
+
+        def publish(event_type, data, **kwargs):
+            if not crashes:
+                crashes.append(event_type)
+                raise RuntimeError("推送异常")
+            original_publish(event_type, data, **kwargs)
+
+        events.publish = publish
+
+        async def run():
+            await manager.start()
+            try:
+                created = await manager.enqueue(submission_ids)
+                job = await _wait_completed(manager, created["job_id"])
+                assert len(manager._worker_tasks) == 1
+                assert not manager._worker_tasks[0].done()
+                return job
+            finally:
+                await manager.stop()
+
+        job = asyncio.run(run())
+
+        assert crashes == ["scoring_job_progress"]
+        assert job["success"] == 4
+
+    def test_evaluation_task_uses_template_total_score(self, session_factory, tmp_path):
+        """测试考评任务使用考评表总分评分，结果写入任务评分字段；文件缺失的项记为失败"""
+        file_path = tmp_path / "plan.txt"
+        file_path.write_text("教案内容", encoding="utf-8")
+
+        db = session_factory()
+        db.add(EvaluationTemplate(
+            template_id="tpl_1",
+            name="考评表",
+            file_url="tpl.pdf",
+            file_name="tpl.pdf",
+            file_type="pdf",
+            scoring_criteria=[{"name": "完成度", "max_score": 50}],
+            total_score=50,
+            submission_requirements={},
+            deadline=datetime.utcnow() + timedelta(days=7),
+            target_teachers=[]
+        ))
+        db.add(EvaluationAssignmentTask(
+            task_id="task_1",
+            template_id="tpl_1",
+            teacher_id="t1",
+            teacher_name="教师1",
+            status="submitted",
+            deadline=datetime.utcnow() + timedelta(days=7),
+            submitted_files=[{"file_name": "plan.txt", "file_url": str(file_path)}]
+        ))
+        db.add(MaterialSubmission(
+            submission_id="sub_nofile",
+            teacher_id="tx",
+            teacher_name="教师X",
+            files=[{"file_name": "missing.txt", "file_url": str(tmp_path / "missing.txt")}]
+        ))
+        db.commit()
+        db.close()
+
+        job = _run_job(_mock_api_manager(session_factory, []), ["task_1", "sub_nofile"])
+
+        assert job["success"] == 1
+        assert job["results"][1]["error"].startswith("文件不存在")
+        db = session_factory()
+        task = db.get(EvaluationAssignmentTask, "task_1")
+        assert task.status == "scored"
+        # 基础分 82 超过考评表总分 50，最终分不超过总分
+        assert task.total_score == 50
+        assert task.scores["final_score"] == 50
+        db.close()
+
+    def test_empty_job_completed_immediately(self, session_factory):
+        """测试空任务直接完成"""
+        manager = _make_manager(session_factory, [])
+        created = asyncio.run(manager.enqueue([]))
+        assert created["status"] == "completed"
+        assert manager.get_job(created["job_id"])["results"] == []
+
+    def test_unknown_job(self, session_factory):
+        """测试查询不存在的任务"""
+        manager = _make_manager(session_factory, [])
+        assert manager.get_job("job_unknown") is None
+
+
+class TestPromptBatching:
+    """多文档合并评分测试"""
+
+    def _create_submissions(self, session_factory, tmp_path, contents):
+        db = session_factory()
+        ids = []
+        for i, content in enumerate(contents):
+            file_path = tmp_path / f"batch_reflection_{i}.txt"
+            file_path.write_text(content, encoding="utf-8")
+            db.add(MaterialSubmission(
+                submission_id=f"batch_{i:02d}",
+                teacher_id=f"t{i}",
+                teacher_name=f"教师{i}",
+                files=[{"file_name": file_path.name, "file_url": str(file_path)}]
+            ))
+            ids.append(f"batch_{i:02d}")
+        db.commit()
+        db.close()
+        return ids
+
+    def test_short_documents_share_one_request(self, session_factory, tmp_path):
+        """测试 worker 领取同组短文档合并请求，长文档单独评分，结果逐项写回"""
+        contents = [f"教学反思 {i}：本节课目标明确。" for i in range(10)]
+        contents.insert(1, "很长的教学反思。" * 1000)
+        ids = self._create_submissions(session_factory, tmp_path, contents)
+        requests = []
+
+        job = _run_job(_mock_api_manager(session_factory, requests, prompt_batch_size=4), ids)
+
+        assert job["success"] == 11
+        assert sorted(requests) == [0, 3, 3, 4]
+        db = session_factory()
+        try:
+            for submission in db.query(MaterialSubmission).all():
+                assert submission.scoring_status == "scored"
+                assert submission.scoring_result["base_score"] == 82
+                assert submission.scoring_result["summary"] == "整体良好"
+        finally:
+            db.close()
+
+    def test_disabled_by_default(self, session_factory, tmp_path):
+        ids = self._create_submissions(session_factory, tmp_path, ["反思一", "反思二", "反思三"])
+        requests = []
+
+        job = _run_job(_mock_api_manager(session_factory, requests), ids)
+
+        assert job["success"] == 3
+        assert requests == [0, 0, 0]
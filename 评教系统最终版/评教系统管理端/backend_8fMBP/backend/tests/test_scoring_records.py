@@ -0,0 +1,170 @@
+"""
+评分记录快照测试
+
+测试快照 ETag 随内容变化、评分结果写入时推送消息入队，
+以及 /api/scoring/records/{submission_id} 的 ETag / 304 条件请求，
+和教师端重新验证使用的服务间接口 /api/scoring/internal/records/{submission_id}。
+"""
+
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import get_current_active_user
+from app.batch_scoring import apply_scoring_result
+from app.database import get_db
+from app.models import Base, EvaluationAssignmentTask, MaterialSubmission, ScoringRecord, SyncOutbox
+from app.routes import scoring as scoring_routes
+from app.routes.scoring import router as scoring_router
+from app.scoring_records import scoring_records_snapshot
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(MaterialSubmission(
+        submission_id="sub_1",
+        teacher_id="t1",
+        teacher_name="教师1",
+        files=[],
+        submitted_at=datetime(2026, 1, 1),
+        review_status="pending"
+    ))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _add_record(db, final_score=88.0):
+    db.add(ScoringRecord(
+        submission_id="sub_1", file_id="f1", file_type="教案", file_name="教案.pdf",
+        base_score=final_score, bonus_score=0, final_score=final_score, grade="良好",
+        score_details='{"完整性": 10}', scored_at=datetime(2026, 1, 2)
+    ))
+    db.commit()
+
+
+class TestScoringRecordsSnapshot:
+    """快照测试"""
+
+    def test_missing_submission(self, db):
+        assert scoring_records_snapshot(db, "unknown") is None
+
+    def test_etag_changes_only_with_content(self, db):
+        first = scoring_records_snapshot(db, "sub_1")
+        assert first["records"] == []
+        assert scoring_records_snapshot(db, "sub_1")["etag"] == first["etag"]
+
+        _add_record(db)
+        second = scoring_records_snapshot(db, "sub_1")
+        assert second["etag"] != first["etag"]
+        assert second["records"][0]["final_score"] == 88.0
+        assert second["records"][0]["score_details"] == '{"完整性": 10}'
+        assert second["updated_at"] is not None
+
+    def test_apply_scoring_result_enqueues_push(self, db):
+        submission = db.get(MaterialSubmission, "sub_1")
+        apply_scoring_result(submission, {"final_score": 90, "grade": "优秀"})
+        db.commit()
+
+        message = db.query(SyncOutbox).one()
+        assert message.path == "/api/admin/sync-scoring-records"
+        assert message.payload["review_status"] == "scored"
+        assert message.payload["scoring_result"]["final_score"] == 90
+        assert message.idempotency_key == f"scoring-records:sub_1:{message.payload['etag']}"
+
+    def test_apply_scoring_result_to_task_enqueues_score(self, db):
+        db.add(EvaluationAssignmentTask(
+            task_id="tpl_1_t1", template_id="tpl_1", teacher_id="t1", teacher_name="教师1",
+            deadline=datetime(2026, 1, 1), status="submitted"
+        ))
+        db.commit()
+
+        apply_scoring_result(db.get(EvaluationAssignmentTask, "tpl_1_t1"), {"final_score": 75})
+        db.commit()
+
+        message = db.query(SyncOutbox).one()
+        assert message.path == "/api/admin/sync-evaluation-score"
+        assert message.payload["total_score"] == 75
+
+
+class TestScoringRecordsEndpoint:
+    """条件请求测试"""
+
+    @pytest.fixture
+    def client(self, db):
+        app = FastAPI()
+        app.include_router(scoring_router)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_active_user] = lambda: None
+        with TestClient(app) as client:
+            yield client
+
+    def test_etag_and_not_modified(self, client, db):
+        response = client.get("/api/scoring/records/sub_1")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.json()["etag"] == etag
+        assert response.json()["teacher_name"] == "教师1"
+
+        not_modified = client.get("/api/scoring/records/sub_1", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+
+        _add_record(db)
+        changed = client.get("/api/scoring/records/sub_1", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert len(changed.json()["records"]) == 1
+
+    def test_missing_submission(self, client):
+        assert client.get("/api/scoring/records/unknown").status_code == 404
+
+
+class TestTeacherServiceEndpoint:
+    """服务间接口测试（不覆盖登录依赖）"""
+
+    @pytest.fixture
+    def client(self, db):
+        app = FastAPI()
+        app.include_router(scoring_router)
+        app.dependency_overrides[get_db] = lambda: db
+        with TestClient(app) as client:
+            yield client
+
+    def test_user_endpoint_requires_login(self, client):
+        assert client.get("/api/scoring/records/sub_1").status_code in (401, 403)
+
+    def test_revalidate_without_login(self, client):
+        response = client.get("/api/scoring/internal/records/sub_1")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        not_modified = client.get("/api/scoring/internal/records/sub_1", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert client.get("/api/scoring/internal/records/unknown").status_code == 404
+
+    def test_sync_token_checked_when_configured(self, client, monkeypatch):
+        monkeypatch.setattr(scoring_routes, "SYNC_SERVICE_TOKEN", "secret")
+
+        assert client.get("/api/scoring/internal/records/sub_1").status_code == 403
+        assert client.get(
+            "/api/scoring/internal/records/sub_1", headers={"X-Sync-Token": "wrong"}
+        ).status_code == 403
+        assert client.get(
+            "/api/scoring/internal/records/sub_1", headers={"X-Sync-Token": "secret"}
+        ).status_code == 200
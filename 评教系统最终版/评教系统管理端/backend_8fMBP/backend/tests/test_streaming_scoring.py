@@ -0,0 +1,233 @@
+"""
+流式评分测试
+
+测试增量 JSON 解析器在任意分段下的解析结果、异步客户端解析 SSE 流并推送中间结果，
+以及触发否决项后立即停止生成。
+"""
+
+import asyncio
+import json
+import random
+
+import httpx
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.deepseek_client import AsyncDeepseekAPIClient
+from app.scoring_engine import ScoringEngine
+from app.utils.json_stream import IncrementalJSONParser
+
+
+SCORING_CONTENT = {
+    "veto_check": {"triggered": False, "reason": ""},
+    "score_details": [
+        {"indicator": "教学目标", "score": 18, "reason": "目标明确，\"可测\"，覆盖 {知识, 能力}"},
+        {"indicator": "教学内容", "score": 20.5, "reason": "内容充实]"}
+    ],
+    "base_score": 85,
+    "grade_suggestion": "良好",
+    "summary": "整体良好\n建议：\\加强评价环节"
+}
+
+VETO_CONTENT = {
+    "veto_check": {"triggered": True, "reason": "教学目标完全缺失"},
+    "score_details": [{"indicator": "教学目标", "score": 0, "reason": "缺失"}],
+    "base_score": 0,
+    "grade_suggestion": "不合格",
+    "summary": "未达到基本要求" * 50
+}
+
+
+def _model_output(content: dict) -> str:
+    """模拟大模型输出：代码块包裹的 JSON"""
+    return "```json\n" + json.dumps(content, ensure_ascii=False, indent=4) + "\n```"
+
+
+def _sse_lines(text: str, chunk_size: int = 5, usage: bool = True):
+    """把模型输出按固定长度切分为 SSE 数据块"""
+    for i in range(0, len(text), chunk_size):
+        chunk = {"choices": [{"index": 0, "delta": {"content": text[i:i + chunk_size]}}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    if usage:
+        yield f"data: {json.dumps({'choices': [], 'usage': {'total_tokens': 321}})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def _streaming_client(handler) -> AsyncDeepseekAPIClient:
+    client = AsyncDeepseekAPIClient("test-key", "https://mock.deepseek/v1/chat")
+    client.streaming = True
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+class TestIncrementalJSONParser:
+    """增量 JSON 解析测试"""
+
+    def test_any_chunking_gives_same_result(self):
+        text = "好的，评分结果如下：\n" + _model_output(SCORING_CONTENT) + "\n以上 {仅供参考}"
+        rng = random.Random(7)
+        for _ in range(100):
+            parser = IncrementalJSONParser()
+            i = 0
+            while i < len(text):
+                size = rng.randint(1, 9)
+                parser.feed(text[i:i + size])
+                i += size
+            assert parser.done
+            assert parser.fields == SCORING_CONTENT
+            assert parser.items["score_details"] == SCORING_CONTENT["score_details"]
+
+    def test_fields_available_before_object_ends(self):
+        """测试顶层字段和数组元素在整个对象结束前即可读取"""
+        text = json.dumps(SCORING_CONTENT, ensure_ascii=False)
+        details_at, base_score_at = text.index('"score_details"'), text.index('"base_score"')
+        parser = IncrementalJSONParser()
+
+        assert parser.feed(text[:details_at]) is True
+        assert parser.fields == {"veto_check": SCORING_CONTENT["veto_check"]}
+
+        assert parser.feed(text[details_at:base_score_at]) is True
+        assert parser.snapshot()["score_details"] == SCORING_CONTENT["score_details"]
+        assert "base_score" not in parser.fields
+        assert not parser.done
+
+    def test_incomplete_value_not_reported(self):
+        parser = IncrementalJSONParser()
+        assert parser.feed('{"base_score": 8') is False
+        assert parser.feed('5, "summary": "未完') is True
+        assert parser.fields == {"base_score": 85}
+
+
+class TestStreamingClient:
+    """流式 API 调用测试"""
+
+    def test_stream_result_and_partial_callbacks(self):
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(json.loads(request.content))
+            body = "".join(_sse_lines(_model_output(SCORING_CONTENT))).encode()
+            return httpx.Response(200, content=body, headers={"Content-Type": "text/event-stream"})
+
+        partials = []
+
+        async def run():
+            client = _streaming_client(handler)
+            result = await client.call_api("prompt", on_partial=partials.append)
+            await client.aclose()
+            return result
+
+        result = asyncio.run(run())
+
+        assert requests_seen[0]["stream"] is True
+        assert result["success"] is True
+        assert result["stopped_early"] is False
+        assert result["fields"] == SCORING_CONTENT
+        assert result["usage"] == {"total_tokens": 321}
+        assert json.loads(result["content"].strip("`json\n")) == SCORING_CONTENT
+        # 中间结果按字段顺序逐步出现
+        assert list(partials[0]) == ["veto_check"]
+        assert partials[1]["score_details"] == SCORING_CONTENT["score_details"][:1]
+        assert partials[-1] == SCORING_CONTENT
+
+    def test_error_status_is_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, text="busy")
+            return httpx.Response(200, content="".join(_sse_lines(_model_output(SCORING_CONTENT))).encode())
+
+        async def run():
+            client = _streaming_client(handler)
+            client._backoff = lambda attempt: asyncio.sleep(0)
+            result = await client.call_api("prompt")
+            await client.aclose()
+            return result
+
+        result = asyncio.run(run())
+        assert len(calls) == 2
+        assert result["fields"] == SCORING_CONTENT
+
+
+class TestStreamingScoring:
+    """流式评分引擎测试"""
+
+    def test_streaming_result_matches_non_streaming(self):
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        non_streaming = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        engine.async_api_client = _streaming_client(
+            lambda request: httpx.Response(200, content="".join(_sse_lines(_model_output(SCORING_CONTENT))).encode())
+        )
+        non_streaming.async_api_client._client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={
+                "choices": [{"message": {"content": _model_output(SCORING_CONTENT)}}], "usage": {}
+            })
+        ))
+
+        result = asyncio.run(engine.score_file_async("教案", "教案内容"))
+        expected = asyncio.run(non_streaming.score_file_async("教案", "教案内容"))
+
+        assert result == expected
+        assert result["final_score"] == 85
+
+    def test_veto_stops_generation(self):
+        """测试判定触发否决项后立即停止生成，不再读取后续数据块"""
+        sent = []
+
+        async def stream():
+            for line in _sse_lines(_model_output(VETO_CONTENT), chunk_size=3):
+                sent.append(line)
+                yield line.encode()
+                await asyncio.sleep(0)
+
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        engine.async_api_client = _streaming_client(lambda request: httpx.Response(200, content=stream()))
+        partials = []
+
+        result = asyncio.run(engine.score_file_async("教案", "教案内容", on_partial=partials.append))
+
+        total_chunks = len(list(_sse_lines(_model_output(VETO_CONTENT), chunk_size=3)))
+        assert result["success"] is True
+        assert result["veto_triggered"] is True
+        assert result["veto_reason"] == "教学目标完全缺失"
+        assert result["final_score"] == 0
+        assert len(sent) < total_chunks / 5
+        assert partials == [{"veto_check": VETO_CONTENT["veto_check"]}]
+
+    def test_veto_stopped_result_cached_separately(self):
+        """测试否决提前停止的结果单独缓存：流式评分直接命中，非流式评分仍请求完整结果"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, content="".join(_sse_lines(_model_output(VETO_CONTENT))).encode())
+
+        def full_handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": _model_output(SCORING_CONTENT)}}], "usage": {}
+            })
+
+        engine = ScoringEngine("test-key", "https://mock.deepseek/v1/chat")
+        engine.async_api_client = _streaming_client(handler)
+        non_streaming = ScoringEngine("test-key", "https://mock.deepseek/v1/chat", result_cache=engine.result_cache)
+        non_streaming.async_api_client.streaming = False
+        non_streaming.async_api_client._client = httpx.AsyncClient(transport=httpx.MockTransport(full_handler))
+
+        first = asyncio.run(engine.score_file_async("教案", "教案内容"))
+        second = asyncio.run(engine.score_file_async("教案", "教案内容"))
+        assert first["veto_triggered"] is True
+        assert second == first
+        assert len(calls) == 1
+
+        full = asyncio.run(non_streaming.score_file_async("教案", "教案内容"))
+        assert full["veto_triggered"] is False
+        assert len(calls) == 2
+
+        # 完整结果写入后，流式评分优先使用完整结果
+        assert asyncio.run(engine.score_file_async("教案", "教案内容")) == full
+        assert len(calls) == 2
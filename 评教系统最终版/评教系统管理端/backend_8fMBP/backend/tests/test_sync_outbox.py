@@ -0,0 +1,441 @@
+"""
+同步发件箱测试
+
+测试消息随业务事务提交/回滚、幂等键去重、分发器合并批量发送、
+教师端不可用时按指数退避重试，超过最大次数后标记为 failed，
+以及接口把同步交给后台任务后的响应延迟（与等待教师端响应的旧实现对比）。
+"""
+
+import asyncio
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.background_workers import BackgroundWorkerPool
+from app.models import Base, SyncOutbox, Teacher, EvaluationTemplate
+from app.services import sync_services
+from app.services.sync_services import TeacherSyncClient
+from app import sync_outbox
+from app.sync_outbox import (
+    OutboxDispatcher, backoff_delay, OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX,
+    enqueue_evaluation_tasks, enqueue_evaluation_score, enqueue_review_status,
+    dispatch_in_background
+)
+from app.task_distribution import distribute_template
+
+
+class _MockTeacherHandler(BaseHTTPRequestHandler):
+    """模拟教师端同步接口，server.fail 为 True 时返回 503"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(server.delay)
+        with server.lock:
+            server.requests.append((self.command, self.path, body))
+        code = 503 if server.fail else 200
+        data = json.dumps({"message": "ok" if code == 200 else "unavailable"}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_POST = _handle
+    do_PUT = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def teacher_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockTeacherHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.fail = False
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _template():
+    return SimpleNamespace(
+        template_id="tpl_1",
+        name="教学考评表",
+        file_url="/uploads/tpl.pdf",
+        file_type="pdf",
+        submission_requirements={},
+        scoring_criteria=[],
+        total_score=100,
+        deadline=datetime(2026, 1, 1)
+    )
+
+
+def _seed_template(db, template_id, teacher_count=0):
+    if teacher_count:
+        db.add_all([
+            Teacher(teacher_id=f"t{i}", teacher_name=f"教师{i}", department_id="d1")
+            for i in range(teacher_count)
+        ])
+    template = EvaluationTemplate(
+        template_id=template_id, name="教学考评表", file_url="/uploads/tpl.pdf", file_name="tpl.pdf",
+        file_type="pdf", scoring_criteria=[], submission_requirements={},
+        deadline=datetime(2026, 1, 1), target_teachers=[], status="draft"
+    )
+    db.add(template)
+    db.commit()
+    return template
+
+
+def _dispatch(session_factory, url, **kwargs):
+    """用独立的客户端执行一次分发"""
+    client = TeacherSyncClient(url, batch_size=kwargs.pop("client_batch_size", 200), timeout=2)
+    dispatcher = OutboxDispatcher(session_factory=session_factory, client=client, **kwargs)
+
+    async def main():
+        try:
+            return await dispatcher.dispatch_once()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def _make_due(session_factory):
+    """跳过退避等待"""
+    db = session_factory()
+    db.query(SyncOutbox).update({SyncOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+
+
+class TestEnqueue:
+    """入队测试"""
+
+    def test_messages_commit_and_rollback_with_business_transaction(self, session_factory):
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), ["t1", "t2"])
+        db.rollback()
+        assert db.query(SyncOutbox).count() == 0
+
+        enqueue_evaluation_tasks(db, _template(), ["t1", "t2"])
+        db.commit()
+        rows = db.query(SyncOutbox).order_by(SyncOutbox.id).all()
+        assert [r.idempotency_key for r in rows] == ["task:tpl_1_t1", "task:tpl_1_t2"]
+        assert rows[0].status == "pending"
+        assert rows[0].bulk_path == "/api/admin/sync-evaluation-tasks"
+        assert rows[0].payload["deadline"] == "2026-01-01T00:00:00"
+        db.close()
+
+    def test_idempotency_key_deduplicates(self, session_factory):
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), ["t1", "t1"])
+        db.commit()
+        enqueue_evaluation_tasks(db, _template(), ["t1", "t2"])
+        db.commit()
+
+        assert db.query(SyncOutbox).count() == 2
+        db.close()
+
+    def test_each_scoring_is_a_new_message(self, session_factory):
+        db = session_factory()
+        task = SimpleNamespace(task_id="tpl_1_t1", template_id="tpl_1", teacher_id="t1",
+                               scores={"a": 1}, total_score=1, scoring_feedback="",
+                               scored_at=datetime(2026, 1, 1))
+        enqueue_evaluation_score(db, task)
+        enqueue_evaluation_score(db, task)
+        task.scored_at = datetime(2026, 1, 2)
+        enqueue_evaluation_score(db, task)
+        db.commit()
+
+        assert db.query(SyncOutbox).count() == 2
+        db.close()
+
+    def test_distribute_template_enqueues_in_same_transaction(self, session_factory):
+        db = session_factory()
+        template = _seed_template(db, "tpl_1", teacher_count=3)
+
+        distribute_template(db, template)
+        result = distribute_template(db, template)
+
+        keys = [k for (k,) in db.query(SyncOutbox.idempotency_key).order_by(SyncOutbox.id)]
+        assert keys == ["task:tpl_1_t0", "task:tpl_1_t1", "task:tpl_1_t2"]
+        assert result["sync_keys"] == keys
+        db.close()
+
+
+class TestDispatcher:
+    """分发器测试"""
+
+    def test_batches_bulk_messages_and_sends_single_ones(self, session_factory, teacher_server):
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), [f"t{i:03d}" for i in range(250)])
+        enqueue_review_status(db, "sub_1", "approved", "", "2026-01-01T00:00:00")
+        db.commit()
+        db.close()
+
+        result = _dispatch(session_factory, teacher_server.url, client_batch_size=100)
+
+        assert result == {"claimed": 251, "sent": 251, "retry": 0, "failed": 0}
+        requests = sorted((method, path) for method, path, _ in teacher_server.requests)
+        assert requests == [("POST", "/api/admin/sync-evaluation-tasks")] * 3 + [("PUT", "/api/admin/sync-review")]
+
+        db = session_factory()
+        assert db.query(SyncOutbox).filter(SyncOutbox.status == "sent").count() == 251
+        assert db.query(SyncOutbox).filter(SyncOutbox.sent_at.is_(None)).count() == 0
+        db.close()
+
+        # 已发送的消息不会再次发送
+        assert _dispatch(session_factory, teacher_server.url)["claimed"] == 0
+
+    def test_batch_size_limits_claimed_messages(self, session_factory, teacher_server):
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), [f"t{i}" for i in range(5)])
+        db.commit()
+        db.close()
+
+        assert _dispatch(session_factory, teacher_server.url, batch_size=3)["claimed"] == 3
+        assert _dispatch(session_factory, teacher_server.url, batch_size=3)["claimed"] == 2
+
+    def test_failure_retries_with_backoff_then_succeeds(self, session_factory, teacher_server):
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), ["t1"])
+        db.commit()
+        db.close()
+
+        teacher_server.fail = True
+        assert _dispatch(session_factory, teacher_server.url)["retry"] == 1
+
+        db = session_factory()
+        row = db.query(SyncOutbox).one()
+        assert row.status == "pending"
+        assert row.attempts == 1
+        assert row.last_error.startswith("503")
+        assert row.next_attempt_at > datetime.utcnow()
+        db.close()
+
+        # 退避期间不会重发
+        assert _dispatch(session_factory, teacher_server.url)["claimed"] == 0
+
+        teacher_server.fail = False
+        _make_due(session_factory)
+        assert _dispatch(session_factory, teacher_server.url)["sent"] == 1
+
+        db = session_factory()
+        row = db.query(SyncOutbox).one()
+        assert row.status == "sent"
+        assert row.attempts == 2
+        assert row.last_error is None
+        db.close()
+
+    def test_gives_up_after_max_attempts(self, session_factory):
+        db = session_factory()
+        enqueue_review_status(db, "sub_1", "approved", "", "2026-01-01T00:00:00")
+        db.commit()
+        db.close()
+
+        for _ in range(2):
+            _dispatch(session_factory, "http://127.0.0.1:9", max_attempts=3)
+            _make_due(session_factory)
+        assert _dispatch(session_factory, "http://127.0.0.1:9", max_attempts=3)["failed"] == 1
+
+        db = session_factory()
+        row = db.query(SyncOutbox).one()
+        assert row.status == "failed"
+        assert row.attempts == 3
+        db.close()
+
+    def test_backoff_delay_is_exponential_and_capped(self):
+        assert backoff_delay(1) == OUTBOX_BACKOFF_BASE
+        assert backoff_delay(3) == OUTBOX_BACKOFF_BASE * 4
+        assert backoff_delay(100) == OUTBOX_BACKOFF_MAX
+
+    def test_background_loop_sends_on_notify(self, session_factory, teacher_server):
+        client = TeacherSyncClient(teacher_server.url, timeout=2)
+        dispatcher = OutboxDispatcher(session_factory=session_factory, client=client, poll_interval=60)
+
+        async def main():
+            await dispatcher.start()
+            try:
+                await asyncio.sleep(0.1)
+                db = session_factory()
+                enqueue_review_status(db, "sub_1", "approved", "", "2026-01-01T00:00:00")
+                db.commit()
+                db.close()
+                dispatcher.notify()
+                for _ in range(50):
+                    if teacher_server.requests:
+                        break
+                    await asyncio.sleep(0.05)
+            finally:
+                await dispatcher.stop()
+                await client.aclose()
+
+        asyncio.run(main())
+        assert [path for _, path, _ in teacher_server.requests] == ["/api/admin/sync-review"]
+
+    def test_dispatch_keys_sends_only_given_messages(self, session_factory, teacher_server):
+        db = session_factory()
+        keys = enqueue_evaluation_tasks(db, _template(), [f"t{i}" for i in range(5)])
+        enqueue_review_status(db, "sub_1", "approved", "", "2026-01-01T00:00:00")
+        db.commit()
+        db.close()
+
+        client = TeacherSyncClient(teacher_server.url, timeout=2)
+        dispatcher = OutboxDispatcher(session_factory=session_factory, client=client, batch_size=2)
+
+        async def main():
+            try:
+                return await dispatcher.dispatch_keys(keys)
+            finally:
+                await client.aclose()
+
+        assert asyncio.run(main()) == {"claimed": 5, "sent": 5, "retry": 0, "failed": 0}
+        assert all(path == "/api/admin/sync-evaluation-tasks" for _, path, _ in teacher_server.requests)
+        db = session_factory()
+        assert db.query(SyncOutbox).filter(SyncOutbox.status == "pending").count() == 1
+        db.close()
+
+    def test_claimed_messages_are_leased(self, session_factory):
+        """测试已领取（发送中）的消息不会被其他领取者重复领取"""
+        db = session_factory()
+        enqueue_evaluation_tasks(db, _template(), ["t1", "t2"])
+        db.commit()
+        db.close()
+
+        dispatcher = OutboxDispatcher(session_factory=session_factory)
+        assert len(dispatcher._claim_due()) == 2
+        assert dispatcher._claim_due() == []
+
+
+class TestDispatchInBackground:
+    """接口交给后台任务同步"""
+
+    def test_returns_job_id_and_drains_on_shutdown(self, session_factory, teacher_server, monkeypatch):
+        teacher_server.delay = 0.05
+        client = TeacherSyncClient(teacher_server.url, timeout=5)
+        monkeypatch.setattr(sync_outbox, "outbox_dispatcher",
+                            OutboxDispatcher(session_factory=session_factory, client=client))
+        monkeypatch.setattr(sync_outbox, "sync_workers", BackgroundWorkerPool("同步任务", workers=2))
+
+        async def main():
+            await sync_outbox.sync_workers.start()
+            db = session_factory()
+            keys = enqueue_evaluation_tasks(db, _template(), ["t1", "t2"])
+            db.commit()
+            db.close()
+            job_id = dispatch_in_background(keys)
+            assert sync_outbox.sync_workers.get_job(job_id)["status"] == "queued"
+            await sync_outbox.sync_workers.stop()
+            await client.aclose()
+            return sync_outbox.sync_workers.get_job(job_id)
+
+        job = asyncio.run(main())
+        assert job["status"] == "succeeded"
+        assert job["result"]["sent"] == 2
+
+    def test_falls_back_to_polling_when_pool_unavailable(self, monkeypatch):
+        monkeypatch.setattr(sync_outbox, "sync_workers", BackgroundWorkerPool("同步任务"))
+        assert dispatch_in_background(["task:x"]) is None
+        assert dispatch_in_background([]) is None
+
+
+class TestSyncLatencyBenchmark:
+    """分发接口延迟基准：等待教师端响应（旧） vs 交给后台任务（新）"""
+
+    TEACHERS = 200
+    REQUESTS = 30
+    TEACHER_DELAY = 0.05
+
+    @staticmethod
+    def _percentiles(samples):
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return statistics.median(ordered) * 1000, p99 * 1000
+
+    def test_endpoint_latency(self, session_factory, teacher_server, monkeypatch):
+        teacher_server.delay = self.TEACHER_DELAY
+        client = TeacherSyncClient(teacher_server.url, timeout=10)
+        monkeypatch.setattr(sync_services, "teacher_sync_client", client)
+        monkeypatch.setattr(sync_outbox, "outbox_dispatcher",
+                            OutboxDispatcher(session_factory=session_factory, client=client))
+        monkeypatch.setattr(sync_outbox, "sync_workers", BackgroundWorkerPool("同步任务"))
+
+        db = session_factory()
+        _seed_template(db, "warmup", teacher_count=self.TEACHERS)
+        templates = {
+            mode: [_seed_template(db, f"{mode}_{i}") for i in range(self.REQUESTS)]
+            for mode in ("await", "background")
+        }
+
+        async def main():
+            timings = {"await": [], "background": []}
+            await sync_outbox.sync_workers.start()
+            try:
+                for template in templates["await"]:
+                    start = time.perf_counter()
+                    result = distribute_template(db, template)
+                    await client.post_bulk(
+                        "/api/admin/sync-evaluation-tasks",
+                        "/api/admin/sync-evaluation-task",
+                        "tasks",
+                        [sync_services.evaluation_task_payload(template, t["teacher_id"]) for t in result["teachers"]]
+                    )
+                    timings["await"].append(time.perf_counter() - start)
+
+                for template in templates["background"]:
+                    start = time.perf_counter()
+                    result = distribute_template(db, template)
+                    dispatch_in_background(result["sync_keys"])
+                    timings["background"].append(time.perf_counter() - start)
+                    await asyncio.sleep(0)
+            finally:
+                await sync_outbox.sync_workers.stop()
+                await client.aclose()
+            return timings
+
+        timings = asyncio.run(main())
+
+        # 后台任务在停止前全部发送完毕
+        pending = db.query(SyncOutbox).filter(
+            SyncOutbox.status == "pending",
+            SyncOutbox.idempotency_key.like("task:background_%")
+        ).count()
+        db.close()
+        assert pending == 0
+
+        before = self._percentiles(timings["await"])
+        after = self._percentiles(timings["background"])
+        print(f"\n分发 {self.TEACHERS} 名教师（教师端响应 {self.TEACHER_DELAY * 1000:.0f}ms）: "
+              f"等待同步 p50 {before[0]:.1f}ms / p99 {before[1]:.1f}ms, "
+              f"后台任务 p50 {after[0]:.1f}ms / p99 {after[1]:.1f}ms")
+        assert after[0] < before[0]
+        assert before[0] >= self.TEACHER_DELAY * 1000
@@ -0,0 +1,201 @@
+"""
+考评表分发测试
+
+测试批量创建考评任务、重复分发幂等、SQL 条数不随教师人数增长，
+以及 10000 名教师的分发基准（与逐个教师查询 + 逐个 add 的旧实现对比）。
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Base, EvaluationAssignmentTask, EvaluationTemplate, Teacher
+from app.task_distribution import distribute_template, load_target_teachers
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'distribution.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _seed(db, teacher_count, template_id="tpl_1"):
+    if teacher_count:
+        db.execute(Teacher.__table__.insert(), [
+            {"teacher_id": f"t{i:05d}", "teacher_name": f"教师{i}", "department_id": "d1"}
+            for i in range(teacher_count)
+        ])
+    template = EvaluationTemplate(
+        template_id=template_id,
+        name="教学考评表",
+        file_url="/uploads/tpl.pdf",
+        file_name="tpl.pdf",
+        file_type="pdf",
+        scoring_criteria=[],
+        submission_requirements={},
+        deadline=datetime.utcnow() + timedelta(days=7),
+        target_teachers=[],
+        status="draft"
+    )
+    db.add(template)
+    db.commit()
+    return template
+
+
+def _distribute_one_by_one(db, template, teacher_ids):
+    """旧实现：逐个查询教师、逐个 add 任务，再查一次教师重建 target_teachers"""
+    created = 0
+    for teacher_id in teacher_ids:
+        teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
+        if not teacher:
+            continue
+        db.add(EvaluationAssignmentTask(
+            task_id=f"{template.template_id}_{teacher_id}",
+            template_id=template.template_id,
+            teacher_id=teacher_id,
+            teacher_name=teacher.teacher_name,
+            deadline=template.deadline,
+            status="pending"
+        ))
+        created += 1
+    db.commit()
+    template.status = "published"
+    template.target_teachers = [
+        {"teacher_id": t.teacher_id, "teacher_name": t.teacher_name}
+        for t in db.query(Teacher).filter(Teacher.teacher_id.in_(teacher_ids)).all()
+    ]
+    db.commit()
+    return created
+
+
+class TestDistributeTemplate:
+    """分发结果测试"""
+
+    def test_batch_distribution_creates_all_tasks(self, db):
+        template = _seed(db, 5)
+        result = distribute_template(db, template)
+
+        assert result["created"] == 5
+        assert result["existing"] == 0
+        tasks = db.query(EvaluationAssignmentTask).order_by(EvaluationAssignmentTask.task_id).all()
+        assert [t.task_id for t in tasks] == [f"tpl_1_t{i:05d}" for i in range(5)]
+        assert tasks[0].teacher_name == "教师0"
+        assert tasks[0].status == "pending"
+        assert tasks[0].deadline == template.deadline
+        # 未显式给出的列使用模型默认值
+        assert tasks[0].is_viewed is False
+        assert tasks[0].created_at is not None
+
+        db.refresh(template)
+        assert template.status == "published"
+        assert template.target_teachers[0] == {"teacher_id": "t00000", "teacher_name": "教师0"}
+
+    def test_targeted_skips_unknown_and_duplicate_ids(self, db):
+        template = _seed(db, 5)
+        result = distribute_template(db, template, ["t00003", "unknown", "t00001", "t00003"])
+
+        assert [t["teacher_id"] for t in result["teachers"]] == ["t00003", "t00001"]
+        assert result["created"] == 2
+        assert db.query(EvaluationAssignmentTask).count() == 2
+
+    def test_redistribution_is_idempotent(self, db):
+        """测试重复分发只补建缺少的任务，已有任务（含已评分）保持不变"""
+        template = _seed(db, 6)
+        distribute_template(db, template, ["t00000", "t00001"])
+        scored = db.get(EvaluationAssignmentTask, "tpl_1_t00000")
+        scored.status = "scored"
+        scored.total_score = 90
+        db.commit()
+
+        result = distribute_template(db, template)
+
+        assert result["created"] == 4
+        assert result["existing"] == 2
+        assert db.query(EvaluationAssignmentTask).count() == 6
+        db.expire_all()
+        assert db.get(EvaluationAssignmentTask, "tpl_1_t00000").status == "scored"
+
+    def test_no_teachers(self, db):
+        template = _seed(db, 0)
+        result = distribute_template(db, template, ["unknown"])
+
+        assert result == {"teachers": [], "created": 0, "existing": 0, "sync_keys": []}
+
+    def test_load_target_teachers_chunks_large_id_lists(self, db):
+        _seed(db, 1200)
+        teachers = load_target_teachers(db, [f"t{i:05d}" for i in range(1199, -1, -1)])
+
+        assert len(teachers) == 1200
+        assert teachers[0]["teacher_id"] == "t01199"
+
+    @pytest.mark.parametrize("teacher_count", [10, 1000])
+    def test_statement_count_constant(self, engine, db, teacher_count):
+        """测试 SQL 条数不随教师人数增长"""
+        template = _seed(db, teacher_count)
+        with count_statements(engine) as statements:
+            distribute_template(db, template)
+
+        # 加载教师、插入前后计数、插入任务、插入同步消息、更新考评表、提交
+        assert len(statements) <= 7
+
+
+class TestDistributionBenchmark:
+    """10000 名教师分发基准"""
+
+    TEACHERS = 10000
+
+    def test_bulk_vs_one_by_one(self, tmp_path):
+        timings = {}
+        for name in ("one_by_one", "bulk"):
+            engine = create_engine(f"sqlite:///{tmp_path / f'{name}.db'}")
+            Base.metadata.create_all(bind=engine)
+            db = sessionmaker(bind=engine)()
+            template = _seed(db, self.TEACHERS)
+            teacher_ids = [f"t{i:05d}" for i in range(self.TEACHERS)]
+
+            start = time.perf_counter()
+            if name == "bulk":
+                created = distribute_template(db, template, teacher_ids)["created"]
+            else:
+                created = _distribute_one_by_one(db, template, teacher_ids)
+            timings[name] = time.perf_counter() - start
+
+            assert created == self.TEACHERS
+            assert db.query(EvaluationAssignmentTask).count() == self.TEACHERS
+            db.close()
+            engine.dispose()
+
+        print(f"\n分发 {self.TEACHERS} 名教师: 逐个 {timings['one_by_one']:.2f}s, "
+              f"批量 {timings['bulk']:.2f}s ({timings['one_by_one'] / timings['bulk']:.1f}x)")
+        assert timings["bulk"] * 3 < timings["one_by_one"]
@@ -0,0 +1,170 @@
+"""
+教师端同步客户端测试
+
+使用本地模拟教师端服务，测试批量接口分批发送、连接复用（keep-alive）、
+旧版教师端没有批量接口时退回逐条同步，以及请求失败不抛异常。
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sync_services import TeacherSyncClient
+from app.services import sync_services
+
+
+class _MockTeacherHandler(BaseHTTPRequestHandler):
+    """模拟教师端同步接口，记录请求路径、条数和客户端连接"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append((self.path, body))
+            server.connections.add(self.client_address)
+
+        is_bulk = self.path in ("/api/admin/sync-evaluation-tasks", "/api/admin/sync-distributions")
+        if is_bulk and server.legacy:
+            self._reply(404, {"detail": "Not Found"})
+        else:
+            self._reply(200, {"message": "ok"})
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def teacher_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockTeacherHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = set()
+    server.legacy = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _template():
+    return SimpleNamespace(
+        template_id="tpl_1",
+        name="教学考评表",
+        file_url="/uploads/tpl.pdf",
+        file_type="pdf",
+        submission_requirements={},
+        scoring_criteria=[{"name": "完成度", "max_score": 10}],
+        total_score=100,
+        deadline=datetime(2026, 1, 1)
+    )
+
+
+def _sync_tasks(client, teacher_count):
+    async def main():
+        try:
+            return await client.post_bulk(
+                "/api/admin/sync-evaluation-tasks",
+                "/api/admin/sync-evaluation-task",
+                "tasks",
+                [sync_services.evaluation_task_payload(_template(), f"t{i:03d}") for i in range(teacher_count)]
+            )
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+class TestTeacherSyncClient:
+    """同步客户端测试"""
+
+    def test_bulk_sync_500_teachers_in_few_requests(self, teacher_server):
+        """测试 500 位教师按批量接口分 3 个请求发送"""
+        client = TeacherSyncClient(teacher_server.url, concurrency=4, batch_size=200)
+        result = _sync_tasks(client, 500)
+
+        assert result == {"success": 500, "failed": 0}
+        assert [path for path, _ in teacher_server.requests] == ["/api/admin/sync-evaluation-tasks"] * 3
+        tasks = [task for _, body in teacher_server.requests for task in body["tasks"]]
+        assert sorted(task["task_id"] for task in tasks) == [f"tpl_1_t{i:03d}" for i in range(500)]
+        assert tasks[0]["deadline"] == "2026-01-01T00:00:00"
+
+    def test_falls_back_to_single_requests_on_old_teacher_service(self, teacher_server):
+        """测试教师端没有批量接口时逐条同步，并复用有限的连接"""
+        teacher_server.legacy = True
+        client = TeacherSyncClient(teacher_server.url, concurrency=4, batch_size=50)
+        result = _sync_tasks(client, 100)
+
+        assert result == {"success": 100, "failed": 0}
+        single = [body for path, body in teacher_server.requests if path == "/api/admin/sync-evaluation-task"]
+        assert len(single) == 100
+        # keep-alive：100 个请求最多使用 concurrency 个连接
+        assert len(teacher_server.connections) <= 4
+
+    def test_distribution_bulk_payload(self, teacher_server):
+        client = TeacherSyncClient(teacher_server.url)
+
+        async def main():
+            try:
+                return await client.post_bulk(
+                    "/api/admin/sync-distributions",
+                    "/api/admin/sync-distribution",
+                    "distributions",
+                    [
+                        sync_services.distribution_payload(
+                            "mat_1", teacher_id, "教案模板", "file", "/uploads/mat_1", "2026-01-01T00:00:00"
+                        )
+                        for teacher_id in ["t1", "t2"]
+                    ]
+                )
+            finally:
+                await client.aclose()
+
+        assert asyncio.run(main()) == {"success": 2, "failed": 0}
+        path, body = teacher_server.requests[0]
+        assert path == "/api/admin/sync-distributions"
+        assert [d["teacher_id"] for d in body["distributions"]] == ["t1", "t2"]
+
+    def test_unreachable_teacher_service_reports_failures(self):
+        """测试教师端不可用时不抛异常，全部记为失败"""
+        client = TeacherSyncClient("http://127.0.0.1:9", batch_size=10, timeout=2)
+        assert _sync_tasks(client, 25) == {"success": 0, "failed": 25}
+
+    def test_gather_bounded_limits_concurrency(self):
+        client = TeacherSyncClient(concurrency=3)
+        running = 0
+        peak = 0
+
+        async def job(i):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return i
+
+        results = asyncio.run(client.gather_bounded([job(i) for i in range(10)]))
+
+        assert results == list(range(10))
+        assert peak == 3
@@ -11,6 +11,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.models import Base, ScoringTemplate
 from app.services.template_manager import (
+    CompiledTemplateCache,
     TemplateManager,
     DEFAULT_TEMPLATES,
     LESSON_PLAN_TEMPLATE
@@ -341,3 +342,96 @@ class TestTemplateIntegration:
         for file_type in ["教学反思", "教研/听课记录", "成绩/学情分析", "课件"]:
             retrieved = template_manager.get_template(file_type)
             assert retrieved is not None
+
+
+class TestCompiledTemplateCache:
+    """已编译模板缓存测试"""
+    
+    @pytest.fixture
+    def cache(self):
+        return CompiledTemplateCache(ttl=60)
+    
+    @pytest.fixture
+    def manager(self, db_session, cache):
+        return TemplateManager(db_session, cache=cache)
+    
+    def _count_queries(self, db_session):
+        """统计模板表查询次数"""
+        from sqlalchemy import event
+        queries = []
+        
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                queries.append(statement)
+        
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        return queries
+    
+    def test_repeated_prompts_use_cache(self, manager, db_session, cache):
+        """测试重复构建提示词时不再查询数据库"""
+        manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        first = manager.build_prompt("教案", "内容一")
+        
+        queries = self._count_queries(db_session)
+        second = manager.build_prompt("教案", "内容二")
+        
+        assert queries == []
+        assert second == first.replace("内容一", "内容二")
+        assert cache.stats()["hits"] == 1
+    
+    def test_update_invalidates_cache(self, manager, cache):
+        """测试更新模板后提示词立即使用新模板"""
+        template_id = manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        assert "教学目标（25分）" in manager.build_prompt("教案", "内容")
+        
+        updated = json.loads(json.dumps(DEFAULT_TEMPLATES["教案"]))
+        updated["core_indicators"][0]["weight"] = 30
+        manager.update_template(template_id, updated)
+        
+        assert cache.version == 2
+        assert "教学目标（30分）" in manager.build_prompt("教案", "内容")
+    
+    def test_delete_invalidates_cache(self, manager):
+        template_id = manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        manager.build_prompt("教案", "内容")
+        manager.delete_template(template_id)
+        
+        assert manager.get_template("教案") is None
+        with pytest.raises(ValueError):
+            manager.build_prompt("教案", "内容")
+    
+    def test_get_template_returns_copy(self, manager):
+        """测试修改 get_template 的返回值不影响缓存"""
+        manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        manager.get_template("教案")["core_indicators"].clear()
+        
+        assert len(manager.get_template("教案")["core_indicators"]) == 4
+    
+    def test_databases_not_shared(self, manager, cache):
+        """测试不同数据库的模板分别缓存"""
+        manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        manager.get_template("教案")
+        
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        other = TemplateManager(sessionmaker(bind=engine)(), cache=cache)
+        assert other.get_template("教案") is None
+    
+    def test_stale_read_not_cached(self, manager, db_session, cache):
+        """测试查询期间模板被修改时，旧版本的查询结果不写入缓存"""
+        manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        version = cache.version
+        cache.invalidate()
+        
+        cache.set_template(db_session.get_bind(), "教案", ({}, ""), version)
+        assert cache.get_template(db_session.get_bind(), "教案") is None
+    
+    def test_ttl_zero_disables_cache(self, db_session):
+        cache = CompiledTemplateCache(ttl=0)
+        manager = TemplateManager(db_session, cache=cache)
+        manager.create_template("教案", DEFAULT_TEMPLATES["教案"])
+        manager.build_prompt("教案", "内容")
+        
+        queries = self._count_queries(db_session)
+        manager.build_prompt("教案", "内容")
+        assert len(queries) == 1
@@ -0,0 +1,180 @@
+"""
+按字数预算提取文本测试
+
+测试 PDF/PPTX 逐页提取在达到字数预算后停止解析后续页面，
+记录采样页，以及预算参与解析缓存键。
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.text_budget import collect_pages, format_page_ranges, render_collected, truncate_text
+from app.utils.parse_cache import ParseCache
+from app.utils.file_parser import FileParser as UtilsFileParser
+from app.file_parser import FileParser as LegacyFileParser
+
+
+def _write_pdf(path, page_texts):
+    """生成每页一行 ASCII 文本的最小 PDF"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # 页面树，页面对象编号确定后再填写
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    path.write_bytes(data)
+    return str(path)
+
+
+def _write_pptx(path, slide_texts):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    for text in slide_texts:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(Inches(1), Inches(1), Inches(6), Inches(1)).text = text
+    prs.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    return _write_pdf(tmp_path / "plan.pdf", [f"Page {i} " + "x" * 90 for i in range(1, 31)])
+
+
+@pytest.fixture
+def pptx_file(tmp_path):
+    return _write_pptx(tmp_path / "slides.pptx", [f"Slide {i} " + "y" * 90 for i in range(1, 31)])
+
+
+class TestCollectPages:
+    """collect_pages 测试"""
+
+    def test_stops_consuming_pages_at_budget(self):
+        """测试达到预算后不再从生成器取页"""
+        consumed = []
+
+        def pages():
+            for number in range(1, 101):
+                consumed.append(number)
+                yield number, "a" * 10
+
+        result = collect_pages(pages(), max_chars=25, separator="\n")
+
+        assert consumed == [1, 2, 3]
+        assert result["sampled_pages"] == [1, 2, 3]
+        assert result["truncated"] is True
+        assert len(result["text"]) == 25
+
+    def test_no_budget_keeps_everything(self):
+        """测试不限制时与直接拼接结果一致"""
+        pages = [(1, "甲"), (2, ""), (3, "丙")]
+        result = collect_pages(iter(pages), max_chars=None)
+
+        assert result["text"] == "甲\n丙"
+        assert result["sampled_pages"] == [1, 3]
+        assert result["truncated"] is False
+        assert render_collected(result) == "甲\n丙"
+
+    def test_exact_fit_not_truncated(self):
+        """测试恰好用完预算且没有后续页面时不算截断"""
+        result = collect_pages(iter([(1, "a" * 10)]), max_chars=10)
+        assert result["truncated"] is False
+
+    def test_render_notes_sampled_pages(self):
+        """测试截断时附加采样页说明"""
+        result = collect_pages(iter([(1, "aaa"), (2, "bbb"), (4, "ccc"), (5, "ddd")]),
+                               max_chars=11, total_pages=300)
+        text = render_collected(result)
+
+        assert text.startswith("aaa\nbbb\nccc")
+        assert "共 300 页" in text
+        assert "已提取第 1-2, 4 页" in text
+
+    def test_format_page_ranges(self):
+        assert format_page_ranges([1, 2, 3, 5, 7, 8]) == "1-3, 5, 7-8"
+        assert format_page_ranges([]) == ""
+
+    def test_truncate_text(self):
+        """测试整篇文本截断"""
+        assert truncate_text("短文本", 100) == "短文本"
+        assert truncate_text("a" * 50, None) == "a" * 50
+        truncated = truncate_text("a" * 50, 10)
+        assert truncated.startswith("a" * 10 + "\n\n[内容已截断：全文 50 字")
+
+
+class TestBudgetedParsing:
+    """解析器按预算提取测试"""
+
+    def test_pdf_stops_extracting_pages(self, pdf_file):
+        """测试 PDF 达到预算后不再提取后续页面"""
+        from PyPDF2 import PageObject
+        original = PageObject.extract_text
+
+        with patch.object(PageObject, "extract_text", autospec=True, side_effect=original) as extract:
+            content = LegacyFileParser.parse_pdf(pdf_file, max_chars=250)
+
+        assert extract.call_count == 3
+        assert content.startswith("Page 1 ")
+        assert "Page 4" not in content
+        assert "共 30 页，已提取第 1-3 页" in content
+
+    def test_pdf_without_budget_unchanged(self, pdf_file):
+        """测试不限制时提取全部页面"""
+        content = LegacyFileParser.parse_pdf(pdf_file)
+        assert "Page 30" in content
+        assert "内容已截断" not in content
+
+    @pytest.mark.parametrize("parser", [LegacyFileParser, UtilsFileParser()])
+    def test_pptx_budget(self, parser, pptx_file):
+        """测试 PPTX 达到预算后停止，并记录采样幻灯片"""
+        content = parser.parse_pptx(pptx_file, max_chars=300)
+
+        assert "[幻灯片 1]" in content
+        assert "[幻灯片 4]" not in content
+        assert "共 30 张幻灯片" in content
+
+    def test_utils_pdf_budget(self, pdf_file):
+        """测试 app.utils 解析器的 PDF 预算"""
+        content = UtilsFileParser().parse_file(pdf_file, max_chars=150)
+        assert content.startswith("Page 1 ")
+        assert "已提取第 1-2 页" in content
+
+    def test_budget_in_cache_key(self, tmp_path, pdf_file):
+        """测试不同预算的结果分开缓存"""
+        cache = ParseCache(cache_dir=str(tmp_path / "cache"), enabled=True)
+        with patch("app.file_parser.parse_cache", cache):
+            limited = LegacyFileParser.parse_file_cached(pdf_file, "pdf", max_chars=250)
+            full = LegacyFileParser.parse_file_cached(pdf_file, "pdf", max_chars=None)
+
+        assert "内容已截断" in limited
+        assert "Page 30" in full
+        assert cache.stats()["misses"] == 2